@@ -0,0 +1,298 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A Categorical DQN (C51) Agent.
+
+Implements the Categorical DQN agent from
+
+"A Distributional Perspective on Reinforcement Learning"
+  Bellemare et al., 2017
+  https://arxiv.org/abs/1707.06887
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.agents import tf_agent
+from tf_agents.agents.dqn import dqn_agent
+from tf_agents.policies import categorical_q_policy
+from tf_agents.utils import common
+
+import gin.tf
+
+
+def project_distribution(supports, weights, target_support):
+  """Projects a batch of categorical distributions onto a target support.
+
+  Each atom of a distribution gives its weight to the two closest atoms of the
+  target support, in proportion to how close it is to each of them. Atoms
+  outside of the target support give their weight to its closest end. The
+  projection is computed for all the atoms of all the distributions at once,
+  with a single segment sum.
+
+  Args:
+    supports: A [B, N] tensor with the atoms of the distributions to project.
+    weights: A [B, N] tensor with the probabilities of these atoms.
+    target_support: A [M] array with the evenly spaced, increasing atoms to
+      project onto. M must be at least 2.
+
+  Returns:
+    A [B, M] tensor with the probabilities of the projected distributions.
+  """
+  with tf.name_scope('project_distribution'):
+    target_support = np.asarray(target_support, dtype=np.float32)
+    num_target_atoms = target_support.shape[0]
+    v_min = target_support[0]
+    delta_z = target_support[1] - target_support[0]
+
+    # Fractional index of each atom in the target support.
+    index = tf.clip_by_value((supports - v_min) / delta_z, 0.,
+                             num_target_atoms - 1.)
+    lower_index = tf.floor(index)
+    upper_index = tf.math.ceil(index)
+    # Atoms exactly on a target atom have lower_index == upper_index, and give
+    # all of their weight to it.
+    lower_weights = weights * (
+        upper_index - index +
+        tf.cast(tf.equal(lower_index, upper_index), weights.dtype))
+    upper_weights = weights * (index - lower_index)
+
+    batch_size = tf.shape(input=weights)[0]
+    offsets = tf.expand_dims(tf.range(batch_size) * num_target_atoms, -1)
+    segment_ids = tf.concat([
+        tf.cast(lower_index, tf.int32) + offsets,
+        tf.cast(upper_index, tf.int32) + offsets
+    ], axis=1)
+    projection = tf.math.unsorted_segment_sum(
+        tf.concat([lower_weights, upper_weights], axis=1), segment_ids,
+        batch_size * num_target_atoms)
+    return tf.reshape(projection, [batch_size, num_target_atoms])
+
+
+@gin.configurable
+class CategoricalDqnAgent(dqn_agent.DqnAgent):
+  """A Categorical DQN (C51) Agent.
+
+  The q network predicts a categorical distribution over `num_atoms` Q values
+  evenly spaced between min_q_value and max_q_value for each action, e.g. a
+  `CategoricalQNetwork`. The policies select actions by the expected values of
+  these distributions.
+  """
+
+  def __init__(
+      self,
+      time_step_spec,
+      action_spec,
+      categorical_q_network,
+      optimizer,
+      min_q_value=-10.0,
+      max_q_value=10.0,
+      epsilon_greedy=0.1,
+      boltzmann_temperature=None,
+      # Params for target network updates
+      target_update_tau=1.0,
+      target_update_period=1,
+      # Params for training.
+      gamma=1.0,
+      reward_scale_factor=1.0,
+      gradient_clipping=None,
+      # Params for debugging
+      debug_summaries=False,
+      summarize_grads_and_vars=False,
+      train_step_counter=None,
+      name=None):
+    """Creates a Categorical DQN Agent.
+
+    Args:
+      time_step_spec: A `TimeStep` spec of the expected time_steps.
+      action_spec: A nest of BoundedTensorSpec representing the actions.
+      categorical_q_network: A tf_agents.network.Network to be used by the
+        agent. The network will be called with call(observation, step_type)
+        and must return logits shaped [B, num_actions, num_atoms], and have a
+        `num_atoms` property, e.g. a `CategoricalQNetwork`.
+      optimizer: The optimizer to use for training.
+      min_q_value: The lowest Q value of the support of the distributions.
+      max_q_value: The highest Q value of the support of the distributions.
+      epsilon_greedy: probability of choosing a random action in the default
+        epsilon-greedy collect policy (used only if a wrapper is not provided to
+        the collect_policy method).
+      boltzmann_temperature: Temperature value to use for Boltzmann sampling of
+        the actions during data collection. The closer to 0.0, the higher the
+        probability of choosing the best action.
+      target_update_tau: Factor for soft update of the target networks.
+      target_update_period: Period for soft update of the target networks.
+      gamma: A discount factor for future rewards.
+      reward_scale_factor: Multiplicative scale for the reward.
+      gradient_clipping: Norm length to clip gradients.
+      debug_summaries: A bool to gather debug summaries.
+      summarize_grads_and_vars: If True, gradient and network variable summaries
+        will be written during training.
+      train_step_counter: An optional counter to increment every time the train
+        op is run.  Defaults to the global_step.
+      name: The name of this agent. All variables in this module will fall
+        under that name. Defaults to the class name.
+
+    Raises:
+      ValueError: If the action spec contains more than one action or action
+        spec minimum is not equal to 0, if the network is recurrent, or if it
+        has less than 2 atoms.
+    """
+    if categorical_q_network.state_spec:
+      raise ValueError('Recurrent networks are not supported.')
+    if categorical_q_network.num_atoms < 2:
+      raise ValueError('The network must have at least 2 atoms, got {}.'.format(
+          categorical_q_network.num_atoms))
+    self._support = np.linspace(
+        min_q_value, max_q_value, categorical_q_network.num_atoms,
+        dtype=np.float32)
+
+    super(CategoricalDqnAgent, self).__init__(
+        time_step_spec,
+        action_spec,
+        categorical_q_network,
+        optimizer,
+        epsilon_greedy=epsilon_greedy,
+        boltzmann_temperature=boltzmann_temperature,
+        target_update_tau=target_update_tau,
+        target_update_period=target_update_period,
+        gamma=gamma,
+        reward_scale_factor=reward_scale_factor,
+        gradient_clipping=gradient_clipping,
+        debug_summaries=debug_summaries,
+        summarize_grads_and_vars=summarize_grads_and_vars,
+        train_step_counter=train_step_counter,
+        name=name)
+
+  def _setup_q_policy(self, time_step_spec, action_spec):
+    return categorical_q_policy.CategoricalQPolicy(
+        time_step_spec,
+        action_spec,
+        q_network=self._q_network,
+        support=self._support)
+
+  def loss(self,
+           time_steps,
+           actions,
+           next_time_steps,
+           td_errors_loss_fn=None,
+           gamma=1.0,
+           reward_scale_factor=1.0,
+           weights=None):
+    """Computes the categorical loss of C51 training.
+
+    The loss is the cross entropy between the distribution predicted for the
+    actions, and the target distribution projected onto the support.
+
+    Args:
+      time_steps: A batch of timesteps.
+      actions: A batch of actions.
+      next_time_steps: A batch of next timesteps.
+      td_errors_loss_fn: Unused, kept for compatibility with `DqnAgent`.
+      gamma: Discount for future rewards.
+      reward_scale_factor: Multiplicative factor to scale rewards.
+      weights: Optional scalar or elementwise (per-batch-entry) importance
+        weights.  The output td_loss will be scaled by these weights, and
+        the final scalar loss is the mean of these values.
+
+    Returns:
+      loss: An instance of `DqnLossInfo`.
+    """
+    del td_errors_loss_fn  # Unused.
+    with tf.name_scope('loss'):
+      support = tf.constant(self._support)
+      actions = tf.reshape(
+          tf.cast(tf.nest.flatten(actions)[0], dtype=tf.int32), [-1])
+      logits, _ = self._q_network(time_steps.observation,
+                                  time_steps.step_type)
+      logits = _index_with_actions(logits, actions)
+
+      next_distribution = self._compute_next_q_distribution(next_time_steps)
+      rewards = reward_scale_factor * next_time_steps.reward
+      discounts = gamma * next_time_steps.discount
+      target_support = (
+          tf.expand_dims(rewards, -1) +
+          tf.expand_dims(discounts, -1) * tf.expand_dims(support, 0))
+      target_distribution = tf.stop_gradient(
+          project_distribution(target_support, next_distribution,
+                               self._support))
+
+      valid_mask = tf.cast(~time_steps.is_last(), tf.float32)
+      td_loss = valid_mask * tf.compat.v2.nn.softmax_cross_entropy_with_logits(
+          labels=target_distribution, logits=logits)
+
+      q_values = common.convert_q_logits_to_values(logits, support)
+      td_targets = tf.reduce_sum(
+          input_tensor=support * target_distribution, axis=-1)
+      td_error = valid_mask * (td_targets - q_values)
+
+      if weights is not None:
+        td_loss *= weights
+
+      # Average across the elements of the batch, see DqnAgent.loss.
+      loss = tf.reduce_mean(input_tensor=td_loss)
+
+      with tf.name_scope('Losses/'):
+        tf.compat.v2.summary.scalar(
+            name='loss', data=loss, step=self.train_step_counter)
+
+      if self._summarize_grads_and_vars:
+        with tf.name_scope('Variables/'):
+          for var in self._q_network.trainable_weights:
+            tf.compat.v2.summary.histogram(
+                name=var.name.replace(':', '_'),
+                data=var,
+                step=self.train_step_counter)
+
+      if self._debug_summaries:
+        common.generate_tensor_summaries('td_error', td_error,
+                                         self.train_step_counter)
+        common.generate_tensor_summaries('td_loss', td_loss,
+                                         self.train_step_counter)
+        common.generate_tensor_summaries('q_values', q_values,
+                                         self.train_step_counter)
+        common.generate_tensor_summaries('td_targets', td_targets,
+                                         self.train_step_counter)
+
+      return tf_agent.LossInfo(loss, dqn_agent.DqnLossInfo(td_loss=td_loss,
+                                                           td_error=td_error))
+
+  def _compute_next_q_distribution(self, next_time_steps):
+    """Compute the distribution of the q value of the next state.
+
+    Args:
+      next_time_steps: A batch of next timesteps
+
+    Returns:
+      A [B, num_atoms] tensor with the probabilities of the atoms of the
+      distribution of the best next action of the target network.
+    """
+    next_target_logits, _ = self._target_q_network(
+        next_time_steps.observation, next_time_steps.step_type)
+    next_target_q_values = common.convert_q_logits_to_values(
+        next_target_logits, tf.constant(self._support))
+    best_next_actions = tf.argmax(
+        input=next_target_q_values, axis=-1, output_type=tf.int32)
+    return tf.nn.softmax(
+        _index_with_actions(next_target_logits, best_next_actions))
+
+
+def _index_with_actions(logits, actions):
+  """Selects the [B, num_atoms] logits of [B] actions in [B, A, num_atoms]."""
+  batch_indices = tf.range(tf.shape(input=logits)[0])
+  return tf.gather_nd(logits, tf.stack([batch_indices, actions], axis=-1))
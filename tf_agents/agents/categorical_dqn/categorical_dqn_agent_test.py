@@ -0,0 +1,163 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for agents.categorical_dqn.categorical_dqn_agent."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.agents.categorical_dqn import categorical_dqn_agent
+from tf_agents.networks import categorical_q_network
+from tf_agents.networks import q_rnn_network
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+from tf_agents.trajectories import trajectory
+from tf_agents.utils import common
+
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+def _project_distribution_reference(supports, weights, target_support):
+  """Projects the distributions one atom at a time."""
+  delta_z = target_support[1] - target_support[0]
+  projection = np.zeros([supports.shape[0], len(target_support)])
+  for b in range(supports.shape[0]):
+    for atom, weight in zip(supports[b], weights[b]):
+      atom = np.clip(atom, target_support[0], target_support[-1])
+      for i, target_atom in enumerate(target_support):
+        projection[b, i] += weight * max(
+            0., 1. - abs(atom - target_atom) / delta_z)
+  return projection
+
+
+class ProjectDistributionTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testMatchesReference(self):
+    rng = np.random.RandomState(0)
+    target_support = np.linspace(-10., 10., 11, dtype=np.float32)
+    supports = rng.uniform(-15., 15., [4, 11]).astype(np.float32)
+    weights = rng.dirichlet(np.ones(11), 4).astype(np.float32)
+
+    projection = categorical_dqn_agent.project_distribution(
+        tf.constant(supports), tf.constant(weights), target_support)
+    projection = self.evaluate(projection)
+    self.assertAllClose(
+        _project_distribution_reference(supports, weights, target_support),
+        projection, atol=1e-5)
+    self.assertAllClose(np.ones(4), projection.sum(axis=1), atol=1e-5)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testIdentityOnTargetSupport(self):
+    target_support = np.linspace(-1., 1., 5, dtype=np.float32)
+    weights = [[0.1, 0.2, 0.3, 0.4, 0.0], [0.0, 0.0, 1.0, 0.0, 0.0]]
+    projection = categorical_dqn_agent.project_distribution(
+        tf.constant([target_support] * 2), tf.constant(weights),
+        target_support)
+    self.assertAllClose(weights, self.evaluate(projection))
+
+
+class CategoricalDqnAgentTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(CategoricalDqnAgentTest, self).setUp()
+    tf.compat.v1.enable_resource_variables()
+    self._obs_spec = tensor_spec.TensorSpec([2], tf.float32)
+    self._time_step_spec = ts.time_step_spec(self._obs_spec)
+    self._action_spec = tensor_spec.BoundedTensorSpec((), tf.int32, 0, 1)
+    self._categorical_net = categorical_q_network.CategoricalQNetwork(
+        self._obs_spec, self._action_spec, num_atoms=11, fc_layer_params=(4,))
+
+  def _create_agent(self, optimizer=None, train_step_counter=None):
+    return categorical_dqn_agent.CategoricalDqnAgent(
+        self._time_step_spec,
+        self._action_spec,
+        categorical_q_network=self._categorical_net,
+        optimizer=optimizer,
+        min_q_value=-5.,
+        max_q_value=5.,
+        gamma=0.9,
+        train_step_counter=train_step_counter)
+
+  def testCreateAgent(self):
+    agent = self._create_agent()
+    self.assertIsNotNone(agent.policy)
+
+  def testCreateAgentWithRecurrentNetworkRaises(self):
+    q_net = q_rnn_network.QRnnNetwork(
+        self._obs_spec, self._action_spec, lstm_size=(4,))
+    with self.assertRaisesRegexp(ValueError, 'Recurrent'):
+      categorical_dqn_agent.CategoricalDqnAgent(
+          self._time_step_spec, self._action_spec, q_net, optimizer=None)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testLoss(self):
+    agent = self._create_agent()
+    observations = tf.constant([[1, 2], [3, 4]], dtype=tf.float32)
+    time_steps = ts.restart(observations, batch_size=2)
+    actions = tf.constant([0, 1], dtype=tf.int32)
+    next_observations = tf.constant([[5, 6], [7, 8]], dtype=tf.float32)
+    next_time_steps = ts.transition(
+        next_observations,
+        reward=tf.constant([1, 2], dtype=tf.float32),
+        discount=tf.constant([1, 0], dtype=tf.float32))
+
+    loss_info = agent.loss(time_steps, actions, next_time_steps)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(agent.initialize())
+    loss, td_loss = self.evaluate([loss_info.loss, loss_info.extra.td_loss])
+    self.assertEqual((2,), td_loss.shape)
+    self.assertAllClose(np.mean(td_loss), loss)
+    self.assertTrue(np.all(td_loss > 0))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testPolicy(self):
+    agent = self._create_agent()
+    observations = tf.constant([[1, 2], [3, 4]], dtype=tf.float32)
+    time_steps = ts.restart(observations, batch_size=2)
+    action_step = agent.policy.action(time_steps)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    actions = self.evaluate(action_step.action)
+    self.assertEqual((2,), actions.shape)
+    self.assertTrue(np.all(actions >= 0) and np.all(actions <= 1))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testTrain(self):
+    counter = common.create_variable('test_train_counter')
+    agent = self._create_agent(
+        optimizer=tf.compat.v1.train.GradientDescentOptimizer(0.1),
+        train_step_counter=counter)
+    experience = trajectory.Trajectory(
+        step_type=tf.constant([[0, 1]] * 2, dtype=tf.int32),
+        observation=tf.constant([[[1, 2], [3, 4]], [[5, 6], [7, 8]]],
+                                dtype=tf.float32),
+        action=tf.constant([[0, 1], [1, 0]], dtype=tf.int32),
+        policy_info=(),
+        next_step_type=tf.constant([[1, 1]] * 2, dtype=tf.int32),
+        reward=tf.constant([[1, 0]] * 2, dtype=tf.float32),
+        discount=tf.constant([[1, 1]] * 2, dtype=tf.float32))
+
+    loss_info = agent.train(experience)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(loss_info)
+    self.assertEqual(1, self.evaluate(counter))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -92,6 +92,10 @@ class DqnAgent(tf_agent.TFAgent):
     https://deepmind.com/research/dqn/
   """
 
+  # Whether q_network runs on both the time steps and the next time steps, see
+  #   fuse_q_network_calls.
+  _supports_fused_q_network_calls = False
+
   def __init__(
       self,
       time_step_spec,
@@ -108,6 +112,7 @@ class DqnAgent(tf_agent.TFAgent):
       gamma=1.0,
       reward_scale_factor=1.0,
       gradient_clipping=None,
+      fuse_q_network_calls=False,
       # Params for debugging
       debug_summaries=False,
       summarize_grads_and_vars=False,
@@ -136,6 +141,16 @@ class DqnAgent(tf_agent.TFAgent):
       gamma: A discount factor for future rewards.
       reward_scale_factor: Multiplicative scale for the reward.
       gradient_clipping: Norm length to clip gradients.
+      fuse_q_network_calls: If True and q_network is not recurrent, agents
+        running q_network on both the time steps and the next time steps (i.e.
+        DdqnAgent) run it once on their concatenation instead. This saves a
+        network call per train step, which speeds up small networks bound by
+        op dispatch, but back-propagates through the network on the next time
+        steps as well, which can be slower for large networks. Layers using
+        batch statistics, e.g. BatchNormalization in training mode, then
+        compute them over the time steps and the next time steps together.
+        Only supported by DdqnAgent, as DqnAgent runs q_network on the time
+        steps only.
       debug_summaries: A bool to gather debug summaries.
       summarize_grads_and_vars: If True, gradient and network variable summaries
         will be written during training.
@@ -146,10 +161,17 @@ class DqnAgent(tf_agent.TFAgent):
 
     Raises:
       ValueError: If the action spec contains more than one action or action
-        spec minimum is not equal to 0.
+        spec minimum is not equal to 0, or if fuse_q_network_calls is set on
+        an agent not supporting it.
     """
     tf.Module.__init__(self, name=name)
 
+    if fuse_q_network_calls and not self._supports_fused_q_network_calls:
+      raise ValueError(
+          '{} runs q_network on the time steps only, so there are no calls to '
+          'fuse: fuse_q_network_calls is only supported by DdqnAgent.'.format(
+              type(self).__name__))
+
     flat_action_spec = tf.nest.flatten(action_spec)
     self._num_actions = [
         spec.maximum - spec.minimum + 1 for spec in flat_action_spec
@@ -179,11 +201,11 @@ class DqnAgent(tf_agent.TFAgent):
     self._gamma = gamma
     self._reward_scale_factor = reward_scale_factor
     self._gradient_clipping = gradient_clipping
+    self._fuse_q_network_calls = fuse_q_network_calls
     self._update_target = self._get_target_updater(
         target_update_tau, target_update_period)
 
-    policy = q_policy.QPolicy(
-        time_step_spec, action_spec, q_network=self._q_network)
+    policy = self._setup_q_policy(time_step_spec, action_spec)
 
     if boltzmann_temperature is not None:
       collect_policy = boltzmann_policy.BoltzmannPolicy(
@@ -207,6 +229,11 @@ class DqnAgent(tf_agent.TFAgent):
     common.soft_variables_update(
         self._q_network.variables, self._target_q_network.variables, tau=1.0)
 
+  def _setup_q_policy(self, time_step_spec, action_spec):
+    """Returns the policy using the q network, before any action selection."""
+    return q_policy.QPolicy(
+        time_step_spec, action_spec, q_network=self._q_network)
+
   def _get_target_updater(self, tau=1.0, period=1):
     """Performs a soft update of the target network parameters.
 
@@ -306,19 +333,8 @@ class DqnAgent(tf_agent.TFAgent):
         if the number of actions is greater than 1.
     """
     with tf.name_scope('loss'):
-      actions = tf.nest.flatten(actions)[0]
-      q_values, _ = self._q_network(time_steps.observation,
-                                    time_steps.step_type)
-
-      # Handle action_spec.shape=(), and shape=(1,) by using the
-      # multi_dim_actions param.
-      multi_dim_actions = tf.nest.flatten(self._action_spec)[0].shape.ndims > 0
-      q_values = common.index_with_actions(
-          q_values,
-          tf.cast(actions, dtype=tf.int32),
-          multi_dim_actions=multi_dim_actions)
-
-      next_q_values = self._compute_next_q_values(next_time_steps)
+      q_values, next_q_values = self._compute_q_values_and_next_q_values(
+          time_steps, actions, next_time_steps)
       td_targets = compute_td_targets(
           next_q_values,
           rewards=reward_scale_factor * next_time_steps.reward,
@@ -374,6 +390,34 @@ class DqnAgent(tf_agent.TFAgent):
       return tf_agent.LossInfo(loss, DqnLossInfo(td_loss=td_loss,
                                                  td_error=td_error))
 
+  def _compute_q_values_and_next_q_values(self, time_steps, actions,
+                                          next_time_steps):
+    """Compute the q values of the actions and of the next states.
+
+    Args:
+      time_steps: A batch of timesteps.
+      actions: A batch of actions.
+      next_time_steps: A batch of next timesteps.
+
+    Returns:
+      A tuple (q_values, next_q_values) of tensors with the Q values of the
+      given actions, and of the given next states for TD error computation.
+    """
+    q_values, _ = self._q_network(time_steps.observation,
+                                  time_steps.step_type)
+    return (self._index_with_actions(q_values, actions),
+            self._compute_next_q_values(next_time_steps))
+
+  def _index_with_actions(self, q_values, actions):
+    actions = tf.nest.flatten(actions)[0]
+    # Handle action_spec.shape=(), and shape=(1,) by using the
+    # multi_dim_actions param.
+    multi_dim_actions = tf.nest.flatten(self._action_spec)[0].shape.ndims > 0
+    return common.index_with_actions(
+        q_values,
+        tf.cast(actions, dtype=tf.int32),
+        multi_dim_actions=multi_dim_actions)
+
   def _compute_next_q_values(self, next_time_steps):
     """Compute the q value of the next state for TD error computation.
 
@@ -400,8 +444,43 @@ class DdqnAgent(DqnAgent):
    Hasselt et al., 2015
    https://arxiv.org/abs/1509.06461
 
+  With fuse_q_network_calls, the q network is run once on the concatenated
+  time steps and next time steps, instead of once on each of them.
   """
 
+  _supports_fused_q_network_calls = True
+
+  def _compute_q_values_and_next_q_values(self, time_steps, actions,
+                                          next_time_steps):
+    """Compute the q values of the actions and of the next states.
+
+    Args:
+      time_steps: A batch of timesteps.
+      actions: A batch of actions.
+      next_time_steps: A batch of next timesteps.
+
+    Returns:
+      A tuple (q_values, next_q_values) of tensors with the Q values of the
+      given actions, and of the given next states for TD error computation.
+    """
+    # The network state of recurrent networks depends on the sequence they are
+    #   run on, so their calls are never fused.
+    if not self._fuse_q_network_calls or self._q_network.state_spec:
+      return super(DdqnAgent, self)._compute_q_values_and_next_q_values(
+          time_steps, actions, next_time_steps)
+
+    observations, step_types = tf.nest.map_structure(
+        lambda t, next_t: tf.concat([t, next_t], axis=0),
+        (time_steps.observation, time_steps.step_type),
+        (next_time_steps.observation, next_time_steps.step_type))
+    all_q_values, _ = self._q_network(observations, step_types)
+    q_values, next_q_values = tf.split(all_q_values, 2, axis=0)
+    next_target_q_values, _ = self._target_q_network(
+        next_time_steps.observation, next_time_steps.step_type)
+    return (self._index_with_actions(q_values, actions),
+            self._select_next_target_q_values(next_q_values,
+                                              next_target_q_values))
+
   def _compute_next_q_values(self, next_time_steps):
     """Compute the q value of the next state for TD error computation.
 
@@ -414,10 +493,15 @@ class DdqnAgent(DqnAgent):
     # TODO(b/117175589): Add binary tests for DDQN.
     next_q_values, _ = self._q_network(next_time_steps.observation,
                                        next_time_steps.step_type)
-    best_next_actions = tf.cast(
-        tf.argmax(input=next_q_values, axis=-1), dtype=tf.int32)
     next_target_q_values, _ = self._target_q_network(
         next_time_steps.observation, next_time_steps.step_type)
+    return self._select_next_target_q_values(next_q_values,
+                                             next_target_q_values)
+
+  def _select_next_target_q_values(self, next_q_values, next_target_q_values):
+    """Selects the target Q values of the best next actions of the q network."""
+    best_next_actions = tf.cast(
+        tf.argmax(input=next_q_values, axis=-1), dtype=tf.int32)
     multi_dim_actions = best_next_actions.shape.ndims > 1
     return common.index_with_actions(
         next_target_q_values,
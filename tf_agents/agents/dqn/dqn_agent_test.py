@@ -19,13 +19,17 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 from absl.testing import parameterized
 import tensorflow as tf
 
 from tf_agents.agents.dqn import dqn_agent
 from tf_agents.networks import network
+from tf_agents.networks import q_network
 from tf_agents.specs import tensor_spec
 from tf_agents.trajectories import time_step as ts
+from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
 
 from tensorflow.python.eager import context  # pylint:disable=g-direct-tensorflow-import  # TF internal
@@ -53,6 +57,20 @@ class DummyNet(network.Network):
     return inputs, network_state
 
 
+class CallCountingNet(DummyNet):
+  """A DummyNet counting the calls of each of its instances."""
+
+  def __init__(self, unused_observation_spec, action_spec, name=None):
+    super(CallCountingNet, self).__init__(unused_observation_spec, action_spec,
+                                          name=name)
+    self.num_calls = 0
+
+  def call(self, inputs, unused_step_type=None, network_state=()):
+    self.num_calls += 1
+    return super(CallCountingNet, self).call(inputs, unused_step_type,
+                                             network_state)
+
+
 class ComputeTDTargetsTest(tf.test.TestCase):
 
   @test_util.run_in_graph_and_eager_modes()
@@ -210,5 +228,183 @@ class AgentTest(tf.test.TestCase):
           self.assertAllEqual(sess.run(action_step.action), [[[0], [0]]])
 
 
+class FusedQNetworkCallsTest(parameterized.TestCase, tf.test.TestCase):
+
+  def setUp(self):
+    super(FusedQNetworkCallsTest, self).setUp()
+    tf.compat.v1.enable_resource_variables()
+    self._obs_spec = [tensor_spec.TensorSpec([2], tf.float32)]
+    self._time_step_spec = ts.time_step_spec(self._obs_spec)
+    self._action_spec = [tensor_spec.BoundedTensorSpec([1], tf.int32, 0, 1)]
+
+  def testDqnAgentRejectsFusedQNetworkCalls(self):
+    q_net = DummyNet(self._obs_spec, self._action_spec)
+    with self.assertRaisesRegexp(ValueError, 'only supported by DdqnAgent'):
+      dqn_agent.DqnAgent(
+          self._time_step_spec,
+          self._action_spec,
+          q_network=q_net,
+          optimizer=None,
+          fuse_q_network_calls=True)
+
+  @parameterized.named_parameters(('Fused', True, 1), ('NotFused', False, 2))
+  @test_util.run_in_graph_and_eager_modes()
+  def testLossWithFusedQNetworkCalls(self, fuse_q_network_calls,
+                                     expected_num_calls):
+    with tf.compat.v2.summary.record_if(False):
+      q_net = CallCountingNet(self._obs_spec, self._action_spec)
+      agent = dqn_agent.DdqnAgent(
+          self._time_step_spec,
+          self._action_spec,
+          q_network=q_net,
+          optimizer=None,
+          fuse_q_network_calls=fuse_q_network_calls)
+
+      observations = [tf.constant([[1, 2], [3, 4]], dtype=tf.float32)]
+      time_steps = ts.restart(observations, batch_size=2)
+
+      actions = [tf.constant([[0], [1]], dtype=tf.int32)]
+
+      rewards = tf.constant([10, 20], dtype=tf.float32)
+      discounts = tf.constant([0.9, 0.9], dtype=tf.float32)
+      next_observations = [tf.constant([[5, 6], [7, 8]], dtype=tf.float32)]
+      next_time_steps = ts.transition(next_observations, rewards, discounts)
+
+      num_calls = q_net.num_calls
+      loss, _ = agent.loss(time_steps, actions, next_time_steps)
+      # The q network runs once on the time steps and next time steps when
+      #   fused, the target network once on the next time steps either way.
+      self.assertEqual(expected_num_calls, q_net.num_calls - num_calls)
+
+      expected_loss = 26.0
+      self.evaluate(tf.compat.v1.initialize_all_variables())
+      self.assertAllClose(self.evaluate(loss), expected_loss)
+
+
+class TrainManyTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(TrainManyTest, self).setUp()
+    tf.compat.v1.enable_resource_variables()
+    self._obs_spec = tensor_spec.TensorSpec([2], tf.float32)
+    self._time_step_spec = ts.time_step_spec(self._obs_spec)
+    self._action_spec = tensor_spec.BoundedTensorSpec((), tf.int32, 0, 1)
+
+  def _create_agent(self):
+    q_net = q_network.QNetwork(
+        self._obs_spec, self._action_spec, fc_layer_params=(8,))
+    return dqn_agent.DqnAgent(
+        self._time_step_spec,
+        self._action_spec,
+        q_network=q_net,
+        optimizer=tf.compat.v1.train.AdamOptimizer(0.01),
+        target_update_period=2,
+        train_step_counter=common.create_variable('train_step_counter'))
+
+  def testTrainManyMatchesTrainSteps(self):
+    if not tf.executing_eagerly():
+      self.skipTest('Iterating over a dataset requires eager mode.')
+    with tf.compat.v2.summary.record_if(False):
+      observations = tf.constant(
+          [[[1, 2], [3, 4]], [[5, 6], [7, 8]]], dtype=tf.float32)
+      mid = tf.fill([2, 2], ts.StepType.MID)
+      experience = trajectory.Trajectory(
+          step_type=mid,
+          observation=observations,
+          action=tf.constant([[0, 1], [1, 0]], dtype=tf.int32),
+          policy_info=(),
+          next_step_type=mid,
+          reward=tf.constant([[1, 2], [3, 4]], dtype=tf.float32),
+          discount=tf.ones([2, 2]))
+
+      agent = self._create_agent()
+      loop_agent = self._create_agent()
+      networks = [agent._q_network, agent._target_q_network]
+      loop_networks = [loop_agent._q_network, loop_agent._target_q_network]
+      # Both agents start from the same weights.
+      for network, loop_network in zip(networks, loop_networks):
+        for variable, loop_variable in zip(network.variables,
+                                           loop_network.variables):
+          loop_variable.assign(variable)
+      initial_target_variables = self.evaluate(
+          loop_agent._target_q_network.variables)
+
+      for _ in range(3):
+        agent.train(experience)
+      iterator = iter(tf.data.Dataset.from_tensors(experience).repeat())
+      loop_agent.train_many(iterator, num_updates=3)
+
+      self.assertEqual(3, self.evaluate(loop_agent.train_step_counter))
+      for network, loop_network in zip(networks, loop_networks):
+        self.assertAllClose(
+            self.evaluate(network.variables),
+            self.evaluate(loop_network.variables))
+      # The target network was updated on the second train step.
+      self.assertNotAllClose(
+          initial_target_variables,
+          self.evaluate(loop_agent._target_q_network.variables))
+      for slot_name in agent._optimizer.get_slot_names():
+        for variable, loop_variable in zip(agent._q_network.variables,
+                                           loop_agent._q_network.variables):
+          self.assertAllClose(
+              self.evaluate(agent._optimizer.get_slot(variable, slot_name)),
+              self.evaluate(
+                  loop_agent._optimizer.get_slot(loop_variable, slot_name)))
+
+
+class DqnAgentBenchmark(tf.test.Benchmark):
+  """Benchmarks train steps on Atari-sized inputs, e.g. --benchmarks=all."""
+
+  def _benchmark_train(self, agent_class, fuse_q_network_calls, batch_size=32,
+                       num_iters=20):
+    observation_spec = tensor_spec.TensorSpec([84, 84, 4], tf.float32)
+    time_step_spec = ts.time_step_spec(observation_spec)
+    action_spec = tensor_spec.BoundedTensorSpec((), tf.int32, 0, 5)
+    q_net = q_network.QNetwork(
+        observation_spec,
+        action_spec,
+        conv_layer_params=((32, (8, 8), 4), (64, (4, 4), 2), (64, (3, 3), 1)),
+        fc_layer_params=(512,))
+    agent = agent_class(
+        time_step_spec,
+        action_spec,
+        q_network=q_net,
+        optimizer=tf.compat.v1.train.AdamOptimizer(),
+        fuse_q_network_calls=fuse_q_network_calls)
+    agent.initialize()
+
+    outer_shape = [batch_size, 2]
+    experience = trajectory.Trajectory(
+        step_type=tf.fill(outer_shape, ts.StepType.MID),
+        observation=tf.random.uniform(outer_shape + [84, 84, 4]),
+        action=tf.zeros(outer_shape, tf.int32),
+        policy_info=(),
+        next_step_type=tf.fill(outer_shape, ts.StepType.MID),
+        reward=tf.ones(outer_shape),
+        discount=tf.ones(outer_shape))
+    train = common.function(agent.train)
+
+    # Trace and warm up before timing.
+    train(experience)
+    start_time = time.time()
+    for _ in range(num_iters):
+      loss_info = train(experience)
+    loss_info.loss.numpy()
+    wall_time = (time.time() - start_time) / num_iters
+    self.report_benchmark(
+        iters=num_iters,
+        wall_time=wall_time,
+        name='{}_fuse_q_network_calls_{}'.format(agent_class.__name__,
+                                                 fuse_q_network_calls),
+        extras={'train_steps_per_sec': 1.0 / wall_time})
+
+  def benchmarkTrainAtari(self):
+    if not tf.executing_eagerly():
+      return
+    self._benchmark_train(dqn_agent.DqnAgent, fuse_q_network_calls=False)
+    self._benchmark_train(dqn_agent.DdqnAgent, fuse_q_network_calls=False)
+    self._benchmark_train(dqn_agent.DdqnAgent, fuse_q_network_calls=True)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -209,7 +209,6 @@ def train_eval(
     if use_tf_functions:
       # To speed up collect use common.function.
       collect_driver.run = common.function(collect_driver.run)
-      tf_agent.train = common.function(tf_agent.train)
 
     initial_collect_policy = random_tf_policy.RandomTFPolicy(
         tf_env.time_step_spec(), tf_env.action_spec())
@@ -256,9 +255,13 @@ def train_eval(
           time_step=time_step,
           policy_state=policy_state,
       )
-      for _ in range(train_steps_per_iteration):
-        experience, _ = next(iterator)
-        train_loss = tf_agent.train(experience)
+      if use_tf_functions:
+        # Runs all the train steps in a single function call.
+        train_loss = tf_agent.train_many(iterator, train_steps_per_iteration)
+      else:
+        for _ in range(train_steps_per_iteration):
+          experience, _ = next(iterator)
+          train_loss = tf_agent.train(experience)
       time_acc += time.time() - start_time
 
       if global_step.numpy() % log_interval == 0:
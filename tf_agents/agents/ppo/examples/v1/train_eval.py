@@ -53,7 +53,7 @@ from tf_agents.networks import actor_distribution_rnn_network
 from tf_agents.networks import value_network
 from tf_agents.networks import value_rnn_network
 from tf_agents.policies import py_tf_policy
-from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.replay_buffers import tf_rollout_buffer
 from tf_agents.utils import common
 
 import gin.tf
@@ -64,7 +64,8 @@ flags.DEFINE_string('root_dir', os.getenv('TEST_UNDECLARED_OUTPUTS_DIR'),
 flags.DEFINE_string('master', '', 'master session')
 flags.DEFINE_string('env_name', 'HalfCheetah-v2', 'Name of an environment')
 flags.DEFINE_integer('replay_buffer_capacity', 1001,
-                     'Replay buffer capacity per env.')
+                     'Replay buffer capacity per env. Steps collected past it '
+                     'in an iteration are dropped.')
 flags.DEFINE_integer('num_parallel_environments', 30,
                      'Number of environments to run in parallel')
 flags.DEFINE_integer('num_environment_steps', 10000000,
@@ -181,7 +182,10 @@ def train_eval(
         summarize_grads_and_vars=summarize_grads_and_vars,
         train_step_counter=global_step)
 
-    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+    # Unlike TFUniformReplayBuffer, which overwrites the oldest items, the
+    # rollout buffer drops the steps collected past replay_buffer_capacity in
+    # each environment, so the capacity must cover a whole collect iteration.
+    replay_buffer = tf_rollout_buffer.TFRolloutBuffer(
         tf_agent.collect_data_spec,
         batch_size=num_parallel_environments,
         max_length=replay_buffer_capacity)
@@ -113,6 +113,8 @@ class PPOAgent(tf_agent.TFAgent):
                value_function_l2_reg=0.0,
                value_pred_loss_coef=0.5,
                num_epochs=25,
+               minibatch_size=None,
+               epochs_in_while_loop=False,
                use_gae=False,
                use_td_lambda_return=False,
                normalize_rewards=True,
@@ -153,6 +155,18 @@ class PPOAgent(tf_agent.TFAgent):
       value_pred_loss_coef: Multiplier for value prediction loss to balance with
         policy gradient loss.
       num_epochs: Number of epochs for computing policy updates.
+      minibatch_size: Optional number of sequences (batch entries) in each
+        minibatch. If set, each epoch shuffles the sequences of the experience,
+        keeping them intact, and takes a gradient step for each minibatch of
+        minibatch_size of them. The sequences left over by the last full
+        minibatch of an epoch are skipped. If None (default), each epoch takes
+        a single gradient step on the whole experience. With a minibatch_size,
+        all the epochs run in a single tf.while_loop, so the size of the train
+        graph does not depend on num_epochs.
+      epochs_in_while_loop: Whether to also run the epochs in a single
+        tf.while_loop when minibatch_size is None, rather than unrolling them
+        in the graph. This bounds the size of the train graph, but saves no
+        debug summaries for the epochs. Ignored if debug_summaries is set.
       use_gae: If True (default False), uses generalized advantage estimation
         for computing per-timestep advantage. Else, just subtracts value
         predictions from empirical return.
@@ -206,6 +220,8 @@ class PPOAgent(tf_agent.TFAgent):
     self._value_function_l2_reg = value_function_l2_reg
     self._value_pred_loss_coef = value_pred_loss_coef
     self._num_epochs = num_epochs
+    self._minibatch_size = minibatch_size
+    self._epochs_in_while_loop = epochs_in_while_loop
     self._use_gae = use_gae
     self._use_td_lambda_return = use_td_lambda_return
     self._reward_norm_clipping = reward_norm_clipping
@@ -502,56 +518,35 @@ class PPOAgent(tf_agent.TFAgent):
     returns, normalized_advantages = self.compute_return_and_advantage(
         next_time_steps, value_preds)
 
-    # Loss tensors across batches will be aggregated for summaries.
-    policy_gradient_losses = []
-    value_estimation_losses = []
-    l2_regularization_losses = []
-    entropy_regularization_losses = []
-    kl_penalty_losses = []
-
-    loss_info = None  # TODO(b/123627451): Remove.
-    # For each epoch, create its own train op that depends on the previous one.
-    for i_epoch in range(self._num_epochs):
-      with tf.name_scope('epoch_%d' % i_epoch):
-        # Only save debug summaries for first and last epochs.
-        debug_summaries = (
-            self._debug_summaries and
-            (i_epoch == 0 or i_epoch == self._num_epochs - 1))
-
-        # Build one epoch train op.
-        with tf.GradientTape() as tape:
-          loss_info = self.get_epoch_loss(
+    if self._minibatch_size is None and (self._debug_summaries or
+                                         not self._epochs_in_while_loop):
+      # Debug summaries are only saved for the first and last epochs, which
+      #   needs a graph unrolled over the epochs.
+      # Loss tensors across epochs will be aggregated for summaries.
+      epoch_losses = []
+
+      loss_info = None  # TODO(b/123627451): Remove.
+      # For each epoch, create its own train op that depends on the previous
+      #   one.
+      for i_epoch in range(self._num_epochs):
+        with tf.name_scope('epoch_%d' % i_epoch):
+          # Only save debug summaries for first and last epochs.
+          debug_summaries = (
+              self._debug_summaries and
+              (i_epoch == 0 or i_epoch == self._num_epochs - 1))
+
+          loss_info, _ = self._update_step(
               time_steps, actions, act_log_probs, returns,
               normalized_advantages, action_distribution_parameters, weights,
-              self.train_step_counter, debug_summaries)
+              debug_summaries)
+          epoch_losses.append(loss_info.extra)
 
-        variables_to_train = (
-            self._actor_net.trainable_weights +
-            self._value_net.trainable_weights)
-        grads = tape.gradient(loss_info.loss, variables_to_train)
-        # Tuple is used for py3, where zip is a generator producing values once.
-        grads_and_vars = tuple(zip(grads, variables_to_train))
-        if self._gradient_clipping > 0:
-          grads_and_vars = eager_utils.clip_gradient_norms(
-              grads_and_vars, self._gradient_clipping)
-
-        # If summarize_gradients, create functions for summarizing both
-        # gradients and variables.
-        if self._summarize_grads_and_vars and debug_summaries:
-          eager_utils.add_gradients_summaries(grads_and_vars,
-                                              self.train_step_counter)
-          eager_utils.add_variables_summaries(grads_and_vars,
-                                              self.train_step_counter)
-
-        self._optimizer.apply_gradients(
-            grads_and_vars, global_step=self.train_step_counter)
-
-        policy_gradient_losses.append(loss_info.extra.policy_gradient_loss)
-        value_estimation_losses.append(loss_info.extra.value_estimation_loss)
-        l2_regularization_losses.append(loss_info.extra.l2_regularization_loss)
-        entropy_regularization_losses.append(
-            loss_info.extra.entropy_regularization_loss)
-        kl_penalty_losses.append(loss_info.extra.kl_penalty_loss)
+      total_losses = tf.nest.map_structure(lambda *losses: tf.add_n(losses),
+                                           *epoch_losses)
+    else:
+      loss_info, total_losses = self._train_epochs(
+          time_steps, actions, act_log_probs, returns, normalized_advantages,
+          action_distribution_parameters, weights)
 
     # After update epochs, update adaptive kl beta, then update observation
     #   normalizer and reward normalizer.
@@ -576,15 +571,13 @@ class PPOAgent(tf_agent.TFAgent):
     loss_info = tf.nest.map_structure(tf.identity, loss_info)
 
     # Make summaries for total loss across all epochs.
-    # The *_losses lists will have been populated by
-    #   calls to self.get_epoch_loss.
     with tf.name_scope('Losses/'):
-      total_policy_gradient_loss = tf.add_n(policy_gradient_losses)
-      total_value_estimation_loss = tf.add_n(value_estimation_losses)
-      total_l2_regularization_loss = tf.add_n(l2_regularization_losses)
-      total_entropy_regularization_loss = tf.add_n(
-          entropy_regularization_losses)
-      total_kl_penalty_loss = tf.add_n(kl_penalty_losses)
+      total_policy_gradient_loss = total_losses.policy_gradient_loss
+      total_value_estimation_loss = total_losses.value_estimation_loss
+      total_l2_regularization_loss = total_losses.l2_regularization_loss
+      total_entropy_regularization_loss = (
+          total_losses.entropy_regularization_loss)
+      total_kl_penalty_loss = total_losses.kl_penalty_loss
       tf.compat.v2.summary.scalar(
           name='policy_gradient_loss',
           data=total_policy_gradient_loss,
@@ -632,6 +625,132 @@ class PPOAgent(tf_agent.TFAgent):
 
     return loss_info
 
+  def _update_step(self, time_steps, actions, act_log_probs, returns,
+                   normalized_advantages, action_distribution_parameters,
+                   weights, debug_summaries):
+    """Takes one gradient step on a batch of experience.
+
+    Args:
+      time_steps: A batch of TimeStep tuples.
+      actions: A batch of actions.
+      act_log_probs: A batch of action probabilities under the sampling policy.
+      returns: A batch of per-timestep returns.
+      normalized_advantages: A batch of normalized per-timestep advantages.
+      action_distribution_parameters: Parameters of data-collecting action
+        distribution.
+      weights: Element-wise importance weights, including a mask for invalid
+        timesteps.
+      debug_summaries: True if debug summaries should be created.
+
+    Returns:
+      A tuple (loss_info, train_op) with the tf_agent.LossInfo of the batch and
+      the op applying the gradients (None when executing eagerly).
+    """
+    with tf.GradientTape() as tape:
+      loss_info = self.get_epoch_loss(
+          time_steps, actions, act_log_probs, returns, normalized_advantages,
+          action_distribution_parameters, weights, self.train_step_counter,
+          debug_summaries)
+
+    variables_to_train = (
+        self._actor_net.trainable_weights + self._value_net.trainable_weights)
+    grads = tape.gradient(loss_info.loss, variables_to_train)
+    # Tuple is used for py3, where zip is a generator producing values once.
+    grads_and_vars = tuple(zip(grads, variables_to_train))
+    if self._gradient_clipping > 0:
+      grads_and_vars = eager_utils.clip_gradient_norms(grads_and_vars,
+                                                       self._gradient_clipping)
+
+    # If summarize_gradients, create functions for summarizing both
+    # gradients and variables.
+    if self._summarize_grads_and_vars and debug_summaries:
+      eager_utils.add_gradients_summaries(grads_and_vars,
+                                          self.train_step_counter)
+      eager_utils.add_variables_summaries(grads_and_vars,
+                                          self.train_step_counter)
+
+    train_op = self._optimizer.apply_gradients(
+        grads_and_vars, global_step=self.train_step_counter)
+    return loss_info, train_op
+
+  def _train_epochs(self, time_steps, actions, act_log_probs, returns,
+                    normalized_advantages, action_distribution_parameters,
+                    weights):
+    """Trains for num_epochs epochs in a single tf.while_loop.
+
+    The size of the graph does not depend on num_epochs. Each epoch takes a
+    single gradient step on the whole experience or, if minibatch_size is set,
+    shuffles the sequences (batch entries) of the experience and takes a
+    gradient step for each minibatch of minibatch_size of them. The sequences
+    themselves are kept intact, as needed by RNN policies. The losses of each
+    gradient step are accumulated in TensorArrays, and no debug summaries are
+    saved.
+
+    Args:
+      time_steps: A batch of TimeStep tuples.
+      actions: A batch of actions.
+      act_log_probs: A batch of action probabilities under the sampling policy.
+      returns: A batch of per-timestep returns.
+      normalized_advantages: A batch of normalized per-timestep advantages.
+      action_distribution_parameters: Parameters of data-collecting action
+        distribution.
+      weights: Element-wise importance weights, including a mask for invalid
+        timesteps.
+
+    Returns:
+      A tuple (loss_info, total_losses) with the tf_agent.LossInfo of the last
+      gradient step and a PPOLossInfo of the losses summed over all of them.
+    """
+    experience = (time_steps, actions, act_log_probs, returns,
+                  normalized_advantages, action_distribution_parameters,
+                  weights)
+
+    if self._minibatch_size is None:
+      num_steps = self._num_epochs
+      get_batch = lambda unused_step: experience
+    else:
+      batch_size = nest_utils.get_outer_shape(time_steps,
+                                              self._time_step_spec)[0]
+      minibatch_size = tf.minimum(self._minibatch_size, batch_size)
+      num_minibatches = batch_size // minibatch_size
+      # Shuffle the sequences once per epoch, dropping the ones left over by
+      #   the last full minibatch.
+      permutations = tf.argsort(
+          tf.random.uniform([self._num_epochs, batch_size]), axis=1)
+      minibatch_indices = tf.reshape(
+          permutations[:, :num_minibatches * minibatch_size],
+          [self._num_epochs * num_minibatches, minibatch_size])
+      num_steps = tf.shape(minibatch_indices)[0]
+
+      def get_batch(step):
+        return tf.nest.map_structure(
+            lambda t: tf.gather(t, minibatch_indices[step]), experience)
+
+    def _loop_body(step, unused_loss_info, loss_arrays):
+      loss_info, train_op = self._update_step(
+          *get_batch(step), debug_summaries=False)
+      with tf.control_dependencies([train_op]):
+        loss_arrays = tf.nest.map_structure(
+            lambda loss_array, loss: loss_array.write(step, loss), loss_arrays,
+            loss_info.extra)
+        return (step + 1, tf.nest.map_structure(tf.identity, loss_info),
+                loss_arrays)
+
+    zero_losses = PPOLossInfo(*[tf.constant(0.0)] * len(PPOLossInfo._fields))
+    loss_arrays = PPOLossInfo(*[
+        tf.TensorArray(tf.float32, size=num_steps)
+        for _ in PPOLossInfo._fields
+    ])
+    _, loss_info, loss_arrays = tf.while_loop(
+        cond=lambda step, *_: step < num_steps,
+        body=_loop_body,
+        loop_vars=(tf.constant(0),
+                   tf_agent.LossInfo(tf.constant(0.0), zero_losses),
+                   loss_arrays))
+    total_losses = tf.nest.map_structure(
+        lambda loss_array: tf.reduce_sum(loss_array.stack()), loss_arrays)
+    return loss_info, total_losses
+
   def l2_regularization_loss(self, debug_summaries=False):
     if self._policy_l2_reg > 0 or self._value_function_l2_reg > 0:
       with tf.name_scope('l2_regularization'):
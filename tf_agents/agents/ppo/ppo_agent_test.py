@@ -19,6 +19,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 from absl import flags
 from absl.testing import parameterized
 from absl.testing.absltest import mock
@@ -128,6 +130,57 @@ def _compute_returns_fn(rewards, discounts, next_state_return=0.0):
   return returns
 
 
+def _create_experience(batch_size):
+  observations = tf.constant([[[1, 2], [3, 4], [5, 6]]] * batch_size,
+                             dtype=tf.float32)
+  step_types = tf.constant([[1] * 3] * batch_size, dtype=tf.int32)
+  rewards = tf.constant([[1] * 3] * batch_size, dtype=tf.float32)
+  discounts = tf.constant([[1] * 3] * batch_size, dtype=tf.float32)
+  actions = tf.constant([[[0], [1], [1]]] * batch_size, dtype=tf.float32)
+  policy_info = {
+      'loc': tf.constant([[[0.0]] * 3] * batch_size, dtype=tf.float32),
+      'scale': tf.constant([[[1.0]] * 3] * batch_size, dtype=tf.float32),
+  }
+  return trajectory.Trajectory(step_types, observations, actions, policy_info,
+                               step_types, rewards, discounts)
+
+
+def _trace_train(num_epochs, minibatch_size=None, epochs_in_while_loop=False):
+  """Traces the train function of a PPOAgent.
+
+  Args:
+    num_epochs: Number of epochs of the agent.
+    minibatch_size: Optional minibatch size of the agent.
+    epochs_in_while_loop: Whether the agent runs full batch epochs in a
+      tf.while_loop.
+
+  Returns:
+    A tuple (num_ops, trace_time) with the number of ops in the traced graph and
+    the time it took to trace it, in seconds.
+  """
+  obs_spec = tensor_spec.TensorSpec([2], tf.float32)
+  action_spec = tensor_spec.BoundedTensorSpec([1], tf.float32, -1, 1)
+  agent = ppo_agent.PPOAgent(
+      ts.time_step_spec(obs_spec),
+      action_spec,
+      tf.compat.v1.train.AdamOptimizer(),
+      actor_net=DummyActorNet(obs_spec, action_spec),
+      value_net=DummyValueNet(obs_spec),
+      normalize_observations=False,
+      num_epochs=num_epochs,
+      minibatch_size=minibatch_size,
+      epochs_in_while_loop=epochs_in_while_loop)
+  experience = _create_experience(batch_size=4)
+  # Force variable creation.
+  agent.policy.variables()
+
+  train = common.function(agent.train)
+  start_time = time.time()
+  concrete_train = train.get_concrete_function(experience)
+  trace_time = time.time() - start_time
+  return len(concrete_train.graph.get_operations()), trace_time
+
+
 class PPOAgentTest(parameterized.TestCase, test_utils.TestCase):
 
   def setUp(self):
@@ -257,6 +310,63 @@ class PPOAgentTest(parameterized.TestCase, test_utils.TestCase):
       # Assert that train_op ran increment_counter num_epochs times.
       self.assertEqual(num_epochs, self.evaluate(counter))
 
+  @parameterized.named_parameters([
+      ('TwoMinibatches', 2, 6),
+      ('OneMinibatchWithLeftover', 3, 3),
+      ('MinibatchLargerThanBatch', 8, 3),
+  ])
+  def testTrainWithMinibatches(self, minibatch_size, expected_num_steps):
+    with tf.compat.v2.summary.record_if(False):
+      counter = common.create_variable('test_train_counter')
+      agent = ppo_agent.PPOAgent(
+          self._time_step_spec,
+          self._action_spec,
+          tf.compat.v1.train.AdamOptimizer(),
+          actor_net=DummyActorNet(self._obs_spec, self._action_spec,),
+          value_net=DummyValueNet(self._obs_spec),
+          normalize_observations=False,
+          num_epochs=3,
+          minibatch_size=minibatch_size,
+          train_step_counter=counter)
+      experience = _create_experience(batch_size=4)
+
+      # Force variable creation.
+      agent.policy.variables()
+
+      if tf.executing_eagerly():
+        loss = lambda: agent.train(experience)
+      else:
+        loss = agent.train(experience)
+
+      self.evaluate(tf.compat.v1.initialize_all_variables())
+      self.assertEqual(0, self.evaluate(counter))
+      self.evaluate(loss)
+      # Assert that train_op ran once per minibatch of each of the 3 epochs.
+      self.assertEqual(expected_num_steps, self.evaluate(counter))
+
+  @parameterized.named_parameters([
+      ('FullBatch', None, True),
+      ('Minibatches', 2, False),
+  ])
+  def testTrainGraphSizeIsIndependentOfNumEpochs(self, minibatch_size,
+                                                 epochs_in_while_loop):
+    if not tf.executing_eagerly():
+      self.skipTest('Traces a tf.function, which requires eager execution.')
+    num_ops, _ = _trace_train(
+        num_epochs=1, minibatch_size=minibatch_size,
+        epochs_in_while_loop=epochs_in_while_loop)
+    num_ops_many_epochs, _ = _trace_train(
+        num_epochs=20, minibatch_size=minibatch_size,
+        epochs_in_while_loop=epochs_in_while_loop)
+    self.assertEqual(num_ops, num_ops_many_epochs)
+
+  def testFullBatchEpochsAreUnrolledByDefault(self):
+    if not tf.executing_eagerly():
+      self.skipTest('Traces a tf.function, which requires eager execution.')
+    num_ops, _ = _trace_train(num_epochs=1)
+    num_ops_many_epochs, _ = _trace_train(num_epochs=2)
+    self.assertGreater(num_ops_many_epochs, num_ops)
+
   def testGetEpochLoss(self):
     agent = ppo_agent.PPOAgent(
         self._time_step_spec,
@@ -728,5 +838,22 @@ class PPOAgentTest(parameterized.TestCase, test_utils.TestCase):
     agent.train(experience)
 
 
+class PPOAgentBenchmark(tf.test.Benchmark):
+  """Benchmarks tracing the train function, e.g. with --benchmarks=all."""
+
+  def benchmarkTraceTrain(self):
+    for minibatch_size, epochs_in_while_loop in ((None, False), (None, True),
+                                                 (2, False)):
+      for num_epochs in (1, 10, 20):
+        num_ops, trace_time = _trace_train(num_epochs, minibatch_size,
+                                           epochs_in_while_loop)
+        self.report_benchmark(
+            iters=1,
+            wall_time=trace_time,
+            name='trace_train_{}_epochs_minibatch_size_{}_loop_{}'.format(
+                num_epochs, minibatch_size, epochs_in_while_loop),
+            extras={'num_ops': num_ops})
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -45,7 +45,7 @@ from tf_agents.eval import metric_utils
 from tf_agents.metrics import tf_metrics
 from tf_agents.networks import actor_distribution_network
 from tf_agents.networks import value_network
-from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.replay_buffers import tf_rollout_buffer
 from tf_agents.utils import common
 
 flags.DEFINE_string('root_dir', os.getenv('TEST_UNDECLARED_OUTPUTS_DIR'),
@@ -128,7 +128,10 @@ def train_eval(
         summarize_grads_and_vars=summarize_grads_and_vars,
         train_step_counter=global_step)
 
-    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+    # Unlike TFUniformReplayBuffer, which overwrites the oldest items, the
+    # rollout buffer drops the steps collected past replay_buffer_capacity in
+    # each environment, so the capacity must cover a whole collect iteration.
+    replay_buffer = tf_rollout_buffer.TFRolloutBuffer(
         tf_agent.collect_data_spec,
         batch_size=tf_env.batch_size,
         max_length=replay_buffer_capacity)
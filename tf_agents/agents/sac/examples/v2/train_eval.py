@@ -216,7 +216,6 @@ def train_eval(
     if use_tf_functions:
       initial_collect_driver.run = common.function(initial_collect_driver.run)
       collect_driver.run = common.function(collect_driver.run)
-      tf_agent.train = common.function(tf_agent.train)
 
     # Collect initial replay data.
     logging.info(
@@ -256,9 +255,13 @@ def train_eval(
           time_step=time_step,
           policy_state=policy_state,
       )
-      for _ in range(train_steps_per_iteration):
-        experience, _ = next(iterator)
-        train_loss = tf_agent.train(experience)
+      if use_tf_functions:
+        # Runs all the train steps in a single function call.
+        train_loss = tf_agent.train_many(iterator, train_steps_per_iteration)
+      else:
+        for _ in range(train_steps_per_iteration):
+          experience, _ = next(iterator)
+          train_loss = tf_agent.train(experience)
       time_acc += time.time() - start_time
 
       if global_step.numpy() % log_interval == 0:
@@ -29,6 +29,7 @@ import tensorflow as tf
 import tensorflow_probability as tfp
 
 from tf_agents.agents import tf_agent
+from tf_agents.networks import ensemble_critic_network
 from tf_agents.policies import actor_policy
 from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
@@ -64,6 +65,9 @@ class SacAgent(tf_agent.TFAgent):
                initial_log_alpha=0.0,
                target_entropy=None,
                gradient_clipping=None,
+               combined_update=False,
+               actor_update_period=1,
+               num_target_critics=None,
                debug_summaries=False,
                summarize_grads_and_vars=False,
                train_step_counter=None,
@@ -74,7 +78,10 @@ class SacAgent(tf_agent.TFAgent):
       time_step_spec: A `TimeStep` spec of the expected time_steps.
       action_spec: A nest of BoundedTensorSpec representing the actions.
       critic_network: A function critic_network((observations, actions)) that
-        returns the q_values for each observation and action.
+        returns the q_values for each observation and action. Two critics are
+        created from it, unless it is an `EnsembleCriticNetwork`, whose
+        critics are all evaluated at once. The actor is trained against the
+        min of all the critics, unless `num_target_critics` is set.
       actor_network: A function actor_network(observation, action_spec) that
         returns action distribution.
       actor_optimizer: The optimizer to use for the actor network.
@@ -90,6 +97,19 @@ class SacAgent(tf_agent.TFAgent):
       initial_log_alpha: Initial value for log_alpha.
       target_entropy: The target average policy entropy, for updating alpha.
       gradient_clipping: Norm length to clip gradients.
+      combined_update: If True, the critic, actor and alpha losses are computed
+        under a single GradientTape before applying any gradient, and the actor
+        and alpha losses share the same actor forward pass. The actor loss then
+        uses the critics from before their update of the same train step.
+      actor_update_period: Period for the optimization step on the actor
+        network and alpha. Training with a high update-to-data ratio (e.g. as
+        REDQ) calls `train` several times per collect step, and updates the
+        actor once per collect step. The actor and alpha losses are only
+        computed on the train steps that update them.
+      num_target_critics: If set, the TD targets are the min over this number of
+        critics, randomly sampled at each train step, instead of all of them.
+        The actor is then trained against the mean of all the critics, as in
+        REDQ, instead of their min.
       debug_summaries: A bool to gather debug summaries.
       summarize_grads_and_vars: If True, gradient and network variable summaries
         will be written during training.
@@ -101,11 +121,26 @@ class SacAgent(tf_agent.TFAgent):
     tf.Module.__init__(self, name=name)
 
     self._critic_network1 = critic_network
-    self._critic_network2 = critic_network.copy(name='CriticNetwork2')
+    if isinstance(critic_network,
+                  ensemble_critic_network.EnsembleCriticNetwork):
+      # The ensemble evaluates all of its critics at once.
+      self._critic_network2 = None
+    else:
+      self._critic_network2 = critic_network.copy(name='CriticNetwork2')
     self._target_critic_network1 = critic_network.copy(
         name='TargetCriticNetwork1')
-    self._target_critic_network2 = critic_network.copy(
-        name='TargetCriticNetwork2')
+    if self._critic_network2 is None:
+      self._target_critic_network2 = None
+    else:
+      self._target_critic_network2 = critic_network.copy(
+          name='TargetCriticNetwork2')
+
+    num_critics = ensemble_critic_network.num_critics(self._critic_networks())
+    if num_target_critics is not None and not (
+        1 <= num_target_critics <= num_critics):
+      raise ValueError(
+          'num_target_critics must be between 1 and the number of critics {}, '
+          'got {}.'.format(num_critics, num_target_critics))
     self._actor_network = actor_network
 
     policy = actor_policy_ctor(
@@ -138,6 +173,9 @@ class SacAgent(tf_agent.TFAgent):
     self._reward_scale_factor = reward_scale_factor
     self._target_entropy = target_entropy
     self._gradient_clipping = gradient_clipping
+    self._combined_update = combined_update
+    self._actor_update_period = actor_update_period
+    self._num_target_critics = num_target_critics
     self._debug_summaries = debug_summaries
     self._summarize_grads_and_vars = summarize_grads_and_vars
     self._update_target = self._get_target_updater(
@@ -160,14 +198,23 @@ class SacAgent(tf_agent.TFAgent):
 
     Copies weights from the Q networks to the target Q network.
     """
-    common.soft_variables_update(
-        self._critic_network1.variables,
-        self._target_critic_network1.variables,
-        tau=1.0)
-    common.soft_variables_update(
-        self._critic_network2.variables,
-        self._target_critic_network2.variables,
-        tau=1.0)
+    for critic_network, target_critic_network in zip(
+        self._critic_networks(), self._target_critic_networks()):
+      common.soft_variables_update(
+          critic_network.variables, target_critic_network.variables, tau=1.0)
+
+  def _critic_networks(self):
+    return [
+        network for network in (self._critic_network1, self._critic_network2)
+        if network is not None
+    ]
+
+  def _target_critic_networks(self):
+    return [
+        network for network in (self._target_critic_network1,
+                                self._target_critic_network2)
+        if network is not None
+    ]
 
   def _experience_to_transitions(self, experience):
     transitions = trajectory.to_transition(experience)
@@ -184,7 +231,9 @@ class SacAgent(tf_agent.TFAgent):
   def _train(self, experience, weights):
     """Returns a train op to update the agent's networks.
 
-    This method trains with the provided batched experience.
+    This method trains with the provided batched experience. On the train
+    steps that skip the actor and alpha updates, as set by
+    `actor_update_period`, their losses are not computed and are reported as 0.
 
     Args:
       experience: A time-stacked trajectory object.
@@ -201,10 +250,66 @@ class SacAgent(tf_agent.TFAgent):
     time_steps, actions, next_time_steps = self._experience_to_transitions(
         experience)
 
-    critic_variables = (
-        self._critic_network1.variables + self._critic_network2.variables)
+    if self._combined_update:
+
+      def train_all():
+        return self._train_combined(time_steps, actions, next_time_steps,
+                                    weights)
+
+      def train_critic():
+        critic_loss = self._train_critic(time_steps, actions, next_time_steps,
+                                         weights)
+        return critic_loss, tf.zeros_like(critic_loss), tf.zeros_like(
+            critic_loss)
+
+      critic_loss, actor_loss, alpha_loss = self._periodically(
+          train_all, self._actor_update_period, skip_fn=train_critic)
+    else:
+      critic_loss = self._train_critic(time_steps, actions, next_time_steps,
+                                       weights)
+
+      def train_actor_and_alpha():
+        return self._train_actor_and_alpha(time_steps, weights)
+
+      def skip_actor_and_alpha():
+        return tf.zeros_like(critic_loss), tf.zeros_like(critic_loss)
+
+      actor_loss, alpha_loss = self._periodically(
+          train_actor_and_alpha,
+          self._actor_update_period,
+          skip_fn=skip_actor_and_alpha)
+
+    with tf.name_scope('Losses'):
+      tf.compat.v2.summary.scalar(
+          name='critic_loss', data=critic_loss, step=self.train_step_counter)
+      tf.compat.v2.summary.scalar(
+          name='actor_loss', data=actor_loss, step=self.train_step_counter)
+      tf.compat.v2.summary.scalar(
+          name='alpha_loss', data=alpha_loss, step=self.train_step_counter)
+
+    self.train_step_counter.assign_add(1)
+    self._update_target()
+
+    total_loss = critic_loss + actor_loss + alpha_loss
+
+    return tf_agent.LossInfo(loss=total_loss, extra=())
+
+  def _critic_variables(self):
+    critic_variables = []
+    for critic_network in self._critic_networks():
+      critic_variables.extend(critic_network.variables)
+    assert critic_variables, 'No critic variables to optimize.'
+    return critic_variables
+
+  def _actor_variables(self):
+    actor_variables = self._actor_network.variables
+    assert actor_variables, 'No actor variables to optimize.'
+    return actor_variables
+
+  def _train_critic(self, time_steps, actions, next_time_steps, weights):
+    """Updates the critics, and returns the critic loss."""
+    critic_variables = self._critic_variables()
     with tf.GradientTape(watch_accessed_variables=False) as tape:
-      assert critic_variables, 'No critic variables to optimize.'
       tape.watch(critic_variables)
       critic_loss = self.critic_loss(
           time_steps,
@@ -217,41 +322,87 @@ class SacAgent(tf_agent.TFAgent):
 
     tf.debugging.check_numerics(critic_loss, 'Critic loss is inf or nan.')
     critic_grads = tape.gradient(critic_loss, critic_variables)
-    self._apply_gradients(critic_grads, critic_variables,
-                          self._critic_optimizer)
-
-    actor_variables = self._actor_network.variables
+    critic_update = self._apply_gradients(critic_grads, critic_variables,
+                                          self._critic_optimizer)
+    with tf.control_dependencies([critic_update]):
+      return tf.identity(critic_loss)
+
+  def _train_actor_and_alpha(self, time_steps, weights):
+    """Updates the actor, then alpha, and returns their losses."""
+    actor_variables = self._actor_variables()
     with tf.GradientTape(watch_accessed_variables=False) as tape:
-      assert actor_variables, 'No actor variables to optimize.'
       tape.watch(actor_variables)
       actor_loss = self.actor_loss(time_steps, weights=weights)
     tf.debugging.check_numerics(actor_loss, 'Actor loss is inf or nan.')
     actor_grads = tape.gradient(actor_loss, actor_variables)
-    self._apply_gradients(actor_grads, actor_variables, self._actor_optimizer)
+    actor_update = self._apply_gradients(actor_grads, actor_variables,
+                                         self._actor_optimizer)
 
     alpha_variable = [self._log_alpha]
-    with tf.GradientTape(watch_accessed_variables=False) as tape:
-      assert actor_variables, 'No actor variables to optimize.'
-      tape.watch(alpha_variable)
-      alpha_loss = self.alpha_loss(time_steps, weights=weights)
+    with tf.control_dependencies([actor_update]):
+      with tf.GradientTape(watch_accessed_variables=False) as tape:
+        tape.watch(alpha_variable)
+        alpha_loss = self.alpha_loss(time_steps, weights=weights)
     tf.debugging.check_numerics(alpha_loss, 'Alpha loss is inf or nan.')
     alpha_grads = tape.gradient(alpha_loss, alpha_variable)
-    self._apply_gradients(alpha_grads, alpha_variable, self._alpha_optimizer)
+    alpha_update = self._apply_gradients(alpha_grads, alpha_variable,
+                                         self._alpha_optimizer)
+    with tf.control_dependencies([actor_update, alpha_update]):
+      return tf.identity(actor_loss), tf.identity(alpha_loss)
 
-    with tf.name_scope('Losses'):
-      tf.compat.v2.summary.scalar(
-          name='critic_loss', data=critic_loss, step=self.train_step_counter)
-      tf.compat.v2.summary.scalar(
-          name='actor_loss', data=actor_loss, step=self.train_step_counter)
-      tf.compat.v2.summary.scalar(
-          name='alpha_loss', data=alpha_loss, step=self.train_step_counter)
+  def _train_combined(self, time_steps, actions, next_time_steps, weights):
+    """Updates the critics, actor and alpha from a single pass.
 
-    self.train_step_counter.assign_add(1)
-    self._update_target()
+    Args:
+      time_steps: A batch of timesteps.
+      actions: A batch of actions.
+      next_time_steps: A batch of next timesteps.
+      weights: Optional scalar or elementwise (per-batch-entry) importance
+        weights.
 
-    total_loss = critic_loss + actor_loss + alpha_loss
+    Returns:
+      A tuple of the critic, actor and alpha losses.
+    """
+    critic_variables = self._critic_variables()
+    actor_variables = self._actor_variables()
+    alpha_variable = [self._log_alpha]
+    with tf.GradientTape(
+        watch_accessed_variables=False, persistent=True) as tape:
+      tape.watch(critic_variables + actor_variables + alpha_variable)
+      critic_loss = self.critic_loss(
+          time_steps,
+          actions,
+          next_time_steps,
+          td_errors_loss_fn=self._td_errors_loss_fn,
+          gamma=self._gamma,
+          reward_scale_factor=self._reward_scale_factor,
+          weights=weights)
+      # The actor and alpha losses share the same actions.
+      with tf.name_scope('actor_loss'):
+        sampled_actions, log_pi = self._actions_and_log_probs(time_steps)
+        actor_loss = self._actor_loss(
+            time_steps, sampled_actions, log_pi, weights=weights)
+      with tf.name_scope('alpha_loss'):
+        alpha_loss = self._alpha_loss(log_pi, weights=weights)
+    critic_grads = tape.gradient(critic_loss, critic_variables)
+    actor_grads = tape.gradient(actor_loss, actor_variables)
+    alpha_grads = tape.gradient(alpha_loss, alpha_variable)
+    del tape
 
-    return tf_agent.LossInfo(loss=total_loss, extra=())
+    tf.debugging.check_numerics(critic_loss, 'Critic loss is inf or nan.')
+    tf.debugging.check_numerics(actor_loss, 'Actor loss is inf or nan.')
+    tf.debugging.check_numerics(alpha_loss, 'Alpha loss is inf or nan.')
+    updates = [
+        self._apply_gradients(critic_grads, critic_variables,
+                              self._critic_optimizer),
+        self._apply_gradients(actor_grads, actor_variables,
+                              self._actor_optimizer),
+        self._apply_gradients(alpha_grads, alpha_variable,
+                              self._alpha_optimizer),
+    ]
+    with tf.control_dependencies(updates):
+      return (tf.identity(critic_loss), tf.identity(actor_loss),
+              tf.identity(alpha_loss))
 
   def _apply_gradients(self, gradients, variables, optimizer):
     grads_and_vars = zip(gradients, variables)
@@ -265,7 +416,15 @@ class SacAgent(tf_agent.TFAgent):
       eager_utils.add_gradients_summaries(grads_and_vars,
                                           self.train_step_counter)
 
-    optimizer.apply_gradients(grads_and_vars)
+    return optimizer.apply_gradients(grads_and_vars)
+
+  def _periodically(self, update_fn, period, skip_fn=tf.no_op):
+    """Runs update_fn every `period` train steps, and skip_fn otherwise."""
+    if period == 1:
+      return update_fn()
+    remainder = tf.math.mod(self.train_step_counter, period)
+    return tf.cond(
+        pred=tf.equal(remainder, 0), true_fn=update_fn, false_fn=skip_fn)
 
   def _get_target_updater(self, tau=1.0, period=1):
     """Performs a soft update of the target network parameters.
@@ -285,13 +444,13 @@ class SacAgent(tf_agent.TFAgent):
 
       def update():
         """Update target network."""
-        critic_update_1 = common.soft_variables_update(
-            self._critic_network1.variables,
-            self._target_critic_network1.variables, tau)
-        critic_update_2 = common.soft_variables_update(
-            self._critic_network2.variables,
-            self._target_critic_network2.variables, tau)
-        return tf.group(critic_update_1, critic_update_2)
+        critic_updates = [
+            common.soft_variables_update(critic_network.variables,
+                                         target_critic_network.variables, tau)
+            for critic_network, target_critic_network in zip(
+                self._critic_networks(), self._target_critic_networks())
+        ]
+        return tf.group(*critic_updates)
 
       return common.Periodically(update, period, 'update_targets')
 
@@ -340,29 +499,28 @@ class SacAgent(tf_agent.TFAgent):
       tf.nest.assert_same_structure(next_time_steps, self.time_step_spec)
 
       next_actions, next_log_pis = self._actions_and_log_probs(next_time_steps)
-      target_input_1 = (next_time_steps.observation, next_actions)
-      target_q_values1, unused_network_state1 = self._target_critic_network1(
-          target_input_1, next_time_steps.step_type)
-      target_input_2 = (next_time_steps.observation, next_actions)
-      target_q_values2, unused_network_state2 = self._target_critic_network2(
-          target_input_2, next_time_steps.step_type)
+      # The q_values of all the critics are stacked along the first axis.
+      target_q_values = ensemble_critic_network.stack_q_values(
+          self._target_critic_networks(),
+          (next_time_steps.observation, next_actions),
+          next_time_steps.step_type)
       target_q_values = (
-          tf.minimum(target_q_values1, target_q_values2) -
+          ensemble_critic_network.reduce_min_over_subset(
+              target_q_values, self._num_target_critics) -
           tf.exp(self._log_alpha) * next_log_pis)
 
       td_targets = tf.stop_gradient(
           reward_scale_factor * next_time_steps.reward +
           gamma * next_time_steps.discount * target_q_values)
 
-      pred_input_1 = (time_steps.observation, actions)
-      pred_td_targets1, unused_network_state1 = self._critic_network1(
-          pred_input_1, time_steps.step_type)
-      pred_input_2 = (time_steps.observation, actions)
-      pred_td_targets2, unused_network_state2 = self._critic_network2(
-          pred_input_2, time_steps.step_type)
-      critic_loss1 = td_errors_loss_fn(td_targets, pred_td_targets1)
-      critic_loss2 = td_errors_loss_fn(td_targets, pred_td_targets2)
-      critic_loss = critic_loss1 + critic_loss2
+      pred_td_targets = ensemble_critic_network.stack_q_values(
+          self._critic_networks(), (time_steps.observation, actions),
+          time_steps.step_type)
+      # The loss function may reduce its inputs, so it is applied per critic.
+      critic_loss = tf.add_n([
+          td_errors_loss_fn(td_targets, member_td_targets)
+          for member_td_targets in tf.unstack(pred_td_targets)
+      ])
 
       if weights is not None:
         critic_loss *= weights
@@ -371,17 +529,16 @@ class SacAgent(tf_agent.TFAgent):
       critic_loss = tf.reduce_mean(input_tensor=critic_loss)
 
       if self._debug_summaries:
-        td_errors1 = td_targets - pred_td_targets1
-        td_errors2 = td_targets - pred_td_targets2
-        td_errors = tf.concat([td_errors1, td_errors2], axis=0)
+        td_errors = td_targets - pred_td_targets
         common.generate_tensor_summaries('td_errors', td_errors,
                                          self.train_step_counter)
         common.generate_tensor_summaries('td_targets', td_targets,
                                          self.train_step_counter)
-        common.generate_tensor_summaries('pred_td_targets1', pred_td_targets1,
-                                         self.train_step_counter)
-        common.generate_tensor_summaries('pred_td_targets2', pred_td_targets2,
-                                         self.train_step_counter)
+        num_critics = tf.compat.dimension_value(pred_td_targets.shape[0])
+        for i in range(num_critics):
+          common.generate_tensor_summaries('pred_td_targets%d' % (i + 1),
+                                           pred_td_targets[i],
+                                           self.train_step_counter)
 
       return critic_loss
 
@@ -398,54 +555,62 @@ class SacAgent(tf_agent.TFAgent):
     """
     with tf.name_scope('actor_loss'):
       tf.nest.assert_same_structure(time_steps, self.time_step_spec)
-
       actions, log_pi = self._actions_and_log_probs(time_steps)
-      target_input_1 = (time_steps.observation, actions)
-      target_q_values1, unused_network_state1 = self._critic_network1(
-          target_input_1, time_steps.step_type)
-      target_input_2 = (time_steps.observation, actions)
-      target_q_values2, unused_network_state2 = self._critic_network2(
-          target_input_2, time_steps.step_type)
-      target_q_values = tf.minimum(target_q_values1, target_q_values2)
-      actor_loss = tf.exp(self._log_alpha) * log_pi - target_q_values
-      if weights is not None:
-        actor_loss *= weights
-      actor_loss = tf.reduce_mean(input_tensor=actor_loss)
+      return self._actor_loss(time_steps, actions, log_pi, weights=weights)
 
-      if self._debug_summaries:
-        common.generate_tensor_summaries('actor_loss', actor_loss,
-                                         self.train_step_counter)
-        common.generate_tensor_summaries('actions', actions,
-                                         self.train_step_counter)
-        common.generate_tensor_summaries('log_pi', log_pi,
+  def _actor_loss(self, time_steps, actions, log_pi, weights=None):
+    """Computes the actor_loss from actions sampled by the policy.
+
+    Called under the `actor_loss` name scope, which also covers sampling the
+    actions.
+    """
+    target_q_values = ensemble_critic_network.stack_q_values(
+        self._critic_networks(), (time_steps.observation, actions),
+        time_steps.step_type)
+    if self._num_target_critics is None:
+      target_q_values = tf.reduce_min(input_tensor=target_q_values, axis=0)
+    else:
+      # As in REDQ, the actor is trained against the mean of the critics.
+      target_q_values = tf.reduce_mean(input_tensor=target_q_values, axis=0)
+    actor_loss = tf.exp(self._log_alpha) * log_pi - target_q_values
+    if weights is not None:
+      actor_loss *= weights
+    actor_loss = tf.reduce_mean(input_tensor=actor_loss)
+
+    if self._debug_summaries:
+      common.generate_tensor_summaries('actor_loss', actor_loss,
+                                       self.train_step_counter)
+      common.generate_tensor_summaries('actions', actions,
+                                       self.train_step_counter)
+      common.generate_tensor_summaries('log_pi', log_pi,
+                                       self.train_step_counter)
+      tf.compat.v2.summary.scalar(
+          name='entropy_avg',
+          data=-tf.reduce_mean(input_tensor=log_pi),
+          step=self.train_step_counter)
+      common.generate_tensor_summaries('target_q_values', target_q_values,
+                                       self.train_step_counter)
+      batch_size = nest_utils.get_outer_shape(
+          time_steps, self._time_step_spec)[0]
+      policy_state = self.policy.get_initial_state(batch_size)
+      action_distribution = self.policy.distribution(
+          time_steps, policy_state).action
+      if isinstance(action_distribution, tfp.distributions.Normal):
+        common.generate_tensor_summaries('act_mean', action_distribution.loc,
                                          self.train_step_counter)
-        tf.compat.v2.summary.scalar(
-            name='entropy_avg',
-            data=-tf.reduce_mean(input_tensor=log_pi),
-            step=self.train_step_counter)
-        common.generate_tensor_summaries('target_q_values', target_q_values,
+        common.generate_tensor_summaries(
+            'act_stddev', action_distribution.scale, self.train_step_counter)
+      elif isinstance(action_distribution, tfp.distributions.Categorical):
+        common.generate_tensor_summaries(
+            'act_mode', action_distribution.mode(), self.train_step_counter)
+      try:
+        common.generate_tensor_summaries('entropy_action',
+                                         action_distribution.entropy(),
                                          self.train_step_counter)
-        batch_size = nest_utils.get_outer_shape(
-            time_steps, self._time_step_spec)[0]
-        policy_state = self.policy.get_initial_state(batch_size)
-        action_distribution = self.policy.distribution(
-            time_steps, policy_state).action
-        if isinstance(action_distribution, tfp.distributions.Normal):
-          common.generate_tensor_summaries('act_mean', action_distribution.loc,
-                                           self.train_step_counter)
-          common.generate_tensor_summaries(
-              'act_stddev', action_distribution.scale, self.train_step_counter)
-        elif isinstance(action_distribution, tfp.distributions.Categorical):
-          common.generate_tensor_summaries(
-              'act_mode', action_distribution.mode(), self.train_step_counter)
-        try:
-          common.generate_tensor_summaries('entropy_action',
-                                           action_distribution.entropy(),
-                                           self.train_step_counter)
-        except NotImplementedError:
-          pass  # Some distributions do not have an analytic entropy.
+      except NotImplementedError:
+        pass  # Some distributions do not have an analytic entropy.
 
-      return actor_loss
+    return actor_loss
 
   def alpha_loss(self, time_steps, weights=None):
     """Computes the alpha_loss for EC-SAC training.
@@ -460,18 +625,24 @@ class SacAgent(tf_agent.TFAgent):
     """
     with tf.name_scope('alpha_loss'):
       tf.nest.assert_same_structure(time_steps, self.time_step_spec)
-
       unused_actions, log_pi = self._actions_and_log_probs(time_steps)
-      alpha_loss = (
-          self._log_alpha * tf.stop_gradient(-log_pi - self._target_entropy))
+      return self._alpha_loss(log_pi, weights=weights)
 
-      if weights is not None:
-        alpha_loss *= weights
+  def _alpha_loss(self, log_pi, weights=None):
+    """Computes the alpha_loss from the log probabilities of sampled actions.
 
-      alpha_loss = tf.reduce_mean(input_tensor=alpha_loss)
+    Called under the `alpha_loss` name scope.
+    """
+    alpha_loss = (
+        self._log_alpha * tf.stop_gradient(-log_pi - self._target_entropy))
 
-      if self._debug_summaries:
-        common.generate_tensor_summaries('alpha_loss', alpha_loss,
-                                         self.train_step_counter)
+    if weights is not None:
+      alpha_loss *= weights
+
+    alpha_loss = tf.reduce_mean(input_tensor=alpha_loss)
+
+    if self._debug_summaries:
+      common.generate_tensor_summaries('alpha_loss', alpha_loss,
+                                       self.train_step_counter)
 
-      return alpha_loss
+    return alpha_loss
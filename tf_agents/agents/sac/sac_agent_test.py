@@ -20,11 +20,16 @@ from __future__ import division
 from __future__ import print_function
 
 import copy
+import numpy as np
 import tensorflow as tf
 
+from tf_agents.agents.ddpg import actor_network
 from tf_agents.agents.ddpg import critic_rnn_network
+from tf_agents.agents.ddpg import critic_network
 from tf_agents.agents.sac import sac_agent
+from tf_agents.networks import actor_distribution_network
 from tf_agents.networks import actor_distribution_rnn_network
+from tf_agents.networks import ensemble_critic_network
 from tf_agents.specs import tensor_spec
 from tf_agents.trajectories import time_step as ts
 from tf_agents.trajectories import trajectory
@@ -277,3 +282,252 @@ class SacAgentTest(tf.test.TestCase):
       self.assertEqual(self.evaluate(counter), 0)
       self.evaluate(loss)
       self.assertEqual(self.evaluate(counter), 1)
+
+  def _create_experience(self, batch_size=5):
+    observations = tf.constant(
+        [[[1, 2], [3, 4]]] * batch_size, dtype=tf.float32)
+    actions = tf.constant([[[0], [1]]] * batch_size, dtype=tf.float32)
+    step_type = tf.constant([[1] * 2] * batch_size, dtype=tf.int32)
+    reward = tf.constant([[1] * 2] * batch_size, dtype=tf.float32)
+    return trajectory.Trajectory(
+        step_type, [observations], actions, (), step_type, reward, reward)
+
+  def _create_deterministic_agent(self, critic_net, actor_net=None, **kwargs):
+    # Deterministic actions have a log probability of 0, so that the losses do
+    # not depend on sampling.
+    if actor_net is None:
+      actor_net = actor_network.ActorNetwork(
+          self._obs_spec, self._action_spec, fc_layer_params=(16,))
+    optimizer_fn = tf.compat.v1.train.GradientDescentOptimizer
+    return sac_agent.SacAgent(
+        self._time_step_spec,
+        self._action_spec,
+        critic_network=critic_net,
+        actor_network=actor_net,
+        actor_optimizer=optimizer_fn(0.1),
+        critic_optimizer=optimizer_fn(0.1),
+        alpha_optimizer=optimizer_fn(0.1),
+        **kwargs)
+
+  def _train_once(self, critic_net, **kwargs):
+    actor_net = actor_distribution_network.ActorDistributionNetwork(
+        self._obs_spec, self._action_spec, fc_layer_params=(16,))
+    counter = common.create_variable('test_train_counter')
+    optimizer_fn = tf.compat.v1.train.AdamOptimizer
+    agent = sac_agent.SacAgent(
+        self._time_step_spec,
+        self._action_spec,
+        critic_network=critic_net,
+        actor_network=actor_net,
+        actor_optimizer=optimizer_fn(1e-3),
+        critic_optimizer=optimizer_fn(1e-3),
+        alpha_optimizer=optimizer_fn(1e-3),
+        train_step_counter=counter,
+        **kwargs)
+    experience = self._create_experience()
+
+    # Force variable creation.
+    agent.policy.variables()
+    if tf.executing_eagerly():
+      loss = lambda: agent.train(experience)
+    else:
+      loss = agent.train(experience)
+
+    self.evaluate(tf.compat.v1.initialize_all_variables())
+    self.assertEqual(self.evaluate(counter), 0)
+    self.evaluate(loss)
+    self.assertEqual(self.evaluate(counter), 1)
+    return agent
+
+  def testTrainWithEnsembleCritic(self):
+    with tf.compat.v2.summary.record_if(False):
+      critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+          (self._obs_spec, self._action_spec),
+          ensemble_size=3,
+          joint_fc_layer_params=(16,))
+      agent = self._train_once(critic_net)
+      # No copy of the ensemble is made, other than its target.
+      self.assertLen(agent._critic_networks(), 1)
+      self.assertLen(agent._target_critic_networks(), 1)
+
+  def testTrainWithCombinedUpdate(self):
+    with tf.compat.v2.summary.record_if(False):
+      critic_net = critic_network.CriticNetwork(
+          (self._obs_spec, self._action_spec), joint_fc_layer_params=(16,))
+      self._train_once(critic_net, combined_update=True)
+
+  def testCombinedUpdateUsesCriticsBeforeTheirUpdate(self):
+    with tf.compat.v2.summary.record_if(False):
+      critic_net = critic_network.CriticNetwork(
+          (self._obs_spec, self._action_spec), joint_fc_layer_params=(16,))
+      agent = self._create_deterministic_agent(
+          critic_net, combined_update=True)
+      experience = self._create_experience()
+      time_steps, actions, next_time_steps = agent._experience_to_transitions(
+          experience)
+
+      # All the losses and gradients are computed before any update.
+      critic_loss = agent.critic_loss(
+          time_steps,
+          actions,
+          next_time_steps,
+          td_errors_loss_fn=tf.math.squared_difference)
+      with tf.GradientTape() as tape:
+        actor_loss = agent.actor_loss(time_steps)
+      alpha_loss = agent.alpha_loss(time_steps)
+      actor_variables = agent._actor_network.trainable_variables
+      actor_grads = tape.gradient(actor_loss, actor_variables)
+      expected_loss = critic_loss + actor_loss + alpha_loss
+      expected_actor_variables = [
+          variable - 0.1 * grad
+          for variable, grad in zip(actor_variables, actor_grads)
+      ]
+
+      if tf.executing_eagerly():
+        loss = lambda: agent.train(experience).loss
+      else:
+        loss = agent.train(experience).loss
+
+      self.evaluate(tf.compat.v1.global_variables_initializer())
+      expected_loss, expected_actor_variables = self.evaluate(
+          [expected_loss, expected_actor_variables])
+      self.assertAllClose(expected_loss, self.evaluate(loss))
+      self.assertAllClose(expected_actor_variables,
+                          self.evaluate(actor_variables))
+
+  def testEnsembleCriticMatchesTwinCritics(self):
+    # Both agents act with the same actor.
+    actor_net = actor_network.ActorNetwork(
+        self._obs_spec, self._action_spec, fc_layer_params=(16,))
+    twin_agent = self._create_deterministic_agent(
+        critic_network.CriticNetwork(
+            (self._obs_spec, self._action_spec), joint_fc_layer_params=(16,)),
+        actor_net)
+    ensemble_agent = self._create_deterministic_agent(
+        ensemble_critic_network.EnsembleCriticNetwork(
+            (self._obs_spec, self._action_spec),
+            ensemble_size=2,
+            joint_fc_layer_params=(16,)),
+        actor_net)
+    time_steps, actions, next_time_steps = (
+        twin_agent._experience_to_transitions(self._create_experience()))
+
+    def losses(agent):
+      critic_loss = agent.critic_loss(
+          time_steps,
+          actions,
+          next_time_steps,
+          td_errors_loss_fn=tf.math.squared_difference)
+      return critic_loss, agent.actor_loss(time_steps)
+
+    # Creates the variables of all the critics.
+    losses(twin_agent)
+    losses(ensemble_agent)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    # The members of the ensemble take the weights of the twin critics.
+    for ensemble_net, twin_nets in (
+        (ensemble_agent._critic_network1, twin_agent._critic_networks()),
+        (ensemble_agent._target_critic_network1,
+         twin_agent._target_critic_networks())):
+      twin_variables = zip(*[net.trainable_variables for net in twin_nets])
+      self.evaluate([
+          ensemble_variable.assign(
+              tf.reshape(tf.stack(member_variables), ensemble_variable.shape))
+          for ensemble_variable, member_variables in zip(
+              ensemble_net.trainable_variables, twin_variables)
+      ])
+
+    self.assertAllClose(
+        self.evaluate(losses(twin_agent)),
+        self.evaluate(losses(ensemble_agent)))
+
+  def testTrainWithRandomSubsetTargets(self):
+    with tf.compat.v2.summary.record_if(False):
+      critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+          (self._obs_spec, self._action_spec),
+          ensemble_size=10,
+          joint_fc_layer_params=(16,))
+      self._train_once(
+          critic_net, actor_update_period=20, num_target_critics=2)
+
+  def testRandomSubsetTargets(self):
+    critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+        (self._obs_spec, self._action_spec), ensemble_size=3)
+    agent = self._create_deterministic_agent(critic_net, num_target_critics=1)
+
+    # The critics return constant q_values of 1, 2 and 3.
+    assignments = []
+    for network in agent._critic_networks() + agent._target_critic_networks():
+      kernel, bias = network.variables
+      assignments.append(kernel.assign(tf.zeros_like(kernel)))
+      assignments.append(bias.assign([[[1.]], [[2.]], [[3.]]]))
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(assignments)
+
+    time_steps, actions, next_time_steps = agent._experience_to_transitions(
+        self._create_experience())
+    critic_loss_fn = lambda: agent.critic_loss(  # pylint: disable=g-long-lambda
+        time_steps,
+        actions,
+        next_time_steps,
+        td_errors_loss_fn=tf.math.squared_difference)
+    if tf.executing_eagerly():
+      critic_loss = critic_loss_fn
+    else:
+      critic_loss = critic_loss_fn()
+
+    # The TD targets are 1 + the q_value of the sampled critic, so that the
+    # loss summed over the critics is 2, 5 or 14. It is always 2 when the
+    # targets are the min over all the critics.
+    critic_losses = set(
+        round(float(self.evaluate(critic_loss)), 4) for _ in range(20))
+    self.assertLessEqual(critic_losses, set([2., 5., 14.]))
+    self.assertGreater(len(critic_losses), 1)
+
+    # The actor is trained against the mean of the critics.
+    self.assertAllClose(-2., self.evaluate(agent.actor_loss(time_steps)))
+
+  def testActorUpdatePeriod(self):
+    with tf.compat.v2.summary.record_if(False):
+      critic_net = critic_network.CriticNetwork(
+          (self._obs_spec, self._action_spec), joint_fc_layer_params=(16,))
+      agent = self._create_deterministic_agent(
+          critic_net,
+          actor_update_period=2,
+          train_step_counter=common.create_variable('test_train_counter'))
+      experience = self._create_experience()
+      actor_variables = agent._actor_network.variables + [agent._log_alpha]
+
+      if tf.executing_eagerly():
+        loss = lambda: agent.train(experience)
+      else:
+        loss = agent.train(experience)
+
+      self.evaluate(tf.compat.v1.global_variables_initializer())
+      actor_values = [self.evaluate(actor_variables)]
+      for _ in range(3):
+        self.evaluate(loss)
+        actor_values.append(self.evaluate(actor_variables))
+
+      # The actor and alpha are only updated on the train steps 0 and 2.
+      for before, after, updated in zip(actor_values[:-1], actor_values[1:],
+                                        [True, False, True]):
+        changed = [
+            not np.array_equal(before_value, after_value)
+            for before_value, after_value in zip(before, after)
+        ]
+        self.assertEqual([updated] * len(changed), changed)
+
+  def testInvalidNumTargetCritics(self):
+    with self.assertRaisesRegexp(ValueError, 'num_target_critics'):
+      sac_agent.SacAgent(
+          self._time_step_spec,
+          self._action_spec,
+          critic_network=DummyCriticNet(),
+          actor_network=None,
+          actor_optimizer=None,
+          critic_optimizer=None,
+          alpha_optimizer=None,
+          num_target_critics=3,
+          actor_policy_ctor=DummyActorPolicy)
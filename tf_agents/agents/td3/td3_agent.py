@@ -33,6 +33,7 @@ import tensorflow as tf
 import tensorflow_probability as tfp
 
 from tf_agents.agents import tf_agent
+from tf_agents.networks import ensemble_critic_network
 from tf_agents.policies import actor_policy
 from tf_agents.policies import gaussian_policy
 from tf_agents.trajectories import trajectory
@@ -69,6 +70,7 @@ class Td3Agent(tf_agent.TFAgent):
                target_policy_noise=0.2,
                target_policy_noise_clip=0.5,
                gradient_clipping=None,
+               num_target_critics=None,
                debug_summaries=False,
                summarize_grads_and_vars=False,
                train_step_counter=None,
@@ -81,7 +83,10 @@ class Td3Agent(tf_agent.TFAgent):
       actor_network: A tf_agents.network.Network to be used by the agent. The
         network will be called with call(observation, step_type).
       critic_network: A tf_agents.network.Network to be used by the agent. The
-        network will be called with call(observation, action, step_type).
+        network will be called with call(observation, action, step_type). Two
+        critics are created from it, unless it is an `EnsembleCriticNetwork`,
+        whose critics are all evaluated at once. The actor is trained against
+        the first critic.
       actor_optimizer: The default optimizer to use for the actor network.
       critic_optimizer: The default optimizer to use for the critic network.
       exploration_noise_std: Scale factor on exploration policy noise.
@@ -98,6 +103,8 @@ class Td3Agent(tf_agent.TFAgent):
       target_policy_noise: Scale factor on target action noise
       target_policy_noise_clip: Value to clip noise.
       gradient_clipping: Norm length to clip gradients.
+      num_target_critics: If set, the TD targets are the min over this number of
+        critics, randomly sampled at each train step, instead of all of them.
       debug_summaries: A bool to gather debug summaries.
       summarize_grads_and_vars: If True, gradient and network variable summaries
         will be written during training.
@@ -115,9 +122,22 @@ class Td3Agent(tf_agent.TFAgent):
     self._target_critic_network_1 = critic_network.copy(
         name='TargetCriticNetwork1')
 
-    self._critic_network_2 = critic_network.copy(name='CriticNetwork2')
-    self._target_critic_network_2 = critic_network.copy(
-        name='TargetCriticNetwork2')
+    if isinstance(critic_network,
+                  ensemble_critic_network.EnsembleCriticNetwork):
+      # The ensemble evaluates all of its critics at once.
+      self._critic_network_2 = None
+      self._target_critic_network_2 = None
+    else:
+      self._critic_network_2 = critic_network.copy(name='CriticNetwork2')
+      self._target_critic_network_2 = critic_network.copy(
+          name='TargetCriticNetwork2')
+
+    num_critics = ensemble_critic_network.num_critics(self._critic_networks())
+    if num_target_critics is not None and not (
+        1 <= num_target_critics <= num_critics):
+      raise ValueError(
+          'num_target_critics must be between 1 and the number of critics {}, '
+          'got {}.'.format(num_critics, num_target_critics))
 
     self._actor_optimizer = actor_optimizer
     self._critic_optimizer = critic_optimizer
@@ -134,6 +154,7 @@ class Td3Agent(tf_agent.TFAgent):
     self._target_policy_noise = target_policy_noise
     self._target_policy_noise_clip = target_policy_noise_clip
     self._gradient_clipping = gradient_clipping
+    self._num_target_critics = num_target_critics
 
     self._update_target = self._get_target_updater(
         target_update_tau, target_update_period)
@@ -165,19 +186,28 @@ class Td3Agent(tf_agent.TFAgent):
     Copies weights from the actor and critic networks to the respective
     target actor and critic networks.
     """
-    common.soft_variables_update(
-        self._critic_network_1.variables,
-        self._target_critic_network_1.variables,
-        tau=1.0)
-    common.soft_variables_update(
-        self._critic_network_2.variables,
-        self._target_critic_network_2.variables,
-        tau=1.0)
+    for critic_network, target_critic_network in zip(
+        self._critic_networks(), self._target_critic_networks()):
+      common.soft_variables_update(
+          critic_network.variables, target_critic_network.variables, tau=1.0)
     common.soft_variables_update(
         self._actor_network.variables,
         self._target_actor_network.variables,
         tau=1.0)
 
+  def _critic_networks(self):
+    return [
+        network for network in (self._critic_network_1, self._critic_network_2)
+        if network is not None
+    ]
+
+  def _target_critic_networks(self):
+    return [
+        network for network in (self._target_critic_network_1,
+                                self._target_critic_network_2)
+        if network is not None
+    ]
+
   def _get_target_updater(self, tau=1.0, period=1):
     """Performs a soft update of the target network parameters.
 
@@ -194,16 +224,16 @@ class Td3Agent(tf_agent.TFAgent):
     with tf.name_scope('update_targets'):
       def update():  # pylint: disable=missing-docstring
         # TODO(b/124381161): What about observation normalizer variables?
-        critic_update_1 = common.soft_variables_update(
-            self._critic_network_1.variables,
-            self._target_critic_network_1.variables, tau)
-        critic_update_2 = common.soft_variables_update(
-            self._critic_network_2.variables,
-            self._target_critic_network_2.variables, tau)
+        critic_updates = [
+            common.soft_variables_update(critic_network.variables,
+                                         target_critic_network.variables, tau)
+            for critic_network, target_critic_network in zip(
+                self._critic_networks(), self._target_critic_networks())
+        ]
         actor_update = common.soft_variables_update(
             self._actor_network.variables, self._target_actor_network.variables,
             tau)
-        return tf.group(critic_update_1, critic_update_2, actor_update)
+        return tf.group(*(critic_updates + [actor_update]))
 
       return common.Periodically(update, period, 'update_targets')
 
@@ -224,9 +254,9 @@ class Td3Agent(tf_agent.TFAgent):
     time_steps, actions, next_time_steps = self._experience_to_transitions(
         experience)
 
-    critic_variables = (
-        self._critic_network_1.variables +
-        self._critic_network_2.variables)
+    critic_variables = []
+    for critic_network in self._critic_networks():
+      critic_variables.extend(critic_network.variables)
     with tf.GradientTape(watch_accessed_variables=False) as tape:
       assert critic_variables, 'No critic variables to optimize.'
       tape.watch(critic_variables)
@@ -308,28 +338,22 @@ class Td3Agent(tf_agent.TFAgent):
       noisy_target_actions = tf.nest.map_structure(add_noise_to_action,
                                                    target_actions)
 
-      # Target q-values are the min of the two networks
-      target_q_input_1 = (next_time_steps.observation, noisy_target_actions)
-      target_q_values_1, _ = self._target_critic_network_1(
-          target_q_input_1,
-          next_time_steps.step_type)
-      target_q_input_2 = (next_time_steps.observation, noisy_target_actions)
-      target_q_values_2, _ = self._target_critic_network_2(
-          target_q_input_2,
+      # Target q-values are the min of the critics, stacked along axis 0, or
+      # of a random subset of them.
+      target_q_values = ensemble_critic_network.stack_q_values(
+          self._target_critic_networks(),
+          (next_time_steps.observation, noisy_target_actions),
           next_time_steps.step_type)
-      target_q_values = tf.minimum(target_q_values_1, target_q_values_2)
+      target_q_values = ensemble_critic_network.reduce_min_over_subset(
+          target_q_values, self._num_target_critics)
 
       td_targets = tf.stop_gradient(
           self._reward_scale_factor * next_time_steps.reward +
           self._gamma * next_time_steps.discount * target_q_values)
 
-      pred_input_1 = (time_steps.observation, actions)
-      pred_td_targets_1, _ = self._critic_network_1(
-          pred_input_1, time_steps.step_type)
-      pred_input_2 = (time_steps.observation, actions)
-      pred_td_targets_2, _ = self._critic_network_2(
-          pred_input_2, time_steps.step_type)
-      pred_td_targets_all = [pred_td_targets_1, pred_td_targets_2]
+      pred_td_targets_all = ensemble_critic_network.stack_q_values(
+          self._critic_networks(), (time_steps.observation, actions),
+          time_steps.step_type)
 
       if self._debug_summaries:
         tf.compat.v2.summary.histogram(
@@ -348,7 +372,8 @@ class Td3Agent(tf_agent.TFAgent):
               data=tf.reduce_min(input_tensor=td_targets),
               step=self.train_step_counter)
 
-        for td_target_idx in range(2):
+        num_critics = tf.compat.dimension_value(pred_td_targets_all.shape[0])
+        for td_target_idx in range(num_critics):
           pred_td_targets = pred_td_targets_all[td_target_idx]
           td_errors = td_targets - pred_td_targets
           with tf.name_scope('critic_net_%d' % (td_target_idx + 1)):
@@ -389,8 +414,11 @@ class Td3Agent(tf_agent.TFAgent):
                   data=tf.reduce_min(input_tensor=pred_td_targets),
                   step=self.train_step_counter)
 
-      critic_loss = (self._td_errors_loss_fn(td_targets, pred_td_targets_1)
-                     + self._td_errors_loss_fn(td_targets, pred_td_targets_2))
+      # The loss function may reduce its inputs, so it is applied per critic.
+      critic_loss = tf.add_n([
+          self._td_errors_loss_fn(td_targets, pred_td_targets)
+          for pred_td_targets in tf.unstack(pred_td_targets_all)
+      ])
       if nest_utils.is_batched_nested_tensors(
           time_steps, self.time_step_spec, num_outer_dims=2):
         # Sum over the time dimension.
@@ -420,6 +448,11 @@ class Td3Agent(tf_agent.TFAgent):
         tape.watch(actions)
         q_values, _ = self._critic_network_1((time_steps.observation, actions),
                                              time_steps.step_type)
+        if isinstance(self._critic_network_1,
+                      ensemble_critic_network.EnsembleCriticNetwork):
+          # The first member of the ensemble takes the place of the first of
+          # the twin critics.
+          q_values = q_values[0]
         actions = tf.nest.flatten(actions)
 
       dqdas = tape.gradient([q_values], actions)
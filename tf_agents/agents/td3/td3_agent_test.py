@@ -21,6 +21,7 @@ from __future__ import print_function
 
 import tensorflow as tf
 from tf_agents.agents.td3 import td3_agent
+from tf_agents.networks import ensemble_critic_network
 from tf_agents.networks import network
 from tf_agents.specs import tensor_spec
 from tf_agents.trajectories import time_step as ts
@@ -166,6 +167,39 @@ class TD3AgentTest(test_utils.TestCase):
       loss_ = self.evaluate(loss)
       self.assertAllClose(loss_, expected_loss)
 
+  def testLossesWithEnsembleCritic(self):
+    with tf.compat.v2.summary.record_if(False):
+      critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+          (self._obs_spec, self._action_spec),
+          ensemble_size=3,
+          joint_fc_layer_params=(4,))
+      agent = td3_agent.Td3Agent(
+          self._time_step_spec,
+          self._action_spec,
+          critic_network=critic_net,
+          actor_network=self._unbounded_actor_net,
+          actor_optimizer=None,
+          critic_optimizer=None)
+      self.assertLen(agent._critic_networks(), 1)
+
+      observations = [tf.constant([[1, 2], [3, 4]], dtype=tf.float32)]
+      time_steps = ts.restart(observations, batch_size=2)
+      actions = [tf.constant([[5], [6]], dtype=tf.float32)]
+
+      rewards = tf.constant([10, 20], dtype=tf.float32)
+      discounts = tf.constant([0.9, 0.9], dtype=tf.float32)
+      next_observations = [tf.constant([[5, 6], [7, 8]], dtype=tf.float32)]
+      next_time_steps = ts.transition(next_observations, rewards, discounts)
+
+      critic_loss = agent.critic_loss(time_steps, actions, next_time_steps)
+      actor_loss = agent.actor_loss(time_steps)
+
+      self.evaluate(tf.compat.v1.global_variables_initializer())
+      critic_loss_, actor_loss_ = self.evaluate([critic_loss, actor_loss])
+      self.assertEqual((), critic_loss_.shape)
+      self.assertEqual((), actor_loss_.shape)
+      self.assertGreater(critic_loss_, 0.)
+
   def testPolicyProducesBoundedAction(self):
     agent = td3_agent.Td3Agent(
         self._time_step_spec,
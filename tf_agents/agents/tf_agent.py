@@ -30,6 +30,38 @@ from tf_agents.utils import nest_utils
 
 LossInfo = collections.namedtuple("LossInfo", ("loss", "extra"))
 
+# Maximum number of experience signatures recorded by the checks of `train`.
+# Experience with many distinct static shapes, e.g. a varying batch size, is
+# then checked on every call instead of growing the record without bound.
+_MAX_CHECKED_EXPERIENCE_SIGNATURES = 16
+
+
+def _experience_signature(experience):
+  """Returns a hashable signature of the structure and static shapes of a nest.
+
+  Args:
+    experience: A nest of tensors or arrays.
+
+  Returns:
+    A hashable nest of tuples, with the types of the sequences, the keys of the
+    dicts, and the static shapes and dtypes of the leaves of `experience`.
+  """
+  if isinstance(experience, dict):
+    return (dict,) + tuple((key, _experience_signature(experience[key]))
+                           for key in sorted(experience))
+  if isinstance(experience, (list, tuple)):
+    return (type(experience),) + tuple(
+        _experience_signature(value) for value in experience)
+  shape = getattr(experience, "shape", None)
+  if shape is None:
+    return type(experience)
+  shape = tf.TensorShape(shape)
+  if shape.rank is not None:
+    shape = tuple(shape.as_list())
+  else:
+    shape = None
+  return (shape, getattr(experience, "dtype", None))
+
 
 class TFAgent(tf.Module):
   """Abstract base class for TF RL agents."""
@@ -86,7 +118,10 @@ class TFAgent(tf.Module):
     if train_step_counter is None:
       train_step_counter = tf.compat.v1.train.get_or_create_global_step()
     self._train_step_counter = train_step_counter
+    # Signatures of the experience which already passed the checks of `train`.
+    self._checked_experience_signatures = set()
     self._train_fn = common.function_in_tf1()(self._train)
+    self._train_many_fn = common.function(self._train_many)
     self._initialize_fn = common.function_in_tf1()(self._initialize)
 
   def initialize(self):
@@ -143,10 +178,126 @@ class TFAgent(tf.Module):
       raise RuntimeError(
           "Cannot find _train_fn.  Did %s.__init__ call super?"
           % type(self).__name__)
+    self._check_trajectory_dimensions(experience)
+
+    if self._enable_functions:
+      loss_info = self._train_fn(experience=experience, weights=weights)
+    else:
+      loss_info = self._train(experience=experience, weights=weights)
+
+    if not isinstance(loss_info, LossInfo):
+      raise TypeError(
+          "loss_info is not a subclass of LossInfo: {}".format(loss_info))
+    return loss_info
+
+  def train_many(self, dataset_iterator, num_updates, weights=None):
+    """Trains the agent on several batches of experience at once.
+
+    Runs `num_updates` train steps in a single `tf.while_loop`, pulling the
+    experience of each step from `dataset_iterator` in the graph. Unless the
+    agent disables functions, the loop runs inside a `common.function`. This
+    amortizes the Python overhead of `train` and of the iterator over all the
+    steps, e.g. for small networks:
+
+    ```python
+    iterator = iter(replay_buffer.as_dataset(
+        sample_batch_size=64, num_steps=2).prefetch(3))
+    loss_info = agent.train_many(iterator, num_updates=100)
+    ```
+
+    The experience is validated as by `train`, once when the loop is traced.
+
+    Args:
+      dataset_iterator: An iterator over a dataset of experience, where each
+        element is either a `Trajectory` batch as expected by `train`, or a
+        tuple `(Trajectory, BufferInfo)` as produced by
+        `replay_buffer.as_dataset`.
+      num_updates: A python integer or scalar `Tensor`, at least 1, with the
+        number of train steps to run.
+      weights: (optional).  The weights of `train`, used by every train step.
+
+    Returns:
+      The `LossInfo` of the last train step.
+
+    Raises:
+      ValueError: If `num_updates` is a python integer smaller than 1.
+      TypeError: If the experience is not type `Trajectory`.  Or if it does not
+        match `self.collect_data_spec` structure types.
+      ValueError: If the experience tensors' time axes are not compatible with
+        `self.train_sequene_length`.  Or if the experience does not match
+        `self.collect_data_spec` structure.
+      RuntimeError: If the class was not initialized properly (`super.__init__`
+        was not called).
+    """
+    if self._enable_functions and getattr(self, "_train_many_fn", None) is None:
+      raise RuntimeError(
+          "Cannot find _train_many_fn.  Did %s.__init__ call super?"
+          % type(self).__name__)
+    if not tf.is_tensor(num_updates) and num_updates < 1:
+      raise ValueError(
+          "num_updates must be at least 1, got %s." % num_updates)
+
+    if self._enable_functions:
+      return self._train_many_fn(
+          dataset_iterator=dataset_iterator,
+          num_updates=num_updates,
+          weights=weights)
+    else:
+      return self._train_many(
+          dataset_iterator=dataset_iterator,
+          num_updates=num_updates,
+          weights=weights)
+
+  def _train_many(self, dataset_iterator, num_updates, weights):
+    """Runs num_updates train steps in a tf.while_loop."""
+
+    def train_next():
+      experience = dataset_iterator.get_next()
+      if not isinstance(experience, trajectory.Trajectory):
+        experience, _ = experience
+      self._check_trajectory_dimensions(experience)
+      loss_info = self._train(experience=experience, weights=weights)
+      if not isinstance(loss_info, LossInfo):
+        raise TypeError(
+            "loss_info is not a subclass of LossInfo: {}".format(loss_info))
+      return loss_info
+
+    # The first step is taken outside of the loop, to get the structure of the
+    # LossInfo to use as loop variable.
+    with tf.control_dependencies([
+        tf.debugging.assert_greater_equal(
+            num_updates, 1, message="num_updates must be at least 1.")
+    ]):
+      loss_info = train_next()
+    _, loss_info = tf.while_loop(
+        cond=lambda step, _: step < num_updates,
+        body=lambda step, _: (step + 1, train_next()),
+        loop_vars=(tf.constant(1), loss_info))
+    return loss_info
+
+  def _check_trajectory_dimensions(self, experience):
+    """Checks the given Trajectory for batch and time outer dimensions.
+
+    The checks only depend on the structure and static shapes of `experience`,
+    so they are skipped when experience with the same signature already passed
+    them, e.g. at every step of an eager train loop. Up to
+    `_MAX_CHECKED_EXPERIENCE_SIGNATURES` signatures are recorded.
+
+    Args:
+      experience: A batch of experience data in the form of a `Trajectory`.
+
+    Raises:
+      ValueError: If experience is not type `Trajectory`, or does not match
+        `self.collect_data_spec` with outer batch and time dimensions.
+    """
     if not isinstance(experience, trajectory.Trajectory):
       raise ValueError(
           "experience must be type Trajectory, saw type: %s" % type(experience))
 
+    signature = _experience_signature(experience)
+    if signature in self._checked_experience_signatures:
+      return
+
     # Check experience matches collect data spec with batch & time dims.
     if not nest_utils.is_batched_nested_tensors(
         experience, self.collect_data_spec, num_outer_dims=2):
@@ -174,15 +325,9 @@ class TFAgent(tf.Module):
 
       tf.nest.map_structure(check_shape, experience)
 
-    if self._enable_functions:
-      loss_info = self._train_fn(experience=experience, weights=weights)
-    else:
-      loss_info = self._train(experience=experience, weights=weights)
-
-    if not isinstance(loss_info, LossInfo):
-      raise TypeError(
-          "loss_info is not a subclass of LossInfo: {}".format(loss_info))
-    return loss_info
+    if (len(self._checked_experience_signatures) <
+        _MAX_CHECKED_EXPERIENCE_SIGNATURES):
+      self._checked_experience_signatures.add(signature)
 
   @property
   def time_step_spec(self):
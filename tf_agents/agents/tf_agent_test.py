@@ -19,9 +19,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 import tensorflow as tf
 
 from tf_agents.agents import tf_agent
+from tf_agents.policies import random_tf_policy
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+from tf_agents.utils import common
 
 
 class LossInfoTest(tf.test.TestCase):
@@ -32,5 +38,129 @@ class LossInfoTest(tf.test.TestCase):
     self.assertTrue(isinstance(loss_info, tf_agent.LossInfo))
 
 
+class RewardSumAgent(tf_agent.TFAgent):
+  """An agent whose loss is the sum of the rewards of the experience."""
+
+  def __init__(self, train_sequence_length=2):
+    tf.Module.__init__(self, name='RewardSumAgent')
+    time_step_spec = ts.time_step_spec(
+        tensor_spec.TensorSpec([2], tf.float32))
+    action_spec = tensor_spec.BoundedTensorSpec([1], tf.float32, -1, 1)
+    policy = random_tf_policy.RandomTFPolicy(time_step_spec, action_spec)
+    super(RewardSumAgent, self).__init__(
+        time_step_spec,
+        action_spec,
+        policy,
+        policy,
+        train_sequence_length=train_sequence_length,
+        train_step_counter=common.create_variable('train_step_counter'))
+
+  def _initialize(self):
+    return tf.no_op()
+
+  def _train(self, experience, weights):
+    self.train_step_counter.assign_add(1)
+    loss = tf.reduce_sum(input_tensor=experience.reward)
+    if weights is not None:
+      loss *= weights
+    return tf_agent.LossInfo(loss, ())
+
+
+def _create_experience(agent, num_steps=2):
+  experience = tensor_spec.sample_spec_nest(
+      agent.collect_data_spec, outer_dims=(3, num_steps))
+  return experience._replace(reward=tf.ones([3, num_steps]))
+
+
+class CheckTrajectoryDimensionsTest(tf.test.TestCase):
+
+  def testChecksAreCachedBySignature(self):
+    agent = RewardSumAgent(train_sequence_length=None)
+    agent._check_trajectory_dimensions(_create_experience(agent))
+    agent._check_trajectory_dimensions(_create_experience(agent))
+    self.assertLen(agent._checked_experience_signatures, 1)
+    agent._check_trajectory_dimensions(_create_experience(agent, num_steps=3))
+    self.assertLen(agent._checked_experience_signatures, 2)
+
+  def testNumCachedSignaturesIsBounded(self):
+    agent = RewardSumAgent(train_sequence_length=None)
+    max_signatures = tf_agent._MAX_CHECKED_EXPERIENCE_SIGNATURES
+    for num_steps in range(1, max_signatures + 5):
+      agent._check_trajectory_dimensions(
+          _create_experience(agent, num_steps=num_steps))
+    self.assertLen(agent._checked_experience_signatures, max_signatures)
+
+  def testFailedChecksAreNotCached(self):
+    agent = RewardSumAgent()
+    experience = _create_experience(agent, num_steps=3)
+    for _ in range(2):
+      with self.assertRaisesRegexp(ValueError, 'time axis'):
+        agent._check_trajectory_dimensions(experience)
+    self.assertEmpty(agent._checked_experience_signatures)
+
+  def testDifferentStructuresAreChecked(self):
+    agent = RewardSumAgent()
+    experience = _create_experience(agent)
+    agent._check_trajectory_dimensions(experience)
+    experience = experience._replace(observation=[experience.observation])
+    with self.assertRaises(ValueError):
+      agent._check_trajectory_dimensions(experience)
+
+
+class TrainManyTest(tf.test.TestCase):
+
+  def _create_iterator(self, agent, num_steps=2):
+    experience = _create_experience(agent, num_steps)
+    dataset = tf.data.Dataset.from_tensors(experience).repeat()
+    return iter(dataset)
+
+  def testTrainMany(self):
+    if not tf.executing_eagerly():
+      self.skipTest('Iterating over a dataset requires eager mode.')
+    agent = RewardSumAgent()
+    loss_info = agent.train_many(self._create_iterator(agent), num_updates=5)
+    self.assertEqual(5, self.evaluate(agent.train_step_counter))
+    self.assertEqual(6., self.evaluate(loss_info.loss))
+
+  def testTrainManyWithWeights(self):
+    if not tf.executing_eagerly():
+      self.skipTest('Iterating over a dataset requires eager mode.')
+    agent = RewardSumAgent()
+    loss_info = agent.train_many(
+        self._create_iterator(agent), num_updates=2, weights=0.5)
+    self.assertEqual(3., self.evaluate(loss_info.loss))
+
+  def testTrainManyRequiresAnUpdate(self):
+    agent = RewardSumAgent()
+    with self.assertRaisesRegexp(ValueError, 'num_updates'):
+      agent.train_many(iter([]), num_updates=0)
+
+  def testTrainManyChecksExperience(self):
+    if not tf.executing_eagerly():
+      self.skipTest('Iterating over a dataset requires eager mode.')
+    agent = RewardSumAgent()
+    with self.assertRaisesRegexp(ValueError, 'time axis'):
+      agent.train_many(self._create_iterator(agent, num_steps=3), 5)
+
+
+class TFAgentBenchmark(tf.test.Benchmark):
+  """Benchmarks the checks of train, e.g. with --benchmarks=all."""
+
+  def benchmarkCheckTrajectoryDimensions(self):
+    num_iters = 1000
+    agent = RewardSumAgent()
+    experience = _create_experience(agent)
+    for cached in (False, True):
+      start_time = time.time()
+      for _ in range(num_iters):
+        if not cached:
+          agent._checked_experience_signatures.clear()
+        agent._check_trajectory_dimensions(experience)
+      self.report_benchmark(
+          iters=num_iters,
+          wall_time=(time.time() - start_time) / num_iters,
+          name='check_trajectory_dimensions_cached_{}'.format(cached))
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -15,7 +15,10 @@
 
 """Drivers for running a policy in an environment."""
 
+from tf_agents.drivers import async_driver
+from tf_agents.drivers import async_observer
 from tf_agents.drivers import driver
 from tf_agents.drivers import dynamic_episode_driver
 from tf_agents.drivers import dynamic_step_driver
+from tf_agents.drivers import hybrid_driver
 from tf_agents.drivers import py_driver
@@ -0,0 +1,226 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A driver running other drivers in background threads.
+
+Running a driver and training in the same loop leaves the learner idle while
+the environments step, and the environments idle while the learner trains.
+`AsyncDriver` runs drivers repeatedly in background threads instead, each with
+its own environment and copy of the policy, feeding their observers (e.g. the
+`add_batch` of a replay buffer) while the learner trains:
+
+  collect_drivers = [
+      dynamic_step_driver.DynamicStepDriver(
+          tf_py_environment.TFPyEnvironment(env_load_fn()),
+          copy_of_collect_policy,
+          observers=[replay_buffer.add_batch],
+          num_steps=collect_steps_per_run) for _ in range(num_collectors)
+  ]
+  async_driver = async_driver.AsyncDriver(
+      collect_drivers, policy=agent.collect_policy,
+      train_step=agent.train_step_counter)
+  async_driver.start()
+  for _ in range(num_iterations):
+    experience = next(dataset_iterator)
+    with async_driver.update_lock:
+      agent.train(experience)
+  async_driver.stop()
+
+The policy of each driver is updated from `policy` every `update_period` runs,
+with `tf_policy.Base.update` or `update_fn`, while holding `update_lock`. The
+weights are copied variable by variable, so a learner updating `policy` without
+holding the lock can have drivers act with a mix of weights from consecutive
+train steps. Drivers act with weights that are up to `policy_lag` train steps
+old. TF drivers require eager mode.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+from absl import logging
+import gin
+
+from tf_agents.drivers import py_driver
+from tf_agents.policies import tf_policy
+
+
+@gin.configurable
+class AsyncDriver(object):
+  """Runs drivers in background threads, updating their policies."""
+
+  def __init__(self,
+               drivers,
+               policy=None,
+               update_period=1,
+               train_step=None,
+               update_fn=None,
+               update_lock=None):
+    """Creates an AsyncDriver.
+
+    Args:
+      drivers: A list of drivers, e.g. `DynamicStepDriver` or `PyDriver`, each
+        with its own environment and policy. Each driver is run repeatedly in
+        its own thread, continuing from the time step and policy state
+        returned by its previous run.
+      policy: Optional policy the policies of the drivers are updated from,
+        e.g. the collect policy of the trained agent. If None and update_fn is
+        None, the policies of the drivers are not updated.
+      update_period: Number of runs of a driver between updates of its policy.
+      train_step: Optional variable counting the train steps, e.g.
+        `agent.train_step_counter`, used to compute the policy lag.
+      update_fn: Optional callable `update_fn(driver_policy)` updating the
+        policy of a driver, e.g. from serialized weights. Defaults to
+        `driver_policy.update(policy)`, which requires the drivers to have
+        `tf_policy.Base` policies: `update_fn` must be provided to update the
+        Python policies of `PyDriver`s.
+      update_lock: Optional lock held while updating the policy of a driver,
+        see `update_lock`. Defaults to a new `threading.Lock`.
+
+    Raises:
+      ValueError: If update_period is smaller than 1, or if `policy` is
+        provided without `update_fn` and a driver policy is not a
+        `tf_policy.Base`.
+    """
+    if update_period < 1:
+      raise ValueError(
+          'update_period must be at least 1, got {}.'.format(update_period))
+    if update_fn is None and policy is not None:
+      for driver in drivers:
+        if not isinstance(driver.policy, tf_policy.Base):
+          raise ValueError(
+              'update_fn is required to update driver policies that are not '
+              'TF policies, got: {}'.format(driver.policy))
+      update_fn = lambda driver_policy: driver_policy.update(policy)
+    self._drivers = drivers
+    self._update_period = update_period
+    self._train_step = train_step
+    self._update_fn = update_fn
+
+    self._update_lock = update_lock or threading.Lock()
+    self._lock = threading.Lock()
+    self._stop_event = threading.Event()
+    self._threads = []
+    self._exception = None
+    self._num_runs = [0] * len(drivers)
+    # The train step of the last policy update of each driver.
+    self._update_train_steps = [None] * len(drivers)
+
+  @property
+  def drivers(self):
+    return self._drivers
+
+  @property
+  def update_lock(self):
+    """The lock held while copying weights to the policy of a driver.
+
+    Hold it while updating the weights the drivers are updated from, e.g.
+    around `agent.train`, for drivers to never copy the weights of a
+    partially applied train step.
+    """
+    return self._update_lock
+
+  @property
+  def num_runs(self):
+    """Returns the total number of runs of the drivers so far."""
+    with self._lock:
+      return sum(self._num_runs)
+
+  @property
+  def policy_lag(self):
+    """Returns the policy lag, in train steps.
+
+    The policy lag is the number of train steps since the oldest policy of the
+    drivers was updated. It is None if `train_step` was not provided, or if a
+    policy was not updated yet.
+    """
+    with self._lock:
+      update_train_steps = list(self._update_train_steps)
+    if self._train_step is None or None in update_train_steps:
+      return None
+    return self._get_train_step() - min(update_train_steps)
+
+  def start(self):
+    """Starts running the drivers in background threads.
+
+    Raises:
+      RuntimeError: If the drivers are already running.
+    """
+    if self._threads:
+      raise RuntimeError('AsyncDriver is already running.')
+    self._stop_event.clear()
+    self._exception = None
+    for index, driver in enumerate(self._drivers):
+      thread = threading.Thread(target=self._run_driver, args=(index, driver))
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  def stop(self):
+    """Stops the drivers once their current runs complete.
+
+    Raises:
+      Exception: The first exception raised by a driver, if any.
+    """
+    self._stop_event.set()
+    for thread in self._threads:
+      thread.join()
+    self._threads = []
+    if self._exception is not None:
+      exception, self._exception = self._exception, None
+      raise exception
+
+  def _get_train_step(self):
+    return int(self._train_step.numpy())
+
+  def _run_driver(self, index, driver):
+    try:
+      time_step, policy_state = _initial_state(driver)
+      while not self._stop_event.is_set():
+        if self._num_runs[index] % self._update_period == 0:
+          self._update_policy(index, driver)
+        time_step, policy_state = driver.run(time_step, policy_state)
+        with self._lock:
+          self._num_runs[index] += 1
+    except Exception as e:  # pylint: disable=broad-except
+      logging.exception('Driver %d of the AsyncDriver failed.', index)
+      with self._lock:
+        if self._exception is None:
+          self._exception = e
+      self._stop_event.set()
+
+  def _update_policy(self, index, driver):
+    if self._update_fn is None:
+      return
+    train_step = None
+    with self._update_lock:
+      # The learner cannot advance between reading the train step and copying
+      # the weights it matches.
+      if self._train_step is not None:
+        train_step = self._get_train_step()
+      self._update_fn(driver.policy)
+    with self._lock:
+      self._update_train_steps[index] = train_step
+
+
+def _initial_state(driver):
+  """Returns the time step and policy state to start running a driver from."""
+  if isinstance(driver, py_driver.PyDriver):
+    return (driver.env.reset(),
+            driver.policy.get_initial_state(driver.env.batch_size))
+  # TF drivers start from the current time step and the initial policy state.
+  return None, None
@@ -0,0 +1,198 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.drivers.async_driver."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+import tensorflow as tf
+
+from tf_agents.drivers import async_driver
+from tf_agents.drivers import py_driver
+from tf_agents.drivers import test_utils as driver_test_utils
+
+
+class MockReplayBufferObserver(object):
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._trajectories = []
+
+  def __call__(self, trajectory_):
+    with self._lock:
+      self._trajectories.append(trajectory_)
+
+  def gather_all(self):
+    with self._lock:
+      return list(self._trajectories)
+
+
+class TrainStepMock(object):
+  """Mocks a train step counter variable in eager mode."""
+
+  def __init__(self):
+    self.value = 0
+
+  def numpy(self):
+    return self.value
+
+
+class LockCheckingTrainStepMock(TrainStepMock):
+  """Records whether a lock is held whenever the train step is read."""
+
+  def __init__(self, lock):
+    super(LockCheckingTrainStepMock, self).__init__()
+    self._lock = lock
+    self.lock_held = []
+
+  def numpy(self):
+    self.lock_held.append(self._lock.locked())
+    return self.value
+
+
+class FailingDriver(object):
+
+  def __init__(self, policy):
+    self.policy = policy
+
+  def run(self, time_step, policy_state):
+    raise ValueError('Driver failed.')
+
+
+class AsyncDriverTest(tf.test.TestCase):
+
+  def _make_driver(self, observer):
+    env = driver_test_utils.PyEnvironmentMock()
+    policy = driver_test_utils.PyPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    return py_driver.PyDriver(env, policy, observers=[observer], max_steps=1)
+
+  def _wait_for_runs(self, driver, num_runs):
+    deadline = time.time() + 10
+    while driver.num_runs < num_runs and time.time() < deadline:
+      time.sleep(0.01)
+
+  def testRunsDrivers(self):
+    observers = [MockReplayBufferObserver(), MockReplayBufferObserver()]
+    updated_policies = []
+    driver = async_driver.AsyncDriver(
+        [self._make_driver(observer) for observer in observers],
+        update_period=2,
+        update_fn=updated_policies.append)
+
+    driver.start()
+    self._wait_for_runs(driver, 20)
+    driver.stop()
+
+    num_runs = driver.num_runs
+    self.assertGreaterEqual(num_runs, 20)
+    self.assertEqual(num_runs,
+                     sum(len(observer.gather_all()) for observer in observers))
+    for observer in observers:
+      trajectories = observer.gather_all()
+      # Each driver continues from the time step of its previous run.
+      self.assertTrue(trajectories[0].is_first())
+      self.assertEqual(trajectories[0].observation + trajectories[0].action,
+                       trajectories[1].observation)
+    # Policies are updated before the first run and every 2 runs.
+    self.assertGreaterEqual(len(updated_policies), num_runs // 2)
+    self.assertLessEqual(len(updated_policies), num_runs // 2 + 2)
+
+    # The drivers stopped.
+    time.sleep(0.05)
+    self.assertEqual(num_runs, driver.num_runs)
+
+  def testPolicyLag(self):
+    train_step = TrainStepMock()
+    driver = async_driver.AsyncDriver(
+        [self._make_driver(MockReplayBufferObserver())],
+        update_period=10**9,
+        train_step=train_step,
+        update_fn=lambda policy: None)
+    self.assertIsNone(driver.policy_lag)
+
+    driver.start()
+    self._wait_for_runs(driver, 1)
+    self.assertEqual(0, driver.policy_lag)
+    train_step.value = 5
+    self.assertEqual(5, driver.policy_lag)
+    driver.stop()
+
+  def testNoPolicyLagWithoutTrainStep(self):
+    driver = async_driver.AsyncDriver(
+        [self._make_driver(MockReplayBufferObserver())],
+        update_fn=lambda policy: None)
+    driver.start()
+    self._wait_for_runs(driver, 1)
+    driver.stop()
+    self.assertIsNone(driver.policy_lag)
+
+  def testDriverErrorsAreRaised(self):
+    driver = async_driver.AsyncDriver(
+        [FailingDriver(policy=None)],
+        update_fn=lambda policy: None)
+    driver.start()
+    with self.assertRaisesRegexp(ValueError, 'Driver failed'):
+      driver.stop()
+
+  def testStartTwice(self):
+    driver = async_driver.AsyncDriver(
+        [self._make_driver(MockReplayBufferObserver())])
+    driver.start()
+    with self.assertRaisesRegexp(RuntimeError, 'already running'):
+      driver.start()
+    driver.stop()
+
+  def testPyPoliciesRequireUpdateFn(self):
+    driver = self._make_driver(MockReplayBufferObserver())
+    with self.assertRaisesRegexp(ValueError, 'update_fn is required'):
+      async_driver.AsyncDriver([driver], policy=driver.policy)
+
+  def testUpdatesHoldUpdateLock(self):
+    update_lock = threading.Lock()
+    lock_held = []
+    train_step = LockCheckingTrainStepMock(update_lock)
+    driver = async_driver.AsyncDriver(
+        [self._make_driver(MockReplayBufferObserver())],
+        train_step=train_step,
+        update_fn=lambda policy: lock_held.append(update_lock.locked()),
+        update_lock=update_lock)
+    self.assertIs(update_lock, driver.update_lock)
+
+    with update_lock:
+      driver.start()
+      time.sleep(0.05)
+      # The update before the first run waits for the lock.
+      self.assertEqual(0, driver.num_runs)
+    self._wait_for_runs(driver, 1)
+    driver.stop()
+    self.assertTrue(lock_held)
+    self.assertTrue(all(lock_held))
+    # The train step of the policy lag is read under the same lock.
+    self.assertTrue(train_step.lock_held)
+    self.assertTrue(all(train_step.lock_held))
+
+  def testInvalidUpdatePeriod(self):
+    with self.assertRaisesRegexp(ValueError, 'update_period'):
+      async_driver.AsyncDriver([], update_period=0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
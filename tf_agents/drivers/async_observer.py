@@ -0,0 +1,238 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An observer notifying another observer from a background thread.
+
+Drivers notify their observers inline, so that slow observers (e.g. writing
+TFRecords, inserting in a hashed replay buffer, or updating Python metrics)
+directly reduce the throughput of the environment. `AsyncObserver` queues the
+trajectories instead, and notifies the wrapped observer from a dedicated
+thread:
+
+  observer = async_observer.AsyncObserver(
+      replay_buffer.add_batch, max_queue_size=64, backpressure='block')
+  driver = py_driver.PyDriver(env, policy, [observer], max_steps=1000)
+  driver.run(time_step)
+  observer.flush()
+
+The wrapped observer is always called with numpy arrays. When called with
+tensors, e.g. by a `DynamicStepDriver`, `AsyncObserver` queues their values
+with a `tf.py_function`.
+
+When the queue is full, the `backpressure` policy decides what happens to a
+new trajectory:
+
+  * 'block': Waits until the queue has room for it.
+  * 'drop': Drops it, see `num_dropped`.
+  * 'coalesce': Appends it to the last queued entry, or waits like 'block' if
+    that entry already holds `max_coalesced_size` trajectories. The
+    trajectories of an entry are passed at once to the `call_sequence` method
+    of the observer when it has one (e.g. `py_metrics`), stacked along a time
+    dimension after the batch dimension, or else one after another.
+
+Exceptions raised by the wrapped observer are re-raised by the next call to
+the `AsyncObserver`, `flush` or `close`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import threading
+
+from absl import logging
+import gin
+import numpy as np
+import tensorflow as tf
+
+BLOCK = 'block'
+DROP = 'drop'
+COALESCE = 'coalesce'
+
+
+@gin.configurable
+class AsyncObserver(object):
+  """Notifies an observer from a background thread."""
+
+  def __init__(self, observer, max_queue_size=64, backpressure=BLOCK,
+               max_coalesced_size=64):
+    """Creates an AsyncObserver.
+
+    Args:
+      observer: The wrapped observer, a callable(trajectory.Trajectory) of
+        numpy arrays.
+      max_queue_size: Maximum number of queued entries.
+      backpressure: What to do with a trajectory when the queue is full, one
+        of 'block', 'drop' or 'coalesce'.
+      max_coalesced_size: Maximum number of trajectories of an entry with the
+        'coalesce' backpressure, bounding the memory held by the queue.
+
+    Raises:
+      ValueError: If max_queue_size or max_coalesced_size is smaller than 1,
+        or if backpressure is invalid.
+    """
+    if max_queue_size < 1:
+      raise ValueError(
+          'max_queue_size must be at least 1, got {}.'.format(max_queue_size))
+    if max_coalesced_size < 1:
+      raise ValueError('max_coalesced_size must be at least 1, got {}.'.format(
+          max_coalesced_size))
+    if backpressure not in (BLOCK, DROP, COALESCE):
+      raise ValueError('backpressure must be one of {}, got {}.'.format(
+          (BLOCK, DROP, COALESCE), backpressure))
+    self._observer = observer
+    self._max_queue_size = max_queue_size
+    self._backpressure = backpressure
+    self._max_coalesced_size = max_coalesced_size
+
+    self._condition = threading.Condition()
+    # Each entry is a list of trajectories, see the 'coalesce' backpressure.
+    self._queue = collections.deque()
+    self._num_in_flight = 0
+    self._num_dropped = 0
+    self._exception = None
+    self._closed = False
+    self._thread = threading.Thread(target=self._notify_observer)
+    self._thread.daemon = True
+    self._thread.start()
+
+  @property
+  def observer(self):
+    return self._observer
+
+  @property
+  def num_dropped(self):
+    """Returns the number of trajectories dropped as the queue was full."""
+    with self._condition:
+      return self._num_dropped
+
+  def __call__(self, trajectory):
+    """Queues a trajectory for the wrapped observer.
+
+    Args:
+      trajectory: A trajectory, of numpy arrays or tensors.
+
+    Returns:
+      When called with tensors, a bool tensor running the queueing. Otherwise
+      None.
+
+    Raises:
+      Exception: The first exception raised by the wrapped observer, if any.
+      RuntimeError: If the AsyncObserver was closed.
+    """
+    if any(tf.is_tensor(t) for t in tf.nest.flatten(trajectory)):
+      def _put_flat(*flat_tensors):
+        self._put(tf.nest.pack_sequence_as(
+            trajectory, [t.numpy() for t in flat_tensors]))
+        return True
+
+      return tf.py_function(
+          _put_flat, tf.nest.flatten(trajectory), tf.bool,
+          name='async_observer')
+    self._put(trajectory)
+
+  def flush(self):
+    """Waits until the wrapped observer processed all queued trajectories.
+
+    Raises:
+      Exception: The first exception raised by the wrapped observer, if any.
+    """
+    with self._condition:
+      while ((self._queue or self._num_in_flight) and
+             self._exception is None):
+        self._condition.wait()
+    self._raise_exception()
+
+  def close(self):
+    """Flushes the queue and stops the background thread.
+
+    Raises:
+      Exception: The first exception raised by the wrapped observer, if any.
+    """
+    try:
+      self.flush()
+    finally:
+      with self._condition:
+        self._closed = True
+        self._condition.notify_all()
+      self._thread.join()
+
+  def _raise_exception(self):
+    with self._condition:
+      exception, self._exception = self._exception, None
+    if exception is not None:
+      raise exception
+
+  def _check_not_closed(self):
+    # The background thread is stopped, queued trajectories would be lost.
+    if self._closed:
+      raise RuntimeError('The AsyncObserver was closed.')
+
+  def _put(self, trajectory):
+    self._raise_exception()
+    with self._condition:
+      self._check_not_closed()
+      if len(self._queue) >= self._max_queue_size:
+        if self._backpressure == DROP:
+          self._num_dropped += 1
+          return
+        if (self._backpressure == COALESCE and
+            len(self._queue[-1]) < self._max_coalesced_size):
+          self._queue[-1].append(trajectory)
+          return
+        while (len(self._queue) >= self._max_queue_size and
+               self._exception is None and not self._closed):
+          self._condition.wait()
+        self._check_not_closed()
+      self._queue.append([trajectory])
+      self._condition.notify_all()
+    self._raise_exception()
+
+  def _notify_observer(self):
+    """Notifies the wrapped observer of the queued trajectories."""
+    while True:
+      with self._condition:
+        while not self._queue and not self._closed:
+          self._condition.wait()
+        if not self._queue:
+          return
+        trajectories = self._queue.popleft()
+        self._num_in_flight += 1
+        self._condition.notify_all()
+
+      try:
+        call_sequence = getattr(self._observer, 'call_sequence', None)
+        # Only batched trajectories can be stacked along a time dimension.
+        is_batched = all(
+            np.ndim(array) for array in tf.nest.flatten(trajectories[0]))
+        if (len(trajectories) > 1 and call_sequence is not None and
+            is_batched):
+          call_sequence(tf.nest.map_structure(
+              lambda *arrays: np.stack(arrays, axis=1), *trajectories))
+        else:
+          for trajectory in trajectories:
+            self._observer(trajectory)
+      except Exception as e:  # pylint: disable=broad-except
+        logging.exception('The observer of the AsyncObserver failed.')
+        with self._condition:
+          if self._exception is None:
+            self._exception = e
+          # Drop the queued trajectories, the exception is re-raised instead.
+          self._queue.clear()
+
+      with self._condition:
+        self._num_in_flight -= 1
+        self._condition.notify_all()
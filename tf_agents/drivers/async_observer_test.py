@@ -0,0 +1,202 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.drivers.async_observer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.drivers import async_observer
+from tf_agents.drivers import py_driver
+from tf_agents.drivers import test_utils as driver_test_utils
+
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+class BlockingObserver(object):
+  """Records trajectories, blocking until released."""
+
+  def __init__(self):
+    self.released = threading.Event()
+    self.trajectories = []
+
+  def __call__(self, trajectory_):
+    self.released.wait()
+    self.trajectories.append(trajectory_)
+
+
+class BlockingSequenceObserver(BlockingObserver):
+
+  def __init__(self):
+    super(BlockingSequenceObserver, self).__init__()
+    self.sequences = []
+
+  def call_sequence(self, trajectory_):
+    self.released.wait()
+    self.sequences.append(trajectory_)
+
+
+class FailingObserver(object):
+
+  def __call__(self, trajectory_):
+    raise ValueError('Observer failed.')
+
+
+def _wait_until_taken(wrapped_observer):
+  """Waits until the wrapped observer took the first queued trajectory."""
+  while not wrapped_observer._num_in_flight:  # pylint: disable=protected-access
+    time.sleep(0.001)
+
+
+class AsyncObserverTest(tf.test.TestCase):
+
+  def testPyDriver(self):
+    env = driver_test_utils.PyEnvironmentMock()
+    policy = driver_test_utils.PyPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    observer = BlockingObserver()
+    observer.released.set()
+    wrapped_observer = async_observer.AsyncObserver(observer)
+    driver = py_driver.PyDriver(
+        env, policy, observers=[wrapped_observer], max_steps=4)
+
+    driver.run(env.reset(), policy.get_initial_state())
+    wrapped_observer.close()
+    self.assertEqual([0, 1, 3, 0, 1],
+                     [t.observation for t in observer.trajectories])
+
+  def testBlock(self):
+    observer = BlockingObserver()
+    wrapped_observer = async_observer.AsyncObserver(
+        observer, max_queue_size=2, backpressure='block')
+    # The first item is taken by the blocked observer, 2 are queued.
+    wrapped_observer(np.array(0))
+    _wait_until_taken(wrapped_observer)
+    for i in range(1, 3):
+      wrapped_observer(np.array(i))
+
+    blocked_call = threading.Thread(target=wrapped_observer,
+                                    args=(np.array(3),))
+    blocked_call.start()
+    blocked_call.join(0.1)
+    self.assertTrue(blocked_call.is_alive())
+
+    observer.released.set()
+    blocked_call.join()
+    wrapped_observer.close()
+    self.assertEqual([0, 1, 2, 3], observer.trajectories)
+
+  def testDrop(self):
+    observer = BlockingObserver()
+    wrapped_observer = async_observer.AsyncObserver(
+        observer, max_queue_size=1, backpressure='drop')
+    wrapped_observer(np.array(0))
+    _wait_until_taken(wrapped_observer)
+    for i in range(1, 4):
+      wrapped_observer(np.array(i))
+
+    observer.released.set()
+    wrapped_observer.close()
+    self.assertEqual([0, 1], observer.trajectories)
+    self.assertEqual(2, wrapped_observer.num_dropped)
+
+  def testCoalesce(self):
+    observer = BlockingSequenceObserver()
+    wrapped_observer = async_observer.AsyncObserver(
+        observer, max_queue_size=1, backpressure='coalesce')
+    wrapped_observer(np.array([0, 10]))
+    _wait_until_taken(wrapped_observer)
+    for i in range(1, 4):
+      wrapped_observer(np.array([i, 10 + i]))
+
+    observer.released.set()
+    wrapped_observer.close()
+    self.assertAllEqual([[0, 10]], observer.trajectories)
+    self.assertLen(observer.sequences, 1)
+    self.assertAllEqual([[1, 2, 3], [11, 12, 13]], observer.sequences[0])
+
+  def testCoalesceBlocksAtMaxCoalescedSize(self):
+    observer = BlockingSequenceObserver()
+    wrapped_observer = async_observer.AsyncObserver(
+        observer, max_queue_size=1, backpressure='coalesce',
+        max_coalesced_size=2)
+    wrapped_observer(np.array([0, 10]))
+    _wait_until_taken(wrapped_observer)
+    for i in range(1, 3):
+      wrapped_observer(np.array([i, 10 + i]))
+
+    # The queued entry is full, the next trajectory waits for room.
+    blocked_call = threading.Thread(target=wrapped_observer,
+                                    args=(np.array([3, 13]),))
+    blocked_call.start()
+    blocked_call.join(0.1)
+    self.assertTrue(blocked_call.is_alive())
+
+    observer.released.set()
+    blocked_call.join()
+    wrapped_observer.close()
+    self.assertAllEqual([[0, 10], [3, 13]], observer.trajectories)
+    self.assertLen(observer.sequences, 1)
+    self.assertAllEqual([[1, 2], [11, 12]], observer.sequences[0])
+
+  def testExceptionsAreRaised(self):
+    wrapped_observer = async_observer.AsyncObserver(FailingObserver())
+    wrapped_observer(np.array(0))
+    with self.assertRaisesRegexp(ValueError, 'Observer failed'):
+      wrapped_observer.flush()
+    wrapped_observer.close()
+
+  def testCallAfterCloseRaises(self):
+    observer = BlockingObserver()
+    observer.released.set()
+    wrapped_observer = async_observer.AsyncObserver(observer)
+    wrapped_observer(np.array(0))
+    wrapped_observer.close()
+    with self.assertRaisesRegexp(RuntimeError, 'AsyncObserver was closed'):
+      wrapped_observer(np.array(1))
+    self.assertAllEqual([0], observer.trajectories)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testTensors(self):
+    observer = BlockingObserver()
+    observer.released.set()
+    wrapped_observer = async_observer.AsyncObserver(observer)
+    trajectory = {'observation': tf.constant([1., 2.]),
+                  'step': tf.constant(3, dtype=tf.int64)}
+    self.evaluate(wrapped_observer(trajectory))
+    wrapped_observer.close()
+
+    self.assertLen(observer.trajectories, 1)
+    self.assertAllEqual([1., 2.], observer.trajectories[0]['observation'])
+    self.assertEqual(3, observer.trajectories[0]['step'])
+
+  def testInvalidArgs(self):
+    with self.assertRaisesRegexp(ValueError, 'max_queue_size'):
+      async_observer.AsyncObserver(lambda traj: None, max_queue_size=0)
+    with self.assertRaisesRegexp(ValueError, 'backpressure'):
+      async_observer.AsyncObserver(lambda traj: None, backpressure='wait')
+    with self.assertRaisesRegexp(ValueError, 'max_coalesced_size'):
+      async_observer.AsyncObserver(lambda traj: None, max_coalesced_size=0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
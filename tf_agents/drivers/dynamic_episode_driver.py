@@ -21,6 +21,8 @@ from __future__ import print_function
 
 import tensorflow as tf
 from tf_agents.drivers import driver
+from tf_agents.replay_buffers import replay_buffer
+from tf_agents.trajectories import time_step as ts
 from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
 from tf_agents.utils import nest_utils
@@ -39,13 +41,26 @@ class DynamicEpisodeDriver(driver.Driver):
 
   This termination condition can be overridden in subclasses by implementing the
   self._loop_condition_fn() method.
+
+  Stopping on the total favors short episodes, which complete more often than
+  long ones. With `num_episodes_per_env`, execution instead stops once every
+  batch element completed its own quota of episodes. The trajectories of batch
+  elements that met their quota are masked into boundary transitions with no
+  reward (see `trajectory.boundary`), so that observers such as metrics see
+  exactly `num_episodes_per_env` episodes from each batch element. Note that
+  a batched environment still steps all its batch elements together.
+
+  As the observers receive these masked transitions, `num_episodes_per_env` is
+  meant for evaluation, e.g. with metrics as observers: it can not be used
+  with replay buffer observers, which would store them.
   """
 
   def __init__(self,
                env,
                policy,
                observers=None,
-               num_episodes=1):
+               num_episodes=1,
+               num_episodes_per_env=None):
     """Creates a DynamicEpisodeDriver.
 
     Args:
@@ -54,16 +69,34 @@ class DynamicEpisodeDriver(driver.Driver):
       observers: A list of observers that are updated after every step in
         the environment. Each observer is a callable(Trajectory).
       num_episodes: The number of episodes to take in the environment.
+      num_episodes_per_env: Optional number of episodes to take in each batch
+        element of the environment. If set, num_episodes is ignored. Only for
+        evaluation drivers, see above.
 
     Raises:
       ValueError:
         If env is not a tf_environment.Base or policy is not an instance of
-        tf_policy.Base.
+        tf_policy.Base, or if num_episodes_per_env is set and an observer is a
+        method of a replay buffer.
     """
     super(DynamicEpisodeDriver, self).__init__(env, policy, observers)
     self._num_episodes = num_episodes
+    self._num_episodes_per_env = num_episodes_per_env
+    if num_episodes_per_env is not None:
+      self._check_observers_accept_masking()
     self._run_fn = common.function_in_tf1()(self._run)
 
+  def _check_observers_accept_masking(self):
+    """Raises if an observer would store the masked transitions."""
+    for observer in self._observers:
+      if isinstance(getattr(observer, '__self__', None),
+                    replay_buffer.ReplayBuffer):
+        raise ValueError(
+            'num_episodes_per_env is only meant for evaluation, and can not '
+            'be used with replay buffer observers, which would store the '
+            'masked transitions of finished batch elements: {}'.format(
+                observer))
+
   def _loop_condition_fn(self, num_episodes):
     """Returns a function with the condition needed for tf.while_loop."""
     def loop_cond(counter, *_):
@@ -79,8 +112,22 @@ class DynamicEpisodeDriver(driver.Driver):
 
     return loop_cond
 
-  def _loop_body_fn(self):
-    """Returns a function with the driver's loop body ops."""
+  def _per_env_loop_condition_fn(self, num_episodes_per_env):
+    """Returns the tf.while_loop condition for per batch element quotas."""
+    def loop_cond(counter, *_):
+      return tf.reduce_any(
+          input_tensor=tf.less(counter, num_episodes_per_env))
+
+    return loop_cond
+
+  def _loop_body_fn(self, num_episodes_per_env=None):
+    """Returns a function with the driver's loop body ops.
+
+    Args:
+      num_episodes_per_env: Optional quota of episodes of each batch element.
+        If provided, the trajectories of batch elements that met their quota
+        are masked before being passed to the observers.
+    """
     def loop_body(counter, time_step, policy_state):
       """Runs a step in environment. While loop will call multiple times.
 
@@ -97,15 +144,16 @@ class DynamicEpisodeDriver(driver.Driver):
       next_time_step = self.env.step(action_step.action)
 
       traj = trajectory.from_transition(time_step, action_step, next_time_step)
+      # While loop counter is only incremented for episode reset episodes.
+      next_counter = counter + tf.cast(traj.is_boundary(), dtype=tf.int32)
+      if num_episodes_per_env is not None:
+        traj = _mask_trajectory(traj, tf.less(counter, num_episodes_per_env))
       observer_ops = [observer(traj) for observer in self._observers]
       with tf.control_dependencies([tf.group(observer_ops)]):
         time_step, next_time_step, policy_state = tf.nest.map_structure(
             tf.identity, (time_step, next_time_step, policy_state))
 
-      # While loop counter is only incremented for episode reset episodes.
-      counter += tf.cast(traj.is_boundary(), dtype=tf.int32)
-
-      return [counter, next_time_step, policy_state]
+      return [next_counter, next_time_step, policy_state]
 
     return loop_body
 
@@ -113,7 +161,8 @@ class DynamicEpisodeDriver(driver.Driver):
           time_step=None,
           policy_state=None,
           num_episodes=None,
-          maximum_iterations=None):
+          maximum_iterations=None,
+          num_episodes_per_env=None):
     """Takes episodes in the environment using the policy and update observers.
 
     If `time_step` and `policy_state` are not provided, `run` will reset the
@@ -130,6 +179,9 @@ class DynamicEpisodeDriver(driver.Driver):
         loop to run. If provided, the cond output is AND-ed with an additional
         condition ensuring the number of iterations executed is no greater than
         maximum_iterations.
+      num_episodes_per_env: Optional number of episodes to take in each batch
+        element of the environment. If None it would use initial
+        num_episodes_per_env. If set, num_episodes is ignored.
 
     Returns:
       time_step: TimeStep named tuple with final observation, reward, etc.
@@ -138,13 +190,15 @@ class DynamicEpisodeDriver(driver.Driver):
     return self._run_fn(time_step=time_step,
                         policy_state=policy_state,
                         num_episodes=num_episodes,
-                        maximum_iterations=maximum_iterations)
+                        maximum_iterations=maximum_iterations,
+                        num_episodes_per_env=num_episodes_per_env)
 
   def _run(self,
            time_step=None,
            policy_state=None,
            num_episodes=None,
-           maximum_iterations=None):
+           maximum_iterations=None,
+           num_episodes_per_env=None):
     """See `run()` docstring for details."""
     if time_step is None:
       time_step = self.env.reset()
@@ -158,10 +212,16 @@ class DynamicEpisodeDriver(driver.Driver):
         time_step, self.env.time_step_spec())
     counter = tf.zeros(batch_dims, tf.int32)
 
-    num_episodes = num_episodes or self._num_episodes
+    num_episodes_per_env = num_episodes_per_env or self._num_episodes_per_env
+    if num_episodes_per_env is not None:
+      self._check_observers_accept_masking()
+      loop_cond = self._per_env_loop_condition_fn(num_episodes_per_env)
+    else:
+      num_episodes = num_episodes or self._num_episodes
+      loop_cond = self._loop_condition_fn(num_episodes)
     [_, time_step, policy_state] = tf.while_loop(
-        cond=self._loop_condition_fn(num_episodes),
-        body=self._loop_body_fn(),
+        cond=loop_cond,
+        body=self._loop_body_fn(num_episodes_per_env),
         loop_vars=[
             counter,
             time_step,
@@ -172,3 +232,25 @@ class DynamicEpisodeDriver(driver.Driver):
         name='driver_loop'
     )
     return time_step, policy_state
+
+
+def _mask_trajectory(traj, mask):
+  """Replaces the transitions of batch elements not in mask by boundaries.
+
+  Args:
+    traj: A `Trajectory` with elements of shape [batch_size, ...].
+    mask: A bool tensor of shape [batch_size], True for the batch elements
+      whose transitions are kept.
+
+  Returns:
+    A `Trajectory` whose masked out batch elements are LAST -> FIRST
+    transitions with no reward, which observers do not count as steps.
+  """
+  step_type = tf.compat.v1.where(
+      mask, traj.step_type, tf.fill(tf.shape(input=mask), ts.StepType.LAST))
+  next_step_type = tf.compat.v1.where(
+      mask, traj.next_step_type,
+      tf.fill(tf.shape(input=mask), ts.StepType.FIRST))
+  reward = tf.compat.v1.where(mask, traj.reward, tf.zeros_like(traj.reward))
+  return traj._replace(
+      step_type=step_type, next_step_type=next_step_type, reward=reward)
@@ -23,7 +23,9 @@ import tensorflow as tf
 
 from tf_agents.drivers import dynamic_episode_driver
 from tf_agents.drivers import test_utils as driver_test_utils
+from tf_agents.environments import batched_py_environment
 from tf_agents.environments import tf_py_environment
+from tf_agents.metrics import tf_metrics
 from tf_agents.utils import test_utils
 
 
@@ -193,6 +195,48 @@ class DynamicEpisodeDriverTest(test_utils.TestCase):
     self.assertAllEqual(trajectories.discount,
                         [[1., 0., 1., 1., 0., 1., 1., 0., 1.]])
 
+  def testNumEpisodesPerEnv(self):
+    # Episodes take 2 steps in the first environment and 3 in the second.
+    env = tf_py_environment.TFPyEnvironment(
+        batched_py_environment.BatchedPyEnvironment([
+            driver_test_utils.PyEnvironmentMock(final_state=3),
+            driver_test_utils.PyEnvironmentMock(final_state=4)
+        ]))
+    policy = driver_test_utils.TFPolicyMock(
+        env.time_step_spec(), env.action_spec(), batch_size=2)
+    num_episodes_metric = tf_metrics.NumberOfEpisodes()
+    num_steps_metric = tf_metrics.EnvironmentSteps()
+    episode_length_metric = tf_metrics.AverageEpisodeLengthMetric()
+
+    driver = dynamic_episode_driver.DynamicEpisodeDriver(
+        env,
+        policy,
+        observers=[num_episodes_metric, num_steps_metric,
+                   episode_length_metric],
+        num_episodes_per_env=2)
+    run_driver = driver.run()
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(run_driver)
+    # The first environment starts a third episode while the second completes
+    # its episodes, which is not observed.
+    self.assertEqual(4, self.evaluate(num_episodes_metric.result()))
+    self.assertEqual(10, self.evaluate(num_steps_metric.result()))
+    self.assertAllClose(2.5, self.evaluate(episode_length_metric.result()))
+
+
+  def testNumEpisodesPerEnvRejectsReplayBuffers(self):
+    env = tf_py_environment.TFPyEnvironment(
+        driver_test_utils.PyEnvironmentMock())
+    policy = driver_test_utils.TFPolicyMock(
+        env.time_step_spec(), env.action_spec())
+    replay_buffer = driver_test_utils.make_replay_buffer(policy)
+
+    with self.assertRaisesRegexp(ValueError, 'only meant for evaluation'):
+      dynamic_episode_driver.DynamicEpisodeDriver(
+          env, policy, observers=[replay_buffer.add_batch],
+          num_episodes_per_env=1)
+
 
 if __name__ == '__main__':
   tf.test.main()
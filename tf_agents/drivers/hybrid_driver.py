@@ -0,0 +1,214 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A Driver stepping python environments using a compiled TF policy.
+
+`PyDriver` with a `PyTFPolicy` pays the overhead of a session or of eager
+execution for every step, and leaves the environment idle while the policy
+computes its action. `HybridDriver` compiles the `action` of a TF policy with
+`common.function`, keeps the environments in Python, and pipelines them: while
+one environment steps in a background thread, the action of the next one is
+computed, hiding the inference latency.
+
+  envs = [parallel_py_environment.ParallelPyEnvironment(
+      [env_load_fn] * num_parallel_environments) for _ in range(2)]
+  driver = hybrid_driver.HybridDriver(
+      envs, agent.collect_policy, observers=[replay_buffer_observer],
+      max_steps=collect_steps_per_iteration)
+  time_steps, policy_states = driver.run()
+  time_steps, policy_states = driver.run(time_steps, policy_states)
+  driver.close()
+
+The driver can also be used in a with-statement, which closes it on exit.
+Requires eager mode.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# pylint: disable=line-too-long
+# multiprocessing.dummy provides a pure *multithreaded* threadpool that works
+# in both python2 and python3 (concurrent.futures isn't available in python2).
+#   https://docs.python.org/2/library/multiprocessing.html#module-multiprocessing.dummy
+from multiprocessing import dummy as mp_threads
+# pylint: enable=line-too-long
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.drivers import driver
+from tf_agents.trajectories import trajectory
+from tf_agents.utils import common
+from tf_agents.utils import nest_utils
+import gin.tf
+
+
+@gin.configurable
+class HybridDriver(driver.Driver):
+  """Steps python environments in turns, using a compiled TF policy."""
+
+  def __init__(self,
+               envs,
+               policy,
+               observers,
+               max_steps=None,
+               max_episodes=None):
+    """Creates a HybridDriver.
+
+    Args:
+      envs: A list of py_environment.Base environments, stepped in turns. The
+        action of an environment is computed while the previous one steps, so
+        that at least 2 environments are needed to hide the inference latency.
+      policy: A tf_policy.Base policy.
+      observers: A list of observers that are notified after every step
+        in an environment. Each observer is a callable(trajectory.Trajectory)
+        of numpy arrays.
+      max_steps: Optional maximum number of steps, summed over the
+        environments, for each run() call. Default: 0.
+      max_episodes: Optional maximum number of episodes, summed over the
+        environments, for each run() call. At least one of max_steps or
+        max_episodes must be provided. If both are set, run() terminates when
+        at least one of the conditions is satisfied. Default: 0.
+
+    Raises:
+      ValueError: If both max_steps and max_episodes are None, or if envs is
+        empty.
+    """
+    max_steps = max_steps or 0
+    max_episodes = max_episodes or 0
+    if max_steps < 1 and max_episodes < 1:
+      raise ValueError(
+          'Either `max_steps` or `max_episodes` should be greater than 0.')
+    if not envs:
+      raise ValueError('At least one environment should be provided.')
+
+    super(HybridDriver, self).__init__(envs[0], policy, observers)
+    self._envs = envs
+    self._max_steps = max_steps or np.inf
+    self._max_episodes = max_episodes or np.inf
+    self._action_fn = common.function(policy.action)
+    # The thread stepping the environments, started by the first run().
+    self._pool = None
+
+  def __enter__(self):
+    """Allows the driver to be used in a with-statement context."""
+    return self
+
+  def __exit__(self, unused_exception_type, unused_exc_value, unused_traceback):
+    """Allows the driver to be used in a with-statement context."""
+    self.close()
+
+  def __del__(self):
+    self.close()
+
+  @property
+  def envs(self):
+    return self._envs
+
+  def close(self):
+    """Stops the thread stepping the environments, if any.
+
+    A later call to run() starts a new thread.
+    """
+    pool = getattr(self, '_pool', None)
+    if pool is not None:
+      self._pool = None
+      pool.close()
+      pool.join()
+
+  def run(self, time_steps=None, policy_states=None):
+    """Runs the policy in the environments, in turns.
+
+    Args:
+      time_steps: Optional list of initial time_steps, one per environment.
+        If None, they are obtained by resetting the environments.
+      policy_states: Optional list of initial policy_states, one per
+        environment. If None, they are obtained from the policy.
+
+    Returns:
+      A tuple (final time_steps, final policy_states) of lists with one entry
+      per environment, to continue from in the next call to run().
+    """
+    if time_steps is None:
+      time_steps = [env.reset() for env in self._envs]
+    if policy_states is None:
+      policy_states = [
+          self.policy.get_initial_state(env.batch_size or 1)
+          for env in self._envs
+      ]
+    time_steps = list(time_steps)
+    policy_states = list(policy_states)
+    num_envs = len(self._envs)
+    action_steps = [None] * num_envs
+    if self._pool is None:
+      self._pool = mp_threads.Pool(1)
+
+    num_steps = 0
+    num_episodes = 0
+    i = 0
+    action_steps[i] = self._action(i, time_steps[i], policy_states[i])
+    pending_step = self._pool.apply_async(self._envs[i].step,
+                                          (action_steps[i].action,))
+    while True:
+      j = (i + 1) % num_envs
+      if j != i:
+        # Computes the next action while environment i steps.
+        action_steps[j] = self._action(j, time_steps[j], policy_states[j])
+      next_time_step = pending_step.get()
+
+      traj = trajectory.from_transition(time_steps[i], action_steps[i],
+                                        next_time_step)
+      for observer in self.observers:
+        observer(traj)
+
+      num_episodes += np.sum(traj.is_last())
+      num_steps += np.sum(~traj.is_boundary())
+
+      time_steps[i] = next_time_step
+      policy_states[i] = action_steps[i].state
+      if num_steps >= self._max_steps or num_episodes >= self._max_episodes:
+        break
+
+      if j == i:
+        action_steps[j] = self._action(j, time_steps[j], policy_states[j])
+      pending_step = self._pool.apply_async(self._envs[j].step,
+                                            (action_steps[j].action,))
+      i = j
+
+    return time_steps, policy_states
+
+  def _action(self, index, time_step, policy_state):
+    """Computes the action of an environment with the compiled policy.
+
+    Args:
+      index: Index of the environment.
+      time_step: A time_step of numpy arrays from the environment.
+      policy_state: The policy_state of the environment.
+
+    Returns:
+      A PolicyStep whose action and info are numpy arrays. The state is left
+      as returned by the policy, to be passed back to it.
+    """
+    batched = self._envs[index].batched
+    if not batched:
+      time_step = nest_utils.batch_nested_array(time_step)
+    action_step = self._action_fn(
+        tf.nest.map_structure(tf.convert_to_tensor, time_step), policy_state)
+    action, info = tf.nest.map_structure(lambda t: t.numpy(),
+                                         (action_step.action, action_step.info))
+    if not batched:
+      action, info = nest_utils.unbatch_nested_array((action, info))
+    return action_step._replace(action=action, info=info)
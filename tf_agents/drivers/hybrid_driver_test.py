@@ -0,0 +1,146 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.drivers.hybrid_driver."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_agents.drivers import hybrid_driver
+from tf_agents.drivers import test_utils as driver_test_utils
+from tf_agents.environments import batched_py_environment
+from tf_agents.environments import tf_py_environment
+
+
+class MockReplayBufferObserver(object):
+
+  def __init__(self):
+    self._trajectories = []
+
+  def __call__(self, trajectory_):
+    self._trajectories.append(trajectory_)
+
+  def gather_all(self):
+    return self._trajectories
+
+
+class HybridDriverTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(HybridDriverTest, self).setUp()
+    if not tf.executing_eagerly():
+      self.skipTest('HybridDriver is eager-only.')
+
+  def _make_policy(self, env, batch_size=1):
+    tf_env = tf_py_environment.TFPyEnvironment(env)
+    return driver_test_utils.TFPolicyMock(
+        tf_env.time_step_spec(), tf_env.action_spec(), batch_size=batch_size)
+
+  def testRunOneEnvironment(self):
+    env = driver_test_utils.PyEnvironmentMock()
+    observer = MockReplayBufferObserver()
+    driver = hybrid_driver.HybridDriver(
+        [env], self._make_policy(env), observers=[observer], max_episodes=2)
+
+    time_steps, policy_states = driver.run()
+    driver.close()
+
+    trajectories = observer.gather_all()
+    self.assertEqual([0, 1, 2, 0, 1], [t.step_type for t in trajectories])
+    self.assertEqual([0, 1, 3, 0, 1], [t.observation for t in trajectories])
+    self.assertEqual([1, 2, 1, 1, 2], [t.action for t in trajectories])
+    self.assertEqual([2, 4, 2, 2, 4], [t.policy_info for t in trajectories])
+    self.assertEqual(2, time_steps[0].step_type)
+    self.assertAllEqual([2], policy_states[0])
+
+  def testRunEnvironmentsInTurns(self):
+    envs = [
+        driver_test_utils.PyEnvironmentMock(),
+        driver_test_utils.PyEnvironmentMock()
+    ]
+    observer = MockReplayBufferObserver()
+    driver = hybrid_driver.HybridDriver(
+        envs, self._make_policy(envs[0]), observers=[observer], max_steps=4)
+
+    time_steps, policy_states = driver.run()
+    trajectories = observer.gather_all()
+    self.assertEqual([0, 0, 1, 1], [t.observation for t in trajectories])
+    self.assertEqual([1, 1, 2, 2], [t.action for t in trajectories])
+
+    # Each environment continues from its own time step and policy state.
+    driver.run(time_steps, policy_states)
+    driver.close()
+    trajectories = observer.gather_all()
+    self.assertEqual([0, 0, 1, 1, 3, 3, 0, 0, 1, 1],
+                     [t.observation for t in trajectories])
+    self.assertEqual([0, 0, 1, 1, 2, 2, 0, 0, 1, 1],
+                     [t.step_type for t in trajectories])
+
+  def testBatchedEnvironments(self):
+    envs = [
+        batched_py_environment.BatchedPyEnvironment([
+            driver_test_utils.PyEnvironmentMock(final_state=3),
+            driver_test_utils.PyEnvironmentMock(final_state=4)
+        ]) for _ in range(2)
+    ]
+    observer = MockReplayBufferObserver()
+    driver = hybrid_driver.HybridDriver(
+        envs, self._make_policy(envs[0], batch_size=2), observers=[observer],
+        max_steps=8)
+
+    driver.run()
+    driver.close()
+    trajectories = observer.gather_all()
+    self.assertLen(trajectories, 4)
+    for traj in trajectories[:2]:
+      self.assertAllEqual([0, 0], traj.observation)
+      self.assertAllEqual([1, 1], traj.action)
+    for traj in trajectories[2:]:
+      self.assertAllEqual([1, 1], traj.observation)
+      self.assertAllEqual([2, 2], traj.action)
+
+  def testThreadStartedByRunAndStoppedOnExit(self):
+    env = driver_test_utils.PyEnvironmentMock()
+    observer = MockReplayBufferObserver()
+    with hybrid_driver.HybridDriver(
+        [env], self._make_policy(env), observers=[observer],
+        max_steps=1) as driver:
+      self.assertIsNone(driver._pool)
+      driver.run()
+      self.assertIsNotNone(driver._pool)
+    self.assertIsNone(driver._pool)
+    self.assertLen(observer.gather_all(), 1)
+
+    # A closed driver starts a new thread when run again.
+    driver.run()
+    self.assertIsNotNone(driver._pool)
+    driver.close()
+    self.assertLen(observer.gather_all(), 2)
+
+  def testValueErrorOnInvalidArgs(self):
+    env = driver_test_utils.PyEnvironmentMock()
+    policy = self._make_policy(env)
+    with self.assertRaises(ValueError):
+      hybrid_driver.HybridDriver([env], policy, observers=[])
+    with self.assertRaises(ValueError):
+      hybrid_driver.HybridDriver([], policy, observers=[], max_steps=1)
+
+
+if __name__ == '__main__':
+  tf.compat.v1.enable_v2_behavior()
+  tf.test.main()
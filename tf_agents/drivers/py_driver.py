@@ -20,6 +20,7 @@ from __future__ import division
 from __future__ import print_function
 
 import numpy as np
+import tensorflow as tf
 from tf_agents.drivers import driver
 from tf_agents.trajectories import trajectory
 
@@ -32,7 +33,9 @@ class PyDriver(driver.Driver):
                policy,
                observers,
                max_steps=None,
-               max_episodes=None):
+               max_episodes=None,
+               steps_per_chunk=None,
+               double_buffered=False):
     """A driver that runs a python policy in a python environment.
 
     Args:
@@ -40,25 +43,63 @@ class PyDriver(driver.Driver):
       policy: A py_policy.Base policy.
       observers: A list of observers that are notified after every step
         in the environment. Each observer is a callable(trajectory.Trajectory).
+        If steps_per_chunk is set, observers are instead notified once per
+        chunk, see below.
       max_steps: Optional maximum number of steps for each run() call.
         Also see below.  Default: 0.
       max_episodes: Optional maximum number of episodes for each run() call.
         At least one of max_steps or max_episodes must be provided. If both
         are set, run() terminates when at least one of the conditions is
         satisfied.  Default: 0.
+      steps_per_chunk: Optional number of environment steps K taken between
+        notifications of the observers. If set, the trajectories of a chunk
+        are written to arrays of shape [K, batch_size, ...] and each observer
+        is notified once per chunk, with a time-stacked trajectory of shape
+        [batch_size, K, ...] (batch_size is 1 for unbatched environments).
+        Observers with a `call_sequence` method (e.g. `py_metrics`) are
+        notified with `observer.call_sequence(trajectory)`, other observers
+        with `observer(trajectory)` (e.g. `replay_buffer.add_sequence`).
+        Note that `PyUniformReplayBuffer.add_sequence` only accepts a batch
+        size of 1, as its single stream of items can not interleave the
+        sequences of several environments, and that `PyStepMetric`s without
+        their own `call_sequence` process the chunk one step at a time.
+        Steps and episodes are counted once per chunk, so that run() may
+        complete up to K - 1 steps of additional episodes.
+      double_buffered: Whether to split the batch of environments in two
+        halves, computing the actions of one half while the other steps. This
+        requires an environment supporting `step_async`, e.g. a
+        `ParallelPyEnvironment`, with a batch size of at least 2, and a policy
+        accepting half batches. Observers are notified with the trajectories
+        of the whole batch, which are identical to the ones of the default
+        mode.
 
     Raises:
-      ValueError: If both max_steps and max_episodes are None.
+      ValueError: If both max_steps and max_episodes are None, if
+        steps_per_chunk is smaller than 1, or if double_buffered is set with
+        steps_per_chunk or with an environment not supporting it.
     """
     max_steps = max_steps or 0
     max_episodes = max_episodes or 0
     if max_steps < 1 and max_episodes < 1:
       raise ValueError(
           'Either `max_steps` or `max_episodes` should be greater than 0.')
+    if steps_per_chunk is not None and steps_per_chunk < 1:
+      raise ValueError('`steps_per_chunk` should be greater than 0, got '
+                       '{}.'.format(steps_per_chunk))
+    if double_buffered:
+      if steps_per_chunk is not None:
+        raise ValueError('`double_buffered` and `steps_per_chunk` can not be '
+                         'used together.')
+      if not hasattr(env, 'step_async') or (env.batch_size or 1) < 2:
+        raise ValueError('`double_buffered` requires a batched environment '
+                         'with a batch size of at least 2 supporting '
+                         '`step_async`, e.g. a ParallelPyEnvironment.')
 
     super(PyDriver, self).__init__(env, policy, observers)
     self._max_steps = max_steps or np.inf
     self._max_episodes = max_episodes or np.inf
+    self._steps_per_chunk = steps_per_chunk
+    self._double_buffered = double_buffered
 
   def run(self, time_step, policy_state=()):
     """Run policy in environment given initial time_step and policy_state.
@@ -70,6 +111,11 @@ class PyDriver(driver.Driver):
     Returns:
       A tuple (final time_step, final policy_state).
     """
+    if self._steps_per_chunk is not None:
+      return self._run_chunks(time_step, policy_state)
+    if self._double_buffered:
+      return self._run_double_buffered(time_step, policy_state)
+
     num_steps = 0
     num_episodes = 0
     while num_steps < self._max_steps and num_episodes < self._max_episodes:
@@ -87,3 +133,117 @@ class PyDriver(driver.Driver):
       policy_state = action_step.state
 
     return time_step, policy_state
+
+  def _run_chunks(self, time_step, policy_state):
+    """Runs the policy in chunks of steps, notifying observers per chunk."""
+    batch_size = self.env.batch_size or 1
+    num_steps = 0
+    num_episodes = 0
+    while num_steps < self._max_steps and num_episodes < self._max_episodes:
+      chunk_length = self._steps_per_chunk
+      if num_steps + chunk_length * batch_size > self._max_steps:
+        # Each step of the environment counts at most batch_size steps, so
+        # shorten the last chunk rather than overshooting max_steps.
+        chunk_length = int(np.ceil((self._max_steps - num_steps) / batch_size))
+      traj, time_step, policy_state = self._run_chunk(
+          time_step, policy_state, chunk_length)
+
+      for observer in self.observers:
+        call_sequence = getattr(observer, 'call_sequence', None)
+        if call_sequence is not None:
+          call_sequence(traj)
+        else:
+          observer(traj)
+
+      num_episodes += np.sum(traj.is_last())
+      num_steps += np.sum(~traj.is_boundary())
+
+    return time_step, policy_state
+
+  def _run_chunk(self, time_step, policy_state, chunk_length):
+    """Takes chunk_length steps, returning their time-stacked trajectory."""
+    chunk = None
+    for t in range(chunk_length):
+      action_step = self.policy.action(time_step, policy_state)
+      next_time_step = self.env.step(action_step.action)
+
+      traj = trajectory.from_transition(time_step, action_step, next_time_step)
+      flat_traj = [np.asarray(value) for value in tf.nest.flatten(traj)]
+      if chunk is None:
+        chunk = [
+            np.empty((chunk_length,) + value.shape, dtype=value.dtype)
+            for value in flat_traj
+        ]
+      for array, value in zip(chunk, flat_traj):
+        array[t] = value
+
+      time_step = next_time_step
+      policy_state = action_step.state
+
+    if self.env.batched:
+      # [K, batch_size, ...] to [batch_size, K, ...].
+      chunk = [np.swapaxes(array, 0, 1) for array in chunk]
+    else:
+      chunk = [array[np.newaxis] for array in chunk]
+    return tf.nest.pack_sequence_as(traj, chunk), time_step, policy_state
+
+  def _run_double_buffered(self, time_step, policy_state):
+    """Runs the policy on a half of the batch while the other half steps."""
+    batch_size = self.env.batch_size
+    halves = [slice(0, batch_size // 2), slice(batch_size // 2, batch_size)]
+    second_half_size = batch_size - batch_size // 2
+    time_steps = [_slice_nest(time_step, half) for half in halves]
+    policy_states = [_slice_nest(policy_state, half) for half in halves]
+    action_steps = [None, None]
+    promises = [None, None]
+
+    def start_step(i):
+      action_steps[i] = self.policy.action(time_steps[i], policy_states[i])
+      promises[i] = self.env.step_async(action_steps[i].action, halves[i])
+
+    def finish_step(i):
+      next_time_step = promises[i]()
+      traj = trajectory.from_transition(time_steps[i], action_steps[i],
+                                        next_time_step)
+      time_steps[i] = next_time_step
+      policy_states[i] = action_steps[i].state
+      return traj
+
+    num_steps = 0
+    num_episodes = 0
+    start_step(0)
+    start_step(1)
+    while True:
+      first_traj = finish_step(0)
+      # The first half is stepped again before the second half completes its
+      # step only if the run continues whatever the second half observes.
+      pipelined = (
+          num_steps + np.sum(~first_traj.is_boundary()) + second_half_size <
+          self._max_steps and
+          num_episodes + np.sum(first_traj.is_last()) + second_half_size <
+          self._max_episodes)
+      if pipelined:
+        start_step(0)
+      traj = _concat_nests([first_traj, finish_step(1)])
+
+      for observer in self.observers:
+        observer(traj)
+
+      num_episodes += np.sum(traj.is_last())
+      num_steps += np.sum(~traj.is_boundary())
+      if num_steps >= self._max_steps or num_episodes >= self._max_episodes:
+        break
+
+      if not pipelined:
+        start_step(0)
+      start_step(1)
+
+    return _concat_nests(time_steps), _concat_nests(policy_states)
+
+
+def _slice_nest(nest, batch_slice):
+  return tf.nest.map_structure(lambda x: x[batch_slice], nest)
+
+
+def _concat_nests(nests):
+  return tf.nest.map_structure(lambda *xs: np.concatenate(xs), *nests)
@@ -19,6 +19,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
+import multiprocessing.dummy as dummy_multiprocessing
+
 from absl.testing import parameterized
 
 import numpy as np
@@ -26,6 +29,9 @@ import tensorflow as tf
 from tf_agents.drivers import py_driver
 from tf_agents.drivers import test_utils as driver_test_utils
 from tf_agents.environments import batched_py_environment
+from tf_agents.environments import parallel_py_environment
+from tf_agents.policies import py_policy
+from tf_agents.trajectories import policy_step
 from tf_agents.trajectories import trajectory
 
 
@@ -41,6 +47,23 @@ class MockReplayBufferObserver(object):
     return self._trajectories
 
 
+class MockSequenceObserver(object):
+
+  def __init__(self):
+    self.sequences = []
+
+  def call_sequence(self, trajectory_):
+    self.sequences.append(trajectory_)
+
+
+class ParityPolicyMock(py_policy.Base):
+  """Takes action 1 on even observations and 2 on odd ones, for any batch."""
+
+  def _action(self, time_step, policy_state):
+    action = (time_step.observation % 2 + 1).astype(np.int32)
+    return policy_step.PolicyStep(action, policy_state, action * 2)
+
+
 class PyDriverTest(parameterized.TestCase, tf.test.TestCase):
 
   def setUp(self):
@@ -133,6 +156,126 @@ class PyDriverTest(parameterized.TestCase, tf.test.TestCase):
     trajectories = replay_buffer_observer.gather_all()
     self.assertEqual(trajectories, self._trajectories[:num_expected_steps])
 
+  @parameterized.named_parameters(
+      [('TwoStepChunksFourSteps', 2, 4, None, [2, 2, 1]),
+       ('ThreeStepChunksOneEpisode', 3, None, 1, [3]),
+       ('ThreeStepChunksTwoEpisodes', 3, None, 2, [3, 3]),
+       ('TenStepChunksTwoSteps', 10, 2, None, [2]),
+      ])
+  def testRunChunks(self, steps_per_chunk, max_steps, max_episodes,
+                    expected_chunk_lengths):
+    env = driver_test_utils.PyEnvironmentMock()
+    policy = driver_test_utils.PyPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    replay_buffer_observer = MockReplayBufferObserver()
+    sequence_observer = MockSequenceObserver()
+    driver = py_driver.PyDriver(
+        env,
+        policy,
+        observers=[replay_buffer_observer, sequence_observer],
+        max_steps=max_steps,
+        max_episodes=max_episodes,
+        steps_per_chunk=steps_per_chunk,
+    )
+
+    initial_time_step = env.reset()
+    initial_policy_state = policy.get_initial_state()
+    driver.run(initial_time_step, initial_policy_state)
+
+    chunks = replay_buffer_observer.gather_all()
+    self.assertEqual(len(chunks), len(sequence_observer.sequences))
+    self.assertEqual(expected_chunk_lengths,
+                     [chunk.step_type.shape[1] for chunk in chunks])
+    trajectories = [
+        tf.nest.map_structure(lambda x, t=t: x[0, t], chunk)
+        for chunk in chunks
+        for t in range(chunk.step_type.shape[1])
+    ]
+    self.assertLen(trajectories, sum(expected_chunk_lengths))
+    for t1, t2 in zip(trajectories, self._trajectories):
+      for t1_field, t2_field in zip(t1, t2):
+        self.assertAllEqual(t1_field, t2_field)
+
+  def testRunChunksBatchedEnvironment(self):
+    env1 = driver_test_utils.PyEnvironmentMock(final_state=3)
+    env2 = driver_test_utils.PyEnvironmentMock(final_state=4)
+    env = batched_py_environment.BatchedPyEnvironment([env1, env2])
+    policy = driver_test_utils.PyPolicyMock(
+        env.time_step_spec(),
+        env.action_spec(),
+        initial_policy_state=np.array([1, 2]))
+    replay_buffer_observer = MockReplayBufferObserver()
+    driver = py_driver.PyDriver(
+        env,
+        policy,
+        observers=[replay_buffer_observer],
+        max_steps=4,
+        steps_per_chunk=3,
+    )
+    driver.run(env.reset(), policy.get_initial_state())
+
+    # Each step counts for both environments, so 2 steps reach max_steps.
+    [chunk] = replay_buffer_observer.gather_all()
+    self.assertAllEqual([[0, 1], [0, 1]], chunk.step_type)
+    self.assertAllEqual([[0, 2], [0, 1]], chunk.observation)
+    self.assertAllEqual([[1, 2], [1, 1]], chunk.next_step_type)
+
+  @parameterized.named_parameters([
+      ('SevenSteps', 7, None),
+      ('TenSteps', 10, None),
+      ('ThreeEpisodes', None, 3),
+  ])
+  def testDoubleBufferedTrajectoriesAreIdentical(self, max_steps,
+                                                 max_episodes):
+    parallel_py_environment.multiprocessing = dummy_multiprocessing
+    trajectories = []
+    for double_buffered in (False, True):
+      env = parallel_py_environment.ParallelPyEnvironment([
+          functools.partial(driver_test_utils.PyEnvironmentMock, final_state)
+          for final_state in (3, 4, 5)
+      ], blocking=True)
+      policy = ParityPolicyMock(env.time_step_spec(), env.action_spec())
+      replay_buffer_observer = MockReplayBufferObserver()
+      driver = py_driver.PyDriver(
+          env,
+          policy,
+          observers=[replay_buffer_observer],
+          max_steps=max_steps,
+          max_episodes=max_episodes,
+          double_buffered=double_buffered)
+      time_step = env.reset()
+      for _ in range(2):
+        time_step, _ = driver.run(time_step)
+        # The environment tracks the time steps collected asynchronously.
+        current_time_step = env.current_time_step()
+        self.assertAllEqual(time_step.step_type, current_time_step.step_type)
+        self.assertAllEqual(time_step.observation,
+                            current_time_step.observation)
+      env.close()
+      trajectories.append(replay_buffer_observer.gather_all())
+
+    self.assertNotEmpty(trajectories[0])
+    self.assertEqual(len(trajectories[0]), len(trajectories[1]))
+    for t1, t2 in zip(*trajectories):
+      for t1_field, t2_field in zip(t1, t2):
+        self.assertAllEqual(t1_field, t2_field)
+
+  def testDoubleBufferedRequiresStepAsync(self):
+    env = batched_py_environment.BatchedPyEnvironment(
+        [driver_test_utils.PyEnvironmentMock() for _ in range(2)])
+    policy = ParityPolicyMock(env.time_step_spec(), env.action_spec())
+    with self.assertRaisesRegexp(ValueError, 'step_async'):
+      py_driver.PyDriver(
+          env, policy, observers=[], max_steps=1, double_buffered=True)
+
+  def testValueErrorOnInvalidStepsPerChunk(self):
+    env = driver_test_utils.PyEnvironmentMock()
+    policy = driver_test_utils.PyPolicyMock(env.time_step_spec(),
+                                            env.action_spec())
+    with self.assertRaises(ValueError):
+      py_driver.PyDriver(
+          env, policy, observers=[], max_steps=1, steps_per_chunk=0)
+
   @parameterized.named_parameters([
       ('NoneStepsNoneEpisodes', None, None),
       ('ZeroStepsNoneEpisodes', 0, None),
@@ -135,6 +135,55 @@ class ParallelPyEnvironment(py_environment.PyEnvironment):
       time_steps = [promise() for promise in time_steps]
     return self._stack_time_steps(time_steps)
 
+  def step_async(self, actions, env_slice=None):
+    """Starts stepping a slice of the environments, without waiting.
+
+    Allows stepping part of the batch while the actions of another part are
+    computed, see the `double_buffered` mode of `PyDriver`. The slice of the
+    `current_time_step` of this environment is updated when the returned
+    callable collects the time steps.
+
+    Args:
+      actions: Batched action, possibly nested, for the environments in
+        env_slice.
+      env_slice: Optional slice of the environments to step. Defaults to all
+        the environments.
+
+    Returns:
+      A callable returning the batch of time steps of the environments in
+      env_slice, waiting for them if needed.
+    """
+    envs = self._envs if env_slice is None else self._envs[env_slice]
+    promises = [
+        env.step(action, blocking=False)
+        for env, action in zip(envs, self._unstack_actions(actions))
+    ]
+
+    def wait():
+      time_step = self._stack_time_steps([promise() for promise in promises])
+      self._update_current_time_step(time_step, env_slice)
+      return time_step
+
+    return wait
+
+  def _update_current_time_step(self, time_step, env_slice):
+    """Sets the time steps of a slice of the environments."""
+    if env_slice is None:
+      self._current_time_step = time_step
+      return
+    if self._current_time_step is None:
+      # The other environments have no time step yet.
+      return
+
+    def update(current, new):
+      # Copies, as the current arrays may be referenced by previous callers.
+      current = np.array(current)
+      current[env_slice] = new
+      return current
+
+    self._current_time_step = tf.nest.map_structure(
+        update, self._current_time_step, time_step)
+
   def close(self):
     """Close all external process."""
     logging.info('Closing all processes.')
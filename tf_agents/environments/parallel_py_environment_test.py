@@ -104,6 +104,33 @@ class ParallelPyEnvironmentTest(tf.test.TestCase):
                         time_step2.observation.shape)
     env.close()
 
+  def test_step_async(self):
+    num_envs = 3
+    env = self._make_parallel_py_environment(num_envs=num_envs)
+    action_spec = env.action_spec()
+    observation_spec = env.observation_spec()
+    rng = np.random.RandomState()
+    action = np.array([
+        array_spec.sample_bounded_spec(action_spec, rng)
+        for _ in range(2)
+    ])
+    initial_time_step = env.reset()
+
+    # Step the last 2 environments only.
+    promise = env.step_async(action, slice(1, num_envs))
+    time_step = promise()
+    self.assertEqual(2, time_step.observation.shape[0])
+    self.assertAllEqual(observation_spec.shape, time_step.observation.shape[1:])
+
+    # Only the stepped environments are updated in the current time step.
+    current_time_step = env.current_time_step()
+    self.assertAllEqual(initial_time_step.step_type[:1],
+                        current_time_step.step_type[:1])
+    self.assertAllEqual(time_step.step_type, current_time_step.step_type[1:])
+    self.assertAllEqual(time_step.observation,
+                        current_time_step.observation[1:])
+    env.close()
+
   def test_non_blocking_start_processes_in_parallel(self):
     self._set_default_specs()
     constructor = functools.partial(
@@ -123,7 +123,8 @@ def eager_compute(metrics,
                   num_episodes=1,
                   train_step=None,
                   summary_writer=None,
-                  summary_prefix=''):
+                  summary_prefix='',
+                  num_episodes_per_env=None):
   """Compute metrics using `policy` on the `environment`.
 
   *NOTE*: Because placeholders are not compatible with Eager mode we can not use
@@ -139,6 +140,10 @@ def eager_compute(metrics,
     train_step: An optional step to write summaries against.
     summary_writer: An optional writer for generating metric summaries.
     summary_prefix: An optional prefix scope for metric summaries.
+    num_episodes_per_env: Optional number of episodes to compute the metrics
+      over in each batch element of the environment. If set, num_episodes is
+      ignored and the metrics are not biased towards short episodes, see
+      `DynamicEpisodeDriver`.
   Returns:
     A dictionary of results {metric_name: metric_value}
   """
@@ -152,7 +157,8 @@ def eager_compute(metrics,
       environment,
       policy,
       observers=metrics,
-      num_episodes=num_episodes)
+      num_episodes=num_episodes,
+      num_episodes_per_env=num_episodes_per_env)
   common.function(driver.run)(time_step, policy_state)
 
   results = [(metric.name, metric.result()) for metric in metrics]
@@ -196,3 +196,16 @@ class PyStepMetric(PyMetric):
     Args:
       trajectory: A trajectory.Trajectory.
     """
+
+  def call_sequence(self, trajectory):
+    """Processes a time-stacked trajectory to update the metric.
+
+    Used by drivers notifying their observers once per chunk of steps. The
+    default implementation calls `call` with each step of the trajectory;
+    subclasses may override it to process all the steps at once.
+
+    Args:
+      trajectory: A trajectory.Trajectory with shape [batch_size, T, ...].
+    """
+    for t in range(trajectory.step_type.shape[1]):
+      self.call(tf.nest.map_structure(lambda x, t=t: x[:, t], trajectory))
@@ -23,6 +23,7 @@ import abc
 import gin
 import numpy as np
 import six
+import tensorflow as tf
 
 from tf_agents.metrics import py_metric
 from tf_agents.utils import nest_utils
@@ -129,6 +130,25 @@ class StreamingMetric(py_metric.PyStepMetric):
       trajectory = nest_utils.batch_nested_array(trajectory)
     self._batched_call(trajectory)
 
+  def call_sequence(self, trajectory):
+    if not self._batch_size:
+      self._batch_size = trajectory.step_type.shape[0]
+      self.reset()
+    self._batched_call_sequence(trajectory)
+
+  def _batched_call_sequence(self, trajectory):
+    """Call with a time-stacked trajectory, of shape [batch_size, T, ...].
+
+    Calls `_batched_call` with each step by default, subclasses may override
+    it to process all the steps at once.
+
+    Args:
+      trajectory: a tf_agents.trajectory.Trajectory.
+    """
+    for t in range(trajectory.step_type.shape[1]):
+      self._batched_call(
+          tf.nest.map_structure(lambda x, t=t: x[:, t], trajectory))
+
 
 @gin.configurable
 class AverageReturnMetric(StreamingMetric):
@@ -164,6 +184,33 @@ class AverageReturnMetric(StreamingMetric):
     is_last = np.where(trajectory.is_last())
     self.add_to_buffer(episode_return[is_last])
 
+  def _batched_call_sequence(self, trajectory):
+    """Processes the steps of a time-stacked trajectory at once.
+
+    Args:
+      trajectory: a tf_agents.trajectory.Trajectory, of shape [batch_size, T].
+    """
+    episode_return = self._np_state.episode_return
+    is_first = trajectory.is_first()
+    rewards = trajectory.reward.astype(np.float64)
+    cumulative_rewards = np.cumsum(rewards, axis=1)
+
+    # The return at each step is the cumulative reward since the last first
+    # step up to it, or since the start of the sequence plus the return so far.
+    steps = np.arange(is_first.shape[1])
+    last_first = np.maximum.accumulate(
+        np.where(is_first, steps, -1), axis=1)
+    reward_before_first = np.take_along_axis(
+        cumulative_rewards - rewards, np.maximum(last_first, 0), axis=1)
+    returns = cumulative_rewards - np.where(
+        last_first >= 0, reward_before_first,
+        -np.expand_dims(episode_return, -1))
+
+    # Adds the returns in the order of the steps, like _batched_call.
+    is_last = trajectory.is_last()
+    self.add_to_buffer(returns.T[is_last.T])
+    episode_return[:] = returns[:, -1]
+
 
 @gin.configurable
 class AverageEpisodeLengthMetric(StreamingMetric):
@@ -197,6 +244,32 @@ class AverageEpisodeLengthMetric(StreamingMetric):
     self.add_to_buffer(episode_steps[np.where(trajectory.is_last())])
     episode_steps[np.where(trajectory.is_last())] = 0
 
+  def _batched_call_sequence(self, trajectory):
+    """Processes the steps of a time-stacked trajectory at once.
+
+    Args:
+      trajectory: a tf_agents.trajectory.Trajectory, of shape [batch_size, T].
+    """
+    episode_steps = self._np_state.episode_steps
+    is_last = trajectory.is_last()
+    cumulative_steps = np.cumsum(
+        (~trajectory.is_boundary()).astype(np.float64), axis=1)
+
+    # The length at each step counts the steps since the last step before it,
+    # or since the start of the sequence plus the steps so far.
+    steps = np.arange(is_last.shape[1])
+    last_before = np.maximum.accumulate(np.where(is_last, steps, -1), axis=1)
+    last_before = np.concatenate(
+        [-np.ones_like(last_before[:, :1]), last_before[:, :-1]], axis=1)
+    steps_before = np.take_along_axis(
+        cumulative_steps, np.maximum(last_before, 0), axis=1)
+    lengths = cumulative_steps - np.where(
+        last_before >= 0, steps_before, -np.expand_dims(episode_steps, -1))
+
+    # Adds the lengths in the order of the steps, like _batched_call.
+    self.add_to_buffer(lengths.T[is_last.T])
+    episode_steps[:] = np.where(is_last[:, -1], 0, lengths[:, -1])
+
 
 @gin.configurable
 class EnvironmentSteps(py_metric.PyStepMetric):
@@ -220,6 +293,10 @@ class EnvironmentSteps(py_metric.PyStepMetric):
     new_steps = np.sum((~trajectory.is_boundary()).astype(np.int64))
     self._np_state.environment_steps += new_steps
 
+  def call_sequence(self, trajectory):
+    # Counting does not depend on the order of the steps.
+    self.call(trajectory)
+
 
 @gin.configurable
 class NumberOfEpisodes(py_metric.PyStepMetric):
@@ -243,6 +320,10 @@ class NumberOfEpisodes(py_metric.PyStepMetric):
     completed_episodes = np.sum(trajectory.is_last().astype(np.int64))
     self._np_state.number_episodes += completed_episodes
 
+  def call_sequence(self, trajectory):
+    # Counting does not depend on the order of the steps.
+    self.call(trajectory)
+
 
 @gin.configurable
 class CounterMetric(py_metric.PyMetric):
@@ -127,6 +127,49 @@ class PyMetricsTest(tf.test.TestCase, parameterized.TestCase):
 
     self.assertEqual(expected_result, metric.result())
 
+  @parameterized.named_parameters(
+      ('AverageReturnMetric', py_metrics.AverageReturnMetric, 6.0),
+      ('AverageEpisodeLengthMetric', py_metrics.AverageEpisodeLengthMetric,
+       3.0),
+      ('EnvironmentSteps', py_metrics.EnvironmentSteps, 3.0),
+      ('NumberOfEpisodes', py_metrics.NumberOfEpisodes, 1.0))
+  def testCallSequence(self, metric_class, expected_result):
+    metric = metric_class()
+
+    # A time-stacked trajectory with shape [1, 5].
+    metric.call_sequence(nest_utils.batch_nested_array(
+        nest_utils.stack_nested_arrays([
+            trajectory.boundary((), (), (), 0., 1.),
+            trajectory.mid((), (), (), 1., 1.),
+            trajectory.mid((), (), (), 2., 1.),
+            trajectory.last((), (), (), 3., 0.),
+            trajectory.boundary((), (), (), 0., 1.)])))
+    self.assertEqual(expected_result, metric.result())
+
+  @parameterized.named_parameters(
+      ('AverageReturnMetric', py_metrics.AverageReturnMetric),
+      ('AverageEpisodeLengthMetric', py_metrics.AverageEpisodeLengthMetric))
+  def testCallSequenceMatchesCall(self, metric_class):
+    first, mid, last = ts.StepType.FIRST, ts.StepType.MID, ts.StepType.LAST
+    # Two environments, with episodes ending and starting within the chunks.
+    step_types = np.array([[first, mid, last, first, last, first, mid, mid],
+                           [mid, mid, mid, last, first, mid, last, first]])
+    next_step_types = np.array(
+        [[mid, last, first, last, first, mid, mid, last],
+         [mid, mid, last, first, mid, last, first, mid]])
+    rewards = np.arange(16, dtype=np.float32).reshape([2, 8])
+    traj = trajectory.Trajectory(step_types, (), (), (), next_step_types,
+                                 rewards, np.ones([2, 8], np.float32))
+
+    step_metric = metric_class(buffer_size=100)
+    sequence_metric = metric_class(buffer_size=100)
+    for chunk in (slice(0, 3), slice(3, 8)):
+      for t in range(chunk.start, chunk.stop):
+        step_metric(tf.nest.map_structure(lambda x, t=t: x[:, t], traj))
+      sequence_metric.call_sequence(
+          tf.nest.map_structure(lambda x, c=chunk: x[:, c], traj))
+      self.assertAllClose(step_metric.result(), sequence_metric.result())
+
   @parameterized.named_parameters(
       ('AverageReturnMetric', py_metrics.AverageReturnMetric, 5.0),
       ('AverageEpisodeLengthMetric', py_metrics.AverageEpisodeLengthMetric,
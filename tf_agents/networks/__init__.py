@@ -19,8 +19,10 @@ from tf_agents.networks import actor_distribution_network
 from tf_agents.networks import actor_distribution_rnn_network
 from tf_agents.networks import bias_layer
 from tf_agents.networks import categorical_projection_network
+from tf_agents.networks import categorical_q_network
 from tf_agents.networks import dynamic_unroll_layer
 from tf_agents.networks import encoding_network
+from tf_agents.networks import ensemble_critic_network
 from tf_agents.networks import expand_dims_layer
 from tf_agents.networks import lstm_encoding_network
 from tf_agents.networks import network
@@ -0,0 +1,115 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Keras network for Categorical (C51) DQN."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_agents.networks import network
+from tf_agents.networks import q_network
+from tf_agents.specs import tensor_spec
+
+import gin.tf
+
+
+@gin.configurable
+class CategoricalQNetwork(network.Network):
+  """Feed Forward network predicting a distribution over Q values per action.
+
+  The network returns the logits of a categorical distribution over `num_atoms`
+  atoms for each action, shaped [B, num_actions, num_atoms] (or
+  [B, T, num_actions, num_atoms]). The support of the distributions is defined
+  by the agent, see `CategoricalDqnAgent`.
+  """
+
+  def __init__(self,
+               input_tensor_spec,
+               action_spec,
+               num_atoms=51,
+               preprocessing_layers=None,
+               preprocessing_combiner=None,
+               conv_layer_params=None,
+               fc_layer_params=(75, 40),
+               activation_fn=tf.keras.activations.relu,
+               name='CategoricalQNetwork'):
+    """Creates an instance of `CategoricalQNetwork`.
+
+    Args:
+      input_tensor_spec: A nest of `tensor_spec.TensorSpec` representing the
+        input observations.
+      action_spec: A nest of `tensor_spec.BoundedTensorSpec` representing the
+        actions.
+      num_atoms: The number of atoms of the distribution over Q values of each
+        action.
+      preprocessing_layers: (Optional.) A nest of `tf.keras.layers.Layer`
+        representing preprocessing for the different observations. For more
+        details see the documentation of `networks.EncodingNetwork`.
+      preprocessing_combiner: (Optional.) A keras layer that takes a flat list
+        of tensors and combines them. For more details see the documentation
+        of `networks.EncodingNetwork`.
+      conv_layer_params: Optional list of convolution layers parameters, where
+        each item is a length-three tuple indicating (filters, kernel_size,
+        stride).
+      fc_layer_params: Optional list of fully_connected parameters, where each
+        item is the number of units in the layer.
+      activation_fn: Activation function, e.g. tf.keras.activations.relu.
+      name: A string representing name of the network.
+
+    Raises:
+      ValueError: If `input_tensor_spec` contains more than one observation. Or
+        if `action_spec` contains more than one action.
+    """
+    q_network.validate_specs(action_spec, input_tensor_spec)
+    flat_action_spec = tf.nest.flatten(action_spec)[0]
+    num_actions = flat_action_spec.maximum - flat_action_spec.minimum + 1
+
+    # The logits of all the atoms of all the actions are predicted by a
+    # QNetwork with num_actions * num_atoms outputs.
+    logits_spec = tensor_spec.BoundedTensorSpec(
+        (), flat_action_spec.dtype, 0, num_actions * num_atoms - 1)
+    logits_network = q_network.QNetwork(
+        input_tensor_spec,
+        logits_spec,
+        preprocessing_layers=preprocessing_layers,
+        preprocessing_combiner=preprocessing_combiner,
+        conv_layer_params=conv_layer_params,
+        fc_layer_params=fc_layer_params,
+        activation_fn=activation_fn)
+
+    super(CategoricalQNetwork, self).__init__(
+        input_tensor_spec=input_tensor_spec,
+        state_spec=(),
+        name=name)
+
+    self._logits_network = logits_network
+    self._num_actions = int(num_actions)
+    self._num_atoms = num_atoms
+
+  @property
+  def num_atoms(self):
+    return self._num_atoms
+
+  def call(self, observation, step_type=None, network_state=()):
+    logits, network_state = self._logits_network(
+        observation, step_type=step_type, network_state=network_state)
+    outer_shape = tf.shape(input=logits)[:-1]
+    logits = tf.reshape(
+        logits,
+        tf.concat([outer_shape, [self._num_actions, self._num_atoms]], axis=0))
+    return logits, network_state
@@ -0,0 +1,57 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.networks.categorical_q_network."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_agents.networks import categorical_q_network
+from tf_agents.specs import tensor_spec
+
+from tensorflow.python.framework import test_util  # TF internal
+
+
+class CategoricalQNetworkTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testBuild(self):
+    batch_size = 3
+    num_state_dims = 5
+    network = categorical_q_network.CategoricalQNetwork(
+        input_tensor_spec=tensor_spec.TensorSpec([num_state_dims], tf.float32),
+        action_spec=tensor_spec.BoundedTensorSpec([1], tf.int32, 0, 1),
+        num_atoms=7)
+    logits, _ = network(tf.random.uniform([batch_size, num_state_dims]))
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.assertAllEqual([batch_size, 2, 7], self.evaluate(logits).shape)
+    self.assertEqual(7, network.num_atoms)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testBuildWithTimeDimension(self):
+    network = categorical_q_network.CategoricalQNetwork(
+        input_tensor_spec=tensor_spec.TensorSpec([5], tf.float32),
+        action_spec=tensor_spec.BoundedTensorSpec((), tf.int32, 0, 3),
+        num_atoms=11)
+    logits, _ = network(tf.random.uniform([3, 2, 5]))
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.assertAllEqual([3, 2, 4, 11], self.evaluate(logits).shape)
+
+
+if __name__ == '__main__':
+  tf.test.main()
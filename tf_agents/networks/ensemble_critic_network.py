@@ -0,0 +1,269 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Critic network evaluating an ensemble of critics at once.
+
+The critics of SAC and TD3 are small MLPs, so evaluating each of them with its
+own network is bound by the number of ops launched rather than by their cost.
+`EnsembleCriticNetwork` stacks the weights of all the critics along a leading
+ensemble axis, so that each layer of all the critics is evaluated by a single
+batched matmul.
+
+With a large ensemble, the TD targets can be the min over a random subset of
+the critics (`reduce_min_over_subset`), as in REDQ. Combined with more critic
+than actor updates, e.g. `actor_update_period`, this allows a high
+update-to-data ratio at close to the cost of training a single critic.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gin
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.networks import network
+
+
+def stack_q_values(critic_networks, inputs, step_type=()):
+  """Evaluates critic networks and stacks their q_values.
+
+  Args:
+    critic_networks: A list of critic networks, each returning the q_values of
+      a single critic, or of an ensemble of critics when it is an
+      `EnsembleCriticNetwork`.
+    inputs: A tuple of (observations, actions) to evaluate the critics on.
+    step_type: The step types of the inputs.
+
+  Returns:
+    A tensor with the q_values of all the critics, stacked along a first axis.
+  """
+  q_values = []
+  for critic_network in critic_networks:
+    critic_q_values, _ = critic_network(inputs, step_type)
+    if not isinstance(critic_network, EnsembleCriticNetwork):
+      critic_q_values = tf.expand_dims(critic_q_values, 0)
+    q_values.append(critic_q_values)
+  if len(q_values) == 1:
+    return q_values[0]
+  return tf.concat(q_values, axis=0)
+
+
+def num_critics(critic_networks):
+  """Returns the number of critics evaluated by `stack_q_values`."""
+  return sum(
+      critic_network.ensemble_size
+      if isinstance(critic_network, EnsembleCriticNetwork) else 1
+      for critic_network in critic_networks)
+
+
+def reduce_min_over_subset(q_values, subset_size=None):
+  """Returns the min of stacked q_values over a random subset of critics.
+
+  This is the target of REDQ (Chen et al., 2021), which trains a large ensemble
+  of critics against the min of a few of them.
+
+  Args:
+    q_values: A tensor of q_values stacked along a first critic axis, see
+      `stack_q_values`.
+    subset_size: The number of critics to sample, without replacement, for the
+      whole batch. If None, the min is over all the critics.
+
+  Returns:
+    A tensor with the min of the sampled q_values, without the critic axis.
+  """
+  if subset_size is not None:
+    indices = tf.random.shuffle(tf.range(tf.shape(input=q_values)[0]))
+    q_values = tf.gather(q_values, indices[:subset_size])
+  return tf.reduce_min(input_tensor=q_values, axis=0)
+
+
+class EnsembleDense(tf.keras.layers.Layer):
+  """Dense layers of an ensemble, with weights stacked along a leading axis.
+
+  Inputs are either shared by all the members of the ensemble and shaped
+  [B, input_dim], or shaped [ensemble_size, B, input_dim]. Outputs are shaped
+  [ensemble_size, B, units].
+  """
+
+  def __init__(self,
+               ensemble_size,
+               units,
+               activation=None,
+               kernel_initializer=None,
+               **kwargs):
+    """Creates an instance of `EnsembleDense`.
+
+    Args:
+      ensemble_size: The number of members of the ensemble.
+      units: The number of output units of each member.
+      activation: Optional activation function.
+      kernel_initializer: Optional initializer of the [ensemble_size,
+        input_dim, units] kernel. Defaults to the uniform variance scaling
+        initializer of `CriticNetwork`, computed for each member.
+      **kwargs: Keyword arguments of `tf.keras.layers.Layer`.
+    """
+    super(EnsembleDense, self).__init__(**kwargs)
+    self._ensemble_size = ensemble_size
+    self._units = units
+    self._activation = activation
+    self._kernel_initializer = kernel_initializer
+
+  def build(self, input_shape):
+    input_dim = tf.compat.dimension_value(tf.TensorShape(input_shape)[-1])
+    kernel_initializer = self._kernel_initializer
+    if kernel_initializer is None:
+      # VarianceScaling(scale=1. / 3., mode='fan_in', distribution='uniform')
+      # would count the ensemble axis in the fan in.
+      limit = np.sqrt(1. / input_dim)
+      kernel_initializer = tf.compat.v1.initializers.random_uniform(
+          minval=-limit, maxval=limit)
+    self._kernel = self.add_weight(
+        'kernel',
+        shape=[self._ensemble_size, input_dim, self._units],
+        initializer=kernel_initializer,
+        trainable=True)
+    self._bias = self.add_weight(
+        'bias',
+        shape=[self._ensemble_size, 1, self._units],
+        initializer=tf.compat.v1.initializers.zeros(),
+        trainable=True)
+    super(EnsembleDense, self).build(input_shape)
+
+  def call(self, inputs):
+    if inputs.shape.ndims == 2:
+      # Shared inputs are multiplied by the kernels of all the members at once.
+      input_dim = tf.compat.dimension_value(inputs.shape[-1])
+      kernel = tf.reshape(
+          tf.transpose(a=self._kernel, perm=[1, 0, 2]),
+          [input_dim, self._ensemble_size * self._units])
+      outputs = tf.reshape(
+          tf.matmul(inputs, kernel), [-1, self._ensemble_size, self._units])
+      outputs = tf.transpose(a=outputs, perm=[1, 0, 2])
+    else:
+      outputs = tf.matmul(inputs, self._kernel)
+    outputs += self._bias
+    if self._activation is not None:
+      outputs = self._activation(outputs)
+    return outputs
+
+
+@gin.configurable
+class EnsembleCriticNetwork(network.Network):
+  """Creates an ensemble of critic networks evaluated at once.
+
+  Each member of the ensemble has the architecture of a `CriticNetwork` with
+  fully connected layers, and its own weights. The network returns the
+  q_values of all the members, shaped [ensemble_size, B].
+  """
+
+  def __init__(self,
+               input_tensor_spec,
+               ensemble_size=2,
+               observation_fc_layer_params=None,
+               action_fc_layer_params=None,
+               joint_fc_layer_params=None,
+               activation_fn=tf.nn.relu,
+               name='EnsembleCriticNetwork'):
+    """Creates an instance of `EnsembleCriticNetwork`.
+
+    Args:
+      input_tensor_spec: A tuple of (observation, action) each a nest of
+        `tensor_spec.TensorSpec` representing the inputs.
+      ensemble_size: The number of critics of the ensemble.
+      observation_fc_layer_params: Optional list of fully connected parameters
+        for observations, where each item is the number of units in the layer.
+      action_fc_layer_params: Optional list of fully connected parameters for
+        actions, where each item is the number of units in the layer.
+      joint_fc_layer_params: Optional list of fully connected parameters after
+        merging observations and actions, where each item is the number of units
+        in the layer.
+      activation_fn: Activation function, e.g. tf.nn.relu, slim.leaky_relu, ...
+      name: A string representing name of the network.
+
+    Raises:
+      ValueError: If `observation_spec` or `action_spec` contains more than one
+        observation, or if ensemble_size is smaller than 1.
+    """
+    super(EnsembleCriticNetwork, self).__init__(
+        input_tensor_spec=input_tensor_spec,
+        state_spec=(),
+        name=name)
+
+    observation_spec, action_spec = input_tensor_spec
+
+    if len(tf.nest.flatten(observation_spec)) > 1:
+      raise ValueError('Only a single observation is supported by this network')
+
+    if len(tf.nest.flatten(action_spec)) > 1:
+      raise ValueError('Only a single action is supported by this network')
+
+    if ensemble_size < 1:
+      raise ValueError(
+          'ensemble_size must be at least 1, got {}.'.format(ensemble_size))
+    self._ensemble_size = ensemble_size
+
+    def _ensemble_layers(fc_layer_params, name):
+      return [
+          EnsembleDense(
+              ensemble_size,
+              num_units,
+              activation=activation_fn,
+              name='/'.join([name, 'dense']))
+          for num_units in fc_layer_params or []
+      ]
+
+    self._observation_layers = _ensemble_layers(observation_fc_layer_params,
+                                                'observation_encoding')
+    self._action_layers = _ensemble_layers(action_fc_layer_params,
+                                           'action_encoding')
+    self._joint_layers = _ensemble_layers(joint_fc_layer_params, 'joint_mlp')
+    self._joint_layers.append(
+        EnsembleDense(
+            ensemble_size,
+            1,
+            kernel_initializer=tf.compat.v1.initializers.random_uniform(
+                minval=-0.003, maxval=0.003),
+            name='value'))
+
+  @property
+  def ensemble_size(self):
+    return self._ensemble_size
+
+  def call(self, inputs, step_type=(), network_state=()):
+    observations, actions = inputs
+    del step_type  # unused.
+    observations = tf.cast(tf.nest.flatten(observations)[0], tf.float32)
+    for layer in self._observation_layers:
+      observations = layer(observations)
+
+    actions = tf.cast(tf.nest.flatten(actions)[0], tf.float32)
+    for layer in self._action_layers:
+      actions = layer(actions)
+
+    # Inputs not encoded yet are shared by all the members of the ensemble.
+    if observations.shape.ndims == 2 and actions.shape.ndims == 3:
+      observations = self._tile(observations)
+    elif observations.shape.ndims == 3 and actions.shape.ndims == 2:
+      actions = self._tile(actions)
+    joint = tf.concat([observations, actions], -1)
+    for layer in self._joint_layers:
+      joint = layer(joint)
+
+    return tf.squeeze(joint, -1), network_state
+
+  def _tile(self, inputs):
+    return tf.tile(tf.expand_dims(inputs, 0), [self._ensemble_size, 1, 1])
@@ -0,0 +1,121 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.networks.ensemble_critic_network."""
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.networks import ensemble_critic_network
+from tf_agents.specs import tensor_spec
+
+from tensorflow.python.framework import test_util  # TF internal
+
+
+class EnsembleCriticNetworkTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testBuild(self):
+    batch_size = 3
+    num_obs_dims = 5
+    num_actions_dims = 2
+    obs_spec = tensor_spec.TensorSpec([num_obs_dims], tf.float32)
+    action_spec = tensor_spec.TensorSpec([num_actions_dims], tf.float32)
+
+    obs = tf.random.uniform([batch_size, num_obs_dims])
+    actions = tf.random.uniform([batch_size, num_actions_dims])
+    critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+        (obs_spec, action_spec),
+        ensemble_size=4,
+        observation_fc_layer_params=[8],
+        joint_fc_layer_params=[6])
+
+    q_values, _ = critic_net((obs, actions))
+    self.assertAllEqual(q_values.shape.as_list(), [4, batch_size])
+    self.assertEqual(len(critic_net.trainable_variables), 6)
+    self.assertEqual(4, critic_net.ensemble_size)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testMembersAreIndependentCritics(self):
+    obs_spec = tensor_spec.TensorSpec([3], tf.float32)
+    action_spec = tensor_spec.TensorSpec([2], tf.float32)
+    obs = np.random.uniform(size=[5, 3]).astype(np.float32)
+    actions = np.random.uniform(size=[5, 2]).astype(np.float32)
+    critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+        (obs_spec, action_spec),
+        ensemble_size=3,
+        action_fc_layer_params=[4],
+        joint_fc_layer_params=[6])
+
+    q_values, _ = critic_net((obs, actions))
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    q_values = self.evaluate(q_values)
+    (action_kernel, action_bias, joint_kernel, joint_bias, value_kernel,
+     value_bias) = self.evaluate(critic_net.trainable_variables)
+
+    relu = lambda x: np.maximum(x, 0.)
+    for i in range(3):
+      encoded_actions = relu(actions.dot(action_kernel[i]) + action_bias[i])
+      joint = np.concatenate([obs, encoded_actions], axis=-1)
+      joint = relu(joint.dot(joint_kernel[i]) + joint_bias[i])
+      expected_q_values = joint.dot(value_kernel[i]) + value_bias[i]
+      self.assertAllClose(expected_q_values[:, 0], q_values[i])
+
+  def testInvalidEnsembleSize(self):
+    obs_spec = tensor_spec.TensorSpec([3], tf.float32)
+    action_spec = tensor_spec.TensorSpec([2], tf.float32)
+    with self.assertRaisesRegexp(ValueError, 'ensemble_size'):
+      ensemble_critic_network.EnsembleCriticNetwork((obs_spec, action_spec),
+                                                    ensemble_size=0)
+
+
+class EnsembleDenseTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testSharedInputs(self):
+    layer = ensemble_critic_network.EnsembleDense(3, 4)
+    inputs = tf.random.uniform([5, 2])
+    outputs = layer(inputs)
+    tiled_outputs = layer(tf.tile(tf.expand_dims(inputs, 0), [3, 1, 1]))
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.assertAllEqual([3, 5, 4], outputs.shape.as_list())
+    self.assertAllClose(*self.evaluate([outputs, tiled_outputs]))
+
+
+class ReduceMinOverSubsetTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testReduceMinOverSubset(self):
+    q_values = tf.constant([[1., 5.], [2., 4.], [3., 3.]])
+    min_q_values = ensemble_critic_network.reduce_min_over_subset(q_values)
+    subset_min_q_values = ensemble_critic_network.reduce_min_over_subset(
+        q_values, subset_size=1)
+    min_q_values, subset_min_q_values = self.evaluate(
+        [min_q_values, subset_min_q_values])
+    self.assertAllEqual([1., 3.], min_q_values)
+    # A single critic is sampled for the whole batch.
+    self.assertIn(subset_min_q_values.tolist(),
+                  [[1., 5.], [2., 4.], [3., 3.]])
+
+  def testNumCritics(self):
+    obs_spec = tensor_spec.TensorSpec([3], tf.float32)
+    action_spec = tensor_spec.TensorSpec([2], tf.float32)
+    critic_net = ensemble_critic_network.EnsembleCriticNetwork(
+        (obs_spec, action_spec), ensemble_size=5)
+    self.assertEqual(5, ensemble_critic_network.num_critics([critic_net]))
+
+
+if __name__ == '__main__':
+  tf.test.main()
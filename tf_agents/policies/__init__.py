@@ -17,10 +17,12 @@
 
 from tf_agents.policies import actor_policy
 from tf_agents.policies import boltzmann_policy
+from tf_agents.policies import categorical_q_policy
 from tf_agents.policies import epsilon_greedy_policy
 from tf_agents.policies import fixed_policy
 from tf_agents.policies import gaussian_policy
 from tf_agents.policies import greedy_policy
+from tf_agents.policies import inference_server
 from tf_agents.policies import ou_noise_policy
 from tf_agents.policies import policy_saver
 from tf_agents.policies import py_policy
@@ -0,0 +1,72 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Policy for Categorical (C51) DQN."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+from tf_agents.policies import q_policy
+from tf_agents.utils import common
+import gin.tf
+
+
+@gin.configurable
+class CategoricalQPolicy(q_policy.QPolicy):
+  """Q-Policy for a network predicting distributions over Q values.
+
+  The Q values of the actions are the expected values of their distributions.
+  """
+
+  def __init__(self,
+               time_step_spec=None,
+               action_spec=None,
+               q_network=None,
+               support=None,
+               emit_log_probability=False,
+               name=None):
+    """Builds a Categorical Q-Policy given a categorical q_network.
+
+    Args:
+      time_step_spec: A `TimeStep` spec of the expected time_steps.
+      action_spec: A nest of BoundedTensorSpec representing the actions.
+      q_network: An instance of a `tf_agents.network.Network`, callable via
+        `network(observation, step_type) -> (logits, final_state)`, e.g. a
+        `CategoricalQNetwork`. The logits are shaped [B, num_actions,
+        num_atoms].
+      support: A [num_atoms] array with the Q values of the atoms.
+      emit_log_probability: Whether to emit log-probs in info of `PolicyStep`.
+      name: The name of this policy. All variables in this module will fall
+        under that name. Defaults to the class name.
+
+    Raises:
+      NotImplementedError: If `action_spec` contains more than one
+        `BoundedTensorSpec`.
+    """
+    super(CategoricalQPolicy, self).__init__(
+        time_step_spec,
+        action_spec,
+        q_network=q_network,
+        emit_log_probability=emit_log_probability,
+        name=name)
+    self._support = support
+
+  def _q_values(self, time_step, policy_state):
+    logits, policy_state = self._q_network(
+        time_step.observation, time_step.step_type, policy_state)
+    support = tf.convert_to_tensor(value=self._support, dtype=tf.float32)
+    return common.convert_q_logits_to_values(logits, support), policy_state
@@ -0,0 +1,71 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test for tf_agents.policies.categorical_q_policy."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+from tf_agents.networks import network
+from tf_agents.policies import categorical_q_policy
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+from tf_agents.utils import test_utils
+from tensorflow.python.framework import test_util  # TF internal
+
+
+class DummyCategoricalNet(network.Network):
+  """Predicts the logits of 2 actions over 3 atoms, ignoring observations."""
+
+  def __init__(self, logits, name=None):
+    super(DummyCategoricalNet, self).__init__(name, (), 'DummyCategoricalNet')
+    self._logits = logits
+
+  def call(self, inputs, unused_step_type=None, network_state=()):
+    batch_size = tf.shape(input=inputs)[0]
+    logits = tf.tile(tf.constant([self._logits], dtype=tf.float32),
+                     [batch_size, 1, 1])
+    return logits, network_state
+
+
+class CategoricalQPolicyTest(test_utils.TestCase):
+
+  def setUp(self):
+    super(CategoricalQPolicyTest, self).setUp()
+    self._obs_spec = tensor_spec.TensorSpec([2], tf.float32)
+    self._time_step_spec = ts.time_step_spec(self._obs_spec)
+    self._action_spec = tensor_spec.BoundedTensorSpec([1], tf.int32, 0, 1)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testQValuesAreExpectedValues(self):
+    # The first action has most of its mass on the highest atom, the second
+    # one on the lowest atom.
+    q_network = DummyCategoricalNet([[0., 0., 10.], [10., 0., 0.]])
+    policy = categorical_q_policy.CategoricalQPolicy(
+        self._time_step_spec,
+        self._action_spec,
+        q_network=q_network,
+        support=[-1., 0., 1.])
+
+    observations = tf.constant([[1, 2], [3, 4]], dtype=tf.float32)
+    time_step = ts.restart(observations, batch_size=2)
+    distribution = policy.distribution(time_step).action
+    self.assertAllClose([[[1., -1.]], [[1., -1.]]],
+                        self.evaluate(distribution.logits), atol=1e-3)
+
+
+if __name__ == '__main__':
+  tf.test.main()
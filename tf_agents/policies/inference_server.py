@@ -0,0 +1,357 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A server computing the actions of many actors in batches.
+
+Actors running their own copy of the policy network scale the number of model
+replicas with the number of actors. Instead, `InferenceServer` serves a single
+policy over a local socket: actors, typically in separate processes, use an
+`InferenceClient` as their policy, whose `action` requests are batched
+together by the server up to `max_batch_size` environments or for up to
+`max_latency_seconds`, and computed with a single `action` call:
+
+  # In the learner process.
+  server = inference_server.InferenceServer(
+      agent.collect_policy, max_batch_size=64, max_latency_seconds=0.005)
+  server.start()
+
+  # In each actor process.
+  policy = inference_server.InferenceClient(server.address)
+  driver = py_driver.PyDriver(env, policy, observers, max_steps=1000)
+
+The served policy may be a Python policy, or a TF policy in eager mode. As the
+served policy is the policy of the learner, actors always act with its latest
+weights.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from multiprocessing import connection
+import sys
+import threading
+import time
+import traceback
+
+from absl import logging
+import numpy as np
+from six.moves import queue
+import tensorflow as tf
+
+from tf_agents.policies import py_policy
+from tf_agents.policies import tf_policy
+from tf_agents.specs import tensor_spec
+from tf_agents.utils import nest_utils
+
+
+# Message types for the communication with the server.
+_INFO = 1
+_ACTION = 2
+_RESULT = 3
+_EXCEPTION = 4
+
+_CLOSED_MESSAGE = 'The inference server was closed.'
+
+
+class InferenceServer(object):
+  """Serves a policy, computing the actions of its clients in batches."""
+
+  def __init__(self,
+               policy,
+               max_batch_size=64,
+               max_latency_seconds=0.005,
+               address=None,
+               authkey=None):
+    """Creates an InferenceServer.
+
+    Args:
+      policy: The served policy, a `py_policy.Base`, or a `tf_policy.Base` in
+        eager mode. Its inputs and outputs must have an outer batch dimension.
+      max_batch_size: Maximum number of environments whose actions are
+        computed in a single batch. A request for more environments is
+        computed on its own.
+      max_latency_seconds: Maximum number of seconds the first request of a
+        batch waits for other requests to join it.
+      address: Optional address to listen on, see
+        `multiprocessing.connection.Listener`. If None (default), a free local
+        socket is used, see `address`.
+      authkey: Optional bytes used to authenticate the clients.
+    """
+    self._policy = policy
+    specs = (policy.time_step_spec, policy.action_spec,
+             policy.policy_state_spec, policy.info_spec)
+    if isinstance(policy, tf_policy.Base):
+      specs = tensor_spec.to_nest_array_spec(specs)
+    self._specs = specs
+    self._max_batch_size = max_batch_size
+    self._max_latency_seconds = max_latency_seconds
+    self._requested_address = address
+    self._authkey = authkey
+    self._listener = None
+    self._requests = queue.Queue()
+    # A request left for the next batch, as it did not fit in the previous one.
+    self._next_request = None
+    self._stopped = threading.Event()
+    self._threads = []
+    self._lock = threading.Lock()
+    self._num_requests = 0
+    self._num_batches = 0
+
+  @property
+  def address(self):
+    """The address clients connect to, available once the server started."""
+    return None if self._listener is None else self._listener.address
+
+  @property
+  def authkey(self):
+    return self._authkey
+
+  @property
+  def num_requests(self):
+    """Returns the number of action requests served so far."""
+    with self._lock:
+      return self._num_requests
+
+  @property
+  def num_batches(self):
+    """Returns the number of batches of requests computed so far."""
+    with self._lock:
+      return self._num_batches
+
+  def start(self):
+    """Starts listening for clients and serving their requests."""
+    self._stopped.clear()
+    self._listener = connection.Listener(self._requested_address,
+                                         authkey=self._authkey)
+    for target in (self._accept_clients, self._compute_batches):
+      thread = threading.Thread(target=target)
+      thread.daemon = True
+      thread.start()
+      self._threads.append(thread)
+
+  def close(self):
+    """Stops serving, disconnecting all the clients.
+
+    The requests that were not computed yet are answered with an error.
+    """
+    if self._listener is None:
+      return
+    with self._lock:
+      self._stopped.set()
+    # Wake up the thread accepting clients, which then closes the listener.
+    try:
+      connection.Client(self._listener.address, authkey=self._authkey).close()
+    except (IOError, OSError):
+      pass
+    for thread in self._threads:
+      thread.join(5)
+    self._threads = []
+    self._listener = None
+    self._fail_pending_requests()
+
+  def _fail_pending_requests(self):
+    """Answers the requests left in the queue with an error."""
+    request, self._next_request = self._next_request, None
+    while True:
+      if request is not None:
+        reply = request[3]
+        reply.put((_EXCEPTION, _CLOSED_MESSAGE))
+      try:
+        request = self._requests.get_nowait()
+      except queue.Empty:
+        return
+
+  def _accept_clients(self):
+    """Serves each client connecting to the listener from its own thread."""
+    while True:
+      try:
+        client_conn = self._listener.accept()
+      except connection.AuthenticationError:
+        logging.warning('Rejected an inference client failing to '
+                        'authenticate.')
+        continue
+      except (IOError, OSError):
+        self._listener.close()
+        return
+      if self._stopped.is_set():
+        client_conn.close()
+        self._listener.close()
+        return
+      thread = threading.Thread(target=self._serve_client, args=(client_conn,))
+      thread.daemon = True
+      thread.start()
+
+  def _serve_client(self, conn):
+    """Queues the action requests of a client until it disconnects."""
+    reply = queue.Queue(maxsize=1)
+    try:
+      while not self._stopped.is_set():
+        try:
+          message, payload = conn.recv()
+        except (EOFError, IOError):
+          break
+        if message == _INFO:
+          conn.send((_RESULT, self._specs))
+        elif message == _ACTION:
+          time_step, policy_state = payload
+          batch_size = nest_utils.get_outer_array_shape(
+              time_step, self._specs[0])[0]
+          # Requests queued after close would never be answered.
+          with self._lock:
+            stopped = self._stopped.is_set()
+            if not stopped:
+              self._requests.put((time_step, policy_state, batch_size, reply))
+          if stopped:
+            conn.send((_EXCEPTION, _CLOSED_MESSAGE))
+            break
+          conn.send(reply.get())
+        else:
+          conn.send((_EXCEPTION,
+                     'Received message of unknown type {}'.format(message)))
+    finally:
+      conn.close()
+
+  def _next_batch(self):
+    """Returns the requests of the next batch, or None once stopped."""
+    request, self._next_request = self._next_request, None
+    while request is None:
+      if self._stopped.is_set():
+        return None
+      try:
+        # Only block for short times to notice when the server is stopped.
+        request = self._requests.get(timeout=0.1)
+      except queue.Empty:
+        continue
+    requests = [request]
+    batch_size = requests[0][2]
+    deadline = time.time() + self._max_latency_seconds
+    while batch_size < self._max_batch_size:
+      remaining = deadline - time.time()
+      if remaining <= 0 or self._stopped.is_set():
+        break
+      try:
+        request = self._requests.get(timeout=min(remaining, 0.1))
+      except queue.Empty:
+        continue
+      if batch_size + request[2] > self._max_batch_size:
+        self._next_request = request
+        break
+      requests.append(request)
+      batch_size += request[2]
+    return requests
+
+  def _compute_batches(self):
+    while True:
+      requests = self._next_batch()
+      if requests is None:
+        return
+      if self._stopped.is_set():
+        for _, _, _, reply in requests:
+          reply.put((_EXCEPTION, _CLOSED_MESSAGE))
+        continue
+      try:
+        time_steps, policy_states, batch_sizes, _ = zip(*requests)
+        policy_step = self._action(
+            _concat_nested_arrays(time_steps),
+            _concat_nested_arrays(policy_states))
+        results = [(_RESULT, step) for step in _split_nested_array(
+            policy_step, np.cumsum(batch_sizes)[:-1])]
+      except Exception:  # pylint: disable=broad-except
+        etype, evalue, tb = sys.exc_info()
+        stacktrace = ''.join(traceback.format_exception(etype, evalue, tb))
+        logging.error('Error in inference server: %s', stacktrace)
+        results = [(_EXCEPTION, stacktrace)] * len(requests)
+      with self._lock:
+        self._num_requests += len(requests)
+        self._num_batches += 1
+      for (_, _, _, reply), result in zip(requests, results):
+        reply.put(result)
+
+  def _action(self, time_step, policy_state):
+    if not isinstance(self._policy, tf_policy.Base):
+      return self._policy.action(time_step, policy_state)
+    policy_step = self._policy.action(
+        tf.nest.map_structure(tf.convert_to_tensor, time_step),
+        tf.nest.map_structure(tf.convert_to_tensor, policy_state))
+    return tf.nest.map_structure(lambda t: t.numpy(), policy_step)
+
+
+class InferenceClient(py_policy.Base):
+  """A Python policy whose actions are computed by an `InferenceServer`.
+
+  Accepts both batched and unbatched time steps. A client must not be used
+  from several threads at once.
+  """
+
+  def __init__(self, address, authkey=None):
+    """Creates an InferenceClient, connected to the server at `address`.
+
+    Args:
+      address: Address of the server, see `InferenceServer.address`.
+      authkey: Optional bytes used to authenticate with the server.
+    """
+    self._conn = connection.Client(address, authkey=authkey)
+    time_step_spec, action_spec, policy_state_spec, info_spec = self._request(
+        _INFO)
+    super(InferenceClient, self).__init__(time_step_spec, action_spec,
+                                          policy_state_spec, info_spec)
+
+  def close(self):
+    """Disconnects from the server."""
+    try:
+      self._conn.close()
+    except IOError:
+      # The connection was already closed.
+      pass
+
+  def _request(self, message, payload=None):
+    self._conn.send((message, payload))
+    message, payload = self._conn.recv()
+    # Re-raise exceptions of the server in the client.
+    if message == _EXCEPTION:
+      raise Exception(payload)
+    return payload
+
+  def _get_initial_state(self, batch_size=None):
+    outer_dims = () if batch_size is None else (batch_size,)
+    return tf.nest.map_structure(
+        lambda spec: np.zeros(outer_dims + spec.shape, dtype=spec.dtype),
+        self._policy_state_spec)
+
+  def _action(self, time_step, policy_state):
+    is_batched = bool(
+        nest_utils.get_outer_array_shape(time_step, self._time_step_spec))
+    if not is_batched:
+      time_step = nest_utils.batch_nested_array(time_step)
+      policy_state = nest_utils.batch_nested_array(policy_state)
+    policy_step = self._request(_ACTION, (time_step, policy_state))
+    if not is_batched:
+      policy_step = nest_utils.unbatch_nested_array(policy_step)
+    return policy_step
+
+
+def _concat_nested_arrays(nested_arrays):
+  """Concatenates a list of nested arrays along their outer dimension."""
+  return tf.nest.map_structure(lambda *arrays: np.concatenate(arrays),
+                               *nested_arrays)
+
+
+def _split_nested_array(nested_array, indices):
+  """Splits a nested array along its outer dimension at indices."""
+  splits = [np.split(array, indices) for array in tf.nest.flatten(nested_array)]
+  return [
+      tf.nest.pack_sequence_as(nested_array, arrays) for arrays in zip(*splits)
+  ]
@@ -0,0 +1,177 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.policies.inference_server."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.policies import inference_server
+from tf_agents.policies import py_policy
+from tf_agents.specs import array_spec
+from tf_agents.trajectories import policy_step
+from tf_agents.trajectories import time_step as ts
+
+
+class DoublingPolicy(py_policy.Base):
+  """Takes the observation times 2 as action, recording the batch sizes."""
+
+  def __init__(self):
+    time_step_spec = ts.time_step_spec(
+        array_spec.ArraySpec([2], np.float32, 'observation'))
+    action_spec = array_spec.BoundedArraySpec([2], np.float32, -100, 100)
+    policy_state_spec = array_spec.ArraySpec([], np.int32, 'count')
+    super(DoublingPolicy, self).__init__(time_step_spec, action_spec,
+                                         policy_state_spec)
+    self.batch_sizes = []
+
+  def _action(self, time_step, policy_state):
+    if np.any(time_step.observation < 0):
+      raise ValueError('Negative observation.')
+    self.batch_sizes.append(time_step.observation.shape[0])
+    return policy_step.PolicyStep(2 * time_step.observation, policy_state + 1,
+                                  ())
+
+
+class InferenceServerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(InferenceServerTest, self).setUp()
+    self._policy = DoublingPolicy()
+    self._servers = []
+
+  def tearDown(self):
+    for server in self._servers:
+      server.close()
+    super(InferenceServerTest, self).tearDown()
+
+  def _start_server(self, **kwargs):
+    server = inference_server.InferenceServer(self._policy, **kwargs)
+    server.start()
+    self._servers.append(server)
+    return server
+
+  def _time_step(self, observation):
+    return ts.restart(np.array(observation, dtype=np.float32),
+                      batch_size=len(observation))
+
+  def testSpecs(self):
+    server = self._start_server()
+    client = inference_server.InferenceClient(server.address)
+    self.assertEqual(self._policy.time_step_spec, client.time_step_spec)
+    self.assertEqual(self._policy.action_spec, client.action_spec)
+    self.assertEqual(self._policy.policy_state_spec, client.policy_state_spec)
+    self.assertAllEqual([0, 0], client.get_initial_state(batch_size=2))
+    client.close()
+
+  def testBatchedAction(self):
+    server = self._start_server()
+    client = inference_server.InferenceClient(server.address)
+    step = client.action(
+        self._time_step([[1., 2.], [3., 4.]]), np.array([0, 5], np.int32))
+    self.assertAllEqual([[2., 4.], [6., 8.]], step.action)
+    self.assertAllEqual([1, 6], step.state)
+    client.close()
+
+  def testUnbatchedAction(self):
+    server = self._start_server()
+    client = inference_server.InferenceClient(server.address)
+    time_step = ts.restart(np.array([1., 2.], dtype=np.float32))
+    step = client.action(time_step, client.get_initial_state())
+    self.assertAllEqual([2., 4.], step.action)
+    self.assertAllEqual(1, step.state)
+    client.close()
+
+  def testBatchesRequests(self):
+    # Requests are batched until 4 environments requested an action.
+    server = self._start_server(max_batch_size=4, max_latency_seconds=60)
+    clients = [
+        inference_server.InferenceClient(server.address) for _ in range(3)
+    ]
+    actions = [None] * 3
+
+    def act(i, batch_size):
+      step = clients[i].action(
+          self._time_step([[i, i]] * batch_size),
+          np.zeros([batch_size], np.int32))
+      actions[i] = step.action
+
+    threads = [threading.Thread(target=act, args=(i, 2 if i == 0 else 1))
+               for i in range(3)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual([4], self._policy.batch_sizes)
+    self.assertEqual(3, server.num_requests)
+    self.assertEqual(1, server.num_batches)
+    self.assertAllEqual([[0., 0.], [0., 0.]], actions[0])
+    self.assertAllEqual([[2., 2.]], actions[1])
+    self.assertAllEqual([[4., 4.]], actions[2])
+    for client in clients:
+      client.close()
+
+  def testMaxLatency(self):
+    server = self._start_server(max_batch_size=4, max_latency_seconds=0.01)
+    client = inference_server.InferenceClient(server.address)
+    client.action(self._time_step([[1., 1.]]), np.zeros([1], np.int32))
+    client.action(self._time_step([[1., 1.]]), np.zeros([1], np.int32))
+    self.assertEqual([1, 1], self._policy.batch_sizes)
+    client.close()
+
+  def testServerErrorsAreRaised(self):
+    server = self._start_server()
+    client = inference_server.InferenceClient(server.address)
+    with self.assertRaisesRegexp(Exception, 'Negative observation'):
+      client.action(self._time_step([[-1., 1.]]), np.zeros([1], np.int32))
+    # The server keeps serving.
+    step = client.action(self._time_step([[1., 1.]]), np.zeros([1], np.int32))
+    self.assertAllEqual([[2., 2.]], step.action)
+    client.close()
+
+
+  def testCloseAnswersPendingRequests(self):
+    # The request waits for others to join its batch until the server closes.
+    server = self._start_server(max_batch_size=4, max_latency_seconds=60)
+    client = inference_server.InferenceClient(server.address)
+    errors = []
+
+    def act():
+      try:
+        client.action(self._time_step([[1., 1.]]), np.zeros([1], np.int32))
+      except Exception as e:  # pylint: disable=broad-except
+        errors.append(e)
+
+    thread = threading.Thread(target=act)
+    thread.start()
+    time.sleep(0.2)
+    server.close()
+    thread.join(10)
+    self.assertFalse(thread.is_alive())
+    self.assertIn('inference server was closed', str(errors[0]))
+    self.assertEqual([], self._policy.batch_sizes)
+    client.close()
+
+
+if __name__ == '__main__':
+  tf.test.main()
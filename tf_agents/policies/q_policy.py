@@ -69,14 +69,18 @@ class QPolicy(tf_policy.Base):
   def _variables(self):
     return self._q_network.variables
 
+  def _q_values(self, time_step, policy_state):
+    """Returns the Q values of the actions and the next policy state."""
+    return self._q_network(time_step.observation, time_step.step_type,
+                           policy_state)
+
   def _distribution(self, time_step, policy_state):
     # In DQN, we always either take a uniformly random action, or the action
     # with the highest Q-value. However, to support more complicated policies,
     # we expose all Q-values as a categorical distribution with Q-values as
     # logits, and apply the GreedyPolicy wrapper in dqn_agent.py to select the
     # action with the highest Q-value.
-    q_values, policy_state = self._q_network(
-        time_step.observation, time_step.step_type, policy_state)
+    q_values, policy_state = self._q_values(time_step, policy_state)
     q_values.shape.assert_has_rank(2)
 
     # TODO(b/122314058): Validate and enforce that sampling distributions
@@ -15,8 +15,14 @@
 
 """Replay Buffers Module."""
 
+from tf_agents.replay_buffers import n_step_observer
 from tf_agents.replay_buffers import py_hashed_replay_buffer
 from tf_agents.replay_buffers import py_uniform_replay_buffer
+from tf_agents.replay_buffers import rate_limiter
 from tf_agents.replay_buffers import replay_buffer
+from tf_agents.replay_buffers import replay_service
+from tf_agents.replay_buffers import sequence_observer
+from tf_agents.replay_buffers import sharded_tf_uniform_replay_buffer
 from tf_agents.replay_buffers import table
+from tf_agents.replay_buffers import tf_rollout_buffer
 from tf_agents.replay_buffers import tf_uniform_replay_buffer
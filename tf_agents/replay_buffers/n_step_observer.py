@@ -0,0 +1,285 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Observers adding n-step transitions to a replay buffer.
+
+Instead of adding every step and sampling windows of `n + 1` steps to compute
+n-step returns at training time, these observers compute the returns when the
+steps are collected, and add a single item per step to the replay buffer. The
+item is a `Trajectory` of 2 time steps, shaped `[2, ...]`:
+
+  * The first step holds the observation `s_t`, action `a_t` and policy info
+    of step `t`, the discounted return `R_t = sum_k gamma^k * prod_{j<k}
+    discount_{t+j} * reward_{t+k}` of the next `m` steps in `reward`, and
+    `gamma^(m - 1) * prod_{j<m} discount_{t+j}` in `discount`.
+  * The second step is the collected step `t + m`, holding `s_{t+m}`.
+
+where `m` is `n`, or fewer steps if the episode ends before. The `discount` is
+such that agents bootstrapping with `gamma * discount`, like DQN, TD3 and SAC
+do, use `gamma^m * prod_{j<m} discount_{t+j}`. Sampling these items without
+`num_steps` gives `[batch_size, 2, ...]` experience, that these agents train
+on as is:
+
+  replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+      n_step_observer.n_step_data_spec(agent.collect_data_spec),
+      batch_size=env.batch_size)
+  observer = n_step_observer.TFNStepObserver(
+      replay_buffer, batch_size=env.batch_size, n=3, gamma=agent_gamma)
+  driver = dynamic_step_driver.DynamicStepDriver(
+      env, policy, observers=[observer])
+  dataset = replay_buffer.as_dataset(sample_batch_size=64)
+
+The transition of step `t` is added when step `t + n` is observed. Like with
+`num_steps=2` windows, transitions starting at episode boundaries are added
+too, and are masked out by the agents.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+import gin
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.specs import array_spec
+from tf_agents.specs import tensor_spec
+from tf_agents.utils import common
+from tf_agents.utils import nest_utils
+
+
+def n_step_data_spec(trajectory_spec):
+  """Returns the spec of the items added by the n-step observers.
+
+  Args:
+    trajectory_spec: The `Trajectory` spec of collected steps, e.g.
+      `agent.collect_data_spec`, made of `TensorSpec`s or `ArraySpec`s.
+
+  Returns:
+    `trajectory_spec` with an outer dimension of 2 added to every spec.
+  """
+  is_array_spec = all(
+      isinstance(spec, array_spec.ArraySpec)
+      for spec in tf.nest.flatten(trajectory_spec))
+  if is_array_spec:
+    return array_spec.add_outer_dims_nest(trajectory_spec, (2,))
+  return tensor_spec.from_spec(
+      array_spec.add_outer_dims_nest(
+          tensor_spec.to_nest_array_spec(trajectory_spec), (2,)))
+
+
+@gin.configurable
+class TFNStepObserver(tf.Module):
+  """Adds batches of n-step transitions to a TF replay buffer."""
+
+  def __init__(self,
+               replay_buffer,
+               batch_size,
+               n,
+               gamma,
+               scope='TFNStepObserver'):
+    """Creates a TFNStepObserver.
+
+    Args:
+      replay_buffer: A TF `ReplayBuffer` whose data_spec is the
+        `n_step_data_spec` of the observed `Trajectory` spec.
+      batch_size: Batch dimension of the observed trajectories.
+      n: Number of steps of the returns.
+      gamma: Discount of future rewards, the one of the trained agent.
+      scope: Scope prefix for variables and ops created by this class.
+
+    Raises:
+      ValueError: If n is smaller than 1.
+    """
+    if n < 1:
+      raise ValueError('n must be at least 1, got {}.'.format(n))
+    super(TFNStepObserver, self).__init__(name=scope)
+    self._replay_buffer = replay_buffer
+    self._batch_size = batch_size
+    self._n = n
+    self._gamma = gamma
+
+    def _create_window(spec):
+      # Each spec has an outer dimension of 2, see n_step_data_spec.
+      shape = [n, batch_size] + spec.shape.as_list()[1:]
+      return common.create_variable(
+          name=spec.name or 'window',
+          initializer=tf.zeros(shape, dtype=spec.dtype),
+          shape=None,
+          dtype=spec.dtype)
+
+    with tf.compat.v1.variable_scope(scope):
+      # Ring buffer of the last n observed trajectories.
+      self._window = tf.nest.map_structure(_create_window,
+                                           replay_buffer.data_spec)
+      self._num_steps = common.create_variable('num_steps', 0)
+
+  @property
+  def n(self):
+    return self._n
+
+  def variables(self):
+    return tf.nest.flatten(self._window) + [self._num_steps]
+
+  def __call__(self, traj):
+    """Observes a batch of trajectories, adding the transitions of n steps ago.
+
+    Args:
+      traj: A batch of `Trajectory` with shape [batch_size, ...].
+
+    Returns:
+      The number of trajectories observed so far.
+    """
+    tf.nest.assert_same_structure(traj, self._replay_buffer.data_spec)
+    step = self._num_steps.value()
+    # The window slots in order, from step - n to step - 1.
+    slots = tf.math.mod(step + tf.range(self._n, dtype=tf.int64), self._n)
+    window = tf.nest.map_structure(
+        lambda w, t: tf.concat([tf.gather(w.value(), slots), t[None]], axis=0),
+        self._window, traj)
+
+    def _add():
+      add_op = self._replay_buffer.add_batch(
+          _n_step_transitions(window, self._n, self._gamma))
+      with tf.control_dependencies([add_op]):
+        return tf.identity(step)
+
+    added = tf.cond(
+        pred=step >= self._n,
+        true_fn=_add,
+        false_fn=lambda: tf.identity(step))
+    with tf.control_dependencies([added]):
+      write_ops = [
+          tf.compat.v1.scatter_update(w, tf.math.mod(step, self._n), t).op
+          for w, t in zip(tf.nest.flatten(self._window), tf.nest.flatten(traj))
+      ]
+    with tf.control_dependencies(write_ops):
+      return tf.identity(self._num_steps.assign_add(1))
+
+
+def _n_step_transitions(window, n, gamma):
+  """Computes the transitions of the oldest steps of a window.
+
+  Args:
+    window: A `Trajectory` of n + 1 steps, shaped [n + 1, batch_size, ...].
+    n: Number of steps of the returns.
+    gamma: Discount of future rewards.
+
+  Returns:
+    A `Trajectory` of the n-step transitions, shaped [batch_size, 2, ...].
+  """
+  steps = tf.nest.map_structure(lambda t: t[:n], window)
+  reward_dtype = steps.reward.dtype
+  ends = tf.cast(
+      tf.logical_or(steps.is_last(), steps.is_boundary()), reward_dtype)
+  # The steps before the end of the episode, m of them.
+  alive = tf.math.cumprod(1 - ends, axis=0, exclusive=True)
+  num_steps = tf.cast(tf.reduce_sum(input_tensor=alive, axis=0), tf.int64)
+  gammas = tf.pow(
+      tf.constant(gamma, dtype=reward_dtype),
+      tf.cast(tf.range(n), reward_dtype))[:, None]
+  discounts = tf.cast(steps.discount, reward_dtype)
+
+  weights = alive * gammas * tf.math.cumprod(discounts, axis=0, exclusive=True)
+  reward = tf.reduce_sum(input_tensor=weights * steps.reward, axis=0)
+  is_final = tf.one_hot(num_steps - 1, n, axis=0, dtype=reward_dtype)
+  discount = tf.reduce_sum(
+      input_tensor=is_final * gammas * tf.math.cumprod(discounts, axis=0),
+      axis=0)
+  next_step_type = tf.reduce_sum(
+      input_tensor=tf.cast(is_final, steps.next_step_type.dtype) *
+      steps.next_step_type,
+      axis=0)
+
+  transition = tf.nest.map_structure(lambda t: t[0], steps).replace(
+      next_step_type=next_step_type,
+      reward=reward,
+      discount=tf.cast(discount, steps.discount.dtype))
+  batch_size = tf.shape(input=num_steps, out_type=tf.int64)[0]
+  indices = tf.stack([num_steps, tf.range(batch_size)], axis=-1)
+  next_step = tf.nest.map_structure(lambda t: tf.gather_nd(t, indices), window)
+  return tf.nest.map_structure(lambda t, u: tf.stack([t, u], axis=1),
+                               transition, next_step)
+
+
+@gin.configurable
+class PyNStepObserver(object):
+  """Adds n-step transitions to a Python replay buffer."""
+
+  def __init__(self, replay_buffer, n, gamma):
+    """Creates a PyNStepObserver.
+
+    Args:
+      replay_buffer: A Python `ReplayBuffer` whose data_spec is the
+        `n_step_data_spec` of the observed `Trajectory` spec, e.g. a
+        `PyUniformReplayBuffer`.
+      n: Number of steps of the returns.
+      gamma: Discount of future rewards, the one of the trained agent.
+
+    Raises:
+      ValueError: If n is smaller than 1.
+    """
+    if n < 1:
+      raise ValueError('n must be at least 1, got {}.'.format(n))
+    self._replay_buffer = replay_buffer
+    self._n = n
+    self._gamma = gamma
+    self._windows = None
+
+  @property
+  def n(self):
+    return self._n
+
+  def __call__(self, traj):
+    """Observes a batch of trajectories, adding the transitions of n steps ago.
+
+    Args:
+      traj: A batch of `Trajectory` with shape [batch_size, ...].
+    """
+    items = nest_utils.unstack_nested_arrays(traj)
+    if self._windows is None:
+      self._windows = [
+          collections.deque(maxlen=self._n + 1) for _ in range(len(items))
+      ]
+    for window, item in zip(self._windows, items):
+      window.append(item)
+      if len(window) > self._n:
+        self._replay_buffer.add_batch(
+            nest_utils.batch_nested_array(self._transition(list(window))))
+
+  def _transition(self, window):
+    """Returns the transition of the oldest step of a window of n + 1 steps."""
+    steps = window[:self._n]
+    num_steps = self._n
+    for i, step in enumerate(steps):
+      if step.is_last() or step.is_boundary():
+        num_steps = i + 1
+        break
+
+    reward = 0.0
+    weight = 1.0
+    for step in steps[:num_steps]:
+      reward += weight * step.reward
+      weight *= self._gamma * step.discount
+    discount = (self._gamma**(num_steps - 1) *
+                np.prod([step.discount for step in steps[:num_steps]]))
+
+    transition = steps[0].replace(
+        next_step_type=steps[num_steps - 1].next_step_type,
+        reward=np.asarray(reward, dtype=steps[0].reward.dtype),
+        discount=np.asarray(discount, dtype=steps[0].discount.dtype))
+    return nest_utils.stack_nested_arrays([transition, window[num_steps]])
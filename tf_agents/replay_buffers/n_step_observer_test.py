@@ -0,0 +1,129 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.replay_buffers.n_step_observer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents import specs
+from tf_agents.replay_buffers import n_step_observer
+from tf_agents.replay_buffers import py_uniform_replay_buffer
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.specs import array_spec
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+from tf_agents.trajectories import trajectory
+
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+def _trajectory_spec():
+  return trajectory.Trajectory(
+      step_type=specs.TensorSpec([], tf.int32, 'step_type'),
+      observation=specs.TensorSpec([], tf.int64, 'observation'),
+      action=specs.TensorSpec([], tf.int64, 'action'),
+      policy_info=(),
+      next_step_type=specs.TensorSpec([], tf.int32, 'next_step_type'),
+      reward=specs.TensorSpec([], tf.float32, 'reward'),
+      discount=specs.TensorSpec([], tf.float32, 'discount'))
+
+
+def _episodes():
+  """Returns batches of trajectories of two episodes, the second incomplete."""
+  steps = [
+      (trajectory.first, 0, 1., 1.),
+      (trajectory.mid, 1, 2., 1.),
+      (trajectory.last, 2, 4., 0.),
+      (trajectory.boundary, 3, 0., 1.),
+      (trajectory.first, 4, 8., 1.),
+      (trajectory.mid, 5, 16., 1.),
+      (trajectory.mid, 6, 32., 1.),
+  ]
+  return [
+      trajectory_fn(
+          observation=np.array([observation], dtype=np.int64),
+          action=np.array([10 * observation], dtype=np.int64),
+          policy_info=(),
+          reward=np.array([reward], dtype=np.float32),
+          discount=np.array([discount], dtype=np.float32))
+      for trajectory_fn, observation, reward, discount in steps
+  ]
+
+
+class NStepObserverTest(tf.test.TestCase):
+
+  def _assertTransitions(self, transitions):
+    """Checks the 2-step transitions of `_episodes` with n=2 and gamma=0.5."""
+    mid, last = ts.StepType.MID, ts.StepType.LAST
+    # Transitions of steps 0 to 4, the second episode ends in step 6.
+    self.assertAllEqual([0, 1, 2, 3, 4], transitions.observation[:, 0])
+    self.assertAllEqual([0, 10, 20, 30, 40], transitions.action[:, 0])
+    self.assertAllEqual([2, 3, 3, 4, 6], transitions.observation[:, 1])
+    self.assertAllEqual([mid, last, last, ts.StepType.FIRST, mid],
+                        transitions.next_step_type[:, 0])
+    # The return of step 0 is 1 + 0.5 * 2, the episode ends after step 2.
+    self.assertAllClose([2., 4., 4., 0., 16.], transitions.reward[:, 0])
+    self.assertAllClose([0.5, 0., 0., 1., 0.5], transitions.discount[:, 0])
+
+  def testDataSpec(self):
+    spec = n_step_observer.n_step_data_spec(_trajectory_spec())
+    self.assertEqual(specs.TensorSpec([2], tf.int64, 'observation'),
+                     spec.observation)
+    py_spec = n_step_observer.n_step_data_spec(
+        array_spec.ArraySpec([3], np.float32, 'reward'))
+    self.assertEqual(array_spec.ArraySpec([2, 3], np.float32, 'reward'),
+                     py_spec)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testTFNStepObserver(self):
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        n_step_observer.n_step_data_spec(_trajectory_spec()),
+        batch_size=1,
+        max_length=10)
+    observer = n_step_observer.TFNStepObserver(
+        replay_buffer, batch_size=1, n=2, gamma=0.5)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    for traj in _episodes():
+      self.evaluate(observer(tf.nest.map_structure(tf.constant, traj)))
+
+    transitions = self.evaluate(replay_buffer.gather_all())
+    self._assertTransitions(tf.nest.map_structure(lambda t: t[0], transitions))
+
+  def testPyNStepObserver(self):
+    replay_buffer = py_uniform_replay_buffer.PyUniformReplayBuffer(
+        n_step_observer.n_step_data_spec(
+            tensor_spec.to_nest_array_spec(_trajectory_spec())),
+        capacity=5)
+    observer = n_step_observer.PyNStepObserver(replay_buffer, n=2, gamma=0.5)
+
+    for traj in _episodes():
+      observer(traj)
+
+    transitions = replay_buffer.gather_all()
+    self._assertTransitions(tf.nest.map_structure(lambda t: t[0], transitions))
+
+  def testInvalidN(self):
+    with self.assertRaisesRegexp(ValueError, 'n must be at least 1'):
+      n_step_observer.PyNStepObserver(None, n=0, gamma=0.5)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -25,6 +25,7 @@ from __future__ import print_function
 
 import pickle
 import threading
+import zlib
 
 from absl import logging
 
@@ -35,14 +36,33 @@ from tf_agents.specs import array_spec
 from tf_agents.trajectories import trajectory
 
 
+def _hash_frame(frame):
+  """Hashes a contiguous frame directly from its memory buffer."""
+  return zlib.crc32(frame)
+
+
 class FrameBuffer(tf.train.experimental.PythonState):
   """Saves some frames in a memory efficient way.
 
+  Frames are stored once each in slots of a preallocated array, which grows as
+  needed. Frames are referred to by their slot index and reference counted;
+  slots whose frames are no longer referenced are reused. Identical frames are
+  found by hashing their memory (without copying it), and are compared
+  elementwise on hash collisions.
+
   Thread safety: cannot add multiple frames in parallel.
   """
 
-  def __init__(self):
-    self._frames = {}
+  def __init__(self, max_frames=None):
+    """Creates a FrameBuffer.
+
+    Args:
+      max_frames: Optional upper bound on the number of distinct frames held
+        at any time. Used to avoid growing the frame array beyond what is
+        needed.
+    """
+    self._max_frames = max_frames
+    self.clear()
 
   def add_frame(self, frame):
     """Add a frame to the buffer.
@@ -51,48 +71,144 @@ class FrameBuffer(tf.train.experimental.PythonState):
       frame: Numpy array.
 
     Returns:
-      A deduplicated frame.
+      The slot index of the deduplicated frame.
+
+    Raises:
+      ValueError: If frame does not have the shape and dtype of the frames
+        already in the buffer.
     """
-    h = hash(frame.tostring())
-    if h in self._frames:
-      _, refcount = self._frames[h]
-      self._frames[h] = (frame, refcount + 1)
-      return h
-    self._frames[h] = (frame, 1)
-    return h
+    frame = np.ascontiguousarray(frame)
+    h = _hash_frame(frame)
+    for slot in self._slots_by_hash.get(h, ()):
+      if np.array_equal(self._frames[slot], frame):
+        self._refcounts[slot] += 1
+        return slot
+
+    slot = self._allocate_slot(frame)
+    self._frames[slot] = frame
+    self._refcounts[slot] = 1
+    self._hashes[slot] = h
+    self._slots_by_hash.setdefault(h, []).append(slot)
+    return slot
 
   def __len__(self):
-    return len(self._frames)
+    return self._num_slots - len(self._free_slots)
 
   def serialize(self):
-    """Callback for `PythonStateWrapper` to serialize the dictionary."""
-    return pickle.dumps(self._frames)
+    """Callback for `PythonStateWrapper` to serialize the frames."""
+    num_slots = self._num_slots
+    state = {
+        'frames': None if self._frames is None else self._frames[:num_slots],
+        'refcounts': self._refcounts[:num_slots],
+        'hashes': self._hashes[:num_slots],
+        'free_slots': self._free_slots,
+    }
+    return pickle.dumps(state)
 
   def deserialize(self, string_value):
-    """Callback for `PythonStateWrapper` to deserialize the array."""
-    self._frames = pickle.loads(string_value)
+    """Callback for `PythonStateWrapper` to deserialize the frames."""
+    state = pickle.loads(string_value)
+    if 'refcounts' not in state:
+      self._load_legacy_frames(state)
+      return
+    self._frames = state['frames']
+    self._refcounts = state['refcounts']
+    self._hashes = state['hashes']
+    self._free_slots = list(state['free_slots'])
+    self._num_slots = len(self._refcounts)
+    self._slots_by_hash = {}
+    for slot in np.flatnonzero(self._refcounts):
+      self._slots_by_hash.setdefault(self._hashes[slot], []).append(slot)
+
+  def _load_legacy_frames(self, frames):
+    """Loads frames saved as a `{hash: (frame, refcount)}` dict.
+
+    This is the format of checkpoints written before frames were stored in
+    slots. The frames kept their split axis, of size 1. The observations stored
+    by those checkpoints refer to frames by hash, and are remapped to slots with
+    `pop_legacy_slots`.
+
+    Args:
+      frames: The deserialized dict of frames.
+    """
+    self.clear()
+    for h, (frame, refcount) in frames.items():
+      slot = self.add_frame(np.squeeze(frame, axis=-1))
+      self._refcounts[slot] = refcount
+      self._legacy_slots[h] = slot
+
+  def pop_legacy_slots(self):
+    """Returns and forgets the slots of the frames of a legacy checkpoint.
+
+    Returns:
+      A dict from the hashes referring to the frames in the observations of a
+      checkpoint in the legacy format to the slots of the frames, or an empty
+      dict if no such checkpoint was loaded since the last call.
+    """
+    legacy_slots, self._legacy_slots = self._legacy_slots, {}
+    return legacy_slots
 
   def compress(self, observation, split_axis=-1):
-    # e.g. When split_axis is -1, turns an array of size 84x84x4
-    # into a list of arrays of size 84x84x1.
-    frame_list = np.split(observation, observation.shape[split_axis],
-                          split_axis)
-    return np.array([self.add_frame(f) for f in frame_list])
+    # e.g. When split_axis is -1, turns an array of size 84x84x4 into 4 frames
+    # of size 84x84 laid out contiguously.
+    frames = np.ascontiguousarray(np.moveaxis(observation, split_axis, 0))
+    return np.array([self.add_frame(f) for f in frames], dtype=np.int64)
 
   def decompress(self, observation, split_axis=-1):
-    frames = [self._frames[h][0] for h in observation]
-    return np.concatenate(frames, axis=split_axis)
+    return np.moveaxis(self._frames[observation], 0, split_axis)
 
   def on_delete(self, observation, split_axis=-1):
-    for h in observation:
-      frame, refcount = self._frames[h]
-      if refcount > 1:
-        self._frames[h] = (frame, refcount - 1)
-      else:
-        del self._frames[h]
+    del split_axis  # Unused.
+    for slot in observation:
+      self._refcounts[slot] -= 1
+      if self._refcounts[slot] == 0:
+        slots = self._slots_by_hash[self._hashes[slot]]
+        slots.remove(slot)
+        if not slots:
+          del self._slots_by_hash[self._hashes[slot]]
+        self._free_slots.append(slot)
 
   def clear(self):
-    self._frames = {}
+    self._frames = None
+    self._refcounts = np.zeros((0,), dtype=np.int64)
+    self._hashes = np.zeros((0,), dtype=np.int64)
+    self._free_slots = []
+    self._num_slots = 0
+    self._slots_by_hash = {}
+    self._legacy_slots = {}
+
+  def _allocate_slot(self, frame):
+    """Returns a free slot for frame, growing the frame array if needed."""
+    if self._frames is not None and (frame.shape != self._frames.shape[1:] or
+                                     frame.dtype != self._frames.dtype):
+      raise ValueError(
+          'All frames must have shape {} and dtype {}, saw shape {} and dtype '
+          '{}.'.format(self._frames.shape[1:], self._frames.dtype,
+                       frame.shape, frame.dtype))
+    if self._free_slots:
+      return self._free_slots.pop()
+    if self._frames is None or self._num_slots == len(self._frames):
+      self._grow(frame)
+    slot = self._num_slots
+    self._num_slots += 1
+    return slot
+
+  def _grow(self, frame):
+    num_slots = max(2 * self._num_slots, 16)
+    if self._max_frames and self._num_slots < self._max_frames:
+      # Only max_frames slots are needed, unless the bound does not hold, in
+      # which case growing keeps doubling.
+      num_slots = min(num_slots, self._max_frames)
+    frames = np.zeros((num_slots,) + frame.shape, dtype=frame.dtype)
+    refcounts = np.zeros((num_slots,), dtype=np.int64)
+    hashes = np.zeros((num_slots,), dtype=np.int64)
+    if self._frames is not None:
+      frames[:self._num_slots] = self._frames[:self._num_slots]
+    refcounts[:self._num_slots] = self._refcounts[:self._num_slots]
+    hashes[:self._num_slots] = self._hashes[:self._num_slots]
+    self._frames = frames
+    self._refcounts = refcounts
+    self._hashes = hashes
 
 
 class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
@@ -109,6 +225,9 @@ class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
   trajectory.Trajectory instances.
   """
 
+  # Decoding gathers frames which writers free and reuse.
+  _decode_requires_lock = True
+
   def __init__(self, data_spec, capacity, log_interval=None):
     if not isinstance(data_spec, trajectory.Trajectory):
       raise ValueError(
@@ -116,7 +235,10 @@ class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
     super(PyHashedReplayBuffer, self).__init__(
         data_spec, capacity)
 
-    self._frame_buffer = FrameBuffer()
+    # At most `capacity` observations are stored, each made of
+    # `observation.shape[-1]` frames.
+    self._frame_buffer = FrameBuffer(
+        max_frames=capacity * data_spec.observation.shape[-1])
     self._lock_frame_buffer = threading.Lock()
     self._log_interval = log_interval
 
@@ -169,6 +291,32 @@ class PyHashedReplayBuffer(py_uniform_replay_buffer.PyUniformReplayBuffer):
     with self._lock_frame_buffer:
       self._frame_buffer.on_delete(encoded_trajectory.observation)
 
+  def _add_item(self, item):
+    self._migrate_legacy_observations()
+    super(PyHashedReplayBuffer, self)._add_item(item)
+
+  def _read_encoded_rows(self, rows):
+    self._migrate_legacy_observations()
+    return super(PyHashedReplayBuffer, self)._read_encoded_rows(rows)
+
+  def _migrate_legacy_observations(self):
+    """Remaps the stored observations of a legacy checkpoint to frame slots.
+
+    Checkpoints written before frames were stored in slots refer to frames by
+    hash, see `FrameBuffer.pop_legacy_slots`. The lock must be held.
+    """
+    with self._lock_frame_buffer:
+      legacy_slots = self._frame_buffer.pop_legacy_slots()
+    if not legacy_slots:
+      return
+    for row in range(self._np_state.size):
+      encoded_trajectory = self._storage.get(row)
+      observation = np.array(
+          [legacy_slots[int(h)] for h in encoded_trajectory.observation],
+          dtype=np.int64)
+      self._storage.set(row, encoded_trajectory._replace(
+          observation=observation))
+
   def _clear(self):
     super(PyHashedReplayBuffer, self)._clear()
     self._frame_buffer.clear()
@@ -18,9 +18,12 @@
 from __future__ import division
 from __future__ import unicode_literals
 
+import functools
 import os
+import pickle
 
 from absl.testing import parameterized
+from absl.testing.absltest import mock
 import numpy as np
 import tensorflow as tf
 from tf_agents.replay_buffers import py_hashed_replay_buffer
@@ -90,6 +93,60 @@ class FrameBufferTest(tf.test.TestCase):
     fb.on_delete([h])
     self.assertEqual(1, len(fb))
 
+  def testCompressDecompress(self):
+    fb = py_hashed_replay_buffer.FrameBuffer()
+    frames = [np.full([15, 15], k, dtype=np.uint8) for k in range(5)]
+    first = np.stack(frames[:4], axis=-1)
+    second = np.stack(frames[1:], axis=-1)
+
+    first_encoded = fb.compress(first)
+    second_encoded = fb.compress(second)
+    self.assertEqual(5, len(fb))
+    self.assertAllEqual(first_encoded[1:], second_encoded[:3])
+    self.assertAllEqual(first, fb.decompress(first_encoded))
+    self.assertAllEqual(second, fb.decompress(second_encoded))
+
+    # Slots of deleted frames are reused.
+    fb.on_delete(first_encoded)
+    self.assertEqual(4, len(fb))
+    third_encoded = fb.compress(first)
+    self.assertEqual(first_encoded[0], third_encoded[0])
+    self.assertAllEqual(first, fb.decompress(third_encoded))
+
+  def testHashCollision(self):
+    fb = py_hashed_replay_buffer.FrameBuffer()
+    a = np.zeros([84, 84, 1], dtype=np.uint8)
+    b = np.ones([84, 84, 1], dtype=np.uint8)
+    with mock.patch.object(py_hashed_replay_buffer, '_hash_frame',
+                           return_value=0):
+      h_a = fb.add_frame(a)
+      h_b = fb.add_frame(b)
+      self.assertNotEqual(h_a, h_b)
+      self.assertEqual(h_a, fb.add_frame(a))
+      self.assertEqual(2, len(fb))
+      fb.on_delete([h_a, h_a])
+      self.assertEqual(1, len(fb))
+      self.assertAllEqual(b, fb.decompress([h_b], split_axis=0)[0])
+
+  def testGrowsGeometricallyPastMaxFrames(self):
+    fb = py_hashed_replay_buffer.FrameBuffer(max_frames=16)
+    for k in range(16):
+      fb.add_frame(np.full([2, 2], k, dtype=np.uint8))
+    self.assertLen(fb._frames, 16)
+    fb.add_frame(np.full([2, 2], 16, dtype=np.uint8))
+    self.assertLen(fb._frames, 32)
+
+
+_COMPRESSED_BUFFER_CLASSES = [
+    ('WithCompression',
+     functools.partial(py_uniform_replay_buffer.PyUniformReplayBuffer,
+                       compression_min_bytes=100)),
+    ('WithParallelDecompression',
+     functools.partial(py_uniform_replay_buffer.PyUniformReplayBuffer,
+                       compression_min_bytes=100,
+                       num_decompression_threads=2)),
+]
+
 
 class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
@@ -149,7 +206,8 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
   @parameterized.named_parameters(
       [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
-       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
+       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)] +
+      _COMPRESSED_BUFFER_CLASSES)
   def testEmptyBufferBatchSize(self, rb_cls):
     self._create_replay_buffer(rb_cls=rb_cls)
     ds = self._replay_buffer.as_dataset(sample_batch_size=2)
@@ -171,9 +229,47 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
       get_next = tf.compat.v1.data.make_one_shot_iterator(ds).get_next()
       self.evaluate(get_next)
 
+  def testRestoreLegacyFrames(self):
+    self._generate_replay_buffer(
+        rb_cls=py_hashed_replay_buffer.PyHashedReplayBuffer)
+    replay_buffer = self._replay_buffer
+    expected = replay_buffer.gather_all()
+
+    # Rewrite the buffer as restored from the legacy format, where frames are
+    # saved by hash with their split axis, and observations refer to hashes.
+    legacy_frames = {}
+    for row in range(replay_buffer.size):
+      item = replay_buffer._decode(replay_buffer._storage.get(row))
+      hashes = []
+      for frame in np.split(item.observation, self._stack_count, axis=-1):
+        h = hash(frame.tobytes())
+        _, refcount = legacy_frames.get(h, (frame, 0))
+        legacy_frames[h] = (frame, refcount + 1)
+        hashes.append(h)
+      replay_buffer._storage.set(
+          row, item._replace(observation=np.array(hashes, dtype=np.int64)))
+    replay_buffer._frame_buffer.deserialize(pickle.dumps(legacy_frames))
+
+    self.assertAllEqual(expected.observation,
+                        replay_buffer.gather_all().observation)
+    # Deleting the restored items when adding new ones releases their frames.
+    self._fill_replay_buffer()
+    self.assertAllEqual(expected.observation,
+                        replay_buffer.gather_all().observation)
+
+  def testCloseStopsDecompressionThreads(self):
+    self._generate_replay_buffer(rb_cls=_COMPRESSED_BUFFER_CLASSES[-1][1])
+    self._replay_buffer.close()
+    self.assertIsNone(self._replay_buffer._decompression_pool)
+    # Sampled batches are then decompressed by the calling thread.
+    traj = self._replay_buffer._get_next(sample_batch_size=4)
+    self.assertAllEqual(traj.observation[:, :, :, 0] + 1,
+                        traj.observation[:, :, :, 1])
+
   @parameterized.named_parameters(
       [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
-       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
+       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)] +
+      _COMPRESSED_BUFFER_CLASSES)
   def testReplayBufferCircular(self, rb_cls):
     self._generate_replay_buffer(rb_cls=rb_cls)
 
@@ -240,7 +336,8 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
   @parameterized.named_parameters(
       [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
-       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
+       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)] +
+      _COMPRESSED_BUFFER_CLASSES)
   def testSampleBatchesWithNumSteps(self, rb_cls):
     self._generate_replay_buffer(rb_cls=rb_cls)
 
@@ -270,7 +367,8 @@ class PyUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
   @parameterized.named_parameters(
       [('WithoutHashing', py_uniform_replay_buffer.PyUniformReplayBuffer),
-       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)])
+       ('WithHashing', py_hashed_replay_buffer.PyHashedReplayBuffer)] +
+      _COMPRESSED_BUFFER_CLASSES)
   def testCheckpointable(self, rb_cls):
     self._generate_replay_buffer(rb_cls=rb_cls)
     self.assertEqual(32, self._replay_buffer.size)
@@ -27,6 +27,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from multiprocessing import pool
 import threading
 
 import numpy as np
@@ -45,23 +46,49 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
   This replay buffer can be subclassed to change the encoding used for the
   underlying storage by overriding _encoded_data_spec, _encode, _decode, and
   _on_delete.
+
+  Large encoded components can additionally be stored compressed (see
+  `compression_min_bytes`), in which case sampled batches can be decompressed
+  by a pool of worker threads. Sampled rows are read under the lock, but
+  decompressed and decoded after releasing it, so that writers are not blocked
+  by readers.
   """
 
-  def __init__(self, data_spec, capacity):
+  # Whether `_decode` reads state shared with writers, and so must run under
+  # the lock with the read of the encoded items.
+  _decode_requires_lock = False
+
+  def __init__(self, data_spec, capacity, compression_min_bytes=None,
+               compression_level=1, num_decompression_threads=None):
     """Creates a PyUniformReplayBuffer.
 
     Args:
       data_spec: An ArraySpec or a list/tuple/nest of ArraySpecs describing a
         single item that can be stored in this buffer.
       capacity: The maximum number of items that can be stored in the buffer.
+      compression_min_bytes: Optional size in bytes. Encoded components at
+        least this large (e.g. pixel observations) are stored zlib-compressed.
+        If None (default), nothing is compressed.
+      compression_level: zlib compression level of compressed components, from
+        1 (fastest) to 9 (smallest).
+      num_decompression_threads: Optional number of worker threads used to
+        decompress the items of a sampled batch in parallel. If None (default),
+        items are decompressed by the calling thread.
     """
     super(PyUniformReplayBuffer, self).__init__(data_spec, capacity)
 
-    self._storage = numpy_storage.NumpyStorage(self._encoded_data_spec(),
-                                               capacity)
+    self._storage = numpy_storage.NumpyStorage(
+        self._encoded_data_spec(),
+        capacity,
+        compression_min_bytes=compression_min_bytes,
+        compression_level=compression_level)
     self._lock = threading.Lock()
     self._np_state = numpy_storage.NumpyState()
 
+    self._decompression_pool = None
+    if num_decompression_threads and self._storage.has_compressed_items:
+      self._decompression_pool = pool.ThreadPool(num_decompression_threads)
+
     # Adding elements to the replay buffer is done in a circular way.
     # Keeps track of the actual size of the replay buffer and the location
     # where to add new elements.
@@ -71,6 +98,16 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
     # Total number of items that went through the replay buffer.
     self._np_state.item_count = np.int64(0)
 
+  def __del__(self):
+    self.close()
+
+  def close(self):
+    """Stops the decompression threads, if any."""
+    decompression_pool = getattr(self, '_decompression_pool', None)
+    if decompression_pool is not None:
+      decompression_pool.close()
+      self._decompression_pool = None
+
   def _encoded_data_spec(self):
     """Spec of data items after encoding using _encode."""
     return self._data_spec
@@ -100,59 +137,93 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
 
     item = nest_utils.unbatch_nested_array(items)
     with self._lock:
-      if self._np_state.size == self._capacity:
-        # If we are at capacity, we are deleting element cur_id.
-        self._on_delete(self._storage.get(self._np_state.cur_id))
-      self._storage.set(self._np_state.cur_id, self._encode(item))
-      self._np_state.size = np.minimum(self._np_state.size + 1,
-                                       self._capacity)
-      self._np_state.cur_id = (self._np_state.cur_id + 1) % self._capacity
-      self._np_state.item_count += 1
+      self._add_item(item)
+
+  def _add_sequence(self, items):
+    outer_shape = nest_utils.get_outer_array_shape(items, self._data_spec)
+    if outer_shape[0] != 1:
+      raise NotImplementedError('PyUniformReplayBuffer only supports a batch '
+                                'size of 1, but received `items` with batch '
+                                'size {}.'.format(outer_shape[0]))
+
+    sequence = nest_utils.unstack_nested_arrays(
+        nest_utils.unbatch_nested_array(items))
+    with self._lock:
+      for item in sequence:
+        self._add_item(item)
+
+  def _add_item(self, item):
+    """Adds an item, the lock must be held."""
+    if self._np_state.size == self._capacity:
+      # If we are at capacity, we are deleting element cur_id.
+      self._on_delete(self._storage.get(self._np_state.cur_id))
+    self._storage.set(self._np_state.cur_id, self._encode(item))
+    self._np_state.size = np.minimum(self._np_state.size + 1, self._capacity)
+    self._np_state.cur_id = (self._np_state.cur_id + 1) % self._capacity
+    self._np_state.item_count += 1
 
   def _get_next(self,
                 sample_batch_size=None,
                 num_steps=None,
                 time_stacked=True):
     num_steps_value = num_steps if num_steps is not None else 1
-    def get_single():
-      """Gets a single item from the replay buffer."""
-      with self._lock:
-        if self._np_state.size <= 0:
-          def empty_item(spec):
-            return np.empty(spec.shape, dtype=spec.dtype)
-          if num_steps is not None:
-            item = [tf.nest.map_structure(empty_item, self.data_spec)
-                    for n in range(num_steps)]
-            if time_stacked:
-              item = nest_utils.stack_nested_arrays(item)
-          else:
-            item = tf.nest.map_structure(empty_item, self.data_spec)
-          return item
-        idx = np.random.randint(self._np_state.size - num_steps_value + 1)
-        if self._np_state.size == self._capacity:
-          # If the buffer is full, add cur_id (head of circular buffer) so that
-          # we sample from the range [cur_id, cur_id + size - num_steps_value].
-          # We will modulo the size below.
-          idx += self._np_state.cur_id
-
-        if num_steps is not None:
+    num_samples = sample_batch_size if sample_batch_size is not None else 1
+
+    items = None
+    encoded_items = None
+    with self._lock:
+      if self._np_state.size <= 0:
+        def empty_item(spec):
+          return np.empty(spec.shape, dtype=spec.dtype)
+        items = [tf.nest.map_structure(empty_item, self.data_spec)
+                 for _ in range(num_samples * num_steps_value)]
+      else:
+        rows = []
+        for _ in range(num_samples):
+          idx = np.random.randint(self._np_state.size - num_steps_value + 1)
+          if self._np_state.size == self._capacity:
+            # If the buffer is full, add cur_id (head of circular buffer) so
+            # that we sample from the range [cur_id, cur_id + size -
+            # num_steps_value]. We will modulo the size below.
+            idx += self._np_state.cur_id
           # TODO(b/120242830): Try getting data from numpy in one shot rather
           # than num_steps_value.
-          item = [self._decode(self._storage.get((idx + n) % self._capacity))
-                  for n in range(num_steps)]
-        else:
-          item = self._decode(self._storage.get(idx % self._capacity))
-
-      if num_steps is not None and time_stacked:
-        item = nest_utils.stack_nested_arrays(item)
-      return item
+          rows.extend((idx + n) % self._capacity
+                      for n in range(num_steps_value))
+        encoded_items = self._read_encoded_rows(rows)
+        if self._decode_requires_lock:
+          items = self._decode_items(encoded_items)
+    if items is None:
+      items = self._decode_items(encoded_items)
+
+    samples = []
+    for start in range(0, len(items), num_steps_value):
+      if num_steps is None:
+        sample = items[start]
+      else:
+        sample = items[start:start + num_steps_value]
+        if time_stacked:
+          sample = nest_utils.stack_nested_arrays(sample)
+      samples.append(sample)
 
     if sample_batch_size is None:
-      return get_single()
+      return samples[0]
     else:
-      samples = [get_single() for _ in range(sample_batch_size)]
       return nest_utils.stack_nested_arrays(samples)
 
+  def _read_encoded_rows(self, rows):
+    """Reads the items stored in rows, still compressed and encoded."""
+    return [self._storage.get(row, decompress=False) for row in rows]
+
+  def _decode_items(self, encoded_items):
+    """Decompresses and decodes items read by `_read_encoded_rows`."""
+    decompression_pool = self._decompression_pool
+    if decompression_pool is not None and len(encoded_items) > 1:
+      items = decompression_pool.map(self._storage.decompress, encoded_items)
+    else:
+      items = [self._storage.decompress(item) for item in encoded_items]
+    return [self._decode(item) for item in items]
+
   def _as_dataset(self, sample_batch_size=None, num_steps=None,
                   num_parallel_calls=None):
     if num_parallel_calls is not None:
@@ -170,12 +241,8 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
 
     def generator_fn():
       while True:
-        if sample_batch_size is not None:
-          batch = [self._get_next(num_steps=num_steps, time_stacked=False)
-                   for _ in range(sample_batch_size)]
-          item = nest_utils.stack_nested_arrays(batch)
-        else:
-          item = self._get_next(num_steps=num_steps, time_stacked=False)
+        item = self._get_next(sample_batch_size=sample_batch_size,
+                              num_steps=num_steps, time_stacked=False)
         yield tuple(tf.nest.flatten(item))
 
     def time_stack(*structures):
@@ -192,8 +259,12 @@ class PyUniformReplayBuffer(replay_buffer.ReplayBuffer):
       return ds
 
   def _gather_all(self):
-    data = [self._decode(self._storage.get(idx))
-            for idx in range(self._capacity)]
+    with self._lock:
+      encoded_items = self._read_encoded_rows(range(self._capacity))
+      if self._decode_requires_lock:
+        data = self._decode_items(encoded_items)
+    if not self._decode_requires_lock:
+      data = self._decode_items(encoded_items)
     stacked = nest_utils.stack_nested_arrays(data)
     batched = tf.nest.map_structure(lambda t: np.expand_dims(t, 0), stacked)
     return batched
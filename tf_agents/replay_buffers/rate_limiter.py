@@ -0,0 +1,338 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Rate limiting of the inserts and samples of replay buffers.
+
+When collection and training run concurrently (e.g. in separate threads or
+processes), a `SamplesPerInsertRateLimiter` holds the ratio between the number
+of sampled items and the number of inserted items close to a target, by
+blocking the side that is ahead. It can be attached to any `ReplayBuffer` with
+`RateLimitedReplayBuffer`:
+
+  limiter = rate_limiter.SamplesPerInsertRateLimiter(
+      samples_per_insert=8.0, min_size_to_sample=1000)
+  replay_buffer = rate_limiter.RateLimitedReplayBuffer(
+      tf_uniform_replay_buffer.TFUniformReplayBuffer(...), limiter)
+
+  # In the collection thread.
+  driver = dynamic_step_driver.DynamicStepDriver(
+      env, policy, observers=[replay_buffer.add_batch])
+
+  # In the training thread.
+  dataset = replay_buffer.as_dataset(sample_batch_size=64, num_steps=2)
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import threading
+import time
+
+import gin
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.replay_buffers import replay_buffer
+from tf_agents.specs import array_spec
+from tf_agents.utils import nest_utils
+
+
+RateLimiterStats = collections.namedtuple('RateLimiterStats', [
+    'num_inserts', 'num_samples', 'insert_blocked_seconds',
+    'sample_blocked_seconds'
+])
+
+
+@gin.configurable
+class SamplesPerInsertRateLimiter(object):
+  """Blocks inserts and samples to hold a samples per insert ratio.
+
+  Each inserted item allows `samples_per_insert` items to be sampled. Inserts
+  are blocked while the number of sampled items is more than `error_buffer`
+  behind this target, and samples while it is more than `error_buffer` ahead.
+  No item can be sampled before `min_size_to_sample` items were inserted.
+
+  Inserts and samples are recorded when they are allowed. This class is thread
+  safe.
+  """
+
+  def __init__(self,
+               samples_per_insert=None,
+               min_size_to_sample=1,
+               error_buffer=None,
+               timeout=None):
+    """Creates a SamplesPerInsertRateLimiter.
+
+    Args:
+      samples_per_insert: Optional target ratio between the number of sampled
+        items and the number of inserted items. If None (default), inserts are
+        never blocked, and samples only until `min_size_to_sample` items were
+        inserted.
+      min_size_to_sample: Number of items that must have been inserted before
+        items can be sampled.
+      error_buffer: How far, in number of sampled items, the ratio may drift
+        away from `samples_per_insert` before inserts or samples are blocked.
+        Defaults to `max(1.0, samples_per_insert)`, its minimal value.
+      timeout: Optional number of seconds an insert or a sample may be blocked,
+        after which a RuntimeError is raised. If None (default), inserts and
+        samples are blocked until they are allowed.
+
+    Raises:
+      ValueError: If error_buffer is smaller than
+        `max(1.0, samples_per_insert)`.
+    """
+    if samples_per_insert is not None:
+      min_error_buffer = max(1.0, samples_per_insert)
+      if error_buffer is None:
+        error_buffer = min_error_buffer
+      if error_buffer < min_error_buffer:
+        raise ValueError(
+            'error_buffer ({}) must be at least max(1.0, samples_per_insert) '
+            '({}), otherwise inserts and samples may block each other '
+            'forever.'.format(error_buffer, min_error_buffer))
+      offset = min_size_to_sample * samples_per_insert
+      self._min_diff = offset - error_buffer
+      self._max_diff = offset + error_buffer
+    self._samples_per_insert = samples_per_insert
+    self._min_size_to_sample = min_size_to_sample
+    self._error_buffer = error_buffer
+    self._timeout = timeout
+    self._condition = threading.Condition()
+    self._closed = False
+    self._num_inserts = 0
+    self._num_samples = 0
+    self._insert_blocked_seconds = 0.0
+    self._sample_blocked_seconds = 0.0
+
+  def __getstate__(self):
+    # The condition can not be pickled, e.g. to send the limiter to another
+    # process, recreate it instead.
+    state = self.__dict__.copy()
+    del state['_condition']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._condition = threading.Condition()
+
+  @property
+  def samples_per_insert(self):
+    return self._samples_per_insert
+
+  @property
+  def stats(self):
+    """Returns the `RateLimiterStats` of the inserts and samples so far.
+
+    `insert_blocked_seconds` and `sample_blocked_seconds` are the total times
+    spent waiting by inserts and samples respectively.
+    """
+    with self._condition:
+      return RateLimiterStats(
+          num_inserts=self._num_inserts,
+          num_samples=self._num_samples,
+          insert_blocked_seconds=self._insert_blocked_seconds,
+          sample_blocked_seconds=self._sample_blocked_seconds)
+
+  def await_insert(self, num_inserts=1):
+    """Blocks until `num_inserts` items can be inserted, and records them.
+
+    Items are allowed one at a time, so that inserting a batch can not block
+    the samples it is waiting for. If the timeout expires, the items allowed
+    so far remain recorded.
+
+    Args:
+      num_inserts: Number of items to insert.
+
+    Raises:
+      RuntimeError: If the timeout expired.
+    """
+    self._await(num_inserts, self._can_insert, '_num_inserts',
+                '_insert_blocked_seconds')
+
+  def await_sample(self, num_samples=1):
+    """Blocks until `num_samples` items can be sampled, and records them.
+
+    Items are allowed one at a time, so that sampling a batch can not block
+    the inserts it is waiting for. If the timeout expires, the items allowed
+    so far remain recorded.
+
+    Args:
+      num_samples: Number of items to sample.
+
+    Raises:
+      RuntimeError: If the timeout expired.
+    """
+    self._await(num_samples, self._can_sample, '_num_samples',
+                '_sample_blocked_seconds')
+
+  def close(self):
+    """Unblocks the pending inserts and samples, raising a RuntimeError.
+
+    Inserts and samples that would be blocked afterwards also raise.
+    """
+    with self._condition:
+      self._closed = True
+      self._condition.notify_all()
+
+  def _can_insert(self):
+    if self._samples_per_insert is None:
+      return True
+    if self._num_inserts + 1 <= self._min_size_to_sample:
+      return True
+    diff = ((self._num_inserts + 1) * self._samples_per_insert -
+            self._num_samples)
+    return diff <= self._max_diff
+
+  def _can_sample(self):
+    if self._num_inserts < self._min_size_to_sample:
+      return False
+    if self._samples_per_insert is None:
+      return True
+    diff = (self._num_inserts * self._samples_per_insert -
+            self._num_samples - 1)
+    return diff >= self._min_diff
+
+  def _await(self, num_items, predicate, count_attr, blocked_seconds_attr):
+    start_time = time.time()
+    deadline = None if self._timeout is None else start_time + self._timeout
+    for _ in range(num_items):
+      with self._condition:
+        if not predicate():
+          wait_start_time = time.time()
+          try:
+            self._wait(predicate, deadline)
+          finally:
+            setattr(
+                self, blocked_seconds_attr,
+                getattr(self, blocked_seconds_attr) +
+                time.time() - wait_start_time)
+        setattr(self, count_attr, getattr(self, count_attr) + 1)
+        self._condition.notify_all()
+
+  def _wait(self, predicate, deadline):
+    while not predicate():
+      if self._closed:
+        raise RuntimeError(
+            'The rate limiter was closed, with {} inserted and {} sampled '
+            'items.'.format(self._num_inserts, self._num_samples))
+      if deadline is None:
+        self._condition.wait()
+      else:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          raise RuntimeError(
+              'Timed out after {} seconds waiting for the rate limiter, with '
+              '{} inserted and {} sampled items.'.format(
+                  self._timeout, self._num_inserts, self._num_samples))
+        self._condition.wait(remaining)
+
+
+@gin.configurable
+class RateLimitedReplayBuffer(replay_buffer.ReplayBuffer):
+  """Wraps a ReplayBuffer, rate limiting its `add_batch` and `get_next`.
+
+  Works with both Python and TensorFlow replay buffers. For the latter, the
+  rate limiter is called through a `tf.py_function` that the returned ops
+  depend on, so that inserts and samples are blocked when the ops run.
+
+  `as_dataset` waits for the rate limiter before drawing each element from the
+  dataset of the wrapped buffer. Note that with `num_parallel_calls`, the
+  wrapped dataset may draw elements ahead of the rate limiter.
+  """
+
+  def __init__(self, buffer, rate_limiter):
+    """Creates a RateLimitedReplayBuffer.
+
+    Args:
+      buffer: The `ReplayBuffer` to wrap.
+      rate_limiter: A `SamplesPerInsertRateLimiter`, possibly shared with other
+        buffers.
+    """
+    super(RateLimitedReplayBuffer, self).__init__(buffer.data_spec,
+                                                  buffer.capacity)
+    self._buffer = buffer
+    self._rate_limiter = rate_limiter
+    self._is_py_buffer = all(
+        isinstance(spec, array_spec.ArraySpec)
+        for spec in tf.nest.flatten(buffer.data_spec))
+
+  @property
+  def buffer(self):
+    return self._buffer
+
+  @property
+  def rate_limiter(self):
+    return self._rate_limiter
+
+  def _await_op(self, await_fn, num_items, name):
+    def _await(num_items):
+      await_fn(int(num_items))
+      return True
+
+    return tf.py_function(_await, [num_items], tf.bool, name=name)
+
+  def _add_batch(self, items):
+    return self._add(items, self._buffer.add_batch)
+
+  def _add_sequence(self, items):
+    return self._add(items, self._buffer.add_sequence)
+
+  def _add(self, items, add_fn):
+    """Adds items with add_fn once all their outer dims can be inserted."""
+    if self._is_py_buffer:
+      outer_shape = nest_utils.get_outer_array_shape(items, self._data_spec)
+      self._rate_limiter.await_insert(int(np.prod(outer_shape)))
+      return add_fn(items)
+    num_inserts = tf.reduce_prod(
+        input_tensor=nest_utils.get_outer_shape(items, self._data_spec))
+    allowed = self._await_op(self._rate_limiter.await_insert, num_inserts,
+                             'await_insert_py_func')
+    with tf.control_dependencies([allowed]):
+      return add_fn(items)
+
+  def _get_next(self,
+                sample_batch_size=None,
+                num_steps=None,
+                time_stacked=True):
+    num_samples = 1 if sample_batch_size is None else sample_batch_size
+    if self._is_py_buffer:
+      self._rate_limiter.await_sample(num_samples)
+      return self._buffer.get_next(sample_batch_size, num_steps, time_stacked)
+    allowed = self._await_op(self._rate_limiter.await_sample, num_samples,
+                             'await_sample_py_func')
+    with tf.control_dependencies([allowed]):
+      return self._buffer.get_next(sample_batch_size, num_steps, time_stacked)
+
+  def _as_dataset(self,
+                  sample_batch_size=None,
+                  num_steps=None,
+                  num_parallel_calls=None):
+    num_samples = 1 if sample_batch_size is None else sample_batch_size
+    allowed = tf.data.experimental.Counter().map(
+        lambda _: self._await_op(self._rate_limiter.await_sample, num_samples,
+                                 'await_sample_py_func'))
+    # Zipped datasets draw their elements in order, so that each element of the
+    # wrapped dataset is drawn once the rate limiter allowed it.
+    ds = tf.data.Dataset.zip((allowed, self._buffer.as_dataset(
+        sample_batch_size, num_steps, num_parallel_calls)))
+    return ds.map(lambda _, item: item)
+
+  def _gather_all(self):
+    return self._buffer.gather_all()
+
+  def _clear(self):
+    return self._buffer.clear()
@@ -0,0 +1,197 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.replay_buffers.rate_limiter."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pickle
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents import specs
+from tf_agents.replay_buffers import py_uniform_replay_buffer
+from tf_agents.replay_buffers import rate_limiter
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.specs import array_spec
+
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+class SamplesPerInsertRateLimiterTest(tf.test.TestCase):
+
+  def testInvalidErrorBuffer(self):
+    with self.assertRaisesRegexp(ValueError, 'error_buffer'):
+      rate_limiter.SamplesPerInsertRateLimiter(
+          samples_per_insert=4.0, error_buffer=1.0)
+
+  def testMinSizeToSample(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        min_size_to_sample=2, timeout=0.1)
+    limiter.await_insert()
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      limiter.await_sample()
+    limiter.await_insert()
+    limiter.await_sample(10)
+    self.assertEqual((2, 10), limiter.stats[:2])
+
+  def testBlocksSamples(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=2.0, min_size_to_sample=1, error_buffer=4.0,
+        timeout=0.1)
+    limiter.await_insert(3)
+    # 3 inserts allow 3 * 2 samples, plus error_buffer - 1 * 2.
+    limiter.await_sample(8)
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      limiter.await_sample()
+    limiter.await_insert()
+    limiter.await_sample(2)
+
+  def testBlocksInserts(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=0.5, min_size_to_sample=2, error_buffer=1.0,
+        timeout=0.1)
+    # 4 inserts are allowed without any sample: 4 * 0.5 - 0 <= 2 * 0.5 + 1.
+    limiter.await_insert(4)
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      limiter.await_insert()
+    limiter.await_sample()
+    limiter.await_insert(2)
+
+  def testStats(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=1.0, timeout=0.1)
+    self.assertEqual(rate_limiter.RateLimiterStats(0, 0, 0.0, 0.0),
+                     limiter.stats)
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      limiter.await_sample()
+    limiter.await_insert(2)
+
+    stats = limiter.stats
+    self.assertEqual(2, stats.num_inserts)
+    self.assertEqual(0, stats.num_samples)
+    self.assertEqual(0.0, stats.insert_blocked_seconds)
+    self.assertGreater(stats.sample_blocked_seconds, 0.05)
+
+  def testConcurrentInsertsAndSamples(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=4.0, min_size_to_sample=10, error_buffer=8.0)
+    diffs = []
+
+    def insert():
+      for _ in range(100):
+        limiter.await_insert()
+
+    def sample():
+      for _ in range(90):
+        limiter.await_sample(4)
+        stats = limiter.stats
+        diffs.append(stats.num_inserts * 4.0 - stats.num_samples)
+        time.sleep(0.001)
+
+    threads = [threading.Thread(target=insert), threading.Thread(target=sample)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual((100, 360), limiter.stats[:2])
+    # The samples stay within error_buffer of the target, up to the inserts
+    # that happened since they were allowed.
+    self.assertGreaterEqual(min(diffs), 10 * 4.0 - 8.0)
+    self.assertGreater(limiter.stats.insert_blocked_seconds, 0.0)
+
+  def testCloseUnblocksSamples(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(min_size_to_sample=1)
+    errors = []
+
+    def sample():
+      try:
+        limiter.await_sample()
+      except RuntimeError as e:
+        errors.append(e)
+
+    thread = threading.Thread(target=sample)
+    thread.start()
+    time.sleep(0.05)
+    limiter.close()
+    thread.join()
+    self.assertEqual(1, len(errors))
+    self.assertIn('closed', str(errors[0]))
+    with self.assertRaisesRegexp(RuntimeError, 'closed'):
+      limiter.await_sample()
+
+  def testPickle(self):
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=1.0, timeout=0.1)
+    limiter.await_insert()
+    limiter = pickle.loads(pickle.dumps(limiter))
+    self.assertEqual(1, limiter.stats.num_inserts)
+    limiter.await_sample()
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      limiter.await_sample()
+
+
+class RateLimitedReplayBufferTest(tf.test.TestCase):
+
+  def testPyReplayBuffer(self):
+    spec = array_spec.ArraySpec([2], np.float32)
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=2.0, timeout=0.1)
+    replay_buffer = rate_limiter.RateLimitedReplayBuffer(
+        py_uniform_replay_buffer.PyUniformReplayBuffer(spec, capacity=10),
+        limiter)
+
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      replay_buffer.get_next()
+    replay_buffer.add_batch(np.ones([1, 2], dtype=np.float32))
+    self.assertAllEqual([[1., 1.], [1., 1.]],
+                        replay_buffer.get_next(sample_batch_size=2))
+    with self.assertRaisesRegexp(RuntimeError, 'Timed out'):
+      replay_buffer.get_next()
+    self.assertEqual((1, 2), limiter.stats[:2])
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testTFReplayBuffer(self):
+    spec = specs.TensorSpec([2], tf.float32, 'observation')
+    limiter = rate_limiter.SamplesPerInsertRateLimiter(
+        samples_per_insert=1.0, error_buffer=4.0)
+    replay_buffer = rate_limiter.RateLimitedReplayBuffer(
+        tf_uniform_replay_buffer.TFUniformReplayBuffer(
+            spec, batch_size=2, max_length=10), limiter)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    add_op = replay_buffer.add_batch(tf.ones([2, 2]))
+    self.evaluate(add_op)
+    self.assertEqual(2, limiter.stats.num_inserts)
+
+    sample, _ = replay_buffer.get_next(sample_batch_size=3)
+    self.assertAllEqual(np.ones([3, 2]), self.evaluate(sample))
+    self.assertEqual(3, limiter.stats.num_samples)
+
+    dataset = replay_buffer.as_dataset(sample_batch_size=2)
+    iterator = tf.compat.v1.data.make_one_shot_iterator(dataset)
+    sample, _ = iterator.get_next()
+    self.assertAllEqual(np.ones([2, 2]), self.evaluate(sample))
+    self.assertEqual(5, limiter.stats.num_samples)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -64,6 +64,24 @@ class ReplayBuffer(tf.Module):
     """
     return self._add_batch(items)
 
+  def add_sequence(self, items):
+    """Adds a batch of sequences of items to the replay buffer.
+
+    Equivalent to calling `add_batch` with `items[:, t]` for each time step t,
+    in order, but buffers supporting it write all the steps at once.
+
+    Args:
+      items: An item or list/tuple/nest of items to be added to the replay
+        buffer. `items` must match the data_spec of this class, with batch_size
+        and num_steps dimensions added to the beginning of each tensor/array.
+    Returns:
+      Adds `items` to the replay buffer.
+    Raises:
+      NotImplementedError: If the replay buffer does not support adding
+        sequences.
+    """
+    return self._add_sequence(items)
+
   def get_next(self,
                sample_batch_size=None,
                num_steps=None,
@@ -192,3 +210,8 @@ class ReplayBuffer(tf.Module):
   def _clear(self):
     """Clears the replay buffer."""
 
+  # Subclasses may implement these methods.
+  def _add_sequence(self, items):
+    """Adds a batch of sequences of items to the replay buffer."""
+    raise NotImplementedError(
+        '{} does not support add_sequence.'.format(type(self).__name__))
@@ -0,0 +1,574 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A replay buffer hosted in a separate process, shared by local clients.
+
+`ReplayServer` creates a Python replay buffer (e.g. a `PyUniformReplayBuffer`)
+in an external process, and serves it over a local socket. Any number of
+`ReplayClient`s, possibly in different processes (e.g. several collectors and a
+learner on the same machine), can connect to it and use it as a regular
+`ReplayBuffer`:
+
+  server = replay_service.ReplayServer(
+      functools.partial(py_uniform_replay_buffer.PyUniformReplayBuffer,
+                        data_spec, capacity),
+      rate_limiter=rate_limiter.SamplesPerInsertRateLimiter(
+          samples_per_insert=8.0, min_size_to_sample=1000))
+  server.start()
+
+  # In the collectors.
+  client = replay_service.ReplayClient(server.address, insert_batch_size=32)
+  client.add_batch(items)
+
+  # In the learner.
+  client = replay_service.ReplayClient(server.address, prefetch_size=4)
+  dataset = client.as_dataset(sample_batch_size=64, num_steps=2)
+
+The server can optionally hold the ratio between the number of sampled items
+and the number of inserted items close to a target with a rate limiter, see
+`rate_limiter.SamplesPerInsertRateLimiter`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import atexit
+import multiprocessing
+from multiprocessing import connection
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from absl import logging
+from six.moves import queue
+import tensorflow as tf
+
+from tf_agents.replay_buffers import replay_buffer
+from tf_agents.specs import array_spec
+from tf_agents.utils import nest_utils
+
+
+# Message types for the communication with the server.
+_READY = 1
+_INFO = 2
+_ADD = 3
+_SAMPLE = 4
+_GATHER_ALL = 5
+_CLEAR = 6
+_RESULT = 7
+_EXCEPTION = 8
+_CLOSE = 9
+_STATS = 10
+
+
+class ReplayServer(object):
+  """Hosts a Python replay buffer in a separate process."""
+
+  def __init__(self,
+               buffer_constructor,
+               address=None,
+               authkey=None,
+               rate_limiter=None):
+    """Creates a ReplayServer.
+
+    The buffer is created in an external process by calling the provided
+    callable, which should not access global variables.
+
+    Args:
+      buffer_constructor: Callable that creates and returns a Python replay
+        buffer (e.g. a `PyUniformReplayBuffer`), whose `add_batch` accepts
+        batches of a single item.
+      address: Optional address to listen on, see
+        `multiprocessing.connection.Listener`. If None (default), a free local
+        socket is used, see `address`.
+      authkey: Optional bytes used to authenticate the clients.
+      rate_limiter: Optional `SamplesPerInsertRateLimiter` blocking the inserts
+        and samples of all the clients. It is copied to the server process, see
+        `ReplayClient.rate_limiter_stats` for its stats. If None (default),
+        inserts and samples are never blocked.
+    """
+    self._buffer_constructor = buffer_constructor
+    self._requested_address = address
+    self._authkey = authkey
+    self._rate_limiter = rate_limiter
+    self._address = None
+    self._conn = None
+    self._process = None
+
+  @property
+  def address(self):
+    """The address clients connect to, available once the server started."""
+    return self._address
+
+  @property
+  def authkey(self):
+    return self._authkey
+
+  def start(self):
+    """Starts the server process and waits for it to listen for clients."""
+    self._conn, conn = multiprocessing.Pipe()
+    self._process = multiprocessing.Process(
+        target=_serve,
+        args=(conn, self._buffer_constructor, self._requested_address,
+              self._authkey, self._rate_limiter))
+    atexit.register(self.close)
+    self._process.start()
+    message, payload = self._conn.recv()
+    if message == _EXCEPTION:
+      self._conn.close()
+      self._process.join(5)
+      self._process = None
+      _unregister_atexit(self.close)
+      raise Exception(payload)
+    assert message == _READY, message
+    self._address = payload
+
+  def close(self):
+    """Stops the server process, disconnecting all its clients.
+
+    Requests blocked by the rate limiter are answered with an error first.
+    """
+    _unregister_atexit(self.close)
+    if self._process is None:
+      return
+    try:
+      self._conn.send((_CLOSE, None))
+      self._conn.close()
+    except IOError:
+      # The connection was already closed.
+      pass
+    self._process.join(5)
+    if self._process.is_alive():
+      logging.warning('Replay server process did not stop in 5 seconds, '
+                      'terminating it.')
+      self._process.terminate()
+      self._process.join()
+    self._process = None
+
+
+class ReplayClient(replay_buffer.ReplayBuffer):
+  """A replay buffer backed by the buffer of a `ReplayServer`.
+
+  Items added with `add_batch` are sent to the server in batches of
+  `insert_batch_size` items, see `flush`. `get_next`, `gather_all` and `clear`
+  are forwarded to the server buffer, and `as_dataset` samples the server from
+  a background thread, keeping up to `prefetch_size` samples ready.
+
+  All methods are thread safe. Note that a client blocked by the rate limiter
+  of the server on an insert (resp. a sample) blocks the other threads using
+  the same client, so collectors and learners should use separate clients.
+  """
+
+  def __init__(self, address, authkey=None, insert_batch_size=1,
+               prefetch_size=1):
+    """Creates a ReplayClient, connected to the server at `address`.
+
+    Args:
+      address: Address of the server, see `ReplayServer.address`.
+      authkey: Optional bytes used to authenticate with the server.
+      insert_batch_size: Number of items to accumulate before sending them to
+        the server.
+      prefetch_size: Number of samples of `as_dataset` to request ahead of
+        time. If 0, samples are requested when the dataset is iterated.
+    """
+    self._address = address
+    self._authkey = authkey
+    self._insert_batch_size = insert_batch_size
+    self._prefetch_size = prefetch_size
+    self._lock = threading.Lock()
+    self._conn = _Connection(address, authkey)
+    data_spec, capacity = self._conn.request(_INFO)
+    super(ReplayClient, self).__init__(data_spec, capacity)
+    self._pending_items = []
+    self._prefetchers = set()
+
+  def flush(self):
+    """Sends the items added since the last flush to the server."""
+    with self._lock:
+      self._flush()
+
+  def close(self):
+    """Sends the pending items and disconnects from the server.
+
+    The prefetchers of the datasets created by `as_dataset` are stopped, and
+    their datasets raise on the next element.
+    """
+    with self._lock:
+      prefetchers, self._prefetchers = self._prefetchers, set()
+    for prefetcher in prefetchers:
+      prefetcher.stop()
+    with self._lock:
+      self._flush()
+      self._conn.close()
+
+  def rate_limiter_stats(self):
+    """Returns the `RateLimiterStats` of the server, or None."""
+    with self._lock:
+      return self._conn.request(_STATS)
+
+  def _flush(self):
+    if self._pending_items:
+      items, self._pending_items = self._pending_items, []
+      self._conn.request(_ADD, items)
+
+  def _add_batch(self, items):
+    self._add_items(nest_utils.unstack_nested_arrays(items))
+
+  def _add_sequence(self, items):
+    # Items are added sequence after sequence.
+    self._add_items([
+        item for sequence in nest_utils.unstack_nested_arrays(items)  # pylint: disable=g-complex-comprehension
+        for item in nest_utils.unstack_nested_arrays(sequence)
+    ])
+
+  def _add_items(self, items):
+    with self._lock:
+      self._pending_items.extend(items)
+      if len(self._pending_items) >= self._insert_batch_size:
+        self._flush()
+
+  def _get_next(self,
+                sample_batch_size=None,
+                num_steps=None,
+                time_stacked=True):
+    with self._lock:
+      return self._conn.request(
+          _SAMPLE, (sample_batch_size, num_steps, time_stacked))
+
+  def _as_dataset(self, sample_batch_size=None, num_steps=None,
+                  num_parallel_calls=None):
+    if num_parallel_calls is not None:
+      raise NotImplementedError('ReplayClient does not support '
+                                'num_parallel_calls (must be None).')
+
+    data_spec = self._data_spec
+    if sample_batch_size is not None:
+      data_spec = array_spec.add_outer_dims_nest(
+          data_spec, (sample_batch_size,))
+    if num_steps is not None:
+      data_spec = (data_spec,) * num_steps
+    shapes = tuple(s.shape for s in tf.nest.flatten(data_spec))
+    dtypes = tuple(s.dtype for s in tf.nest.flatten(data_spec))
+    request = (sample_batch_size, num_steps, False)
+
+    def generator_fn():
+      if not self._prefetch_size:
+        while True:
+          yield tuple(tf.nest.flatten(self._get_next(*request)))
+      else:
+        prefetcher = _Prefetcher(self._address, self._authkey, request,
+                                 self._prefetch_size)
+        with self._lock:
+          self._prefetchers.add(prefetcher)
+        try:
+          while True:
+            yield tuple(tf.nest.flatten(prefetcher.get()))
+        finally:
+          with self._lock:
+            self._prefetchers.discard(prefetcher)
+          prefetcher.stop()
+
+    def time_stack(*structures):
+      time_axis = 0 if sample_batch_size is None else 1
+      return tf.nest.map_structure(
+          lambda *elements: tf.stack(elements, axis=time_axis), *structures)
+
+    ds = tf.data.Dataset.from_generator(
+        generator_fn, dtypes,
+        shapes).map(lambda *items: tf.nest.pack_sequence_as(data_spec, items))
+    if num_steps is not None:
+      return ds.map(time_stack)
+    else:
+      return ds
+
+  def _gather_all(self):
+    with self._lock:
+      self._flush()
+      return self._conn.request(_GATHER_ALL)
+
+  def _clear(self):
+    with self._lock:
+      self._pending_items = []
+      self._conn.request(_CLEAR)
+
+
+class _Connection(object):
+  """A client connection to a ReplayServer."""
+
+  def __init__(self, address, authkey=None):
+    self._conn = connection.Client(address, authkey=authkey)
+
+  def request(self, message, payload=None):
+    """Sends a request to the server and returns the result.
+
+    Args:
+      message: Message type of the request.
+      payload: Payload of the request.
+
+    Raises:
+      Exception: An exception was raised by the server.
+      KeyError: The received message is of an unknown type.
+
+    Returns:
+      Payload of the result.
+    """
+    self._conn.send((message, payload))
+    message, payload = self._conn.recv()
+    # Re-raise exceptions of the server in the client.
+    if message == _EXCEPTION:
+      raise Exception(payload)
+    if message == _RESULT:
+      return payload
+    self.close()
+    raise KeyError('Received message of unexpected type {}'.format(message))
+
+  def close(self):
+    try:
+      self._conn.close()
+    except IOError:
+      # The connection was already closed.
+      pass
+
+  def shutdown(self):
+    """Unblocks the threads waiting on the connection, with an EOFError.
+
+    Unlike `close`, which does not interrupt a pending `request`, shutting down
+    the socket makes it return. The connection must still be closed.
+    """
+    try:
+      sock = socket.fromfd(self._conn.fileno(), socket.AF_INET,
+                           socket.SOCK_STREAM)
+    except (IOError, OSError):
+      # The connection was already closed, or is not a socket.
+      return
+    try:
+      sock.shutdown(socket.SHUT_RDWR)
+    except (IOError, OSError):
+      pass
+    finally:
+      sock.close()
+
+
+class _Prefetcher(object):
+  """Samples a ReplayServer from a background thread."""
+
+  def __init__(self, address, authkey, request, prefetch_size):
+    self._conn = _Connection(address, authkey)
+    self._request = request
+    self._queue = queue.Queue(maxsize=prefetch_size)
+    self._stopped = threading.Event()
+    self._thread = threading.Thread(target=self._run)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def get(self):
+    """Returns the next sample, re-raising the errors of the thread."""
+    while True:
+      try:
+        item, error = self._queue.get(timeout=0.1)
+        break
+      except queue.Empty:
+        if self._stopped.is_set():
+          raise RuntimeError('The replay client was closed.')
+    if error is not None:
+      raise error
+    return item
+
+  def stop(self, timeout=5):
+    """Stops the thread, interrupting its pending request.
+
+    Args:
+      timeout: Number of seconds to wait for the thread to stop. The thread is
+        a daemon, so it does not prevent exiting if it is still blocked.
+    """
+    self._stopped.set()
+    self._conn.shutdown()
+    self._thread.join(timeout)
+    if self._thread.is_alive():
+      logging.warning('Replay prefetcher thread did not stop in %s seconds.',
+                      timeout)
+    self._conn.close()
+
+  def _put(self, item, error=None):
+    while not self._stopped.is_set():
+      try:
+        self._queue.put((item, error), timeout=0.1)
+        return
+      except queue.Full:
+        continue
+
+  def _run(self):
+    try:
+      while not self._stopped.is_set():
+        self._put(self._conn.request(_SAMPLE, self._request))
+    except Exception as e:  # pylint: disable=broad-except
+      self._put(None, e)
+
+
+def _unregister_atexit(func):
+  # atexit.unregister is not available in Python 2, where the function stays
+  # registered and is a no-op once the server is closed.
+  if hasattr(atexit, 'unregister'):
+    atexit.unregister(func)
+
+
+def _serve(conn, buffer_constructor, address, authkey, rate_limiter):
+  """Serves a replay buffer until a close message is received on conn.
+
+  Args:
+    conn: Connection for communication to the process owning the server.
+    buffer_constructor: Callable that creates the replay buffer.
+    address: Address to listen on.
+    authkey: Optional bytes used to authenticate the clients.
+    rate_limiter: Optional `SamplesPerInsertRateLimiter`.
+  """
+  try:
+    buffer = buffer_constructor()
+    listener = connection.Listener(address, authkey=authkey)
+    in_flight = _InFlightRequests()
+    accept_thread = threading.Thread(
+        target=_accept_clients,
+        args=(listener, buffer, rate_limiter, in_flight))
+    accept_thread.daemon = True
+    accept_thread.start()
+    conn.send((_READY, listener.address))
+    while True:
+      try:
+        # Only block for short times to have keyboard exceptions be raised.
+        if not conn.poll(0.1):
+          continue
+        message, payload = conn.recv()
+      except (EOFError, KeyboardInterrupt):
+        break
+      if message == _CLOSE:
+        assert payload is None
+        break
+      raise KeyError('Received message of unknown type {}'.format(message))
+    listener.close()
+    # Answer the requests blocked by the rate limiter with an error, rather
+    # than leaving their clients waiting for the process to exit.
+    if rate_limiter is not None:
+      rate_limiter.close()
+    in_flight.wait(timeout=1.0)
+  except Exception:  # pylint: disable=broad-except
+    etype, evalue, tb = sys.exc_info()
+    stacktrace = ''.join(traceback.format_exception(etype, evalue, tb))
+    logging.error('Error in replay server process: %s', stacktrace)
+    conn.send((_EXCEPTION, stacktrace))
+  finally:
+    conn.close()
+
+
+class _InFlightRequests(object):
+  """Counts the client requests being handled by the server."""
+
+  def __init__(self):
+    self._condition = threading.Condition()
+    self._count = 0
+
+  def __enter__(self):
+    with self._condition:
+      self._count += 1
+
+  def __exit__(self, *unused_exc_info):
+    with self._condition:
+      self._count -= 1
+      self._condition.notify_all()
+
+  def wait(self, timeout):
+    """Waits up to `timeout` seconds for the requests being handled."""
+    deadline = time.time() + timeout
+    with self._condition:
+      while self._count:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          return
+        self._condition.wait(remaining)
+
+
+def _accept_clients(listener, buffer, rate_limiter, in_flight):
+  """Serves each client connecting to listener from its own thread."""
+  while True:
+    try:
+      client_conn = listener.accept()
+    except (IOError, OSError):
+      # The listener was closed.
+      return
+    except connection.AuthenticationError:
+      logging.warning('Rejected a replay client failing to authenticate.')
+      continue
+    thread = threading.Thread(
+        target=_serve_client,
+        args=(client_conn, buffer, rate_limiter, in_flight))
+    thread.daemon = True
+    thread.start()
+
+
+def _serve_client(conn, buffer, rate_limiter, in_flight):
+  """Handles the requests of a client until it disconnects."""
+
+  def add(items):
+    if rate_limiter is not None:
+      rate_limiter.await_insert(len(items))
+    for item in items:
+      buffer.add_batch(nest_utils.batch_nested_array(item))
+
+  def sample(sample_batch_size, num_steps, time_stacked):
+    if rate_limiter is not None:
+      num_samples = 1 if sample_batch_size is None else sample_batch_size
+      rate_limiter.await_sample(num_samples)
+    return buffer.get_next(sample_batch_size, num_steps, time_stacked)
+
+  def stats():
+    return None if rate_limiter is None else rate_limiter.stats
+
+  def handle(message, payload):
+    if message == _INFO:
+      return (buffer.data_spec, buffer.capacity)
+    elif message == _ADD:
+      return add(payload)
+    elif message == _SAMPLE:
+      return sample(*payload)
+    elif message == _GATHER_ALL:
+      return buffer.gather_all()
+    elif message == _CLEAR:
+      return buffer.clear()
+    elif message == _STATS:
+      return stats()
+    raise KeyError('Received message of unknown type {}'.format(message))
+
+  try:
+    while True:
+      try:
+        message, payload = conn.recv()
+      except (EOFError, IOError):
+        break
+      with in_flight:
+        try:
+          response = (_RESULT, handle(message, payload))
+        except Exception:  # pylint: disable=broad-except
+          etype, evalue, tb = sys.exc_info()
+          stacktrace = ''.join(traceback.format_exception(etype, evalue, tb))
+          response = (_EXCEPTION, stacktrace)
+        try:
+          conn.send(response)
+        except IOError:
+          # The client disconnected, e.g. a stopped prefetcher.
+          break
+  finally:
+    conn.close()
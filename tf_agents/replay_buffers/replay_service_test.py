@@ -0,0 +1,253 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.replay_buffers.replay_service."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.replay_buffers import py_uniform_replay_buffer
+from tf_agents.replay_buffers import rate_limiter
+from tf_agents.replay_buffers import replay_service
+from tf_agents.specs import array_spec
+
+
+class ReplayServiceTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ReplayServiceTest, self).setUp()
+    self._data_spec = {
+        'observation': array_spec.ArraySpec([2], np.float32),
+        'step': array_spec.ArraySpec([], np.int64)
+    }
+    self._servers = []
+
+  def tearDown(self):
+    for server in self._servers:
+      server.close()
+    super(ReplayServiceTest, self).tearDown()
+
+  def _start_server(self, capacity=10, **rate_limiter_kwargs):
+    limiter = None
+    if rate_limiter_kwargs:
+      limiter = rate_limiter.SamplesPerInsertRateLimiter(**rate_limiter_kwargs)
+    server = replay_service.ReplayServer(
+        functools.partial(py_uniform_replay_buffer.PyUniformReplayBuffer,
+                          self._data_spec, capacity),
+        rate_limiter=limiter)
+    server.start()
+    self._servers.append(server)
+    return server
+
+  def _items(self, steps):
+    steps = np.array(steps, dtype=np.int64)
+    return {
+        'observation': np.stack([steps, -steps], axis=-1).astype(np.float32),
+        'step': steps
+    }
+
+  def testDataSpecAndCapacity(self):
+    server = self._start_server(capacity=7)
+    client = replay_service.ReplayClient(server.address)
+    self.assertEqual(self._data_spec, client.data_spec)
+    self.assertEqual(7, client.capacity)
+    client.close()
+
+  def testAddBatchGetNext(self):
+    server = self._start_server()
+    client = replay_service.ReplayClient(server.address)
+    client.add_batch(self._items([1, 2, 3]))
+
+    sample = client.get_next(sample_batch_size=5)
+    self.assertAllEqual([5, 2], sample['observation'].shape)
+    for step, observation in zip(sample['step'], sample['observation']):
+      self.assertIn(step, [1, 2, 3])
+      self.assertAllEqual([step, -step], observation)
+    client.close()
+
+  def testInsertBatching(self):
+    server = self._start_server(timeout=0.5)
+    collector = replay_service.ReplayClient(server.address,
+                                            insert_batch_size=3)
+    learner = replay_service.ReplayClient(server.address)
+
+    collector.add_batch(self._items([1, 2]))
+    # The items are still pending in the collector.
+    with self.assertRaisesRegexp(Exception, 'Timed out'):
+      learner.get_next()
+
+    collector.add_batch(self._items([3]))
+    self.assertIn(learner.get_next()['step'], [1, 2, 3])
+
+    collector.add_batch(self._items([4]))
+    collector.flush()
+    self.assertIn(4, learner.gather_all()['step'][0])
+    collector.close()
+    learner.close()
+
+  def testSamplesPerInsertBlocksSamples(self):
+    server = self._start_server(
+        samples_per_insert=2.0, min_size_to_sample=2, timeout=0.5)
+    collector = replay_service.ReplayClient(server.address)
+    learner = replay_service.ReplayClient(server.address)
+
+    with self.assertRaisesRegexp(Exception, 'Timed out'):
+      learner.get_next()
+    collector.add_batch(self._items([1, 2]))
+    # Reaching min_size_to_sample allows error_buffer samples, and each
+    # following insert samples_per_insert more.
+    learner.get_next(sample_batch_size=2)
+    with self.assertRaisesRegexp(Exception, 'Timed out'):
+      learner.get_next()
+
+    collector.add_batch(self._items([3]))
+    learner.get_next(sample_batch_size=2)
+    collector.close()
+    learner.close()
+
+  def testSamplesPerInsertBlocksInserts(self):
+    server = self._start_server(
+        samples_per_insert=1.0, min_size_to_sample=1, error_buffer=2.0,
+        timeout=0.5)
+    collector = replay_service.ReplayClient(server.address)
+    learner = replay_service.ReplayClient(server.address)
+
+    # 3 inserts are allowed without any sample: 3 * 1 - 0 <= 1 * 1 + 2.
+    collector.add_batch(self._items([1, 2, 3]))
+    with self.assertRaisesRegexp(Exception, 'Timed out'):
+      collector.add_batch(self._items([4]))
+
+    learner.get_next()
+    collector.add_batch(self._items([5]))
+    collector.close()
+    learner.close()
+
+  def testRateLimiterStats(self):
+    server = self._start_server(samples_per_insert=1.0, timeout=0.5)
+    client = replay_service.ReplayClient(server.address)
+    with self.assertRaisesRegexp(Exception, 'Timed out'):
+      client.get_next()
+    client.add_batch(self._items([1, 2]))
+    client.get_next()
+
+    stats = client.rate_limiter_stats()
+    self.assertEqual(2, stats.num_inserts)
+    self.assertEqual(1, stats.num_samples)
+    self.assertEqual(0.0, stats.insert_blocked_seconds)
+    self.assertGreater(stats.sample_blocked_seconds, 0.25)
+    client.close()
+
+  def testNoRateLimiterStats(self):
+    server = self._start_server()
+    client = replay_service.ReplayClient(server.address)
+    self.assertIsNone(client.rate_limiter_stats())
+    client.close()
+
+  def testServerErrorsAreRaised(self):
+    server = self._start_server()
+    client = replay_service.ReplayClient(server.address)
+    with self.assertRaisesRegexp(Exception, 'ValueError'):
+      client.add_batch({
+          'observation': np.zeros([1, 3], dtype=np.float32),
+          'step': np.ones([1], dtype=np.int64)
+      })
+      client.flush()
+    client.close()
+
+  def testGatherAllAndClear(self):
+    server = self._start_server(capacity=3)
+    client = replay_service.ReplayClient(server.address, insert_batch_size=10)
+    client.add_batch(self._items([1, 2, 3]))
+
+    self.assertAllEqual([[1, 2, 3]], client.gather_all()['step'])
+    client.clear()
+    client.add_batch(self._items([4]))
+    self.assertEqual(4, client.gather_all()['step'][0, 0])
+    client.close()
+
+  def testAsDataset(self):
+    server = self._start_server()
+    client = replay_service.ReplayClient(server.address, prefetch_size=2)
+    client.add_batch(self._items(range(5)))
+    client.flush()
+
+    ds = client.as_dataset(sample_batch_size=4, num_steps=2)
+    get_next = tf.compat.v1.data.make_one_shot_iterator(ds).get_next()
+    for _ in range(5):
+      sample = self.evaluate(get_next)
+      self.assertAllEqual([4, 2, 2], sample['observation'].shape)
+      self.assertAllEqual(sample['step'][:, 0] + 1, sample['step'][:, 1])
+    client.close()
+
+
+  def testServerCloseAnswersBlockedSamples(self):
+    server = self._start_server(min_size_to_sample=1)
+    client = replay_service.ReplayClient(server.address)
+    errors = []
+
+    def sample():
+      try:
+        client.get_next()
+      except Exception as e:  # pylint: disable=broad-except
+        errors.append(e)
+
+    thread = threading.Thread(target=sample)
+    thread.start()
+    time.sleep(0.5)
+    server.close()
+    thread.join(5)
+    self.assertFalse(thread.is_alive())
+    self.assertIn('rate limiter was closed', str(errors[0]))
+
+  def testCloseStopsServerProcess(self):
+    server = self._start_server()
+    process = server._process
+    server.close()
+    self.assertFalse(process.is_alive())
+    # Closing again, e.g. at exit, is a no-op.
+    server.close()
+
+  def testCloseStopsPrefetchers(self):
+    server = self._start_server(min_size_to_sample=1)
+    client = replay_service.ReplayClient(server.address, prefetch_size=1)
+    get_next = tf.compat.v1.data.make_one_shot_iterator(
+        client.as_dataset()).get_next()
+    errors = []
+
+    def sample():
+      try:
+        self.evaluate(get_next)
+      except tf.errors.OpError as e:
+        errors.append(e)
+
+    thread = threading.Thread(target=sample)
+    thread.start()
+    time.sleep(0.5)
+    client.close()
+    thread.join(5)
+    self.assertFalse(thread.is_alive())
+    self.assertIn('replay client was closed', str(errors[0]))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,172 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Observers adding items to a replay buffer several time steps at a time.
+
+Adding each step to a replay buffer with `add_batch` pays the overhead of a
+write (e.g. reserving ids in a critical section and scattering to every table
+of a `TFUniformReplayBuffer`) once per step. These observers accumulate
+`sequence_length` steps locally, and add them with a single `add_sequence`:
+
+  observer = sequence_observer.TFSequenceObserver(
+      replay_buffer, batch_size=env.batch_size, sequence_length=16)
+  driver = dynamic_step_driver.DynamicStepDriver(
+      env, policy, observers=[observer], num_steps=collect_steps)
+
+Accumulated steps are not visible in the replay buffer until they are added,
+see `flush`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gin
+import numpy as np
+import tensorflow as tf
+
+from tf_agents.utils import common
+
+
+@gin.configurable
+class TFSequenceObserver(tf.Module):
+  """Accumulates batches of items, adding them to a TF replay buffer."""
+
+  def __init__(self,
+               replay_buffer,
+               batch_size,
+               sequence_length,
+               scope='TFSequenceObserver'):
+    """Creates a TFSequenceObserver.
+
+    Args:
+      replay_buffer: A TF `ReplayBuffer` supporting `add_sequence`, e.g. a
+        `TFUniformReplayBuffer`.
+      batch_size: Batch dimension of the observed items.
+      sequence_length: Number of steps to accumulate before adding them.
+      scope: Scope prefix for variables and ops created by this class.
+    """
+    super(TFSequenceObserver, self).__init__(name=scope)
+    self._replay_buffer = replay_buffer
+    self._batch_size = batch_size
+    self._sequence_length = sequence_length
+
+    def _create_staging(spec):
+      # Time major, so that each step is written with a single scatter.
+      shape = [sequence_length, batch_size] + spec.shape.as_list()
+      return common.create_variable(
+          name=spec.name or 'staging',
+          initializer=tf.zeros(shape, dtype=spec.dtype),
+          shape=None,
+          dtype=spec.dtype)
+
+    with tf.compat.v1.variable_scope(scope):
+      self._staging = tf.nest.map_structure(_create_staging,
+                                            replay_buffer.data_spec)
+      self._num_steps = common.create_variable('num_steps', 0)
+
+  @property
+  def sequence_length(self):
+    return self._sequence_length
+
+  def variables(self):
+    return tf.nest.flatten(self._staging) + [self._num_steps]
+
+  def __call__(self, items):
+    """Accumulates a batch of items, adding the sequence once it is complete.
+
+    Args:
+      items: A batch of items matching the data_spec of the replay buffer, with
+        shape [batch_size, data_spec, ...].
+
+    Returns:
+      The number of steps accumulated after adding items.
+    """
+    tf.nest.assert_same_structure(items, self._replay_buffer.data_spec)
+    step = self._num_steps.value()
+    write_ops = [
+        tf.compat.v1.scatter_update(staging, step, item).op for staging, item
+        in zip(tf.nest.flatten(self._staging), tf.nest.flatten(items))
+    ]
+    with tf.control_dependencies(write_ops):
+      num_steps = self._num_steps.assign_add(1)
+
+    return tf.cond(
+        pred=num_steps >= self._sequence_length,
+        true_fn=lambda: self._add_staged(self._sequence_length),
+        false_fn=lambda: tf.identity(num_steps))
+
+  def flush(self):
+    """Adds the steps accumulated so far to the replay buffer.
+
+    Returns:
+      The number of steps accumulated after flushing, i.e. 0.
+    """
+    num_steps = self._num_steps.value()
+    return tf.cond(
+        pred=num_steps > 0,
+        true_fn=lambda: self._add_staged(num_steps),
+        false_fn=lambda: tf.identity(num_steps))
+
+  def _add_staged(self, num_steps):
+    def _batch_major(staging):
+      staged = staging.value()[:num_steps]
+      perm = [1, 0] + list(range(2, staged.shape.ndims))
+      return tf.transpose(a=staged, perm=perm)
+
+    add_op = self._replay_buffer.add_sequence(
+        tf.nest.map_structure(_batch_major, self._staging))
+    with tf.control_dependencies([add_op]):
+      return tf.identity(self._num_steps.assign(0))
+
+
+@gin.configurable
+class PySequenceObserver(object):
+  """Accumulates batches of items, adding them to a Python replay buffer."""
+
+  def __init__(self, replay_buffer, sequence_length):
+    """Creates a PySequenceObserver.
+
+    Args:
+      replay_buffer: A Python `ReplayBuffer` supporting `add_sequence`, e.g. a
+        `PyUniformReplayBuffer`.
+      sequence_length: Number of steps to accumulate before adding them.
+    """
+    self._replay_buffer = replay_buffer
+    self._sequence_length = sequence_length
+    self._items = []
+
+  @property
+  def sequence_length(self):
+    return self._sequence_length
+
+  def __call__(self, items):
+    """Accumulates a batch of items, adding the sequence once it is complete.
+
+    Args:
+      items: A batch of items matching the data_spec of the replay buffer, with
+        shape [batch_size, data_spec, ...].
+    """
+    self._items.append(items)
+    if len(self._items) >= self._sequence_length:
+      self.flush()
+
+  def flush(self):
+    """Adds the steps accumulated so far to the replay buffer."""
+    if not self._items:
+      return
+    items, self._items = self._items, []
+    self._replay_buffer.add_sequence(
+        tf.nest.map_structure(lambda *steps: np.stack(steps, axis=1), *items))
@@ -0,0 +1,100 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.replay_buffers.sequence_observer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents import specs
+from tf_agents.replay_buffers import py_uniform_replay_buffer
+from tf_agents.replay_buffers import sequence_observer
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.specs import array_spec
+
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+class TFSequenceObserverTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testAddsSequences(self):
+    spec = {
+        'observation': specs.TensorSpec([2], tf.float32, 'observation'),
+        'step': specs.TensorSpec([], tf.int64, 'step')
+    }
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=2, max_length=10)
+    observer = sequence_observer.TFSequenceObserver(
+        replay_buffer, batch_size=2, sequence_length=3)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    for step in range(5):
+      items = {
+          'observation': tf.fill([2, 2], float(step)),
+          'step': tf.constant([step, 100 + step], dtype=tf.int64)
+      }
+      num_steps = self.evaluate(observer(items))
+      self.assertEqual((step + 1) % 3, num_steps)
+
+    # Only the first sequence of 3 steps was added.
+    items = self.evaluate(replay_buffer.gather_all())
+    self.assertAllEqual([[0, 1, 2], [100, 101, 102]], items['step'])
+    self.assertAllEqual([3, 2], items['observation'].shape[:2])
+
+    self.assertEqual(0, self.evaluate(observer.flush()))
+    items = self.evaluate(replay_buffer.gather_all())
+    self.assertAllEqual([list(range(5)), list(range(100, 105))],
+                        items['step'])
+    self.assertAllEqual(np.tile(np.arange(5.)[None, :, None], [2, 1, 2]),
+                        items['observation'])
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testFlushEmpty(self):
+    spec = specs.TensorSpec([], tf.int64, 'step')
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=1, max_length=10)
+    observer = sequence_observer.TFSequenceObserver(
+        replay_buffer, batch_size=1, sequence_length=3)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    self.assertEqual(0, self.evaluate(observer.flush()))
+    self.assertAllEqual([[]], self.evaluate(replay_buffer.gather_all()))
+
+
+class PySequenceObserverTest(tf.test.TestCase):
+
+  def testAddsSequences(self):
+    spec = array_spec.ArraySpec([], np.int64)
+    replay_buffer = py_uniform_replay_buffer.PyUniformReplayBuffer(
+        spec, capacity=5)
+    observer = sequence_observer.PySequenceObserver(
+        replay_buffer, sequence_length=3)
+
+    for step in range(5):
+      observer(np.array([step], dtype=np.int64))
+    self.assertAllEqual([0, 1, 2], replay_buffer.gather_all()[0, :3])
+    self.assertEqual(3, replay_buffer.size)
+
+    observer.flush()
+    self.assertAllEqual([[0, 1, 2, 3, 4]], replay_buffer.gather_all())
+
+
+if __name__ == '__main__':
+  tf.test.main()
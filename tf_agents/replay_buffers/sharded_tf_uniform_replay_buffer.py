@@ -0,0 +1,331 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A batched replay buffer split into independent TFUniformReplayBuffer shards.
+
+- Each shard has its own tables, last_id and critical section, so writes to
+different shards, and reads, do not serialize on a single critical section.
+- add_batch splits the batch evenly across the shards. Collectors running
+concurrently can instead each write to their own shard, see `shards`.
+- Sampling picks the shard of each sample proportionally to the number of items
+it holds, so that items are sampled uniformly across all shards, and reads all
+shards with a single partitioned gather.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tf_agents.replay_buffers import replay_buffer
+from tf_agents.replay_buffers import table
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+
+import gin.tf
+from tensorflow.python.data.util import nest as data_nest  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+@gin.configurable
+class ShardedTFUniformReplayBuffer(replay_buffer.ReplayBuffer):
+  """A TFUniformReplayBuffer split into shards with independent id counters."""
+
+  def __init__(self,
+               data_spec,
+               batch_size,
+               num_shards,
+               max_length=1000,
+               scope='ShardedTFUniformReplayBuffer',
+               device='cpu:*',
+               table_fn=table.Table,
+               episode_sampling=None):
+    """Creates a ShardedTFUniformReplayBuffer.
+
+    Args:
+      data_spec: A TensorSpec or a list/tuple/nest of TensorSpecs describing a
+        single item that can be stored in this buffer.
+      batch_size: Batch dimension of tensors when adding to buffer.
+      num_shards: Number of shards. Each shard stores
+        `batch_size / num_shards` batch segments.
+      max_length: The maximum number of items that can be stored in a single
+        batch segment of the buffer.
+      scope: Scope prefix for variables and ops created by this class.
+      device: A TensorFlow device to place the Variables and ops.
+      table_fn: Function to create tables `table_fn(data_spec, capacity)` that
+        can read/write nested tensors.
+      episode_sampling: Not supported, must be None. Episode boundaries are
+        tracked per shard, which the partitioned sampling does not account for.
+
+    Raises:
+      ValueError: If num_shards does not evenly divide batch_size, or if
+        episode_sampling is set.
+    """
+    if episode_sampling is not None:
+      raise ValueError(
+          'ShardedTFUniformReplayBuffer does not support episode_sampling: '
+          '{}'.format(episode_sampling))
+    if batch_size % num_shards:
+      raise ValueError(
+          'num_shards ({}) must evenly divide batch_size ({}).'.format(
+              num_shards, batch_size))
+    super(ShardedTFUniformReplayBuffer, self).__init__(
+        data_spec, batch_size * max_length)
+    self._batch_size = batch_size
+    self._num_shards = num_shards
+    self._shard_batch_size = batch_size // num_shards
+    self._max_length = max_length
+    self._scope = scope
+    self._device = device
+    self._shards = [
+        tf_uniform_replay_buffer.TFUniformReplayBuffer(
+            data_spec,
+            batch_size=self._shard_batch_size,
+            max_length=max_length,
+            scope='{}_shard{}'.format(scope, i),
+            device=device,
+            table_fn=table_fn) for i in range(num_shards)
+    ]
+
+  def variables(self):
+    return [v for shard in self._shards for v in shard.variables()]  # pylint: disable=g-complex-comprehension
+
+  @property
+  def device(self):
+    return self._device
+
+  @property
+  def scope(self):
+    return self._scope
+
+  @property
+  def shards(self):
+    """The `TFUniformReplayBuffer` shards, each with `batch_size / num_shards`.
+
+    Concurrent collectors can each add batches to their own shard, so that
+    their writes never contend with each other.
+    """
+    return self._shards
+
+  # Methods defined in ReplayBuffer base class
+
+  def _add_batch(self, items):
+    """Adds a batch of items to the replay buffer, split across the shards.
+
+    Args:
+      items: A tensor or list/tuple/nest of tensors representing a batch of
+      items to be added to the replay buffer. Each element of `items` must match
+      the data_spec of this class. Should be shape [batch_size, data_spec, ...]
+    Returns:
+      An op that adds `items` to the replay buffer.
+    """
+    return self._add_to_shards(items, lambda shard: shard.add_batch)
+
+  def _add_sequence(self, items):
+    """Adds a batch of sequences of items, split across the shards.
+
+    Args:
+      items: A tensor or list/tuple/nest of tensors representing a batch of
+      sequences of items to be added to the replay buffer. Should be shape
+      [batch_size, num_steps, data_spec, ...]
+    Returns:
+      An op that adds `items` to the replay buffer.
+    """
+    return self._add_to_shards(items, lambda shard: shard.add_sequence)
+
+  def _add_to_shards(self, items, add_fn):
+    """Splits items across the shards, adding them with add_fn(shard)."""
+    tf.nest.assert_same_structure(items, self._data_spec)
+
+    with tf.device(self._device), tf.name_scope(self._scope):
+      flat_splits = [
+          tf.split(t, self._num_shards) for t in tf.nest.flatten(items)
+      ]
+      add_ops = []
+      for i, shard in enumerate(self._shards):
+        shard_items = tf.nest.pack_sequence_as(
+            items, [splits[i] for splits in flat_splits])
+        add_ops.append(add_fn(shard)(shard_items))
+      return tf.group(*add_ops)
+
+  def _get_next(self,
+                sample_batch_size=None,
+                num_steps=None,
+                time_stacked=True):
+    """Returns an item or batch of items sampled uniformly from the buffer.
+
+    Args:
+      sample_batch_size: (Optional.) An optional batch_size to specify the
+        number of items to return. See get_next() documentation.
+      num_steps: (Optional.)  Optional way to specify that sub-episodes are
+        desired. See get_next() documentation.
+      time_stacked: Bool, when true and num_steps > 1 get_next on the buffer
+        would return the items stack on the time dimension. The outputs would be
+        [B, T, ..] if sample_batch_size is given or [T, ..] otherwise.
+    Returns:
+      A 2 tuple, containing:
+        - An item, sequence of items, or batch thereof sampled uniformly
+          from the buffer.
+        - BufferInfo NamedTuple, containing:
+          - The items' ids, within their shard.
+          - The sampling probability of each item.
+    """
+    num_samples = 1 if sample_batch_size is None else sample_batch_size
+    num_steps_value = 1 if num_steps is None else num_steps
+
+    with tf.device(self._device), tf.name_scope(self._scope):
+      with tf.name_scope('get_next'):
+        # Reads each shard's last id without entering its critical section, so
+        # that sampling does not serialize with the writers of every shard.
+        valid_ranges = [
+            shard.valid_range_ids(num_steps) for shard in self._shards
+        ]
+        min_ids = tf.stack([min_id for min_id, _ in valid_ranges])
+        max_ids = tf.stack([max_id for _, max_id in valid_ranges])
+        num_ids = max_ids - min_ids
+        total_num_ids = tf.reduce_sum(input_tensor=num_ids)
+        assert_nonempty = tf.compat.v1.assert_greater(
+            total_num_ids,
+            tf.constant(0, dtype=tf.int64),
+            message='ShardedTFUniformReplayBuffer is empty. Make sure to add '
+            'items before sampling the buffer.')
+        with tf.control_dependencies([assert_nonempty]):
+          probability = 1. / tf.cast(
+              total_num_ids * self._shard_batch_size, tf.float32)
+          # Sampling shards proportionally to the number of valid ids they
+          # hold makes items uniformly distributed across all shards.
+          shard_ids = tf.random.categorical(
+              tf.math.log([tf.cast(num_ids, tf.float32)]), num_samples,
+              dtype=tf.int32)[0]
+          id_offsets = tf.random.uniform(
+              [num_samples], maxval=tf.int64.max, dtype=tf.int64)
+          ids = tf.gather(min_ids, shard_ids) + tf.math.mod(
+              id_offsets, tf.gather(num_ids, shard_ids))
+          segments = tf.random.uniform(
+              [num_samples],
+              minval=0,
+              maxval=self._shard_batch_size,
+              dtype=tf.int64)
+
+        # Shape [num_samples, num_steps_value].
+        window_ids = (tf.expand_dims(ids, -1) +
+                      tf.range(num_steps_value, dtype=tf.int64))
+        rows = (tf.expand_dims(segments, -1) * self._max_length +
+                tf.math.mod(window_ids, self._max_length))
+
+        positions = tf.dynamic_partition(
+            tf.range(num_samples), shard_ids, self._num_shards)
+        shard_rows = tf.dynamic_partition(rows, shard_ids, self._num_shards)
+        shard_reads = [
+            shard.read_rows(r) for shard, r in zip(self._shards, shard_rows)
+        ]
+        shard_data = [data for data, _ in shard_reads]
+        shard_data_ids = [data_ids for _, data_ids in shard_reads]
+
+        def stitch(*parts):
+          stitched = tf.dynamic_stitch(positions, parts)
+          stitched.set_shape([num_samples] + stitched.shape.as_list()[1:])
+          return stitched
+
+        data = tf.nest.map_structure(stitch, *shard_data)
+        data_ids = stitch(*shard_data_ids)
+
+        def select_steps(nest):
+          if num_steps is None:
+            return tf.nest.map_structure(lambda t: t[:, 0], nest)
+          if not time_stacked:
+            return tuple(
+                tf.nest.map_structure(lambda t: t[:, step], nest)  # pylint: disable=cell-var-from-loop
+                for step in range(num_steps))
+          return nest
+
+        def unbatch(nest):
+          if sample_batch_size is None:
+            return tf.nest.map_structure(lambda t: t[0], nest)
+          return nest
+
+        data = unbatch(select_steps(data))
+        data_ids = unbatch(select_steps(data_ids))
+        rows_shape = () if sample_batch_size is None else (sample_batch_size,)
+        probabilities = tf.fill(rows_shape, probability)
+
+        buffer_info = tf_uniform_replay_buffer.BufferInfo(
+            ids=data_ids, probabilities=probabilities)
+    return data, buffer_info
+
+  @gin.configurable(
+      'tf_agents.sharded_tf_uniform_replay_buffer.'
+      'ShardedTFUniformReplayBuffer.as_dataset')
+  def as_dataset(self,
+                 sample_batch_size=None,
+                 num_steps=None,
+                 num_parallel_calls=None):
+    return self._as_dataset(sample_batch_size, num_steps, num_parallel_calls)
+
+  def _as_dataset(self,
+                  sample_batch_size=None,
+                  num_steps=None,
+                  num_parallel_calls=None):
+    """Creates a dataset that returns entries from the buffer.
+
+    Args:
+      sample_batch_size: (Optional.) An optional batch_size to specify the
+        number of items to return. See as_dataset() documentation.
+      num_steps: (Optional.)  Optional way to specify that sub-episodes are
+        desired. See as_dataset() documentation.
+      num_parallel_calls: (Optional.) Number elements to process in parallel.
+        See as_dataset() documentation.
+    Returns:
+      A dataset of type tf.data.Dataset, elements of which are 2-tuples of:
+        - An item or sequence of items or batch thereof
+        - Auxiliary info for the items (i.e. ids, probs).
+
+    Raises:
+      ValueError: If the data spec contains lists that must be converted to
+        tuples.
+    """
+    # data_tf.nest.flatten does not flatten python lists, nest.flatten does.
+    if tf.nest.flatten(self._data_spec) != data_nest.flatten(self._data_spec):
+      raise ValueError(
+          'Cannot perform gather; data spec contains lists and this conflicts '
+          'with gathering operator.  Convert any lists to tuples.  '
+          'For example, if your spec looks like [a, b, c], '
+          'change it to (a, b, c).  Spec structure is:\n  {}'.format(
+              tf.nest.map_structure(lambda spec: spec.dtype, self._data_spec)))
+
+    def get_next(_):
+      return self.get_next(sample_batch_size, num_steps, time_stacked=True)
+
+    return tf.data.experimental.Counter().map(
+        get_next,
+        num_parallel_calls=num_parallel_calls)
+
+  def _gather_all(self):
+    """Returns all the items in buffer, shape [batch_size, timestep, ...].
+
+    All shards must hold the same number of items, which is the case when
+    items are only added with `add_batch`.
+
+    Returns:
+      All the items currently in the buffer.
+    """
+    with tf.device(self._device), tf.name_scope(self._scope):
+      with tf.name_scope('gather_all'):
+        shard_items = [shard.gather_all() for shard in self._shards]
+        return tf.nest.map_structure(lambda *t: tf.concat(t, axis=0),
+                                     *shard_items)
+
+  def _clear(self):
+    """Return op that resets the contents of all the shards."""
+    return tf.group(*[shard.clear() for shard in self._shards])
@@ -0,0 +1,176 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sharded_tf_uniform_replay_buffer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from tf_agents import specs
+from tf_agents.replay_buffers import sharded_tf_uniform_replay_buffer
+from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.utils import common
+
+
+class ShardedTFUniformReplayBufferTest(parameterized.TestCase,
+                                       tf.test.TestCase):
+
+  def _create_and_fill(self, batch_size, num_shards, num_items=10,
+                       max_length=1000):
+    spec = specs.TensorSpec([], tf.int64, 'action')
+    replay_buffer = (
+        sharded_tf_uniform_replay_buffer.ShardedTFUniformReplayBuffer(
+            spec, batch_size=batch_size, num_shards=num_shards,
+            max_length=max_length))
+
+    @common.function(autograph=True)
+    def add_data():
+      # Each element has its batch index in the 100s place.
+      for i in tf.range(num_items, dtype=tf.int64):
+        batch = tf.range(0, batch_size * 100, 100, dtype=tf.int64) + i
+        replay_buffer.add_batch(batch)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(add_data())
+    return replay_buffer
+
+  def testInvalidNumShards(self):
+    spec = specs.TensorSpec([], tf.int64, 'action')
+    with self.assertRaisesRegexp(ValueError, 'evenly divide'):
+      sharded_tf_uniform_replay_buffer.ShardedTFUniformReplayBuffer(
+          spec, batch_size=3, num_shards=2)
+
+  def testEpisodeSamplingNotSupported(self):
+    spec = specs.TensorSpec([], tf.int64, 'action')
+    with self.assertRaisesRegexp(ValueError, 'episode_sampling'):
+      sharded_tf_uniform_replay_buffer.ShardedTFUniformReplayBuffer(
+          spec, batch_size=2, num_shards=2,
+          episode_sampling=tf_uniform_replay_buffer.WITHIN_EPISODE)
+
+  def testShardValidRangeIds(self):
+    replay_buffer = self._create_and_fill(
+        batch_size=4, num_shards=2, num_items=5, max_length=3)
+    shard = replay_buffer.shards[0]
+    self.assertEqual((2, 5), self.evaluate(shard.valid_range_ids()))
+    self.assertEqual((2, 4), self.evaluate(shard.valid_range_ids(2)))
+
+  def testGetNextEmpty(self):
+    spec = specs.TensorSpec([], tf.int64, 'action')
+    replay_buffer = (
+        sharded_tf_uniform_replay_buffer.ShardedTFUniformReplayBuffer(
+            spec, batch_size=2, num_shards=2))
+
+    with self.assertRaisesRegexp(
+        tf.errors.InvalidArgumentError,
+        'ShardedTFUniformReplayBuffer is empty.'):
+      self.evaluate(tf.compat.v1.global_variables_initializer())
+      sample, _ = replay_buffer.get_next()
+      self.evaluate(sample)
+
+  @parameterized.named_parameters(
+      ('OneShard', 4, 1),
+      ('TwoShards', 4, 2),
+      ('FourShards', 4, 4),
+  )
+  def testGatherAll(self, batch_size, num_shards):
+    replay_buffer = self._create_and_fill(batch_size, num_shards)
+    expected = [
+        list(range(x * 100, x * 100 + 10)) for x in range(batch_size)
+    ]
+    self.assertAllEqual(expected, self.evaluate(replay_buffer.gather_all()))
+
+  @parameterized.named_parameters(
+      ('OneShard', 4, 1),
+      ('TwoShards', 4, 2),
+      ('FourShards', 4, 4),
+  )
+  def testMultiStepStackedBatchedSampling(self, batch_size, num_shards):
+    replay_buffer = self._create_and_fill(batch_size, num_shards,
+                                          num_items=15, max_length=10)
+
+    if tf.executing_eagerly():
+      sample = lambda: replay_buffer.get_next(20, num_steps=3)
+    else:
+      sample = replay_buffer.get_next(20, num_steps=3)
+    for _ in range(50):
+      steps_, buffer_info = self.evaluate(sample)
+      self.assertEqual((20, 3), steps_.shape)
+      self.assertAllEqual(steps_[:, 0] + 1, steps_[:, 1])
+      self.assertAllEqual(steps_[:, 0] + 2, steps_[:, 2])
+      self.assertAllGreaterEqual(steps_ % 100, 5)
+      self.assertAllEqual(steps_ % 100, buffer_info.ids)
+      self.assertAllClose([1. / (8 * batch_size)] * 20,
+                          buffer_info.probabilities)
+
+  def testMultiStepSampling(self):
+    replay_buffer = self._create_and_fill(batch_size=4, num_shards=2)
+
+    if tf.executing_eagerly():
+      sample = lambda: replay_buffer.get_next(num_steps=2, time_stacked=False)
+    else:
+      sample = replay_buffer.get_next(num_steps=2, time_stacked=False)
+    for _ in range(50):
+      (step_, next_step_), _ = self.evaluate(sample)
+      self.assertEqual(step_ + 1, next_step_)
+
+  def testSamplesShardsProportionallyToFillLevel(self):
+    spec = specs.TensorSpec([], tf.int64, 'action')
+    replay_buffer = (
+        sharded_tf_uniform_replay_buffer.ShardedTFUniformReplayBuffer(
+            spec, batch_size=2, num_shards=2))
+    first_shard, second_shard = replay_buffer.shards
+
+    @common.function(autograph=True)
+    def add_data():
+      # The first shard holds 3 times more items than the second one.
+      for i in tf.range(30, dtype=tf.int64):
+        first_shard.add_batch(tf.zeros([1], dtype=tf.int64) + i)
+      for i in tf.range(10, dtype=tf.int64):
+        second_shard.add_batch(tf.zeros([1], dtype=tf.int64) + 100 + i)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(add_data())
+
+    sample, _ = self.evaluate(replay_buffer.get_next(sample_batch_size=4000))
+    np.testing.assert_allclose(0.75, np.mean(sample < 100), atol=0.05)
+
+  def testAsDatasetParallelCalls(self):
+    replay_buffer = self._create_and_fill(batch_size=4, num_shards=2)
+    ds = replay_buffer.as_dataset(
+        sample_batch_size=5, num_steps=2, num_parallel_calls=4)
+    if tf.executing_eagerly():
+      itr = iter(ds)
+      sample = lambda: next(itr)
+    else:
+      itr = tf.compat.v1.data.make_initializable_iterator(ds)
+      self.evaluate(itr.initializer)
+      sample = itr.get_next()
+    for _ in range(10):
+      steps_, _ = self.evaluate(sample)
+      self.assertAllEqual(steps_[:, 0] + 1, steps_[:, 1])
+
+  def testClear(self):
+    replay_buffer = self._create_and_fill(batch_size=4, num_shards=2)
+    self.evaluate(replay_buffer.clear())
+    self.assertAllEqual([[]] * 4, self.evaluate(replay_buffer.gather_all()))
+
+
+if __name__ == '__main__':
+  tf.test.main()
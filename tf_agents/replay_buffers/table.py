@@ -131,3 +131,205 @@ class Table(tf.Module):
         for (slot, value) in zip(flattened_slots, flattened_values)
     ]
     return tf.group(*write_ops)
+
+
+class FusedTable(tf.Module):
+  """A table storing all slots of the same dtype in a single tf.Variable.
+
+  Drop-in replacement for `Table` (e.g. as the `table_fn` of a replay buffer).
+  Each slot is flattened into a contiguous range of columns of the `[capacity,
+  num_columns]` variable holding its dtype, so that reading or writing rows
+  takes one gather or scatter per dtype, rather than one per slot.
+
+  Writing all the slots of a dtype, as the replay buffers do, is a single
+  `scatter_update` as in `Table`. Writing only some of them reads and rewrites
+  the columns of the others, so such partial writes run in a critical section
+  for them not to overwrite each other. Slots with no elements take no columns.
+  """
+
+  def __init__(self, tensor_spec, capacity, scope='Table'):
+    """Creates a table.
+
+    Args:
+      tensor_spec: A nest of TensorSpec representing each value that can be
+        stored in the table.
+      capacity: Maximum number of values the table can store.
+      scope: Variable scope for the Table.
+    Raises:
+      ValueError: If the names in tensor_spec are empty or not unique.
+    """
+    super(FusedTable, self).__init__(name=scope)
+    self._tensor_spec = tensor_spec
+    self._capacity = capacity
+
+    def _create_unique_slot_name(spec):
+      return tf.compat.v1.get_default_graph().unique_name(spec.name or 'slot')
+
+    self._slots = tf.nest.map_structure(_create_unique_slot_name,
+                                        self._tensor_spec)
+
+    # Assign each slot a range of columns in the storage of its dtype.
+    self._slot2spec_map = {}
+    self._slot2columns_map = {}
+    self._dtype2slots_map = {}
+    num_columns = {}
+    for slot, spec in zip(tf.nest.flatten(self._slots),
+                          tf.nest.flatten(self._tensor_spec)):
+      num_elements = spec.shape.num_elements()
+      offset = num_columns.get(spec.dtype.name, 0)
+      self._slot2spec_map[slot] = spec
+      self._slot2columns_map[slot] = (offset, offset + num_elements)
+      dtype_slots = self._dtype2slots_map.setdefault(spec.dtype.name, [])
+      if num_elements:
+        dtype_slots.append(slot)
+      num_columns[spec.dtype.name] = offset + num_elements
+    self._dtypes = [tf.as_dtype(name) for name in sorted(num_columns)]
+
+    def _create_storage(dtype):
+      """Create storage for all the slots of a dtype, track it."""
+      shape = [self._capacity, num_columns[dtype.name]]
+      return common.create_variable(
+          name=tf.compat.v1.get_default_graph().unique_name(dtype.name),
+          initializer=tf.zeros(shape, dtype=dtype),
+          shape=None,
+          dtype=dtype,
+          unique_name=False)
+
+    with tf.compat.v1.variable_scope(scope):
+      self._storage = [_create_storage(dtype) for dtype in self._dtypes]
+      self._write_cs = tf.CriticalSection(name='write')
+    self._dtype2storage_map = dict(
+        zip([dtype.name for dtype in self._dtypes], self._storage))
+
+  @property
+  def slots(self):
+    return self._slots
+
+  def variables(self):
+    return list(self._storage)
+
+  def read(self, rows, slots=None):
+    """Returns values for the given rows.
+
+    Args:
+      rows: A scalar/list/tensor of location(s) to read values from. If rows is
+        a scalar, a single value is returned without a batch dimension. If rows
+        is a list of integers or a rank-1 int Tensor a batch of values will be
+        returned with each Tensor having an extra first dimension equal to the
+        length of rows.
+      slots: Optional list/tuple/nest of slots to read from. If None, all
+        tensors at the given rows are retrieved and the return value has the
+        same structure as the tensor_spec. Otherwise, only tensors with names
+        matching the slots are retrieved, and the return value has the same
+        structure as slots.
+
+    Returns:
+      Values at given rows.
+    """
+    slots = slots or self._slots
+    flattened_slots = tf.nest.flatten(slots)
+    rows = tf.convert_to_tensor(value=rows)
+    flat_rows = tf.reshape(rows, [-1])
+
+    # One gather per dtype, of all the columns.
+    dtype_values = {}
+    for slot in flattened_slots:
+      dtype_name = self._slot2spec_map[slot].dtype.name
+      start, end = self._slot2columns_map[slot]
+      if start != end and dtype_name not in dtype_values:
+        dtype_values[dtype_name] = (
+            self._dtype2storage_map[dtype_name].sparse_read(flat_rows))
+
+    values = []
+    for slot in flattened_slots:
+      spec = self._slot2spec_map[slot]
+      start, end = self._slot2columns_map[slot]
+      shape = tf.concat([
+          tf.shape(input=rows),
+          tf.constant(spec.shape.as_list(), dtype=tf.int32)
+      ], 0)
+      if start == end:
+        value = tf.zeros(shape, dtype=spec.dtype)
+      else:
+        value = tf.reshape(dtype_values[spec.dtype.name][:, start:end], shape)
+      value.set_shape(rows.shape.concatenate(spec.shape))
+      values.append(value)
+    return tf.nest.pack_sequence_as(slots, values)
+
+  def write(self, rows, values, slots=None):
+    """Returns ops for writing values at the given rows.
+
+    Args:
+      rows: A scalar/list/tensor of location(s) to write values at.
+      values: A nest of Tensors to write. If rows has more than one element,
+        values can have an extra first dimension representing the batch size.
+        Values must have the same structure as the tensor_spec of this class
+        if `slots` is None, otherwise it must have the same structure as
+        `slots`.
+      slots: Optional list/tuple/nest of slots to write. If None, all tensors
+        in the table are updated. Otherwise, only tensors with names matching
+        the slots are updated.
+
+    Returns:
+      Ops for writing values at rows.
+    """
+    slots = slots or self._slots
+    flattened_slots = tf.nest.flatten(slots)
+    flattened_values = tf.nest.flatten(values)
+    rows = tf.convert_to_tensor(value=rows)
+    flat_rows = tf.reshape(rows, [-1])
+
+    slot2value_map = {}
+    for slot, value in zip(flattened_slots, flattened_values):
+      spec = self._slot2spec_map[slot]
+      start, end = self._slot2columns_map[slot]
+      if start == end:
+        continue
+      value = tf.convert_to_tensor(value=value, dtype=spec.dtype)
+      # Like scatter_update, broadcast values missing the rows dimensions.
+      value = tf.broadcast_to(
+          value,
+          tf.concat([
+              tf.shape(input=rows),
+              tf.constant(spec.shape.as_list(), dtype=tf.int32)
+          ], 0))
+      slot2value_map[slot] = tf.reshape(value, [-1, end - start])
+
+    write_ops = []
+    partial_dtypes = []
+    for dtype in self._dtypes:
+      dtype_slots = self._dtype2slots_map[dtype.name]
+      written = [slot in slot2value_map for slot in dtype_slots]
+      if not any(written):
+        continue
+      if all(written):
+        # All the columns are written, as by the replay buffers.
+        write_ops.append(
+            tf.compat.v1.scatter_update(
+                self._dtype2storage_map[dtype.name], flat_rows,
+                tf.concat([slot2value_map[slot] for slot in dtype_slots],
+                          axis=-1)).op)
+      else:
+        partial_dtypes.append(dtype)
+
+    def _write_partial():
+      partial_write_ops = []
+      for dtype in partial_dtypes:
+        storage = self._dtype2storage_map[dtype.name]
+        # Only some of the slots of this dtype are written, keep the others.
+        current_values = storage.sparse_read(flat_rows)
+        columns = []
+        for slot in self._dtype2slots_map[dtype.name]:
+          if slot in slot2value_map:
+            columns.append(slot2value_map[slot])
+          else:
+            start, end = self._slot2columns_map[slot]
+            columns.append(current_values[:, start:end])
+        partial_write_ops.append(
+            tf.compat.v1.scatter_update(storage, flat_rows,
+                                        tf.concat(columns, axis=-1)).op)
+      return tf.group(*partial_write_ops)
+
+    if partial_dtypes:
+      write_ops.append(self._write_cs.execute(_write_partial))
+    return tf.group(*write_ops)
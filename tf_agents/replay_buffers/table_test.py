@@ -301,5 +301,136 @@ class TableTest(tf.test.TestCase):
     root.restore(save_path).assert_consumed().run_restore_ops()
 
 
+class FusedTableTest(tf.test.TestCase):
+
+  def _spec(self):
+    return [
+        specs.TensorSpec([3], tf.float32, 'action'), [
+            specs.TensorSpec([5], tf.float32, 'camera'),
+            specs.TensorSpec([3, 2], tf.float32, 'lidar'),
+            specs.TensorSpec([], tf.int64, 'step'),
+            specs.TensorSpec([], tf.string, 'name')
+        ]
+    ]
+
+  def _values(self, batch_size, scale):
+    spec = self._spec()
+    return [
+        scale * np.ones([batch_size] + spec[0].shape.as_list(), np.float32),
+        [(scale + 1) * np.ones([batch_size] + spec[1][0].shape.as_list(),
+                               np.float32),
+         (scale + 2) * np.ones([batch_size] + spec[1][1].shape.as_list(),
+                               np.float32),
+         scale * np.arange(batch_size, dtype=np.int64),
+         np.array([str(scale * i).encode('utf-8') for i in range(batch_size)])]
+    ]
+
+  def _assertValuesEqual(self, expected, actual):
+    for expected_value, actual_value in zip(
+        tf.nest.flatten(expected), tf.nest.flatten(actual)):
+      self.assertAllEqual(expected_value, actual_value)
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testOneVariablePerDtype(self):
+    replay_table = table.FusedTable(self._spec(), capacity=3)
+    variables = replay_table.variables()
+    self.assertEqual(3, len(variables))
+    self.assertAllEqual([[3, 14], [3, 1], [3, 1]],
+                        [v.shape.as_list() for v in variables])
+    self.assertEqual(replay_table.slots,
+                     ['action', ['camera', 'lidar', 'step', 'name']])
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testReadWriteSingle(self):
+    spec = self._spec()
+    replay_table = table.FusedTable(spec, capacity=3)
+    expected_values = tf.nest.map_structure(lambda x: x[0],
+                                            self._values(1, 1))
+
+    write_op = replay_table.write(1, expected_values)
+    read_op = replay_table.read(1)
+    tf.nest.map_structure(lambda s, t: self.assertEqual(s.shape, t.shape), spec,
+                          read_op)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(write_op)
+    self._assertValuesEqual(expected_values, self.evaluate(read_op))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testReadWriteBatch(self):
+    replay_table = table.FusedTable(self._spec(), capacity=4)
+    values = self._values(4, 1)
+
+    write_op = replay_table.write([3, 2, 1, 0], values)
+    read_op = replay_table.read([[3, 2], [1, 0]])
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(write_op)
+    expected_values = tf.nest.map_structure(
+        lambda x: np.reshape(x, (2, 2) + x.shape[1:]), values)
+    self._assertValuesEqual(expected_values, self.evaluate(read_op))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testReadPartialSlots(self):
+    replay_table = table.FusedTable(self._spec(), capacity=4)
+    action, [_, lidar, step, _] = self._values(2, 1)
+
+    write_op = replay_table.write([0, 1], self._values(2, 1))
+    read_op = replay_table.read([0, 1], slots=['lidar', ['step', 'action']])
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(write_op)
+    self._assertValuesEqual([lidar, [step, action]], self.evaluate(read_op))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testWritePartialSlots(self):
+    replay_table = table.FusedTable(self._spec(), capacity=4)
+    _, [camera1, _, step1, name1] = self._values(2, 1)
+    action2, [_, lidar2, _, _] = self._values(2, 10)
+
+    write_op1 = replay_table.write([0, 1], self._values(2, 1))
+    write_op2 = replay_table.write(
+        [0, 1], [lidar2, [action2]], ['lidar', ['action']])
+    read_op = replay_table.read([0, 1])
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(write_op1)
+    self.evaluate(write_op2)
+    self._assertValuesEqual([action2, [camera1, lidar2, step1, name1]],
+                            self.evaluate(read_op))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testWriteBroadcast(self):
+    spec = specs.TensorSpec([], tf.int64, 'id')
+    replay_table = table.FusedTable(spec, capacity=4)
+
+    write_op = replay_table.write([1, 3], tf.constant(7, dtype=tf.int64))
+    read_op = replay_table.read([0, 1, 2, 3])
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(write_op)
+    self.assertAllEqual([0, 7, 0, 7], self.evaluate(read_op))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testZeroElementSlot(self):
+    spec = (specs.TensorSpec([0], tf.float32, 'empty'),
+            specs.TensorSpec([2], tf.float32, 'value'))
+    replay_table = table.FusedTable(spec, capacity=3)
+    values = (np.zeros([2, 0], np.float32), np.ones([2, 2], np.float32))
+
+    write_op = replay_table.write([0, 2], values)
+    read_op = replay_table.read([0, 2])
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(write_op)
+    self._assertValuesEqual(values, self.evaluate(read_op))
+    self.assertEqual([2, 0], read_op[0].shape.as_list())
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testSaveRestore(self):
+    replay_table = table.FusedTable(self._spec(), capacity=3)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    directory = self.get_temp_dir()
+    prefix = os.path.join(directory, 'table')
+    root = tf.train.Checkpoint(table=replay_table)
+    save_path = root.save(prefix)
+    root.restore(save_path).assert_consumed().run_restore_ops()
+
+
 if __name__ == '__main__':
   tf.test.main()
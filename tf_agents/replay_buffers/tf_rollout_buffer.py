@@ -0,0 +1,202 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A TF buffer storing the rollouts of on-policy agents.
+
+On-policy agents like PPO and REINFORCE collect a rollout, train on all of it
+with `gather_all` and `clear` the buffer. Unlike `TFUniformReplayBuffer`, which
+stores items in a ring buffer indexed by ids, `TFRolloutBuffer` stores them in
+`[batch_size, max_length, ...]` variables at the position of a write cursor:
+`gather_all` slices the variables instead of computing rows and gathering
+them, and `clear` only resets the cursor.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import gin
+import tensorflow as tf
+
+from tf_agents.replay_buffers import replay_buffer
+from tf_agents.utils import common
+
+
+@gin.configurable
+class TFRolloutBuffer(replay_buffer.ReplayBuffer):
+  """A TF buffer for on-policy rollouts, with cheap `gather_all` and `clear`.
+
+  Items added once `max_length` items were added to each batch segment since
+  the last `clear` are dropped, whereas `TFUniformReplayBuffer` overwrites its
+  oldest items. `max_length` must then cover all the items added between two
+  calls to `clear`. The buffer can not be sampled from, use `gather_all`.
+  """
+
+  def __init__(self,
+               data_spec,
+               batch_size,
+               max_length=1000,
+               scope='TFRolloutBuffer',
+               device='cpu:*'):
+    """Creates a TFRolloutBuffer.
+
+    Args:
+      data_spec: A TensorSpec or a list/tuple/nest of TensorSpecs describing a
+        single item that can be stored in this buffer.
+      batch_size: Batch dimension of tensors when adding to buffer.
+      max_length: The maximum number of items that can be stored in a single
+        batch segment of the buffer.
+      scope: Scope prefix for variables and ops created by this class.
+      device: A TensorFlow device to place the Variables and ops.
+    """
+    super(TFRolloutBuffer, self).__init__(data_spec, batch_size * max_length)
+    self._batch_size = batch_size
+    self._max_length = max_length
+    self._scope = scope
+    self._device = device
+
+    def _create_storage(spec):
+      shape = [batch_size, max_length] + spec.shape.as_list()
+      return common.create_variable(
+          name=spec.name or 'storage',
+          initializer=tf.zeros(shape, dtype=spec.dtype),
+          shape=None,
+          dtype=spec.dtype)
+
+    with tf.device(self._device), tf.compat.v1.variable_scope(self._scope):
+      # A flat list, so that the variables are tracked for checkpointing.
+      self._storage = [
+          _create_storage(spec) for spec in tf.nest.flatten(self._data_spec)
+      ]
+      # Number of items added to each batch segment.
+      self._num_steps = common.create_variable('num_steps', 0)
+
+  def variables(self):
+    return self._storage + [self._num_steps]
+
+  @property
+  def device(self):
+    return self._device
+
+  @property
+  def scope(self):
+    return self._scope
+
+  @property
+  def num_steps(self):
+    """Returns the number of items stored in each batch segment."""
+    return self._num_steps.value()
+
+  # Methods defined in ReplayBuffer base class
+
+  def _add_batch(self, items):
+    """Adds a batch of items at the write cursor.
+
+    Args:
+      items: A tensor or list/tuple/nest of tensors representing a batch of
+        items to be added to the buffer. Each element of `items` must match
+        the data_spec of this class. Should be shape [batch_size, data_spec,
+        ...]
+
+    Returns:
+      An op that adds `items` to the buffer.
+    """
+    tf.nest.assert_same_structure(items, self._data_spec)
+    with tf.device(self._device), tf.name_scope(self._scope):
+      return self._write(
+          tf.nest.map_structure(lambda t: tf.expand_dims(t, 1), items),
+          num_items=1)
+
+  def _add_sequence(self, items):
+    """Adds a batch of sequences of items at the write cursor.
+
+    Args:
+      items: A tensor or list/tuple/nest of tensors representing a batch of
+        sequences of items to be added to the buffer. Each element of `items`
+        must match the data_spec of this class. Should be shape [batch_size,
+        num_steps, data_spec, ...]
+
+    Returns:
+      An op that adds `items` to the buffer.
+    """
+    tf.nest.assert_same_structure(items, self._data_spec)
+    with tf.device(self._device), tf.name_scope(self._scope):
+      num_items = tf.shape(
+          input=tf.nest.flatten(items)[0], out_type=tf.int64)[1]
+      return self._write(items, num_items)
+
+  def _write(self, items, num_items):
+    """Writes [batch_size, num_items, ...] items, dropping the overflow."""
+    start = self._num_steps.value()
+    end = tf.minimum(start + num_items, self._max_length)
+
+    def _assign():
+      write_ops = [
+          storage[:, start:end].assign(item[:, :end - start])
+          for storage, item in zip(self._storage, tf.nest.flatten(items))
+      ]
+      with tf.control_dependencies(write_ops):
+        return tf.identity(self._num_steps.assign(end))
+
+    num_steps = tf.cond(
+        pred=start < self._max_length,
+        true_fn=_assign,
+        false_fn=lambda: tf.identity(start))
+    return tf.group(num_steps)
+
+  def _get_next(self,
+                sample_batch_size=None,
+                num_steps=None,
+                time_stacked=True):
+    raise NotImplementedError('TFRolloutBuffer does not support sampling, use '
+                              'gather_all.')
+
+  def _as_dataset(self,
+                  sample_batch_size=None,
+                  num_steps=None,
+                  num_parallel_calls=None):
+    raise NotImplementedError('TFRolloutBuffer does not support sampling, use '
+                              'gather_all.')
+
+  def _gather_all(self):
+    """Returns all the items in buffer, shape [batch_size, timestep, ...].
+
+    Returns:
+      All the items currently in the buffer, sliced from its storage.
+    """
+    with tf.device(self._device), tf.name_scope(self._scope):
+      with tf.name_scope('gather_all'):
+        num_steps = self._num_steps.value()
+        items = [storage.value()[:, :num_steps] for storage in self._storage]
+        for item, spec in zip(items, tf.nest.flatten(self._data_spec)):
+          item.set_shape([self._batch_size, None] + spec.shape.as_list())
+    return tf.nest.pack_sequence_as(self._data_spec, items)
+
+  def _clear(self, clear_all_variables=False):
+    """Return op that resets the contents of the buffer.
+
+    Args:
+      clear_all_variables: boolean indicating if all variables should be
+        cleared. By default, only the write cursor is reset, and the stored
+        values are overwritten by the next items. Set
+        `clear_all_variables=True` to also zero the storage.
+
+    Returns:
+      op that resets the buffer contents.
+    """
+    assignments = [self._num_steps.assign(0)]
+    if clear_all_variables:
+      assignments += [v.assign(tf.zeros_like(v)) for v in self._storage]
+    return tf.group(*assignments, name='clear')
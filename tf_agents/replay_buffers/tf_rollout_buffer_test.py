@@ -0,0 +1,118 @@
+# coding=utf-8
+# Copyright 2018 The TF-Agents Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for tf_agents.replay_buffers.tf_rollout_buffer."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from tf_agents import specs
+from tf_agents.replay_buffers import tf_rollout_buffer
+
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
+
+def _data_spec():
+  return {
+      'observation': specs.TensorSpec([2], tf.float32, 'observation'),
+      'step': specs.TensorSpec([], tf.int64, 'step')
+  }
+
+
+def _items(steps):
+  steps = tf.constant(steps, dtype=tf.int64)
+  return {
+      'observation': tf.stack([tf.cast(steps, tf.float32)] * 2, axis=-1),
+      'step': steps
+  }
+
+
+class TFRolloutBufferTest(tf.test.TestCase):
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testAddBatchGatherAll(self):
+    rollout_buffer = tf_rollout_buffer.TFRolloutBuffer(
+        _data_spec(), batch_size=2, max_length=4)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    self.assertAllEqual([[], []],
+                        self.evaluate(rollout_buffer.gather_all())['step'])
+    for step in range(3):
+      self.evaluate(rollout_buffer.add_batch(_items([step, 10 + step])))
+
+    items = self.evaluate(rollout_buffer.gather_all())
+    self.assertAllEqual([[0, 1, 2], [10, 11, 12]], items['step'])
+    self.assertAllEqual([2, 3, 2], items['observation'].shape)
+    self.assertAllEqual([[1., 1.], [11., 11.]], items['observation'][:, 1])
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testAddSequence(self):
+    rollout_buffer = tf_rollout_buffer.TFRolloutBuffer(
+        _data_spec(), batch_size=2, max_length=4)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    self.evaluate(rollout_buffer.add_batch(_items([0, 10])))
+    self.evaluate(rollout_buffer.add_sequence(_items([[1, 2], [11, 12]])))
+    self.assertAllEqual([[0, 1, 2], [10, 11, 12]],
+                        self.evaluate(rollout_buffer.gather_all())['step'])
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testOverflowIsDropped(self):
+    rollout_buffer = tf_rollout_buffer.TFRolloutBuffer(
+        _data_spec(), batch_size=1, max_length=3)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    self.evaluate(rollout_buffer.add_sequence(_items([[0, 1]])))
+    self.evaluate(rollout_buffer.add_sequence(_items([[2, 3]])))
+    self.evaluate(rollout_buffer.add_batch(_items([4])))
+    self.assertAllEqual([[0, 1, 2]],
+                        self.evaluate(rollout_buffer.gather_all())['step'])
+    self.assertEqual(3, self.evaluate(rollout_buffer.num_steps))
+
+  @test_util.run_in_graph_and_eager_modes()
+  def testClear(self):
+    rollout_buffer = tf_rollout_buffer.TFRolloutBuffer(
+        _data_spec(), batch_size=2, max_length=4)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    self.evaluate(rollout_buffer.add_batch(_items([0, 10])))
+    self.evaluate(rollout_buffer.add_batch(_items([1, 11])))
+    self.evaluate(rollout_buffer.clear())
+    self.assertEqual(0, self.evaluate(rollout_buffer.num_steps))
+
+    self.evaluate(rollout_buffer.add_batch(_items([2, 12])))
+    self.assertAllEqual([[2], [12]],
+                        self.evaluate(rollout_buffer.gather_all())['step'])
+
+    self.evaluate(rollout_buffer._clear(clear_all_variables=True))  # pylint: disable=protected-access
+    storage = self.evaluate(rollout_buffer.variables()[:-1])
+    for value in storage:
+      self.assertAllEqual(np.zeros_like(value), value)
+
+  def testSamplingIsNotSupported(self):
+    rollout_buffer = tf_rollout_buffer.TFRolloutBuffer(
+        _data_spec(), batch_size=1, max_length=3)
+    with self.assertRaisesRegexp(NotImplementedError, 'gather_all'):
+      rollout_buffer.get_next()
+    with self.assertRaisesRegexp(NotImplementedError, 'gather_all'):
+      rollout_buffer.as_dataset()
+
+
+if __name__ == '__main__':
+  tf.test.main()
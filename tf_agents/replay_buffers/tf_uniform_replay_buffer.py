@@ -22,6 +22,10 @@ its own contiguous memory. Within batch segments, behaves as a circular buffer.
 The get_next function returns 'ids' in addition to the data. This is not really
 needed for the batched replay buffer, but is returned to be consistent with
 the API for a priority replay buffer, which needs the ids to update priorities.
+
+- Optionally, when storing `Trajectory` items, the buffer maintains an episode
+index at write time so that sampled sub-episodes (num_steps) never straddle an
+episode boundary, or are aligned with the start of an episode.
 """
 
 from __future__ import absolute_import
@@ -35,6 +39,7 @@ import tensorflow as tf
 from tf_agents.replay_buffers import replay_buffer
 from tf_agents.replay_buffers import table
 from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
 
 import gin.tf
@@ -44,6 +49,17 @@ from tensorflow.python.data.util import nest as data_nest  # pylint:disable=g-di
 BufferInfo = collections.namedtuple('BufferInfo',
                                     ['ids', 'probabilities'])
 
+# Values of the `episode_sampling` argument of `TFUniformReplayBuffer`.
+# Sampled sub-episodes never straddle an episode boundary.
+WITHIN_EPISODE = 'within_episode'
+# Sampled sub-episodes start at the first step of an episode (or the oldest one
+# still in the buffer) and are padded with zeros, and ids of -1, past its end.
+EPISODE_START = 'episode_start'
+
+# Maximum number of times sub-episodes straddling an episode boundary are
+# resampled in `WITHIN_EPISODE` mode before giving up.
+_MAX_EPISODE_RESAMPLING_ITERATIONS = 100
+
 
 @gin.configurable
 class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
@@ -55,7 +71,8 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
                max_length=1000,
                scope='TFUniformReplayBuffer',
                device='cpu:*',
-               table_fn=table.Table):
+               table_fn=table.Table,
+               episode_sampling=None):
     """Creates a TFUniformReplayBuffer.
 
     Args:
@@ -68,10 +85,26 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
       device: A TensorFlow device to place the Variables and ops.
       table_fn: Function to create tables `table_fn(data_spec, capacity)` that
         can read/write nested tensors.
+      episode_sampling: Optional, one of `WITHIN_EPISODE` or `EPISODE_START`.
+        If set, data_spec must be a `Trajectory` spec, the episode each item
+        belongs to is recorded when adding it, and sampling with num_steps
+        either never returns sub-episodes straddling an episode boundary
+        (`WITHIN_EPISODE`), or returns sub-episodes starting at the first step
+        of an episode which are zero padded past its end (`EPISODE_START`).
+        Padded steps have an id of -1.
 
     Raises:
-      ValueError: If batch_size does not evenly divide capacity.
+      ValueError: If batch_size does not evenly divide capacity, or if
+        episode_sampling is set and data_spec is not a `Trajectory` spec.
     """
+    if episode_sampling not in (None, WITHIN_EPISODE, EPISODE_START):
+      raise ValueError(
+          'Unknown episode_sampling: {}'.format(episode_sampling))
+    if (episode_sampling is not None and
+        not isinstance(data_spec, trajectory.Trajectory)):
+      raise ValueError(
+          'episode_sampling requires data_spec to be the spec of a '
+          'trajectory: {}'.format(data_spec))
     self._batch_size = batch_size
     self._max_length = max_length
     capacity = self._batch_size * self._max_length
@@ -84,6 +117,7 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
     self._scope = scope
     self._device = device
     self._table_fn = table_fn
+    self._episode_sampling = episode_sampling
     # TODO(sguada) move to create_variables function so we can use make_template
     # to handle this.
     with tf.device(self._device), tf.compat.v1.variable_scope(self._scope):
@@ -92,11 +126,24 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
       self._id_table = table_fn(self._id_spec, self._capacity_value)
       self._last_id = common.create_variable('last_id', -1)
       self._last_id_cs = tf.CriticalSection(name='last_id')
+      if self._episode_sampling is not None:
+        # Id of the first item of the episode each item belongs to.
+        self._episode_spec = tensor_spec.TensorSpec(
+            [], dtype=tf.int64, name='episode_start_id')
+        self._episode_table = table_fn(self._episode_spec,
+                                       self._capacity_value)
+        # Id of the first item of the current episode, per batch segment.
+        self._episode_start_ids = common.create_variable(
+            'episode_start_ids', -1, shape=[self._batch_size])
 
   def variables(self):
-    return (self._data_table.variables() +
-            self._id_table.variables() +
-            [self._last_id])
+    variables = (self._data_table.variables() +
+                 self._id_table.variables() +
+                 [self._last_id])
+    if self._episode_sampling is not None:
+      variables += (self._episode_table.variables() +
+                    [self._episode_start_ids])
+    return variables
 
   @property
   def device(self):
@@ -110,6 +157,41 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
   def scope(self):
     return self._scope
 
+  @property
+  def episode_sampling(self):
+    return self._episode_sampling
+
+  def valid_range_ids(self, num_steps=None):
+    """Returns the [min_id, max_id) range of ids that can start a sample.
+
+    The last id is read outside of the last_id critical section, so that
+    readers, e.g. samplers polling several buffers, do not serialize with the
+    writers. This is as consistent as a locked read: ids are reserved before
+    their items are written in either case.
+
+    Args:
+      num_steps: (Optional.) Number of consecutive ids that need to be valid
+        from the start id.
+    Returns:
+      A tuple (min_id, max_id) of int64 scalar tensors.
+    """
+    with tf.device(self._device), tf.name_scope(self._scope):
+      return self._valid_range_ids(self._last_id.value(), self._max_length,
+                                   num_steps)
+
+  def read_rows(self, rows):
+    """Reads the items and ids stored at the given rows.
+
+    Args:
+      rows: An int64 tensor of rows, e.g. `segment * max_length + id %
+        max_length`.
+    Returns:
+      A tuple (items, ids) of the nest of items and the int64 ids stored at
+      `rows`, each with a leading `rows.shape`.
+    """
+    with tf.device(self._device), tf.name_scope(self._scope):
+      return self._data_table.read(rows), self._id_table.read(rows)
+
   # Methods defined in ReplayBuffer base class
 
   def _add_batch(self, items):
@@ -127,11 +209,66 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
     tf.nest.assert_same_structure(items, self._data_spec)
 
     with tf.device(self._device), tf.name_scope(self._scope):
-      id_ = self._increment_last_id()
+      if self._episode_sampling is None:
+        id_ = self._increment_last_id()
+      else:
+        id_, episode_start_ids = self._increment_last_id_and_episode_starts(
+            tf.expand_dims(items.is_first(), 1))
+        episode_start_ids = episode_start_ids[:, 0]
       write_rows = self._get_rows_for_id(id_)
       write_id_op = self._id_table.write(write_rows, id_)
       write_data_op = self._data_table.write(write_rows, items)
-      return tf.group(write_id_op, write_data_op)
+      if self._episode_sampling is None:
+        return tf.group(write_id_op, write_data_op)
+      write_episode_op = self._episode_table.write(write_rows,
+                                                   episode_start_ids)
+      return tf.group(write_id_op, write_data_op, write_episode_op)
+
+  def _add_sequence(self, items):
+    """Adds a batch of sequences of items to the replay buffer.
+
+    The ids of all the items are reserved at once, and each table is written
+    with a single scatter, rather than once per time step.
+
+    Args:
+      items: A tensor or list/tuple/nest of tensors representing a batch of
+      sequences of items to be added to the replay buffer. Each element of
+      `items` must match the data_spec of this class. Should be shape
+      [batch_size, num_steps, data_spec, ...], with num_steps <= max_length.
+    Returns:
+      An op that adds `items` to the replay buffer.
+    """
+    tf.nest.assert_same_structure(items, self._data_spec)
+
+    with tf.device(self._device), tf.name_scope(self._scope):
+      num_steps = tf.shape(
+          input=tf.nest.flatten(items)[0], out_type=tf.int64)[1]
+      # Longer sequences would write several items to the same rows.
+      assert_fits = tf.compat.v1.assert_less_equal(
+          num_steps,
+          tf.constant(self._max_length, dtype=tf.int64),
+          message='Sequences added to TFUniformReplayBuffer can not be '
+          'longer than max_length.')
+      with tf.control_dependencies([assert_fits]):
+        if self._episode_sampling is None:
+          last_id = self._increment_last_id(num_steps)
+        else:
+          last_id, episode_start_ids = (
+              self._increment_last_id_and_episode_starts(items.is_first()))
+      # Broadcast [1, num_steps] ids over [batch_size, 1] segments.
+      ids = tf.expand_dims(
+          last_id - num_steps + 1 + tf.range(num_steps, dtype=tf.int64), 0)
+      segments = tf.expand_dims(
+          tf.range(self._batch_size, dtype=tf.int64), -1)
+      write_rows = self._get_rows(ids, segments)
+      write_id_op = self._id_table.write(
+          write_rows, tf.broadcast_to(ids, tf.shape(input=write_rows)))
+      write_data_op = self._data_table.write(write_rows, items)
+      if self._episode_sampling is None:
+        return tf.group(write_id_op, write_data_op)
+      write_episode_op = self._episode_table.write(write_rows,
+                                                   episode_start_ids)
+      return tf.group(write_id_op, write_data_op, write_episode_op)
 
   def _get_next(self,
                 sample_batch_size=None,
@@ -162,10 +299,16 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
     Raises:
       ValueError: if num_steps is bigger than the capacity.
     """
+    if self._episode_sampling == EPISODE_START and num_steps is None:
+      raise ValueError('EPISODE_START sampling requires num_steps.')
+
     with tf.device(self._device), tf.name_scope(self._scope):
       with tf.name_scope('get_next'):
+        # In EPISODE_START mode sub-episodes are padded, so they can start at
+        # any valid id.
         min_val, max_val = self._valid_range_ids(
-            self._get_last_id(), self._max_length, num_steps)
+            self._get_last_id(), self._max_length,
+            None if self._episode_sampling == EPISODE_START else num_steps)
         rows_shape = () if sample_batch_size is None else (sample_batch_size,)
         assert_nonempty = tf.compat.v1.assert_greater(
             max_val,
@@ -179,40 +322,42 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
               true_fn=lambda: 0.,
               false_fn=lambda: 1. / tf.cast(num_ids * self._batch_size,  # pylint: disable=g-long-lambda
                                             tf.float32))
-          ids = tf.random.uniform(
-              rows_shape, minval=min_val, maxval=max_val, dtype=tf.int64)
-
-        # Move each id sample to a random batch.
-        batch_offsets = tf.random.uniform(
-            rows_shape, minval=0, maxval=self._batch_size, dtype=tf.int64)
-        batch_offsets *= self._max_length
-        ids += batch_offsets
+          ids, segments = self._sample_ids(rows_shape, min_val, max_val)
+
+        episode_ids = None
+        if num_steps is not None:
+          if self._episode_sampling == WITHIN_EPISODE:
+            ids, segments = self._resample_straddling_ids(
+                ids, segments, min_val, max_val, num_steps)
+          elif self._episode_sampling == EPISODE_START:
+            episode_ids = self._episode_table.read(
+                self._get_rows(ids, segments))
+            # The first steps of the episode may have been overwritten.
+            ids = tf.maximum(episode_ids, min_val)
 
         if num_steps is None:
-          rows_to_get = tf.math.mod(ids, self._capacity)
-          data = self._data_table.read(rows_to_get)
-          data_ids = self._id_table.read(rows_to_get)
+          data, data_ids = self._read_window(ids, segments)
         else:
           if time_stacked:
             step_range = tf.range(num_steps, dtype=tf.int64)
             if sample_batch_size:
-              step_range = tf.reshape(step_range, [1, num_steps])
-              step_range = tf.tile(step_range, [sample_batch_size, 1])
-              ids = tf.tile(tf.expand_dims(ids, -1), [1, num_steps])
-            else:
-              step_range = tf.reshape(step_range, [num_steps])
-
-            rows_to_get = tf.math.mod(step_range + ids, self._capacity)
-            data = self._data_table.read(rows_to_get)
-            data_ids = self._id_table.read(rows_to_get)
+              # Broadcast [sample_batch_size, 1] samples over [1, num_steps]
+              # steps.
+              step_range = tf.expand_dims(step_range, 0)
+              ids, segments = tf.expand_dims(ids, -1), tf.expand_dims(
+                  segments, -1)
+              if episode_ids is not None:
+                episode_ids = tf.expand_dims(episode_ids, -1)
+            data, data_ids = self._read_window(
+                ids + step_range, segments, episode_ids)
           else:
             data = []
             data_ids = []
             for step in range(num_steps):
-              steps_to_get = tf.math.mod(ids + step, self._capacity)
-              items = self._data_table.read(steps_to_get)
+              items, items_ids = self._read_window(
+                  ids + step, segments, episode_ids)
               data.append(items)
-              data_ids.append(self._id_table.read(steps_to_get))
+              data_ids.append(items_ids)
             data = tuple(data)
             data_ids = tuple(data_ids)
         probabilities = tf.fill(rows_shape, probability)
@@ -305,8 +450,13 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
       op that clears or unlinks the replay buffer contents.
     """
     table_vars = self._data_table.variables() + self._id_table.variables()
+    if self._episode_sampling is not None:
+      table_vars += self._episode_table.variables()
     def _init_vars():
       assignments = [self._last_id.assign(-1)]
+      if self._episode_sampling is not None:
+        assignments.append(self._episode_start_ids.assign(
+            tf.fill([self._batch_size], tf.constant(-1, dtype=tf.int64))))
       if clear_all_variables:
         assignments += [v.assign(tf.zeros_like(v)) for v in table_vars]
       return tf.group(*assignments, name='clear')
@@ -352,6 +502,44 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
       return self._last_id.assign_add(increment).value()
     return self._last_id_cs.execute(_assign_add)
 
+  def _increment_last_id_and_episode_starts(self, is_first):
+    """Increments the last_id and tracks episode starts in a thread safe manner.
+
+    Args:
+      is_first: A bool tensor of shape [batch_size, num_steps], whether each of
+        the sequences of items being added is the first step of an episode.
+    Returns:
+      A tuple (last_id, episode_start_ids) with the last_id incremented by
+      num_steps and, for each of the added items, the id of the first item of
+      the episode it belongs to, with shape [batch_size, num_steps].
+    """
+    num_steps = tf.shape(input=is_first, out_type=tf.int64)[1]
+    steps = tf.range(num_steps, dtype=tf.int64)
+
+    def _assign_add():
+      last_id = self._last_id.assign_add(num_steps).value()
+      ids = last_id - num_steps + 1 + steps
+      previous_start_ids = self._episode_start_ids.value()
+      # Items added to an empty segment start an episode, even when they are
+      # not the first step of one.
+      new_episode = tf.logical_or(
+          is_first,
+          tf.logical_and(
+              tf.expand_dims(previous_start_ids < 0, -1),
+              tf.expand_dims(tf.equal(steps, 0), 0)))
+      # The episode of each item started at the last episode start up to it,
+      # ids being increasing: a cumulative max over the steps.
+      start_ids = tf.compat.v2.where(new_episode, ids, -1)
+      episode_start_ids = tf.transpose(
+          a=tf.scan(
+              tf.maximum,
+              tf.transpose(a=start_ids),
+              initializer=previous_start_ids))
+      assign_op = self._episode_start_ids.assign(episode_start_ids[:, -1])
+      with tf.control_dependencies([assign_op]):
+        return tf.identity(last_id), tf.identity(episode_start_ids)
+    return self._last_id_cs.execute(_assign_add)
+
   def _get_last_id(self):
 
     def last_id():
@@ -364,3 +552,97 @@ class TFUniformReplayBuffer(replay_buffer.ReplayBuffer):
     id_mod = tf.math.mod(id_, self._max_length)
     rows = self._batch_offsets + id_mod
     return rows
+
+  def _get_rows(self, ids, segments):
+    """Returns the rows holding ids in the given batch segments (broadcast)."""
+    return segments * self._max_length + tf.math.mod(ids, self._max_length)
+
+  def _sample_ids(self, rows_shape, min_val, max_val):
+    """Samples ids in [min_val, max_val) and batch segments uniformly."""
+    ids = tf.random.uniform(
+        rows_shape, minval=min_val, maxval=max_val, dtype=tf.int64)
+    # Move each id sample to a random batch segment.
+    segments = tf.random.uniform(
+        rows_shape, minval=0, maxval=self._batch_size, dtype=tf.int64)
+    return ids, segments
+
+  def _resample_straddling_ids(self, ids, segments, min_val, max_val,
+                               num_steps):
+    """Resamples the sub-episodes that straddle an episode boundary.
+
+    Episode start ids never decrease along a batch segment, so the num_steps
+    items starting at an id belong to a single episode iff the first and last
+    of them do.
+
+    Args:
+      ids: Sampled ids of the first item of each sub-episode.
+      segments: Sampled batch segments of each sub-episode.
+      min_val: Minimum valid id (inclusive).
+      max_val: Maximum valid id (exclusive).
+      num_steps: Number of items in each sub-episode.
+    Returns:
+      A tuple (ids, segments) of sub-episodes within a single episode.
+    """
+    def straddling(ids, segments):
+      first = self._episode_table.read(self._get_rows(ids, segments))
+      last = self._episode_table.read(
+          self._get_rows(ids + num_steps - 1, segments))
+      return tf.not_equal(first, last)
+
+    def loop_cond(unused_ids, unused_segments, straddles):
+      return tf.reduce_any(input_tensor=straddles)
+
+    def loop_body(ids, segments, straddles):
+      new_ids, new_segments = self._sample_ids(
+          tf.shape(input=ids), min_val, max_val)
+      ids = tf.compat.v1.where(straddles, new_ids, ids)
+      segments = tf.compat.v1.where(straddles, new_segments, segments)
+      return ids, segments, straddling(ids, segments)
+
+    ids, segments, straddles = tf.while_loop(
+        cond=loop_cond,
+        body=loop_body,
+        loop_vars=[ids, segments, straddling(ids, segments)],
+        back_prop=False,
+        maximum_iterations=_MAX_EPISODE_RESAMPLING_ITERATIONS,
+        name='resample_straddling_ids')
+    assert_within_episode = tf.compat.v1.assert_equal(
+        tf.reduce_any(input_tensor=straddles),
+        False,
+        message='Could not sample sub-episodes within a single episode. Make '
+        'sure the buffer holds episodes longer than num_steps.')
+    with tf.control_dependencies([assert_within_episode]):
+      return tf.identity(ids), tf.identity(segments)
+
+  def _read_window(self, ids, segments, episode_ids=None):
+    """Reads the items with the given ids and batch segments.
+
+    Args:
+      ids: Ids of the items to read.
+      segments: Batch segments of the items to read, broadcast against ids.
+      episode_ids: Optional episode start ids, broadcast against ids. If
+        provided, the items not belonging to these episodes (or not yet added)
+        are replaced by zeros and their ids by -1.
+    Returns:
+      A tuple (data, data_ids).
+    """
+    rows = self._get_rows(ids, segments)
+    data = self._data_table.read(rows)
+    data_ids = self._id_table.read(rows)
+    if episode_ids is None:
+      return data, data_ids
+
+    in_episode = tf.logical_and(
+        tf.equal(self._episode_table.read(rows), episode_ids),
+        tf.equal(data_ids, ids))
+
+    def pad(t):
+      mask = in_episode
+      for _ in range(t.shape.ndims - in_episode.shape.ndims):
+        mask = tf.expand_dims(mask, -1)
+      return tf.compat.v2.where(mask, t, tf.zeros_like(t))
+
+    data = tf.nest.map_structure(pad, data)
+    data_ids = tf.compat.v2.where(in_episode, data_ids,
+                                  -tf.ones_like(data_ids))
+    return data, data_ids
@@ -23,10 +23,15 @@ import numpy as np
 import tensorflow as tf
 
 from tf_agents import specs
+from tf_agents.replay_buffers import table
 from tf_agents.replay_buffers import tf_uniform_replay_buffer
+from tf_agents.trajectories import time_step as ts
+from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
 from tf_agents.utils import test_utils
 
+from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
+
 
 def _get_add_op(spec, replay_buffer, batch_size):
   # TODO(b/68398658) Remove dtypes once scatter_update is fixed.
@@ -41,6 +46,59 @@ def _get_add_op(spec, replay_buffer, batch_size):
   return values, replay_buffer.add_batch(values_batched)
 
 
+def _trajectory_spec():
+  return trajectory.Trajectory(
+      step_type=specs.TensorSpec([], tf.int32, 'step_type'),
+      observation=specs.TensorSpec([], tf.int64, 'observation'),
+      action=specs.TensorSpec([], tf.int32, 'action'),
+      policy_info=(),
+      next_step_type=specs.TensorSpec([], tf.int32, 'next_step_type'),
+      reward=specs.TensorSpec([], tf.float32, 'reward'),
+      discount=specs.TensorSpec([], tf.float32, 'discount'))
+
+
+def _add_episodes(replay_buffer, batch_size, num_items, episode_length):
+  """Adds episodes whose observations are `item index + 100 * batch index`."""
+
+  @common.function(autograph=True)
+  def add_data():
+    for i in tf.range(num_items, dtype=tf.int64):
+      step_type = tf.cond(
+          pred=tf.equal(tf.math.mod(i, episode_length), 0),
+          true_fn=lambda: ts.StepType.FIRST,
+          false_fn=lambda: ts.StepType.MID)
+      step_type = tf.fill([batch_size], step_type)
+      zeros = tf.zeros([batch_size])
+      replay_buffer.add_batch(trajectory.Trajectory(
+          step_type=step_type,
+          observation=tf.range(0, 100 * batch_size, 100, dtype=tf.int64) + i,
+          action=tf.zeros([batch_size], dtype=tf.int32),
+          policy_info=(),
+          next_step_type=step_type,
+          reward=zeros,
+          discount=zeros))
+
+  return add_data()
+
+
+def _episode_sequences(batch_size, num_items, episode_length):
+  """Returns the items added by `_add_episodes`, shape [batch_size, items]."""
+  items = np.arange(num_items)
+  step_type = np.where(items % episode_length == 0, ts.StepType.FIRST,
+                       ts.StepType.MID).astype(np.int32)
+  step_type = np.tile(step_type, [batch_size, 1])
+  zeros = np.zeros([batch_size, num_items], dtype=np.float32)
+  return trajectory.Trajectory(
+      step_type=step_type,
+      observation=(100 * np.arange(batch_size)[:, None] + items).astype(
+          np.int64),
+      action=np.zeros([batch_size, num_items], dtype=np.int32),
+      policy_info=(),
+      next_step_type=step_type,
+      reward=zeros,
+      discount=zeros)
+
+
 class TFUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
 
   def _assertContains(self, list1, list2):
@@ -191,6 +249,47 @@ class TFUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
     tf.nest.map_structure(check_np_arrays_everything_equal, empty_items,
                           self.evaluate(replay_buffer.gather_all()))
 
+  @test_util.run_in_graph_and_eager_modes()
+  def testFusedTable(self):
+    batch_size = 2
+    spec = self._data_spec()
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec,
+        batch_size=batch_size,
+        max_length=10,
+        table_fn=table.FusedTable)
+
+    action = tf.constant(1 * np.ones(spec[0].shape.as_list(), dtype=np.float32))
+    lidar = tf.constant(
+        2 * np.ones(spec[1][0].shape.as_list(), dtype=np.float32))
+    camera = tf.constant(
+        3 * np.ones(spec[1][1].shape.as_list(), dtype=np.float32))
+    values = [action, [lidar, camera]]
+    values_batched = tf.nest.map_structure(lambda t: tf.stack([t] * batch_size),
+                                           values)
+
+    # Adding, sampling and clearing all the variables fit in a single graph.
+    if tf.executing_eagerly():
+      add_op = lambda: replay_buffer.add_batch(values_batched)
+      sample = lambda: replay_buffer.get_next(sample_batch_size=3)[0]
+      clear_op = lambda: replay_buffer._clear(clear_all_variables=True)
+    else:
+      add_op = replay_buffer.add_batch(values_batched)
+      sample = replay_buffer.get_next(sample_batch_size=3)[0]
+      clear_op = replay_buffer._clear(clear_all_variables=True)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    empty_items = self.evaluate(replay_buffer.gather_all())
+    self.evaluate(add_op)
+    self.evaluate(add_op)
+    values_ = self.evaluate(values)
+    tf.nest.map_structure(lambda x, y: self._assertContains([x], list(y)),
+                          values_, self.evaluate(sample))
+
+    self.evaluate(clear_op)
+    tf.nest.map_structure(np.testing.assert_equal, empty_items,
+                          self.evaluate(replay_buffer.gather_all()))
+
   @parameterized.named_parameters(
       ('BatchSizeOne', 1),
       ('BatchSizeFive', 5),
@@ -433,6 +532,165 @@ class TFUniformReplayBufferTest(parameterized.TestCase, tf.test.TestCase):
           1. / min(i * buffer_batch_size, max_length * buffer_batch_size))
       self.assertAllClose(expected_probability, probabilities_)
 
+  @parameterized.named_parameters(
+      ('BatchSizeOne', 1),
+      ('BatchSizeFive', 5),
+  )
+  def testMultiStepSamplingWithinBatchSegments(self, batch_size):
+    spec = specs.TensorSpec([], tf.int64, 'action')
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        spec, batch_size=batch_size, max_length=4)
+
+    @common.function(autograph=True)
+    def add_data():
+      # Each element has its batch index in the 100s place.
+      for i in tf.range(10, dtype=tf.int64):
+        batch = tf.range(0, batch_size * 100, 100, dtype=tf.int64) + i
+        replay_buffer.add_batch(batch)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    self.evaluate(add_data())
+
+    if tf.executing_eagerly():
+      steps = lambda: replay_buffer.get_next(10, num_steps=3)[0]
+    else:
+      steps, _ = replay_buffer.get_next(10, num_steps=3)
+    for _ in range(100):
+      steps_ = self.evaluate(steps)
+      self.assertAllEqual(steps_[:, 0] + 1, steps_[:, 1])
+      self.assertAllEqual(steps_[:, 0] + 2, steps_[:, 2])
+
+  @parameterized.named_parameters(
+      ('BatchSizeOne', 1),
+      ('BatchSizeFive', 5),
+  )
+  def testAddSequence(self, batch_size):
+    sequences = _episode_sequences(batch_size, 12, 3)
+    batch_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        _trajectory_spec(), batch_size=batch_size, max_length=10,
+        scope='batch_rb')
+    sequence_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        _trajectory_spec(), batch_size=batch_size, max_length=10,
+        scope='sequence_rb')
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+
+    for i in range(12):
+      self.evaluate(batch_buffer.add_batch(
+          tf.nest.map_structure(lambda t: t[:, i], sequences)))  # pylint: disable=cell-var-from-loop
+    # Sequences of 4 items, wrapping around max_length.
+    for i in range(0, 12, 4):
+      self.evaluate(sequence_buffer.add_sequence(
+          tf.nest.map_structure(lambda t: t[:, i:i + 4], sequences)))  # pylint: disable=cell-var-from-loop
+
+    expected_items = self.evaluate(batch_buffer.gather_all())
+    items = self.evaluate(sequence_buffer.gather_all())
+    tf.nest.map_structure(self.assertAllEqual, expected_items, items)
+    self.assertAllEqual(
+        np.arange(2, 12), items.observation[0])
+    sample, buffer_info = sequence_buffer.get_next(3, num_steps=2)
+    sample, buffer_info = self.evaluate((sample, buffer_info))
+    self.assertAllEqual(buffer_info.ids[:, 0] + 1, buffer_info.ids[:, 1])
+    self.assertAllEqual(sample.observation % 100, buffer_info.ids)
+
+  def testAddSequenceLongerThanMaxLength(self):
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        _trajectory_spec(), batch_size=1, max_length=3)
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      self.evaluate(replay_buffer.add_sequence(_episode_sequences(1, 4, 2)))
+
+  @parameterized.named_parameters(
+      ('BatchSizeOne', 1),
+      ('BatchSizeFive', 5),
+  )
+  def testAddSequenceSampleWithinEpisode(self, batch_size):
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        _trajectory_spec(),
+        batch_size=batch_size,
+        max_length=10,
+        episode_sampling=tf_uniform_replay_buffer.WITHIN_EPISODE)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    # Episodes of 3 steps added in sequences of 4 steps, the first episode is
+    # partially overwritten.
+    sequences = _episode_sequences(batch_size, 16, 3)
+    for i in range(0, 16, 4):
+      self.evaluate(replay_buffer.add_sequence(
+          tf.nest.map_structure(lambda t: t[:, i:i + 4], sequences)))  # pylint: disable=cell-var-from-loop
+
+    if tf.executing_eagerly():
+      sample = lambda: replay_buffer.get_next(10, num_steps=3)[0]
+    else:
+      sample, _ = replay_buffer.get_next(10, num_steps=3)
+    for _ in range(100):
+      observation = self.evaluate(sample).observation
+      # Only windows aligned with the 3 step episodes are within an episode.
+      self.assertAllEqual(np.zeros(10), observation[:, 0] % 100 % 3)
+      self.assertAllEqual(observation[:, 0] + 1, observation[:, 1])
+      self.assertAllEqual(observation[:, 0] + 2, observation[:, 2])
+
+  def testEpisodeSamplingRequiresTrajectory(self):
+    with self.assertRaisesRegexp(ValueError, 'spec of a trajectory'):
+      tf_uniform_replay_buffer.TFUniformReplayBuffer(
+          self._data_spec(),
+          batch_size=1,
+          episode_sampling=tf_uniform_replay_buffer.WITHIN_EPISODE)
+
+  @parameterized.named_parameters(
+      ('BatchSizeOne', 1),
+      ('BatchSizeFive', 5),
+  )
+  def testSampleWithinEpisode(self, batch_size):
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        _trajectory_spec(),
+        batch_size=batch_size,
+        max_length=10,
+        episode_sampling=tf_uniform_replay_buffer.WITHIN_EPISODE)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    # Episodes of 3 steps, the first one is partially overwritten.
+    self.evaluate(_add_episodes(replay_buffer, batch_size, 14, 3))
+
+    if tf.executing_eagerly():
+      sample = lambda: replay_buffer.get_next(10, num_steps=3)[0]
+    else:
+      sample, _ = replay_buffer.get_next(10, num_steps=3)
+    for _ in range(100):
+      observation = self.evaluate(sample).observation
+      # Only windows aligned with the 3 step episodes are within an episode.
+      self.assertAllEqual(np.zeros(10), observation[:, 0] % 100 % 3)
+      self.assertAllEqual(observation[:, 0] + 1, observation[:, 1])
+      self.assertAllEqual(observation[:, 0] + 2, observation[:, 2])
+
+  def testSampleEpisodeStart(self):
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        _trajectory_spec(),
+        batch_size=2,
+        max_length=20,
+        episode_sampling=tf_uniform_replay_buffer.EPISODE_START)
+
+    self.evaluate(tf.compat.v1.global_variables_initializer())
+    # Episodes of 3 steps, the last one is not complete.
+    self.evaluate(_add_episodes(replay_buffer, 2, 11, 3))
+
+    if tf.executing_eagerly():
+      sample = lambda: replay_buffer.get_next(10, num_steps=5)
+    else:
+      sample = replay_buffer.get_next(10, num_steps=5)
+    for _ in range(100):
+      items, buffer_info = self.evaluate(sample)
+      observation = items.observation
+      self.assertAllEqual(np.zeros(10), observation[:, 0] % 100 % 3)
+      for episode_observation, ids in zip(observation, buffer_info.ids):
+        start = episode_observation[0]
+        length = min(3, 11 - start % 100)
+        expected_observation = [start + i for i in range(length)]
+        expected_observation += [0] * (5 - length)
+        self.assertAllEqual(expected_observation, episode_observation)
+        expected_ids = [start % 100 + i for i in range(length)]
+        expected_ids += [-1] * (5 - length)
+        self.assertAllEqual(expected_ids, ids)
+
 
 if __name__ == '__main__':
   tf.test.main()
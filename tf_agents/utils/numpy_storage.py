@@ -19,6 +19,8 @@ from __future__ import division
 from __future__ import print_function
 
 import io
+import zlib
+
 import numpy as np
 import tensorflow as tf
 
@@ -145,7 +147,12 @@ class _NumpyWrapper(tf.train.experimental.PythonState):
     """Callback to serialize the array."""
     string_file = io.BytesIO()
     try:
-      np.save(string_file, self.array, allow_pickle=False)
+      if self.array.dtype == np.object_:
+        # Object arrays hold variable length bytes (the compressed slots of a
+        # `NumpyStorage`), which are saved concatenated to avoid pickling.
+        np.savez(string_file, **_pack_bytes_array(self.array))
+      else:
+        np.save(string_file, self.array, allow_pickle=False)
       serialized = string_file.getvalue()
     finally:
       string_file.close()
@@ -155,11 +162,39 @@ class _NumpyWrapper(tf.train.experimental.PythonState):
     """Callback to deserialize the array."""
     string_file = io.BytesIO(string_value)
     try:
-      self.array = np.load(string_file, allow_pickle=False)
+      array = np.load(string_file, allow_pickle=False)
+      if isinstance(array, np.lib.npyio.NpzFile):
+        # Packed bytes array, see `serialize`.
+        with array:
+          array = _unpack_bytes_array(array['lengths'], array['data'])
+      self.array = array
     finally:
       string_file.close()
 
 
+def _pack_bytes_array(array):
+  """Packs an object array of bytes (or None) into two numeric arrays."""
+  flat = array.ravel()
+  lengths = np.array([-1 if element is None else len(element)
+                      for element in flat], dtype=np.int64)
+  data = np.frombuffer(
+      b''.join(element for element in flat if element is not None),
+      dtype=np.uint8)
+  return {'lengths': lengths.reshape(array.shape), 'data': data}
+
+
+def _unpack_bytes_array(lengths, data):
+  """Inverse of `_pack_bytes_array`."""
+  array = np.empty(lengths.size, dtype=np.object_)
+  data = data.tobytes()
+  offset = 0
+  for i, length in enumerate(lengths.ravel()):
+    if length >= 0:
+      array[i] = data[offset:offset + length]
+      offset += length
+  return array.reshape(lengths.shape)
+
+
 class NumpyStorage(tf.Module):
   """A class to store nested objects in a collection of numpy arrays.
 
@@ -168,15 +203,26 @@ class NumpyStorage(tf.Module):
   two arrays, one for the 'foo' key and one for the 'bar' key. The .get and
   .set methods would return/take Python dictionaries, but break down the
   component arrays before storing them.
+
+  Large components (e.g. pixel observations) can optionally be stored
+  zlib-compressed by setting `compression_min_bytes`. Compressed components are
+  kept as bytes in an object array and inflated again by `get`, or by
+  `decompress` when they were read with `get(..., decompress=False)`.
   """
 
-  def __init__(self, data_spec, capacity):
+  def __init__(self, data_spec, capacity, compression_min_bytes=None,
+               compression_level=1):
     """Creates a NumpyStorage object.
 
     Args:
       data_spec: An ArraySpec or a list/tuple/nest of ArraySpecs describing a
         single item that can be stored in this table.
       capacity: The maximum number of items that can be stored in the buffer.
+      compression_min_bytes: Optional size in bytes. Components of data_spec
+        whose items are at least this large are stored compressed. If None
+        (default), nothing is compressed.
+      compression_level: zlib compression level used for compressed
+        components, from 1 (fastest) to 9 (smallest).
 
     Raises:
       ValueError: If data_spec is not an instance or nest of ArraySpecs.
@@ -191,6 +237,12 @@ class NumpyStorage(tf.Module):
     self._data_spec = data_spec
     self._flat_specs = tf.nest.flatten(data_spec)
     self._np_state = NumpyState()
+    self._compression_level = compression_level
+    self._compressed = data_structures.NoDependency([
+        compression_min_bytes is not None and
+        _spec_nbytes(spec) >= compression_min_bytes
+        for spec in self._flat_specs
+    ])
 
     self._buf_names = data_structures.NoDependency([])
     for idx in range(len(self._flat_specs)):
@@ -206,20 +258,73 @@ class NumpyStorage(tf.Module):
     """Creates or retrieves one of the numpy arrays backing the storage."""
     array = getattr(self._np_state, self._buf_names[index])
     if np.isscalar(array) or array.ndim == 0:
-      spec = self._flat_specs[index]
-      shape = (self._capacity,) + spec.shape
-      array = np.zeros(shape=shape, dtype=spec.dtype)
+      if self._compressed[index]:
+        # Rows that were never set hold None, see `_decompress_element`.
+        array = np.empty(shape=(self._capacity,), dtype=np.object_)
+      else:
+        spec = self._flat_specs[index]
+        shape = (self._capacity,) + spec.shape
+        array = np.zeros(shape=shape, dtype=spec.dtype)
       setattr(self._np_state, self._buf_names[index], array)
     return array
 
-  def get(self, idx):
-    """Get value stored at idx."""
+  @property
+  def has_compressed_items(self):
+    """Whether any component of the stored items is compressed."""
+    return any(self._compressed)
+
+  def get(self, idx, decompress=True):
+    """Get value stored at idx.
+
+    Args:
+      idx: The row to read.
+      decompress: If False, compressed components are returned as bytes and
+        must be inflated with `decompress`. This allows reading rows quickly
+        (e.g. under a lock) and decompressing them later, possibly in parallel.
+
+    Returns:
+      The item stored at idx.
+    """
     encoded_item = []
     for buf_idx in range(len(self._flat_specs)):
       encoded_item.append(self._array(buf_idx)[idx])
+    if decompress:
+      encoded_item = self._decompress_flat(encoded_item)
     return tf.nest.pack_sequence_as(self._data_spec, encoded_item)
 
+  def decompress(self, item):
+    """Inflates the compressed components of an item read with `get`."""
+    return tf.nest.pack_sequence_as(
+        self._data_spec, self._decompress_flat(tf.nest.flatten(item)))
+
   def set(self, table_idx, value):
     """Set table_idx to value."""
     for nest_idx, element in enumerate(tf.nest.flatten(value)):
+      if self._compressed[nest_idx]:
+        spec = self._flat_specs[nest_idx]
+        element = zlib.compress(
+            np.ascontiguousarray(element, dtype=spec.dtype).tobytes(),
+            self._compression_level)
       self._array(nest_idx)[table_idx] = element
+
+  def _decompress_flat(self, flat_item):
+    if not self.has_compressed_items:
+      return flat_item
+    return [
+        self._decompress_element(spec, element) if compressed else element
+        for spec, compressed, element in zip(self._flat_specs,
+                                             self._compressed, flat_item)
+    ]
+
+  def _decompress_element(self, spec, element):
+    if element is None:
+      return np.zeros(shape=spec.shape, dtype=spec.dtype)
+    # Arrays over bytes are read-only, unlike arrays over a bytearray.
+    return np.frombuffer(
+        bytearray(zlib.decompress(element)),
+        dtype=spec.dtype).reshape(spec.shape)
+
+
+def _spec_nbytes(spec):
+  """Returns the size in bytes of a single array described by spec."""
+  return int(np.prod(spec.shape, dtype=np.int64)) * spec.dtype.itemsize
@@ -23,6 +23,7 @@ import os
 import numpy as np
 import tensorflow as tf
 
+from tf_agents.specs import array_spec
 from tf_agents.utils import numpy_storage
 
 from tensorflow.python.framework import test_util  # pylint:disable=g-direct-tensorflow-import  # TF internal
@@ -50,5 +51,59 @@ class NumpyStorageTest(tf.test.TestCase):
     self.assertAllEqual(np.ones([3, 4]), second_checkpoint.numpy_arrays.x)
 
 
+class NumpyStorageCompressionTest(tf.test.TestCase):
+
+  def _data_spec(self):
+    return {
+        'pixels': array_spec.ArraySpec((84, 84, 4), np.uint8),
+        'reward': array_spec.ArraySpec((), np.float32),
+    }
+
+  def testGetSetCompressed(self):
+    storage = numpy_storage.NumpyStorage(
+        self._data_spec(), capacity=3, compression_min_bytes=1000)
+    self.assertTrue(storage.has_compressed_items)
+
+    pixels = np.zeros((84, 84, 4), dtype=np.uint8)
+    pixels[10:20, 30:40] = 255
+    storage.set(1, {'pixels': pixels, 'reward': np.float32(2.)})
+
+    item = storage.get(1)
+    self.assertAllEqual(pixels, item['pixels'])
+    self.assertEqual(np.uint8, item['pixels'].dtype)
+    self.assertTrue(item['pixels'].flags.writeable)
+    self.assertEqual(2., item['reward'])
+
+    raw_item = storage.get(1, decompress=False)
+    self.assertIsInstance(raw_item['pixels'], bytes)
+    self.assertLess(len(raw_item['pixels']), pixels.nbytes)
+    self.assertAllEqual(pixels, storage.decompress(raw_item)['pixels'])
+
+    # Rows that were never set decompress to zeros.
+    self.assertAllEqual(np.zeros_like(pixels), storage.get(0)['pixels'])
+
+  def testNoCompressionByDefault(self):
+    storage = numpy_storage.NumpyStorage(self._data_spec(), capacity=3)
+    self.assertFalse(storage.has_compressed_items)
+
+  def testSaveRestoreCompressed(self):
+    storage = numpy_storage.NumpyStorage(
+        self._data_spec(), capacity=3, compression_min_bytes=1000)
+    pixels = np.random.randint(0, 256, size=(84, 84, 4)).astype(np.uint8)
+    storage.set(0, {'pixels': pixels, 'reward': np.float32(1.)})
+    checkpoint = tf.train.Checkpoint(storage=storage)
+    prefix = os.path.join(self.get_temp_dir(), 'ckpt')
+    save_path = checkpoint.save(prefix)
+
+    restored_storage = numpy_storage.NumpyStorage(
+        self._data_spec(), capacity=3, compression_min_bytes=1000)
+    tf.train.Checkpoint(storage=restored_storage).restore(save_path)
+    self.assertAllEqual(pixels, restored_storage.get(0)['pixels'])
+    self.assertEqual(1., restored_storage.get(0)['reward'])
+    # Rows that were never set are restored as such.
+    self.assertAllEqual(np.zeros_like(pixels),
+                        restored_storage.get(1)['pixels'])
+
+
 if __name__ == '__main__':
   tf.test.main()